@@ -28,6 +28,7 @@ KNOWN_GADGETS_FILE = "known_vulnerability_gadgets.pkl"
 SIMILARITY_RESULTS_FILE = "similarity_results.json"
 CANDIDATE_MATCHES_FILE = "candidate_matches.pkl"
 SIMILARITY_MATRIX_FILE = "similarity_matrix.npy"
+SHORTLIST_TOP_K = 25  # Gadgets per candidate that get the expensive metrics (None = all)
 
 @dataclass
 class NormalizedInstruction:
@@ -414,6 +415,79 @@ class SemanticSimilarityMatcher:
             return similarity
         except:
             return 0.0
+    
+    def transform(self, sequences: List[List[NormalizedInstruction]]):
+        """TF-IDF rows (L2-normalized) for sequences, or None if not fitted"""
+        if not self.is_fitted:
+            return None
+        documents = [' '.join(instr.to_string() for instr in seq) for seq in sequences]
+        return self.vectorizer.transform(documents)
+    
+    def similarity_from_vectors(self, vec1, vec2) -> float:
+        """Cosine similarity of two rows returned by transform()"""
+        if vec1 is None or vec2 is None:
+            return 0.0
+        # Rows are already L2-normalized, so cosine is a sparse dot product
+        return float(vec1.multiply(vec2).sum())
+
+class NGramGadgetIndex:
+    """Inverted N-gram index over library gadgets.
+
+    Scores one candidate against every gadget using only the posting lists of
+    the candidate's own N-grams. The score is exactly
+    NGramSimilarityMatcher.compute_weighted_similarity(compute_ngram_similarity(...)),
+    so it is a cheap prefilter for the expensive alignment/LCS/graph metrics.
+    """
+
+    def __init__(self, gadgets: Dict[str, 'VulnerabilityGadget'], n_values: List[int]):
+        self.names = list(gadgets.keys())
+        self.n_values = list(n_values)
+        self.weights = np.array(self.n_values, dtype=np.float64)
+        # postings[n][ngram] -> gadget indices containing that ngram
+        self.postings: Dict[int, Dict[Tuple, List[int]]] = {n: defaultdict(list) for n in self.n_values}
+        self.sizes = np.zeros((len(self.names), len(self.n_values)), dtype=np.float64)
+
+        for g_idx, name in enumerate(self.names):
+            gadget = gadgets[name]
+            for k, n in enumerate(self.n_values):
+                grams = gadget.ngrams.get(n, set())
+                self.sizes[g_idx, k] = len(grams)
+                for gram in grams:
+                    self.postings[n][gram].append(g_idx)
+
+    def __len__(self):
+        return len(self.names)
+
+    def score_all(self, ngrams_by_n: Dict[int, Set[Tuple]]) -> np.ndarray:
+        """Weighted N-gram Jaccard of one candidate against every gadget"""
+        inter = np.zeros_like(self.sizes)
+        cand_sizes = np.zeros(len(self.n_values), dtype=np.float64)
+        for k, n in enumerate(self.n_values):
+            grams = ngrams_by_n.get(n, set())
+            cand_sizes[k] = len(grams)
+            postings = self.postings[n]
+            for gram in grams:
+                hits = postings.get(gram)
+                if hits:
+                    inter[hits, k] += 1
+
+        union = self.sizes + cand_sizes - inter
+        both = (self.sizes > 0) & (cand_sizes > 0)
+        sims = np.where(both, inter / np.maximum(union, 1), 0.0)
+        return sims @ self.weights / self.weights.sum()
+
+    def shortlist(self, ngrams_by_n: Dict[int, Set[Tuple]], top_k: Optional[int]) -> List[int]:
+        """Indices (in library order) of the top_k gadgets sharing at least one N-gram.
+        top_k=None disables the prefilter and returns every gadget."""
+        if top_k is None:
+            return list(range(len(self.names)))
+        scores = self.score_all(ngrams_by_n)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            # Stable sort: ties keep library order
+            order = np.argsort(-scores[candidates], kind='stable')[:top_k]
+            candidates = candidates[order]
+        return sorted(candidates.tolist())
 
 class VulnerabilityGadgetLibrary:
     """Manager for known vulnerability gadgets"""
@@ -496,8 +570,9 @@ class VulnerabilityGadgetLibrary:
 class SimilarityAnalyzer:
     """Main similarity analysis engine"""
     
-    def __init__(self):
+    def __init__(self, shortlist_k: Optional[int] = SHORTLIST_TOP_K):
         self.gadget_library = VulnerabilityGadgetLibrary()
+        self.shortlist_k = shortlist_k
         self.normalizer = AssemblyNormalizer()
         
         # Similarity matchers
@@ -644,19 +719,39 @@ class SimilarityAnalyzer:
         return github_candidates
     
     def _find_similar_sequences(self, github_gadgets: List[Dict]):
-        """Find similar sequences between GitHub and known vulnerabilities"""
-        total_comparisons = len(github_gadgets) * len(self.gadget_library.gadgets)
+        """Find similar sequences between GitHub and known vulnerabilities.
+
+        Each candidate is first scored against the whole library through the
+        N-gram index. Only the shortlist_k best gadgets (those sharing at least
+        one N-gram) get the full set of similarity metrics.
+        """
+        gadgets = self.gadget_library.gadgets
+        index = NGramGadgetIndex(gadgets, self.ngram_matcher.n_values)
+        # Library CFGs are fixed: build them once, not once per pair
+        gadget_cfgs = {name: self.graph_matcher.build_cfg(g.instructions) for name, g in gadgets.items()}
+        gadget_tfidf = self.semantic_matcher.transform([g.instructions for g in gadgets.values()])
         processed = 0
         
-        for gh_candidate in github_gadgets:
+        for c_idx, gh_candidate in enumerate(github_gadgets):
             best_similarities = {}
             best_matches = []
             
-            for vuln_name, vuln_gadget in self.gadget_library.gadgets.items():
+            instructions = gh_candidate['instructions']
+            cand_ngrams = {n: self.ngram_matcher._generate_ngrams(instructions, n)
+                           for n in self.ngram_matcher.n_values}
+            cand_cfg = self.graph_matcher.build_cfg(instructions)
+            cand_tfidf = self.semantic_matcher.transform([instructions])
+            
+            for g_idx in index.shortlist(cand_ngrams, self.shortlist_k):
+                vuln_name = index.names[g_idx]
                 # Compute multiple similarity metrics
                 similarities = self._compute_all_similarities(
-                    gh_candidate['instructions'], 
-                    vuln_gadget.instructions
+                    instructions,
+                    gadgets[vuln_name].instructions,
+                    cfg1=cand_cfg,
+                    cfg2=gadget_cfgs[vuln_name],
+                    tfidf1=cand_tfidf,
+                    tfidf2=gadget_tfidf[g_idx] if gadget_tfidf is not None else None,
                 )
                 
                 # Combined similarity score
@@ -665,10 +760,11 @@ class SimilarityAnalyzer:
                 if combined_score > 0.3:  # Threshold for potential matches
                     best_similarities[vuln_name] = similarities
                     best_matches.append(vuln_name)
-                
                 processed += 1
-                if processed % 1000 == 0:
-                    print(f"  Processed {processed}/{total_comparisons} comparisons...")
+            
+            if (c_idx + 1) % 1000 == 0:
+                print(f"  Processed {c_idx + 1}/{len(github_gadgets)} candidates "
+                      f"({processed} full comparisons)...")
             
             # Create candidate match if we found any similarities
             if best_matches:
@@ -691,8 +787,15 @@ class SimilarityAnalyzer:
                 self.candidate_matches.append(candidate_match)
     
     def _compute_all_similarities(self, seq1: List[NormalizedInstruction], 
-                                 seq2: List[NormalizedInstruction]) -> Dict[str, float]:
-        """Compute all similarity metrics"""
+                                 seq2: List[NormalizedInstruction],
+                                 cfg1: Optional[nx.DiGraph] = None,
+                                 cfg2: Optional[nx.DiGraph] = None,
+                                 tfidf1=None, tfidf2=None) -> Dict[str, float]:
+        """Compute all similarity metrics.
+
+        cfg1/cfg2 and tfidf1/tfidf2 (SemanticSimilarityMatcher.transform rows)
+        let callers reuse per-sequence work across many pairs.
+        """
         similarities = {}
         
         # N-gram similarity
@@ -705,12 +808,17 @@ class SimilarityAnalyzer:
         similarities['lcs'] = self.alignment_matcher.compute_lcs_similarity(seq1, seq2)
         
         # Graph-based similarity
-        cfg1 = self.graph_matcher.build_cfg(seq1)
-        cfg2 = self.graph_matcher.build_cfg(seq2)
+        if cfg1 is None:
+            cfg1 = self.graph_matcher.build_cfg(seq1)
+        if cfg2 is None:
+            cfg2 = self.graph_matcher.build_cfg(seq2)
         similarities['graph'] = self.graph_matcher.compute_graph_similarity(cfg1, cfg2)
         
         # Semantic similarity
-        similarities['semantic'] = self.semantic_matcher.compute_semantic_similarity(seq1, seq2)
+        if tfidf1 is not None and tfidf2 is not None:
+            similarities['semantic'] = self.semantic_matcher.similarity_from_vectors(tfidf1, tfidf2)
+        else:
+            similarities['semantic'] = self.semantic_matcher.compute_semantic_similarity(seq1, seq2)
         
         return similarities
     
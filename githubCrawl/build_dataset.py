@@ -26,12 +26,14 @@ import os
 import sys
 import json
 import pickle
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Sequence, Tuple
 from pathlib import Path
 from random import shuffle, seed
 from collections import defaultdict
 
 from dsl_matcher import DSLMatcher
+from instruction_corpus import InstructionCorpus
+from instruction_semantics import SCANNER_SEMANTICS, semantic_flags, semantics_dict
 from minimal_subsequence import reduce_to_minimal_window
 
 
@@ -48,85 +50,18 @@ WINDOW_SIZES = [5, 8, 10, 15, 20]
 MAX_NEGATIVE_SAMPLES = 20000  # cap to keep dataset manageable
 
 
+def _instruction_semantics(opcode: str, operands: List[str], arch: str) -> Dict[str, bool]:
+    """Semantics dict of one instruction (the github_vulnerability_scanner table;
+    any non-x86 architecture is read as arm64)."""
+    table = SCANNER_SEMANTICS['x86_64' if arch == 'x86_64' else 'arm64']
+    return semantics_dict(semantic_flags(table, opcode.lower(), operands))
+
+
 def _ensure_semantics(instr: Dict[str, Any], arch: str) -> Dict[str, Any]:
-    """Attach semantics if missing (ported from github_vulnerability_scanner logic)."""
+    """Attach semantics if missing and normalize keys for the DSL."""
     if 'semantics' in instr and isinstance(instr['semantics'], dict):
         return instr
-    opcode = instr.get('opcode', '').lower()
-    operands = instr.get('operands', [])
-    sem = {
-        'is_branch': False,
-        'is_conditional': False,
-        'is_indirect': False,
-        'is_call': False,
-        'is_return': False,
-        'is_load': False,
-        'is_store': False,
-        'accesses_memory': False,
-        'is_arithmetic': False,
-        'is_comparison': False,
-        'is_speculation_barrier': False,
-        'is_cache_operation': False,
-        'is_timing_sensitive': False,
-        'is_privileged': False
-    }
-    if arch == 'x86_64':
-        if opcode.startswith('j'):
-            sem['is_branch'] = True
-            if opcode != 'jmp':
-                sem['is_conditional'] = True
-            if any('[' in op for op in operands):
-                sem['is_indirect'] = True
-        elif opcode in ['call', 'ret']:
-            sem['is_call'] = opcode == 'call'
-            sem['is_return'] = opcode == 'ret'
-            if opcode == 'call' and any('[' in op or '%' in op for op in operands):
-                sem['is_indirect'] = True
-        elif opcode in ['mov', 'movzx', 'movsx', 'movzbl', 'movzwl', 'lea']:
-            if any('[' in op for op in operands):
-                sem['accesses_memory'] = True
-                sem['is_load'] = True
-        elif opcode in ['add', 'sub', 'mul', 'div', 'xor', 'and', 'or', 'shl', 'shr']:
-            sem['is_arithmetic'] = True
-        elif opcode in ['cmp', 'test']:
-            sem['is_comparison'] = True
-        elif opcode in ['lfence', 'mfence', 'sfence']:
-            sem['is_speculation_barrier'] = True
-        elif opcode in ['clflush', 'clwb', 'clflushopt']:
-            sem['is_cache_operation'] = True
-        elif opcode in ['rdtsc', 'rdtscp']:
-            sem['is_timing_sensitive'] = True
-    else:  # arm64 default
-        if opcode.startswith('b'):
-            sem['is_branch'] = True
-            if '.' in opcode:
-                sem['is_conditional'] = True
-            if opcode in ['br', 'blr']:
-                sem['is_indirect'] = True
-        elif opcode in ['bl', 'blr', 'ret']:
-            sem['is_call'] = opcode in ['bl', 'blr']
-            sem['is_return'] = opcode == 'ret'
-            if opcode == 'blr':
-                sem['is_indirect'] = True
-        elif opcode in ['ldr', 'ldrb', 'ldrh', 'ldp']:
-            sem['is_load'] = True
-            sem['accesses_memory'] = True
-        elif opcode in ['str', 'strb', 'strh', 'stp']:
-            sem['is_store'] = True
-            sem['accesses_memory'] = True
-        elif opcode in ['add', 'sub', 'mul', 'div', 'and', 'orr', 'eor', 'lsl', 'lsr']:
-            sem['is_arithmetic'] = True
-        elif opcode in ['cmp', 'subs']:
-            sem['is_comparison'] = True
-        elif opcode in ['dsb', 'isb', 'dmb']:
-            sem['is_speculation_barrier'] = True
-        elif opcode in ['dc', 'ic']:
-            sem['is_cache_operation'] = True
-        elif opcode == 'mrs':
-            sem['is_timing_sensitive'] = True
-            sem['is_privileged'] = True
-
-    instr['semantics'] = sem
+    instr['semantics'] = _instruction_semantics(instr.get('opcode', ''), instr.get('operands', []), arch)
     # Normalize keys for DSL
     if 'raw' in instr and 'raw_line' not in instr:
         instr['raw_line'] = instr['raw']
@@ -135,7 +70,8 @@ def _ensure_semantics(instr: Dict[str, Any], arch: str) -> Dict[str, Any]:
     return instr
 
 
-def _sliding_windows(instructions: List[Dict[str, Any]], sizes: List[int]) -> List[Tuple[int, int, List[Dict[str, Any]]]]:
+def _sliding_windows(instructions: Sequence[Dict[str, Any]], sizes: List[int]) -> List[Tuple[int, int, Sequence[Dict[str, Any]]]]:
+    """(start, end, window) for every window size; windows of an InstructionCorpus are zero-copy slices."""
     windows = []
     n = len(instructions)
     for w in sizes:
@@ -262,7 +198,7 @@ def build_positives(matcher: DSLMatcher) -> int:
     return count
 
 
-def _is_hard_negative(window: List[Dict[str, Any]], arch: str, matcher: DSLMatcher) -> bool:
+def _is_hard_negative(window: Sequence[Dict[str, Any]], arch: str, matcher: DSLMatcher) -> bool:
     # Heuristic: has branch+memory in proximity or dependent loads,
     # but fails a stricter SPECTRE_V1-style check (to avoid being swallowed by relaxed DSLs)
     sems = [w.get('semantics', {}) for w in window]
@@ -306,17 +242,21 @@ def build_negatives(matcher: DSLMatcher) -> int:
         raw_instrs = file_data.get('raw_instructions', [])
         if not raw_instrs:
             continue
-        instrs = []
+        # Candidates keep zero-copy windows of the file's corpus; only the
+        # kept samples are turned into dicts
+        instrs = InstructionCorpus(arch)
         for ri in raw_instrs:
             if not isinstance(ri, dict):
                 continue
-            instr = {
-                'opcode': ri.get('opcode', ''),
-                'operands': ri.get('operands', []),
-                'raw_line': ri.get('raw', ri.get('raw_line', '')),
-                'line_num': ri.get('line', ri.get('line_num', 0)),
-            }
-            instrs.append(_ensure_semantics(instr, arch))
+            opcode = ri.get('opcode', '')
+            operands = ri.get('operands', [])
+            instrs.append(
+                ri.get('line', ri.get('line_num', 0)),
+                ri.get('raw', ri.get('raw_line', '')),
+                opcode,
+                operands,
+                _instruction_semantics(opcode, operands, arch),
+            )
 
         for start, end, window in _sliding_windows(instrs, WINDOW_SIZES):
             if _is_hard_negative(window, arch, matcher):
@@ -337,6 +277,7 @@ def build_negatives(matcher: DSLMatcher) -> int:
     shuffle(candidates)
     kept = candidates[:MAX_NEGATIVE_SAMPLES]
     for s in kept:
+        s['instructions'] = s['instructions'].to_dicts()
         out.write(json.dumps(s) + '\n')
     out.close()
     print(f"✅ Negatives written: {len(kept)} -> {NEG_JSONL}")
@@ -1,4 +1,9 @@
 import os
+import re
+import json
+import shutil
+import hashlib
+import argparse
 import subprocess
 from pathlib import Path
 from multiprocessing import Pool, cpu_count
@@ -7,6 +12,24 @@ SOURCE_LIST = "c_cpp_files.txt"
 ASM_ROOT = "assembly_outputs"
 ERROR_LOG = "compiler_errors.log"
 
+# Content-addressed compile cache:
+#   compile_cache/objects/<key[:2]>/<key>.s   compiler output
+#   compile_cache/manifest.json               key -> (source hash, header hash, compiler,
+#                                             flags), output path -> key
+# key = sha256(CACHE_VERSION, source sha256, source file name, compiler identity, flags,
+#              header digest).
+# The header digest hashes the contents of every header the preprocessor resolves for
+# the job (`cc -M` with the job's flags), so editing a header invalidates the sources
+# that include it. Every compile runs in the source's directory and is given only the
+# file name, so the name (not the repo path) is what reaches the .file directive and
+# __FILE__. The name is therefore part of the key and the path is not: repos that
+# vendor the same file share one compilation, and a hit matches a fresh compile.
+CACHE_DIR = "compile_cache"
+# Bumped when the compile command changes what a key's output contains (2: compiles
+# run in the source's directory, so objects no longer embed the repo path)
+CACHE_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
 # Define your target matrix
 TARGETS = [
     # ("x86_64", "gcc", "gcc", "x86-64"),
@@ -26,30 +49,147 @@ def prepare_jobs(files):
                 jobs.append((src, arch, compiler, compiler_cmd, march_flag, opt_level))
     return jobs
 
-def compile_source(args):
-    src_path, arch, compiler, compiler_cmd, march_flag, opt_level = args
+def output_path(src_path, arch, compiler, opt_level):
     src_path = Path(src_path)
     rel_src = src_path.relative_to(Path.cwd()) if src_path.is_absolute() else src_path
     out_dir = Path(ASM_ROOT) / arch / compiler / opt_level / rel_src.parent
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_file = out_dir / (src_path.stem + f".{arch}.{compiler}.{opt_level}.s")
+    return out_dir / (src_path.stem + f".{arch}.{compiler}.{opt_level}.s")
+
+def compile_flags(march_flag, opt_level):
+    return ["-S", f"-{opt_level}", f"-march={march_flag}"]
+
+def compiler_identity(compiler_cmd):
+    """Resolved path plus first line of --version; None if the compiler is missing."""
+    path = shutil.which(compiler_cmd)
+    if path is None:
+        return None
+    try:
+        result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30)
+    except Exception:
+        return None
+    version = result.stdout.splitlines()[0] if result.stdout else ""
+    return f"{os.path.realpath(path)} {version}".strip()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(source_hash, source_name, identity, flags, header_digest):
+    payload = json.dumps([CACHE_VERSION, source_hash, source_name, identity, flags, header_digest],
+                         separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+_MAKE_DEP_TOKEN = re.compile(r"(?:\\.|[^\s\\])+")
+_header_hashes = {}
+
+def header_digest(args):
+    """sha256 over the contents of the headers one compile resolves, in include order.
+
+    Runs the preprocessor in dependency mode (`cc -M`) with the job's flags, so
+    include paths and macros select the same headers as the real compile.
+    Returns None if that fails (the compile itself will report the error).
+    """
+    src, compiler_cmd, flags = args
+    src_dir = Path(src).parent
+    cmd = [compiler_cmd, "-M", *[f for f in flags if f != "-S"], Path(src).name]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60, cwd=src_dir)
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    # "target.o: src.c hdr1.h \\\n hdr2.h ..."; spaces in paths are escaped as "\ "
+    rules = result.stdout.replace("\\\n", " ")
+    prerequisites = rules.split(":", 1)[1] if ":" in rules else ""
+    # Relative paths are relative to the source's directory, where the preprocessor ran
+    paths = [os.path.abspath(src_dir / tok.replace("\\ ", " "))
+             for tok in _MAKE_DEP_TOKEN.findall(prerequisites)]
+    digest = hashlib.sha256()
+    for path in paths[1:]:  # the first prerequisite is the source itself
+        if path not in _header_hashes:
+            try:
+                _header_hashes[path] = file_sha256(path)
+            except OSError:
+                return None
+        digest.update(_header_hashes[path].encode("ascii"))
+    return digest.hexdigest()
+
+def copy_atomic(src, dst):
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + f".tmp{os.getpid()}")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+class CompileCache:
+    """Manifest and object store of the compile cache (used by the main process only)."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / MANIFEST_NAME
+        self.entries = {}
+        self.outputs = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self.entries = manifest.get("entries", {})
+            self.outputs = manifest.get("outputs", {})
+        self.up_to_date = 0
+        self.restored = 0
+        self.misses = 0
+
+    def object_path(self, key):
+        return self.cache_dir / "objects" / key[:2] / f"{key}.s"
+
+    def has(self, key):
+        return key in self.entries and self.object_path(key).exists()
+
+    def record(self, key, out_file, entry):
+        self.entries[key] = entry
+        self.outputs[str(out_file)] = key
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries, "outputs": self.outputs}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def stats(self):
+        hits = self.up_to_date + self.restored
+        total = hits + self.misses
+        rate = 100.0 * hits / total if total else 0.0
+        return (f"Compile cache: {hits} hits ({self.up_to_date} up to date, {self.restored} restored "
+                f"from cache), {self.misses} misses ({rate:.1f}% hit rate)")
+
+def compile_source(args):
+    src_path, arch, compiler, compiler_cmd, march_flag, opt_level = args[:6]
+    # Optional 7th element: cache object path to store a successful output in
+    cache_object = args[6] if len(args) > 6 else None
+    src_path = Path(src_path)
+    out_file = output_path(src_path, arch, compiler, opt_level)
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    # Compile from the source's directory with only its file name (see CACHE_DIR)
     cmd = [
         compiler_cmd,
-        "-S",
-        f"-{opt_level}",
-        f"-march={march_flag}",
-        str(src_path),
+        *compile_flags(march_flag, opt_level),
+        src_path.name,
         "-o",
-        str(out_file)
+        str(out_file.resolve())
     ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60, cwd=src_path.parent)
         if result.returncode != 0:
             raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        if cache_object is not None:
+            copy_atomic(out_file, cache_object)
         print(f"Compiled: {src_path} -> {out_file}")
         return None
     except Exception as e:
-        error_msg = f"FAILED: {' '.join(cmd)}\n"
+        error_msg = f"FAILED: cd {src_path.parent} && {' '.join(cmd)}\n"
         if isinstance(e, subprocess.CalledProcessError):
             error_msg += e.stderr + "\n"
         else:
@@ -57,23 +197,117 @@ def compile_source(args):
         print(f"Failed: {src_path} [{arch} {compiler} {opt_level}]")
         return error_msg
 
+def plan_jobs(jobs, cache, rebuild=False, pool=None):
+    """Resolve cache hits in place and return the jobs that need compiling.
+
+    Returns (to_compile, shared): one job per distinct cache key (with the cache
+    object path, key and manifest entry appended) and, per key, the other jobs
+    to fill from it. Header digests are computed across ``pool`` if given.
+    """
+    identities = {}
+    source_hashes = {}
+    for src, _, _, compiler_cmd, _, _ in jobs:
+        if compiler_cmd not in identities:
+            identities[compiler_cmd] = compiler_identity(compiler_cmd)
+        if src not in source_hashes:
+            try:
+                source_hashes[src] = file_sha256(src)
+            except OSError:
+                source_hashes[src] = None
+
+    # One preprocessor run per (source, compiler, flags)
+    dep_jobs = sorted({
+        (src, compiler_cmd, tuple(compile_flags(march_flag, opt_level)))
+        for src, _, _, compiler_cmd, march_flag, opt_level in jobs
+        if identities[compiler_cmd] is not None and source_hashes[src] is not None
+    })
+    digests = (pool.map if pool is not None else map)(header_digest, dep_jobs)
+    header_digests = dict(zip(dep_jobs, digests))
+
+    to_compile = []
+    shared = {}
+    for job in jobs:
+        src, arch, compiler, compiler_cmd, march_flag, opt_level = job
+        identity = identities[compiler_cmd]
+        source_hash = source_hashes[src]
+        flags = compile_flags(march_flag, opt_level)
+        headers = header_digests.get((src, compiler_cmd, tuple(flags)))
+        if identity is None or source_hash is None or headers is None:
+            # Not cacheable; let the compiler report the problem
+            cache.misses += 1
+            to_compile.append(job)
+            continue
+
+        key = cache_key(source_hash, Path(src).name, identity, flags, headers)
+        entry = {"source_sha256": source_hash, "headers_sha256": headers,
+                 "compiler": identity, "flags": flags}
+        out_file = output_path(src, arch, compiler, opt_level)
+        if cache.has(key) and not rebuild:
+            if cache.outputs.get(str(out_file)) == key and out_file.exists():
+                cache.up_to_date += 1
+            else:
+                copy_atomic(cache.object_path(key), out_file)
+                cache.restored += 1
+            cache.record(key, out_file, entry)
+        elif key in shared:
+            # Same source, headers, compiler and flags as a job already queued
+            shared[key].append(job)
+        else:
+            shared[key] = []
+            cache.misses += 1
+            to_compile.append(job + (str(cache.object_path(key)), key, entry))
+    return to_compile, shared
+
 def main():
+    parser = argparse.ArgumentParser(description="Compile C/C++ sources to assembly for every target")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Compile cache directory")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompile everything and refresh the cache")
+    args = parser.parse_args()
+
     if not os.path.exists(SOURCE_LIST):
         print(f"Source list {SOURCE_LIST} not found.")
         return
     with open(SOURCE_LIST, "r") as f:
         files = [line.strip() for line in f if line.strip()]
     jobs = prepare_jobs(files)
+
+    cache = CompileCache(args.cache_dir)
     errors = []
-    with Pool(processes=cpu_count()) as pool:
-        for result in pool.imap_unordered(compile_source, jobs):
-            if result:
-                errors.append(result)
+    try:
+        with Pool(processes=cpu_count()) as pool:
+            to_compile, shared = plan_jobs(jobs, cache, rebuild=args.rebuild, pool=pool)
+            print(f"{len(jobs)} jobs, {len(to_compile)} to compile")
+            for job, result in zip(to_compile, pool.imap(compile_source, to_compile)):
+                if len(job) <= 6:
+                    if result:
+                        errors.append(result)
+                    continue
+                src, arch, compiler, _, _, opt_level, cache_object, key, entry = job
+                duplicates = shared.get(key, [])
+                if result:
+                    # The jobs sharing this compile fail with it
+                    errors.append(result)
+                    for dup in duplicates:
+                        cache.misses += 1
+                        print(f"Failed: {dup[0]} [{dup[1]} {dup[2]} {dup[5]}] (same compile as {src})")
+                        errors.append(f"FAILED: {dup[0]} [{dup[1]} {dup[2]} {dup[5]}]: "
+                                      f"shares the failed compile of {src}\n")
+                    continue
+                cache.record(key, output_path(src, arch, compiler, opt_level), entry)
+                for dup in duplicates:
+                    out_file = output_path(dup[0], dup[1], dup[2], dup[5])
+                    copy_atomic(cache_object, out_file)
+                    cache.record(key, out_file, entry)
+                    cache.restored += 1
+    finally:
+        cache.save()
     if errors:
         with open(ERROR_LOG, "a") as logf:
             for err in errors:
                 logf.write(err)
+    print(cache.stats())
     print(f"Done. {len(errors)} errors logged to {ERROR_LOG}.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -3,6 +3,10 @@
 DSL Matcher for Speculative Execution Gadgets
 Compiles JSON DSL constraints into checks over instruction windows.
 
+Each vulnerability type is compiled once per architecture (CompiledPattern);
+a window is indexed once (WindowIndex), after which any contiguous span of it
+can be validated without rescanning, which keeps minimal_window linear.
+
 Instruction format expected (compatible with existing code):
 {
   'line_num': int,
@@ -31,240 +35,386 @@ Instruction format expected (compatible with existing code):
 from __future__ import annotations
 
 import json
+from bisect import bisect_left
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Sequence, Tuple, Any
 
 
-class DSLMatcher:
-    def __init__(self, dsl_path: str = "dsl/vuln_patterns.json") -> None:
-        self.dsl_path = Path(dsl_path)
-        with open(self.dsl_path, 'r') as f:
-            self.dsl = json.load(f)
+# Per-instruction bits derived from the semantics dict. The first five are the
+# sequence tags of the DSL; the rest back the property constraints.
+TAG_BITS = {
+    'COMPARISON': 1 << 0,
+    'BRANCH_CONDITIONAL': 1 << 1,
+    'MEMORY_LOAD': 1 << 2,          # is_load, or accesses memory without storing
+    'INDIRECT_BRANCH': 1 << 3,
+    'RETURN': 1 << 4,
+}
+_ACCESSES_MEMORY = 1 << 5
+_INDIRECT = 1 << 6
+_PRIVILEGED = 1 << 7
+_BRANCH = 1 << 8
+_CALL = 1 << 9
+_STORE = 1 << 10
+_ANTI_OPCODE = 1 << 11
+
+FAULT_TOKENS = ('brk', 'hvc', 'svc', 'ud2', 'int')
+
+
+def _instruction_bits(sem: Dict[str, Any]) -> int:
+    bits = 0
+    branch = sem.get('is_branch')
+    access = sem.get('accesses_memory')
+    store = sem.get('is_store')
+    indirect = sem.get('is_indirect')
+    if sem.get('is_comparison'):
+        bits |= TAG_BITS['COMPARISON']
+    if branch:
+        bits |= _BRANCH
+        if sem.get('is_conditional'):
+            bits |= TAG_BITS['BRANCH_CONDITIONAL']
+        if indirect:
+            bits |= TAG_BITS['INDIRECT_BRANCH']
+    if sem.get('is_load') or (access and not store):
+        bits |= TAG_BITS['MEMORY_LOAD']
+    if sem.get('is_return'):
+        bits |= TAG_BITS['RETURN']
+    if access:
+        bits |= _ACCESSES_MEMORY
+    if store:
+        bits |= _STORE
+    if indirect:
+        bits |= _INDIRECT
+    if sem.get('is_privileged'):
+        bits |= _PRIVILEGED
+    if sem.get('is_call'):
+        bits |= _CALL
+    return bits
+
+
+class CompiledPattern:
+    """DSL spec of one vulnerability type, pre-resolved for one architecture."""
+
+    def __init__(self, spec: Optional[Dict[str, Any]], arch: str) -> None:
+        self.known = bool(spec)
+        spec = spec or {}
+        self.constraints: Dict[str, Any] = spec.get('constraints', {})
+        self.sequence = [(req.get('semantic'), req.get('within', None))
+                         for req in self.constraints.get('sequence') or []]
+        self.max_distance = self.constraints.get('max_distance')
+        self.anti_opcodes = set()
+        self.anti_tokens: List[str] = []
+        for ap in spec.get('anti_patterns', []):
+            ap_arch = ap.get('arch')
+            if ap_arch and ap_arch != arch:
+                continue
+            if 'opcode' in ap:
+                self.anti_opcodes.add(ap['opcode'])
+            if 'token' in ap:
+                self.anti_tokens.append(ap['token'].lower())
+        self.raw_tokens = list(self.anti_tokens)
+        if self.constraints.get('requires_exception_or_fault_context'):
+            self.raw_tokens += FAULT_TOKENS
+
+    def index(self, instructions: Sequence[Dict[str, Any]]) -> 'WindowIndex':
+        return WindowIndex(self, instructions)
+
+
+class WindowIndex:
+    """Position indexes over one instruction window for a CompiledPattern.
+
+    Built in one pass over the window; check(l, r) then answers
+    validate_window(instructions[l:r]) (same result and evidence) in time
+    independent of the span length:
+
+    - counts of flagged instructions come from prefix sums
+    - sequence steps jump to the next instruction with the tag
+    - "A then B within d" constraints keep, per start position, the nearest
+      valid pair end, as a suffix minimum
+    - raw-line tokens are located once in the joined lines; a span contains a
+      token if its first occurrence after the span start ends inside the span
+    """
+
+    def __init__(self, pattern: CompiledPattern, instructions: Sequence[Dict[str, Any]]) -> None:
+        self.pattern = pattern
+        n = self.n = len(instructions)
+        anti_opcodes = pattern.anti_opcodes
+        bits = []
+        for instr in instructions:
+            b = _instruction_bits(instr.get('semantics', {}))
+            if anti_opcodes and instr.get('opcode', '').lower() in anti_opcodes:
+                b |= _ANTI_OPCODE
+            bits.append(b)
+        self.bits = bits
+
+        self._prefix: Dict[int, List[int]] = {}
+        self._next: Dict[int, List[int]] = {}
+        self._pairs: Dict[Tuple[int, int, int], List[int]] = {}
+
+        # Token occurrences in ' '.join(lowered raw lines)
+        self.line_start: List[int] = []
+        self.line_end: List[int] = []
+        self.occurrences: Dict[str, List[int]] = {}
+        if pattern.raw_tokens:
+            lines = [instr.get('raw_line', '').lower() for instr in instructions]
+            pos = 0
+            for line in lines:
+                self.line_start.append(pos)
+                self.line_end.append(pos + len(line))
+                pos += len(line) + 1
+            text = ' '.join(lines)
+            for token in pattern.raw_tokens:
+                if token in self.occurrences or not token:
+                    continue
+                found = []
+                at = text.find(token)
+                while at >= 0:
+                    found.append(at)
+                    at = text.find(token, at + 1)
+                self.occurrences[token] = found
+
+    # --- Indexes (built on first use) ---
+
+    def _prefix_counts(self, flag: int) -> List[int]:
+        prefix = self._prefix.get(flag)
+        if prefix is None:
+            prefix = [0]
+            total = 0
+            for b in self.bits:
+                if b & flag:
+                    total += 1
+                prefix.append(total)
+            self._prefix[flag] = prefix
+        return prefix
+
+    def count(self, flag: int, l: int, r: int) -> int:
+        prefix = self._prefix_counts(flag)
+        return prefix[r] - prefix[l]
+
+    def next_with(self, flag: int) -> List[int]:
+        """next_with(flag)[k]: first index >= k with the flag, n if none."""
+        nxt = self._next.get(flag)
+        if nxt is None:
+            nxt = [self.n] * (self.n + 1)
+            for k in range(self.n - 1, -1, -1):
+                nxt[k] = k if self.bits[k] & flag else nxt[k + 1]
+            self._next[flag] = nxt
+        return nxt
+
+    def _pair_ends(self, first: int, then: int, distance: int) -> List[int]:
+        """Suffix minimum over i of the end j of a pair (i has ``first``, j is
+        the next instruction after i with ``then``, j - i <= distance)."""
+        key = (first, then, distance)
+        ends = self._pairs.get(key)
+        if ends is None:
+            n = self.n
+            nxt = self.next_with(then)
+            ends = [n] * (n + 1)
+            for i in range(n - 1, -1, -1):
+                best = ends[i + 1]
+                if self.bits[i] & first:
+                    j = nxt[i + 1]
+                    if j < n and j - i <= distance and j < best:
+                        best = j
+                ends[i] = best
+            self._pairs[key] = ends
+        return ends
+
+    def has_pair(self, first: int, then: int, distance: int, l: int, r: int) -> bool:
+        return self._pair_ends(first, then, distance)[l] < r
+
+    def has_token(self, token: str, l: int, r: int) -> bool:
+        if not token:
+            return True
+        if l >= r:
+            return False
+        found = self.occurrences.get(token, [])
+        k = bisect_left(found, self.line_start[l])
+        return k < len(found) and found[k] + len(token) <= self.line_end[r - 1]
 
-    def list_vulnerability_types(self) -> List[str]:
-        return list(self.dsl.get('vulnerabilities', {}).keys())
+    # --- Constraint checks on instructions[l:r] ---
 
-    def validate_window(self, instructions: List[Dict[str, Any]], vuln_type: str, arch: str, ignore_anti_patterns: bool = False) -> Tuple[bool, Dict[str, Any]]:
-        """
-        Check if a window of instructions satisfies the DSL for vuln_type.
-        Returns (is_match, evidence_dict)
-        """
-        spec = self.dsl['vulnerabilities'].get(vuln_type)
-        if not spec:
+    def check(self, l: int, r: int, ignore_anti_patterns: bool = False) -> Tuple[bool, Dict[str, Any]]:
+        if not self.pattern.known:
             return False, {'reason': 'unknown_vuln_type'}
 
-        constraints = spec.get('constraints', {})
-        anti_patterns = spec.get('anti_patterns', [])
-
-        # Anti-patterns first (unless ignored)
-        if not ignore_anti_patterns and self._has_anti_patterns(instructions, anti_patterns, arch):
+        if not ignore_anti_patterns and self._has_anti_patterns(l, r):
             return False, {'reason': 'anti_pattern_triggered'}
 
         evidence = {}
 
-        # Sequence constraints
-        sequence_ok, seq_evidence = self._check_sequence_constraints(instructions, constraints)
+        sequence_ok, seq_evidence = self._check_sequence_constraints(l, r)
         evidence.update(seq_evidence)
         if not sequence_ok:
             return False, {'reason': 'sequence_constraints_failed', **evidence}
 
-        # Property constraints
-        property_ok, prop_evidence = self._check_property_constraints(instructions, constraints)
+        property_ok, prop_evidence = self._check_property_constraints(l, r)
         evidence.update(prop_evidence)
         if not property_ok:
             return False, {'reason': 'property_constraints_failed', **evidence}
 
         return True, evidence
 
-    def minimal_window(self, instructions: List[Dict[str, Any]], vuln_type: str, arch: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """
-        Shrink window to minimal size while constraints hold (greedy from both ends).
-        Returns (minimal_instructions, evidence)
-        """
-        left, right = 0, len(instructions)
-        best_ev = {}
-
-        # Try shrinking from left
-        while left < right:
-            match, ev = self.validate_window(instructions[left:right], vuln_type, arch)
-            if match:
-                best_ev = ev
-                left += 1
-            else:
-                left -= 1 if left > 0 else 0
-                break
-
-        # Ensure still valid; if not, move left back by one if we overshot
-        if left >= right or not self.validate_window(instructions[left:right], vuln_type, arch)[0]:
-            # Find the smallest left that still matches
-            l = 0
-            r = right
-            while l < left:
-                m = l + 1
-                if self.validate_window(instructions[m:r], vuln_type, arch)[0]:
-                    l = m
-                else:
-                    break
-            left = l
-
-        # Shrink from right
-        while right > left:
-            match, ev = self.validate_window(instructions[left:right-1], vuln_type, arch)
-            if match:
-                best_ev = ev
-                right -= 1
-            else:
-                break
-
-        return instructions[left:right], best_ev
-
-    # --- Internals ---
-
-    def _has_anti_patterns(self, instructions: List[Dict[str, Any]], anti_patterns: List[Dict[str, str]], arch: str) -> bool:
-        if not anti_patterns:
-            return False
-        raw_concat = ' '.join(instr.get('raw_line', '').lower() for instr in instructions)
-        for ap in anti_patterns:
-            ap_arch = ap.get('arch')
-            if ap_arch and ap_arch != arch:
-                continue
-            if 'opcode' in ap:
-                if any(instr.get('opcode', '').lower() == ap['opcode'] for instr in instructions):
-                    return True
-            if 'token' in ap:
-                if ap['token'].lower() in raw_concat:
-                    return True
-        return False
+    def _has_anti_patterns(self, l: int, r: int) -> bool:
+        if self.pattern.anti_opcodes and self.count(_ANTI_OPCODE, l, r):
+            return True
+        return any(self.has_token(token, l, r) for token in self.pattern.anti_tokens)
 
-    def _check_sequence_constraints(self, instructions: List[Dict[str, Any]], constraints: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
-        seq = constraints.get('sequence')
-        if not seq:
+    def _check_sequence_constraints(self, l: int, r: int) -> Tuple[bool, Dict[str, Any]]:
+        if not self.pattern.sequence:
             return True, {}
 
-        # Convert semantics to tags per instruction
-        tags = []
-        for instr in instructions:
-            sem = instr.get('semantics', {})
-            tag_set = set()
-            if sem.get('is_comparison'):
-                tag_set.add('COMPARISON')
-            if sem.get('is_branch') and sem.get('is_conditional'):
-                tag_set.add('BRANCH_CONDITIONAL')
-            if sem.get('is_load') or (sem.get('accesses_memory') and not sem.get('is_store')):
-                tag_set.add('MEMORY_LOAD')
-            if sem.get('is_indirect') and sem.get('is_branch'):
-                tag_set.add('INDIRECT_BRANCH')
-            if sem.get('is_return'):
-                tag_set.add('RETURN')
-            tags.append(tag_set)
-
         # Greedily check order with distance limits
+        length = r - l
         pos = -1
         evidence = {}
-        for i, req in enumerate(seq):
-            required = req.get('semantic')
-            within = req.get('within', None)
-            found = False
+        for i, (required, within) in enumerate(self.pattern.sequence):
             start = pos + 1
-            end = len(instructions) if within is None else min(len(instructions), start + within + 1)
-            for j in range(start, end):
-                if required in tags[j]:
-                    pos = j
-                    evidence[f'seq_{i}_{required}'] = j
-                    found = True
-                    break
-            if not found:
+            end = length if within is None else min(length, start + within + 1)
+            flag = TAG_BITS.get(required)
+            j = self.next_with(flag)[l + start] - l if flag is not None and start < end else end
+            if j >= end:
                 return False, evidence
+            pos = j
+            evidence[f'seq_{i}_{required}'] = j
 
         # Check max_distance if provided
-        max_distance = constraints.get('max_distance')
-        if max_distance is not None and len(instructions) > max_distance:
+        max_distance = self.pattern.max_distance
+        if max_distance is not None and length > max_distance:
             return False, {**evidence, 'reason': 'max_distance_exceeded'}
         return True, evidence
 
-    def _check_property_constraints(self, instructions: List[Dict[str, Any]], constraints: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
-        sems = [instr.get('semantics', {}) for instr in instructions]
+    def _check_property_constraints(self, l: int, r: int) -> Tuple[bool, Dict[str, Any]]:
+        constraints = self.pattern.constraints
         evidence = {}
 
-        def any_sem(key: str) -> bool:
-            return any(s.get(key, False) for s in sems)
-
-        def count_sem(key: str) -> int:
-            return sum(1 for s in sems if s.get(key, False))
-
-        # Requires dependent load: look for two loads within 5 steps
+        # Requires dependent load: two consecutive loads within 5 steps
         if constraints.get('requires_dependent_load'):
-            load_idxs = [i for i, s in enumerate(sems) if s.get('is_load') or (s.get('accesses_memory') and not s.get('is_store'))]
-            has_dep = any(load_idxs[i+1] - load_idxs[i] <= 5 for i in range(len(load_idxs)-1))
-            if not has_dep:
+            load = TAG_BITS['MEMORY_LOAD']
+            if not self.has_pair(load, load, 5, l, r):
                 return False, {'missing': 'dependent_load'}
             evidence['dependent_load'] = True
 
         if constraints.get('requires_branch_then_memory'):
-            ok = False
-            for i in range(len(sems)-1):
-                if sems[i].get('is_branch') and sems[i].get('is_conditional'):
-                    # memory access within next 6
-                    for j in range(i+1, min(i+7, len(sems))):
-                        if sems[j].get('accesses_memory', False):
-                            ok = True
-                            break
-                if ok:
-                    break
-            if not ok:
+            # memory access within next 6
+            if not self.has_pair(TAG_BITS['BRANCH_CONDITIONAL'], _ACCESSES_MEMORY, 6, l, r):
                 return False, {'missing': 'branch_then_memory'}
             evidence['branch_then_memory'] = True
 
-        if constraints.get('requires_indirect_branch') and not any_sem('is_indirect'):
+        if constraints.get('requires_indirect_branch') and not self.count(_INDIRECT, l, r):
             return False, {'missing': 'indirect_branch'}
         if constraints.get('requires_branch_target_computed'):
             # approximated by is_indirect on branch
-            if not any(s.get('is_indirect', False) and s.get('is_branch', False) for s in sems):
+            if not self.count(TAG_BITS['INDIRECT_BRANCH'], l, r):
                 return False, {'missing': 'branch_target_computed'}
             evidence['branch_target_computed'] = True
 
-        if constraints.get('requires_privileged_access') and not any_sem('is_privileged'):
+        if constraints.get('requires_privileged_access') and not self.count(_PRIVILEGED, l, r):
             return False, {'missing': 'privileged_access'}
-        if constraints.get('requires_memory_access') and not any_sem('accesses_memory'):
+        if constraints.get('requires_memory_access') and not self.count(_ACCESSES_MEMORY, l, r):
             return False, {'missing': 'memory_access'}
 
-        if 'min_branch_count' in constraints and count_sem('is_branch') < constraints['min_branch_count']:
+        if 'min_branch_count' in constraints and self.count(_BRANCH, l, r) < constraints['min_branch_count']:
             return False, {'missing': 'min_branch_count'}
 
-        if constraints.get('requires_return_instruction') and not any_sem('is_return'):
+        if constraints.get('requires_return_instruction') and not self.count(TAG_BITS['RETURN'], l, r):
             return False, {'missing': 'return_instruction'}
-        if constraints.get('requires_call_or_indirect_call') and not any(s.get('is_call', False) or (s.get('is_indirect', False) and s.get('is_call', False)) for s in sems):
+        if constraints.get('requires_call_or_indirect_call') and not self.count(_CALL, l, r):
             return False, {'missing': 'call_or_indirect_call'}
 
         if 'min_memory_ops' in constraints:
-            mem_ops = sum(1 for s in sems if s.get('accesses_memory', False))
-            if mem_ops < constraints['min_memory_ops']:
+            if self.count(_ACCESSES_MEMORY, l, r) < constraints['min_memory_ops']:
                 return False, {'missing': 'min_memory_ops'}
 
         if constraints.get('requires_store_then_load'):
-            ok = False
-            for i in range(len(sems)-1):
-                if sems[i].get('is_store', False):
-                    for j in range(i+1, min(i+6, len(sems))):
-                        if sems[j].get('is_load', False) or (sems[j].get('accesses_memory') and not sems[j].get('is_store')):
-                            ok = True
-                            break
-                if ok:
-                    break
-            if not ok:
+            if not self.has_pair(_STORE, TAG_BITS['MEMORY_LOAD'], 5, l, r):
                 return False, {'missing': 'store_then_load'}
             evidence['store_then_load'] = True
 
         if constraints.get('requires_exception_or_fault_context'):
             # crude proxy using raw lines for exception/fault tokens
-            raw = ' '.join(instr.get('raw_line', '').lower() for instr in instructions)
-            if not any(tok in raw for tok in ['brk', 'hvc', 'svc', 'ud2', 'int']):
+            if not any(self.has_token(tok, l, r) for tok in FAULT_TOKENS):
                 return False, {'missing': 'exception_or_fault'}
             evidence['exception_or_fault'] = True
 
         return True, evidence
 
 
+DEFAULT_DSL_PATH = "dsl/vuln_patterns.json"
+
+
+class DSLMatcher:
+    def __init__(self, dsl_path: str = DEFAULT_DSL_PATH) -> None:
+        self.dsl_path = Path(dsl_path)
+        with open(self.dsl_path, 'r') as f:
+            self.dsl = json.load(f)
+        self._compiled: Dict[Tuple[str, str], CompiledPattern] = {}
+
+    def list_vulnerability_types(self) -> List[str]:
+        return list(self.dsl.get('vulnerabilities', {}).keys())
+
+    def compile(self, vuln_type: str, arch: str) -> CompiledPattern:
+        """CompiledPattern for vuln_type on arch (compiled once per matcher)."""
+        key = (vuln_type, arch)
+        pattern = self._compiled.get(key)
+        if pattern is None:
+            pattern = self._compiled[key] = CompiledPattern(self.dsl['vulnerabilities'].get(vuln_type), arch)
+        return pattern
+
+    def validate_window(self, instructions: Sequence[Dict[str, Any]], vuln_type: str, arch: str, ignore_anti_patterns: bool = False) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Check if a window of instructions satisfies the DSL for vuln_type.
+        Returns (is_match, evidence_dict)
+        """
+        index = self.compile(vuln_type, arch).index(instructions)
+        return index.check(0, len(instructions), ignore_anti_patterns)
+
+    def minimal_window(self, instructions: Sequence[Dict[str, Any]], vuln_type: str, arch: str) -> Tuple[Sequence[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Shrink window to minimal size while constraints hold (greedy from both ends).
+        Returns (minimal_instructions, evidence)
+
+        The window is indexed once; every candidate span is then checked
+        without rescanning it, so the shrink is linear in the window size.
+        """
+        check = self.compile(vuln_type, arch).index(instructions).check
+        left, right = 0, len(instructions)
+        best_ev = {}
+
+        # Try shrinking from left
+        while left < right:
+            match, ev = check(left, right)
+            if match:
+                best_ev = ev
+                left += 1
+            else:
+                left -= 1 if left > 0 else 0
+                break
+
+        # Ensure still valid; if not, move left back by one if we overshot
+        if left >= right or not check(left, right)[0]:
+            # Find the smallest left that still matches
+            l = 0
+            r = right
+            while l < left:
+                m = l + 1
+                if check(m, r)[0]:
+                    l = m
+                else:
+                    break
+            left = l
+
+        # Shrink from right
+        while right > left:
+            match, ev = check(left, right - 1)
+            if match:
+                best_ev = ev
+                right -= 1
+            else:
+                break
+
+        return instructions[left:right], best_ev
+
+
 def _demo():
     # Simple demo usage
     matcher = DSLMatcher()
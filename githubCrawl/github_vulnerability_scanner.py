@@ -7,9 +7,13 @@ and compiled assembly code to identify vulnerable patterns in real-world code.
 
 import os
 import argparse
+import hashlib
 import json
 import pickle
+import queue
 import sqlite3
+import threading
+from multiprocessing import Pool
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
@@ -21,6 +25,8 @@ from semantic_vulnerability_analyzer import SemanticVulnerabilityAnalyzer
 from ensemble_vulnerability_detector import EnsembleVulnerabilityDetector
 from dsl_matcher import DSLMatcher
 from minimal_subsequence import reduce_to_minimal_window
+from instruction_corpus import InstructionCorpus
+from instruction_semantics import SCANNER_SEMANTICS, semantic_flags, semantics_dict
 
 @dataclass
 class GitHubRepository:
@@ -60,6 +66,150 @@ class VulnerabilityMatch:
     detector_used: str
     timestamp: str
 
+VULNERABILITY_INSERT_SQL = '''
+    INSERT OR REPLACE INTO vulnerabilities 
+    (repository, source_file, assembly_file, vulnerability_type, confidence, 
+     risk_level, location_start, location_end, evidence, detector_used, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+PROCESSED_FILE_UPSERT_SQL = '''
+    INSERT INTO assembly_files
+    (filepath, source_file, repository, architecture, compiler, optimization_level,
+     file_size, instruction_count, processed, content_hash, detector_used)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+    ON CONFLICT(filepath) DO UPDATE SET
+        source_file = excluded.source_file,
+        repository = excluded.repository,
+        architecture = excluded.architecture,
+        compiler = excluded.compiler,
+        optimization_level = excluded.optimization_level,
+        file_size = excluded.file_size,
+        instruction_count = excluded.instruction_count,
+        processed = 1,
+        content_hash = excluded.content_hash,
+        detector_used = excluded.detector_used
+'''
+
+def _vulnerability_row(match: VulnerabilityMatch) -> Tuple:
+    """Row for VULNERABILITY_INSERT_SQL"""
+    return (
+        match.repository,
+        match.source_file,
+        match.assembly_file,
+        match.vulnerability_type,
+        match.confidence,
+        match.risk_level,
+        match.location.get('start_line', 0),
+        match.location.get('end_line', 0),
+        json.dumps(match.evidence),
+        match.detector_used,
+        match.timestamp
+    )
+
+def file_content_hash(filepath: str) -> str:
+    """SHA-1 of a file's bytes, used to skip unchanged files on re-runs"""
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ScanResultWriter(threading.Thread):
+    """Single database writer for a scan.
+
+    Scanned-file results are queued by the scan loop and committed in batches
+    of up to ``batch_size`` files, one transaction per batch, over a single
+    WAL-mode connection. A file's matches and its processed flag are written
+    in the same transaction, so an interrupted scan never leaves a file half
+    recorded.
+    """
+    
+    def __init__(self, db_path: Path, batch_size: int = 10):
+        super().__init__(name="scan-result-writer", daemon=True)
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.queue: queue.Queue = queue.Queue(maxsize=self.batch_size * 4)
+        self.saved_files = 0
+        self.saved_matches = 0
+        self.error: Optional[BaseException] = None
+    
+    def submit(self, asm_file: AssemblyFile, content_hash: str, detector_type: str,
+               matches: List[VulnerabilityMatch]):
+        """Queue one scanned file (blocks while the writer is behind)"""
+        self.queue.put((asm_file, content_hash, detector_type, matches))
+    
+    def close(self):
+        """Flush everything queued, stop the thread and re-raise a write error"""
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+    
+    def run(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            finished = False
+            while not finished:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    finished = True
+                    batch.pop()
+                # After a failed write keep draining so producers never block
+                if batch and self.error is None:
+                    try:
+                        self._write_batch(conn, batch)
+                    except Exception as e:
+                        self.error = e
+        finally:
+            conn.close()
+    
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Tuple]):
+        file_rows = []
+        vuln_rows = []
+        for asm_file, content_hash, detector_type, matches in batch:
+            file_rows.append((
+                asm_file.filepath, asm_file.source_file, asm_file.repository,
+                asm_file.architecture, asm_file.compiler, asm_file.optimization_level,
+                asm_file.file_size, asm_file.instruction_count, content_hash, detector_type
+            ))
+            vuln_rows.extend(_vulnerability_row(match) for match in matches)
+        
+        with conn:  # one transaction per batch
+            # Results of an earlier scan of a changed file are replaced, not duplicated
+            conn.executemany('DELETE FROM vulnerabilities WHERE assembly_file = ?',
+                             [(row[0],) for row in file_rows])
+            conn.executemany(VULNERABILITY_INSERT_SQL, vuln_rows)
+            conn.executemany(PROCESSED_FILE_UPSERT_SQL, file_rows)
+        
+        self.saved_files += len(file_rows)
+        self.saved_matches += len(vuln_rows)
+
+# Scanner used by _scan_file_worker (set per process by _init_scan_worker)
+_WORKER_SCANNER = None
+_WORKER_DETECTOR_TYPE = None
+
+def _init_scan_worker(scanner: 'GitHubVulnerabilityScanner', detector_type: str):
+    global _WORKER_SCANNER, _WORKER_DETECTOR_TYPE
+    _WORKER_SCANNER = scanner
+    _WORKER_DETECTOR_TYPE = detector_type
+
+def _scan_file_worker(job: Tuple[AssemblyFile, str]) -> Tuple[AssemblyFile, str, List[VulnerabilityMatch], Optional[str]]:
+    """Scan one file; returns (asm_file, content_hash, matches, error)"""
+    asm_file, content_hash = job
+    try:
+        matches = _WORKER_SCANNER.scan_assembly_file(asm_file, _WORKER_DETECTOR_TYPE)
+        return asm_file, content_hash, matches, None
+    except Exception as e:
+        return asm_file, content_hash, [], str(e)
+
 class GitHubVulnerabilityScanner:
     """Main scanner that integrates GitHub crawling with vulnerability detection"""
     
@@ -133,6 +283,12 @@ class GitHubVulnerabilityScanner:
             )
         ''')
         
+        # Columns added for resumable scans (databases created before them are migrated)
+        existing_columns = {row[1] for row in cursor.execute('PRAGMA table_info(assembly_files)')}
+        for column in ('content_hash', 'detector_used'):
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE assembly_files ADD COLUMN {column} TEXT')
+        
         # Vulnerabilities table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS vulnerabilities (
@@ -389,41 +545,35 @@ class GitHubVulnerabilityScanner:
         
         return True
     
-    def parse_assembly_file(self, asm_file: AssemblyFile) -> List[Dict[str, Any]]:
-        """Parse assembly file into instruction format for vulnerability detection"""
-        instructions = []
+    def parse_assembly_file(self, asm_file: AssemblyFile) -> InstructionCorpus:
+        """Parse assembly file into instruction format for vulnerability detection.
+
+        Returns an InstructionCorpus: its items read like the instruction dicts
+        ('line_num', 'raw_line', 'opcode', 'operands', 'semantics') and its
+        slices are zero-copy windows.
+        """
+        instructions = InstructionCorpus(asm_file.architecture)
         
         try:
             with open(asm_file.filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            for i, line in enumerate(lines):
-                line = line.strip()
-                
-                # Skip empty lines, comments, and directives
-                if not line or line.startswith('.') or line.startswith('#') or ':' in line:
-                    continue
-                
-                # Basic instruction parsing
-                parts = line.split()
-                if not parts:
-                    continue
-                
-                opcode = parts[0].lower()
-                operands = parts[1:] if len(parts) > 1 else []
-                
-                # Analyze instruction semantics
-                semantics = self._analyze_instruction_semantics(opcode, operands, asm_file.architecture)
-                
-                instruction = {
-                    'line_num': i + 1,
-                    'raw_line': line,
-                    'opcode': opcode,
-                    'operands': operands,
-                    'semantics': semantics
-                }
-                
-                instructions.append(instruction)
+                for i, line in enumerate(f):
+                    line = line.strip()
+                    
+                    # Skip empty lines, comments, and directives
+                    if not line or line.startswith('.') or line.startswith('#') or ':' in line:
+                        continue
+                    
+                    # Basic instruction parsing
+                    parts = line.split()
+                    if not parts:
+                        continue
+                    
+                    opcode = parts[0].lower()
+                    operands = parts[1:] if len(parts) > 1 else []
+                    
+                    # Analyze instruction semantics
+                    flags = self._semantic_flags(opcode, operands, asm_file.architecture)
+                    instructions.append(i + 1, line, opcode, operands, flags)
             
             # Update instruction count
             asm_file.instruction_count = len(instructions)
@@ -433,85 +583,16 @@ class GitHubVulnerabilityScanner:
         
         return instructions
     
+    def _semantic_flags(self, opcode: str, operands: List[str], arch: str) -> Tuple[str, ...]:
+        """Names of the semantic flags set for an instruction"""
+        table = SCANNER_SEMANTICS.get(arch)
+        if table is None:
+            return ()
+        return semantic_flags(table, opcode, operands)
+    
     def _analyze_instruction_semantics(self, opcode: str, operands: List[str], arch: str) -> Dict[str, bool]:
         """Analyze semantic properties of an instruction"""
-        semantics = {
-            'is_branch': False,
-            'is_conditional': False,
-            'is_indirect': False,
-            'is_call': False,
-            'is_return': False,
-            'is_load': False,
-            'is_store': False,
-            'accesses_memory': False,
-            'is_arithmetic': False,
-            'is_comparison': False,
-            'is_speculation_barrier': False,
-            'is_cache_operation': False,
-            'is_timing_sensitive': False,
-            'is_privileged': False
-        }
-        
-        if arch == 'x86_64':
-            # x86-64 instruction semantics
-            if opcode.startswith('j'):
-                semantics['is_branch'] = True
-                if opcode != 'jmp':
-                    semantics['is_conditional'] = True
-                if any('[' in op for op in operands):
-                    semantics['is_indirect'] = True
-            elif opcode in ['call', 'ret']:
-                semantics['is_call'] = opcode == 'call'
-                semantics['is_return'] = opcode == 'ret'
-                if opcode == 'call' and any('[' in op or '%' in op for op in operands):
-                    semantics['is_indirect'] = True
-            elif opcode in ['mov', 'movzx', 'movsx', 'movzbl', 'movzwl', 'lea']:
-                if any('[' in op for op in operands):
-                    semantics['accesses_memory'] = True
-                    semantics['is_load'] = True
-            elif opcode in ['add', 'sub', 'mul', 'div', 'xor', 'and', 'or', 'shl', 'shr']:
-                semantics['is_arithmetic'] = True
-            elif opcode in ['cmp', 'test']:
-                semantics['is_comparison'] = True
-            elif opcode in ['lfence', 'mfence', 'sfence']:
-                semantics['is_speculation_barrier'] = True
-            elif opcode in ['clflush', 'clwb', 'clflushopt']:
-                semantics['is_cache_operation'] = True
-            elif opcode in ['rdtsc', 'rdtscp']:
-                semantics['is_timing_sensitive'] = True
-                
-        elif arch == 'arm64':
-            # ARM64 instruction semantics
-            if opcode.startswith('b'):
-                semantics['is_branch'] = True
-                if '.' in opcode:  # conditional branches like b.eq
-                    semantics['is_conditional'] = True
-                if opcode in ['br', 'blr']:
-                    semantics['is_indirect'] = True
-            elif opcode in ['bl', 'blr', 'ret']:
-                semantics['is_call'] = opcode in ['bl', 'blr']
-                semantics['is_return'] = opcode == 'ret'
-                if opcode == 'blr':
-                    semantics['is_indirect'] = True
-            elif opcode in ['ldr', 'ldrb', 'ldrh', 'ldp']:
-                semantics['is_load'] = True
-                semantics['accesses_memory'] = True
-            elif opcode in ['str', 'strb', 'strh', 'stp']:
-                semantics['is_store'] = True
-                semantics['accesses_memory'] = True
-            elif opcode in ['add', 'sub', 'mul', 'div', 'and', 'orr', 'eor', 'lsl', 'lsr']:
-                semantics['is_arithmetic'] = True
-            elif opcode in ['cmp', 'subs']:
-                semantics['is_comparison'] = True
-            elif opcode in ['dsb', 'isb', 'dmb']:
-                semantics['is_speculation_barrier'] = True
-            elif opcode in ['dc', 'ic']:
-                semantics['is_cache_operation'] = True
-            elif opcode == 'mrs':
-                semantics['is_timing_sensitive'] = True
-                semantics['is_privileged'] = True
-        
-        return semantics
+        return semantics_dict(self._semantic_flags(opcode, operands, arch))
     
     def scan_assembly_file(self, asm_file: AssemblyFile, detector_type: str = "ensemble") -> List[VulnerabilityMatch]:
         """Scan a single assembly file for vulnerabilities"""
@@ -571,7 +652,7 @@ class GitHubVulnerabilityScanner:
                     start_line = location.get('start_line', 0)
                     end_line = location.get('end_line', 0)
                     if start_line and end_line:
-                        window = [instr for instr in instructions if start_line <= instr.get('line_num', 0) <= end_line]
+                        window = instructions.window_by_lines(start_line, end_line)
                         minimized, dsl_evidence = reduce_to_minimal_window(window, vuln_type, asm_file.architecture)
                         if minimized:
                             new_start = minimized[0].get('line_num', start_line)
@@ -626,35 +707,48 @@ class GitHubVulnerabilityScanner:
             return
         
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for match in matches:
-            cursor.execute('''
-                INSERT OR REPLACE INTO vulnerabilities 
-                (repository, source_file, assembly_file, vulnerability_type, confidence, 
-                 risk_level, location_start, location_end, evidence, detector_used, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                match.repository,
-                match.source_file,
-                match.assembly_file,
-                match.vulnerability_type,
-                match.confidence,
-                match.risk_level,
-                match.location.get('start_line', 0),
-                match.location.get('end_line', 0),
-                json.dumps(match.evidence),
-                match.detector_used,
-                match.timestamp
-            ))
-        
-        conn.commit()
+        with conn:
+            conn.executemany(VULNERABILITY_INSERT_SQL, [_vulnerability_row(match) for match in matches])
         conn.close()
         
         self.logger.info(f"Saved {len(matches)} vulnerability matches to database")
     
-    def run_full_scan(self, detector_type: str = "ensemble", max_files: int = None) -> Dict[str, Any]:
-        """Run full vulnerability scan on all GitHub repositories"""
+    def _select_files_to_scan(self, assembly_files: List[AssemblyFile], detector_type: str,
+                              rescan: bool = False) -> List[Tuple[AssemblyFile, str]]:
+        """(file, content hash) for every file that is new, changed, or was last
+        scanned with a different detector. rescan=True ignores recorded state."""
+        processed = {}
+        if not rescan:
+            conn = sqlite3.connect(self.db_path)
+            processed = {
+                filepath: (content_hash, detector_used)
+                for filepath, content_hash, detector_used in conn.execute(
+                    'SELECT filepath, content_hash, detector_used FROM assembly_files WHERE processed = 1'
+                )
+            }
+            conn.close()
+        
+        pending = []
+        for asm_file in assembly_files:
+            try:
+                content_hash = file_content_hash(asm_file.filepath)
+            except OSError as e:
+                self.logger.warning(f"Failed to hash {asm_file.filepath}: {e}")
+                continue
+            if processed.get(asm_file.filepath) == (content_hash, detector_type):
+                continue
+            pending.append((asm_file, content_hash))
+        return pending
+    
+    def run_full_scan(self, detector_type: str = "ensemble", max_files: int = None,
+                      workers: int = 1, rescan: bool = False) -> Dict[str, Any]:
+        """Run full vulnerability scan on all GitHub repositories
+
+        Files already recorded as processed with the same content hash and
+        detector are skipped, so an interrupted scan resumes where it stopped.
+        workers > 1 scans files in a process pool; all database writes go
+        through one ScanResultWriter thread.
+        """
         self.logger.info("Starting full GitHub vulnerability scan...")
         
         # Initialize detectors
@@ -668,14 +762,25 @@ class GitHubVulnerabilityScanner:
             self.logger.error("No assembly files found")
             return {}
         
+        # Skip files whose results are already in the database
+        pending = self._select_files_to_scan(assembly_files, detector_type, rescan)
+        unchanged_files = len(assembly_files) - len(pending)
+        self.logger.info(f"{unchanged_files} files unchanged since the last scan, "
+                         f"{len(pending)} to scan")
+        
         # Limit files if specified
-        if max_files:
-            assembly_files = assembly_files[:max_files]
+        limited_files = 0
+        if max_files and len(pending) > max_files:
+            limited_files = len(pending) - max_files
+            pending = pending[:max_files]
+            self.logger.info(f"Scanning {max_files} files (max_files); {limited_files} left for a later run")
         
         # Scan files
         all_matches = []
         scan_stats = {
             'total_files': len(assembly_files),
+            'skipped_files': unchanged_files,
+            'limited_files': limited_files,
             'scanned_files': 0,
             'failed_files': 0,
             'total_vulnerabilities': 0,
@@ -684,28 +789,45 @@ class GitHubVulnerabilityScanner:
             'vulnerabilities_by_repo': defaultdict(int)
         }
         
-        for i, asm_file in enumerate(assembly_files):
-            self.logger.info(f"Scanning file {i+1}/{len(assembly_files)}: {Path(asm_file.filepath).name}")
-            
-            try:
-                matches = self.scan_assembly_file(asm_file, detector_type)
+        # The pool is forked before the writer thread starts
+        pool = None
+        if workers > 1 and len(pending) > 1:
+            pool = Pool(workers, initializer=_init_scan_worker, initargs=(self, detector_type))
+            results = pool.imap_unordered(_scan_file_worker, pending)
+        else:
+            _init_scan_worker(self, detector_type)
+            results = map(_scan_file_worker, pending)
+        
+        writer = ScanResultWriter(self.db_path, self.config['batch_size'])
+        writer.start()
+        try:
+            for i, (asm_file, content_hash, matches, error) in enumerate(results, 1):
+                self.logger.info(f"Scanned file {i}/{len(pending)}: {Path(asm_file.filepath).name}")
                 
-                if matches:
-                    all_matches.extend(matches)
-                    self.save_results_to_database(matches)
-                    
-                    # Update statistics
-                    for match in matches:
-                        scan_stats['total_vulnerabilities'] += 1
-                        scan_stats['vulnerabilities_by_type'][match.vulnerability_type] += 1
-                        scan_stats['vulnerabilities_by_risk'][match.risk_level] += 1
-                        scan_stats['vulnerabilities_by_repo'][match.repository] += 1
+                if error is not None:
+                    self.logger.error(f"Failed to scan {asm_file.filepath}: {error}")
+                    scan_stats['failed_files'] += 1
+                    continue
                 
-                scan_stats['scanned_files'] += 1
+                writer.submit(asm_file, content_hash, detector_type, matches)
+                all_matches.extend(matches)
                 
-            except Exception as e:
-                self.logger.error(f"Failed to scan {asm_file.filepath}: {e}")
-                scan_stats['failed_files'] += 1
+                # Update statistics
+                for match in matches:
+                    scan_stats['total_vulnerabilities'] += 1
+                    scan_stats['vulnerabilities_by_type'][match.vulnerability_type] += 1
+                    scan_stats['vulnerabilities_by_risk'][match.risk_level] += 1
+                    scan_stats['vulnerabilities_by_repo'][match.repository] += 1
+                
+                scan_stats['scanned_files'] += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            writer.close()
+        
+        self.logger.info(f"Saved {writer.saved_matches} vulnerability matches "
+                         f"from {writer.saved_files} files to database")
         
         # Generate summary report
         self.generate_scan_report(scan_stats, all_matches)
@@ -746,6 +868,9 @@ class GitHubVulnerabilityScanner:
         print("="*80)
         print(f"📊 Scanned {stats['scanned_files']} assembly files")
         print(f"🔍 Found {stats['total_vulnerabilities']} potential vulnerabilities")
+        print(f"⏭️  Skipped {stats.get('skipped_files', 0)} files unchanged since the last scan")
+        if stats.get('limited_files'):
+            print(f"⏸️  Left out {stats['limited_files']} files beyond the max_files limit")
         print(f"❌ Failed to scan {stats['failed_files']} files")
         
         print(f"\n🎯 Vulnerability Types:")
@@ -770,6 +895,8 @@ def main():
     parser = argparse.ArgumentParser(description="Scan GitHub-compiled assembly for speculative execution vulnerabilities")
     parser.add_argument("--num-files", type=int, default=None, help="Number of assembly files to process. If omitted or <=0, process all.")
     parser.add_argument("--detector", type=str, default="ensemble", choices=["ensemble", "robust", "semantic"], help="Detector type to use")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes scanning files in parallel")
+    parser.add_argument("--rescan", action="store_true", help="Rescan files already recorded as processed and unchanged")
     args = parser.parse_args()
 
     # Normalize num-files: None or <=0 means process all
@@ -780,7 +907,9 @@ def main():
     # Run scan with optional file limit
     results = scanner.run_full_scan(
         detector_type=args.detector,
-        max_files=max_files
+        max_files=max_files,
+        workers=args.workers,
+        rescan=args.rescan
     )
     
     print(f"\n✅ Scan completed successfully!")
@@ -30,6 +30,16 @@ except ImportError:
     CAPSTONE_AVAILABLE = False
     print("Warning: capstone not available, using simplified parsing")
 
+# Local (basic block / temporary) labels; any other label starts a function region
+LOCAL_LABEL_RE = re.compile(r'^(?:\.L|L(?:BB|tmp|loh|JTI|CPI|func_end|set|exception|_|\d)|l(?:tmp|_)|\d+$)')
+
+# Mnemonics ending a basic block (besides b.<cond> and x86 j<cc>)
+BLOCK_END_MNEMONICS = {'b', 'bl', 'br', 'blr', 'ret', 'retq', 'cbz', 'cbnz', 'tbz', 'tbnz',
+                       'call', 'callq'}
+
+def ends_basic_block(mnemonic: str) -> bool:
+    return mnemonic in BLOCK_END_MNEMONICS or mnemonic.startswith('b.') or mnemonic.startswith('j')
+
 @dataclass
 class ImprovedVulnerabilityDetection:
     """Enhanced vulnerability detection with confidence metrics"""
@@ -109,6 +119,12 @@ class ImprovedVulnerabilityScanner:
             'LOW': 0.50        # Low confidence threshold
         }
         
+        # Files are scored per region (function, or basic-block chunk of a long
+        # function); regions scoring below evidence_threshold cannot reach any
+        # confidence threshold, so the pattern-evidence helpers skip them
+        self.max_region_instructions = 256
+        self.evidence_threshold = min(self.confidence_thresholds.values())
+        
         self.logger.info("Improved Vulnerability Scanner initialized")
     
     def _parse_vulnerability_type_from_filename(self, filename: str) -> Optional[str]:
@@ -135,7 +151,11 @@ class ImprovedVulnerabilityScanner:
         return None
     
     def _parse_assembly_file(self, filepath: str) -> List[Dict[str, Any]]:
-        """Parse assembly file and extract instructions"""
+        """Parse assembly file and extract instructions
+        
+        Each instruction also records its 1-based source line ('line_num') and
+        the label directly preceding it, if any ('label').
+        """
         instructions = []
         
         try:
@@ -144,20 +164,24 @@ class ImprovedVulnerabilityScanner:
             
             lines = content.split('\n')
             address = 0
+            label = None
             
-            for line in lines:
+            for line_num, line in enumerate(lines, 1):
                 line = line.strip()
                 
                 # Skip empty lines and comments
                 if not line or line.startswith('#') or line.startswith(';') or line.startswith('//'):
                     continue
                 
-                # Skip assembler directives
-                if line.startswith('.'):
+                # Skip labels (lines ending with ':'), remembering them for region
+                # splitting (a function label wins over local labels after it)
+                if line.endswith(':'):
+                    if label is None or LOCAL_LABEL_RE.match(label):
+                        label = line[:-1].strip()
                     continue
                 
-                # Skip labels (lines ending with ':')
-                if line.endswith(':'):
+                # Skip assembler directives
+                if line.startswith('.'):
                     continue
                 
                 # Parse instruction
@@ -166,16 +190,24 @@ class ImprovedVulnerabilityScanner:
                     mnemonic = parts[0].lower()
                     op_str = parts[1] if len(parts) > 1 else ''
                     
+                    # A label followed by a comment ("_main: ; @main") is kept as an
+                    # instruction, as before, but still names the region it starts
+                    if mnemonic.endswith(':') and (label is None or LOCAL_LABEL_RE.match(label)):
+                        label = parts[0][:-1]
+                    
                     instruction = {
                         'mnemonic': mnemonic,
                         'op_str': op_str,
                         'address': address,
                         'bytes': b'',  # Would need actual parsing for real bytes
-                        'size': 4  # Assume 4-byte instructions
+                        'size': 4,  # Assume 4-byte instructions
+                        'line_num': line_num,
+                        'label': label
                     }
                     
                     instructions.append(instruction)
                     address += 4
+                    label = None
             
             return instructions
             
@@ -710,9 +742,55 @@ class ImprovedVulnerabilityScanner:
         complexity = (decision_points + 1) / len(instructions) * 100
         return min(complexity, 1.0)
     
+    def _split_regions(self, instructions: List[Dict]) -> List[Tuple[int, int]]:
+        """Split instructions into [start, end) regions
+        
+        Regions are functions (started by non-local labels). Functions longer
+        than max_region_instructions are cut into chunks of whole basic blocks
+        (blocks start at labels and after branches); a single oversized block
+        is cut at the size limit.
+        """
+        limit = self.max_region_instructions
+        starts = [0] + [i for i in range(1, len(instructions))
+                        if instructions[i].get('label') and not LOCAL_LABEL_RE.match(instructions[i]['label'])]
+        ends = starts[1:] + [len(instructions)]
+        
+        regions = []
+        for start, end in zip(starts, ends):
+            if end - start <= limit:
+                regions.append((start, end))
+                continue
+            
+            # Pack whole basic blocks into chunks of at most `limit` instructions
+            leaders = [i for i in range(start + 1, end)
+                       if instructions[i].get('label') or
+                       ends_basic_block(instructions[i - 1].get('mnemonic', '').lower())]
+            chunks = []
+            chunk_start = prev = start
+            for leader in leaders + [end]:
+                if leader - chunk_start > limit and prev > chunk_start:
+                    chunks.append((chunk_start, prev))
+                    chunk_start = prev
+                prev = leader
+            chunks.append((chunk_start, end))
+            
+            for chunk_start, chunk_end in chunks:
+                for piece in range(chunk_start, chunk_end, limit):
+                    regions.append((piece, min(piece + limit, chunk_end)))
+        
+        return regions
+    
     def detect_vulnerabilities_improved(self, assembly_file: str, 
                                       context: Optional[CodeContext] = None) -> List[ImprovedVulnerabilityDetection]:
-        """Enhanced vulnerability detection with validation"""
+        """Enhanced vulnerability detection with validation
+        
+        The file is split into regions (see _split_regions). Features of all
+        regions are stacked into one matrix that each classifier scores in a
+        single predict_proba call. Detections report the region as
+        location_start/location_end (instruction indices, end exclusive).
+        A given context applies to every region; otherwise it is analyzed
+        per region.
+        """
         detections = []
         
         try:
@@ -722,87 +800,61 @@ class ImprovedVulnerabilityScanner:
                 self.logger.warning(f"No instructions found in {assembly_file}")
                 return detections
             
-            # Extract code context if not provided
-            if context is None:
-                context = self.context_analyzer.analyze_context(assembly_file, instructions)
+            # Regions to score, with their code context
+            regions = []
+            for start, end in self._split_regions(instructions):
+                region_instructions = instructions[start:end]
+                region_context = context
+                if region_context is None:
+                    region_context = self.context_analyzer.analyze_context(assembly_file, region_instructions)
+                
+                # Pre-filter obviously safe code
+                if self._is_obviously_safe(region_instructions, region_context):
+                    continue
+                regions.append((start, end, region_instructions, region_context))
             
-            # Pre-filter obviously safe code
-            if self._is_obviously_safe(instructions, context):
+            if not regions:
                 self.logger.debug(f"Skipping obviously safe code in {assembly_file}")
                 return detections
             
-            # Extract enhanced features
-            statistical_features = self._extract_statistical_features(instructions)
-            semantic_features = self._extract_semantic_features(instructions)
-            context_features = self._extract_context_features(instructions)
-            
-            # Combine features for prediction
-            combined_features = {**statistical_features, **context_features}
-            feature_vector = np.array([list(combined_features.values())])
-            feature_vector_scaled = self.scaler.transform(feature_vector)
+            # Extract enhanced features for all regions
+            statistical_rows = []
+            feature_rows = []
+            semantic_texts = []
+            for _, _, region_instructions, _ in regions:
+                statistical_features = self._extract_statistical_features(region_instructions)
+                context_features = self._extract_context_features(region_instructions)
+                
+                # Combine features for prediction
+                combined_features = {**statistical_features, **context_features}
+                statistical_rows.append(statistical_features)
+                feature_rows.append(list(combined_features.values()))
+                semantic_texts.append(' '.join(self._extract_semantic_features(region_instructions)))
             
-            # Get semantic features for TF-IDF
-            semantic_text = ' '.join(semantic_features)
-            tfidf_vector = self.tfidf_vectorizer.transform([semantic_text])
+            feature_matrix_scaled = self.scaler.transform(np.array(feature_rows))
+            tfidf_matrix = self.tfidf_vectorizer.transform(semantic_texts)
             
             # Combine all features
-            X_combined = np.hstack([feature_vector_scaled, tfidf_vector.toarray()])
+            X_combined = np.hstack([feature_matrix_scaled, tfidf_matrix.toarray()])
             
-            # Test each vulnerability type
+            # Test each vulnerability type on all regions at once
             for vuln_type, classifier in self.classifiers.items():
                 try:
-                    # Get prediction probability
-                    proba = classifier.predict_proba(X_combined)[0]
-                    if len(proba) > 1:  # Binary classifier with positive class
-                        confidence = proba[1]
-                    else:
+                    # Get prediction probabilities
+                    proba = classifier.predict_proba(X_combined)
+                    if proba.shape[1] < 2:  # Binary classifier with positive class
                         continue
                     
-                    # Extract pattern-specific evidence
-                    pattern_features = self._extract_pattern_features(instructions, vuln_type.upper())
-                    pattern_evidence = self._validate_vulnerability_patterns(instructions, vuln_type.upper())
-                    
-                    # Calculate validation score
-                    validation_score = self._calculate_validation_score(
-                        confidence, pattern_evidence, context, vuln_type
-                    )
-                    
-                    # Calculate false positive likelihood
-                    fp_likelihood = self._estimate_false_positive_likelihood(
-                        confidence, validation_score, pattern_evidence, context
-                    )
-                    
-                    # Determine if detection meets threshold
-                    risk_level = self._determine_risk_level(confidence, validation_score, context)
-                    
-                    if confidence >= self.confidence_thresholds[risk_level]:
-                        # Extract exploit requirements and mitigation factors
-                        exploit_reqs = self._identify_exploit_requirements(instructions, vuln_type, context)
-                        mitigations = self._identify_mitigation_factors(instructions, context)
-                        
-                        detection = ImprovedVulnerabilityDetection(
-                            assembly_file=assembly_file,
-                            vulnerability_type=vuln_type.upper(),
-                            confidence=confidence,
-                            validation_score=validation_score,
-                            evidence={
-                                'statistical_features': statistical_features,
-                                'pattern_features': pattern_features,
-                                'pattern_evidence': pattern_evidence,
-                                'context': asdict(context),
-                                'ml_prediction': confidence
-                            },
-                            location_start=0,  # Could be enhanced to find specific locations
-                            location_end=len(instructions),
-                            risk_level=risk_level,
-                            false_positive_likelihood=fp_likelihood,
-                            exploit_requirements=exploit_reqs,
-                            mitigation_factors=mitigations
+                    for (start, end, region_instructions, region_context), statistical_features, confidence in zip(
+                            regions, statistical_rows, proba[:, 1]):
+                        if confidence < self.evidence_threshold:
+                            continue
+                        detection = self._build_detection(
+                            assembly_file, vuln_type, float(confidence), start, end,
+                            region_instructions, region_context, statistical_features
                         )
-                        
-                        detections.append(detection)
-                        self.logger.info(f"Detected {vuln_type} in {assembly_file} "
-                                       f"(confidence: {confidence:.3f}, validation: {validation_score:.3f})")
+                        if detection is not None:
+                            detections.append(detection)
                 
                 except Exception as e:
                     self.logger.warning(f"Error testing {vuln_type} on {assembly_file}: {e}")
@@ -815,6 +867,62 @@ class ImprovedVulnerabilityScanner:
         
         return detections
     
+    def _build_detection(self, assembly_file: str, vuln_type: str, confidence: float,
+                         start: int, end: int, instructions: List[Dict], context: CodeContext,
+                         statistical_features: Dict[str, float]) -> Optional[ImprovedVulnerabilityDetection]:
+        """Validate one region's classifier score; returns a detection if it meets its risk threshold"""
+        # Extract pattern-specific evidence
+        pattern_features = self._extract_pattern_features(instructions, vuln_type.upper())
+        pattern_evidence = self._validate_vulnerability_patterns(instructions, vuln_type.upper())
+        
+        # Calculate validation score
+        validation_score = self._calculate_validation_score(
+            confidence, pattern_evidence, context, vuln_type
+        )
+        
+        # Calculate false positive likelihood
+        fp_likelihood = self._estimate_false_positive_likelihood(
+            confidence, validation_score, pattern_evidence, context
+        )
+        
+        # Determine if detection meets threshold
+        risk_level = self._determine_risk_level(confidence, validation_score, context)
+        
+        if confidence < self.confidence_thresholds[risk_level]:
+            return None
+        
+        # Extract exploit requirements and mitigation factors
+        exploit_reqs = self._identify_exploit_requirements(instructions, vuln_type, context)
+        mitigations = self._identify_mitigation_factors(instructions, context)
+        
+        self.logger.info(f"Detected {vuln_type} in {assembly_file} "
+                         f"[{start}:{end}] (confidence: {confidence:.3f}, validation: {validation_score:.3f})")
+        
+        return ImprovedVulnerabilityDetection(
+            assembly_file=assembly_file,
+            vulnerability_type=vuln_type.upper(),
+            confidence=confidence,
+            validation_score=validation_score,
+            evidence={
+                'statistical_features': statistical_features,
+                'pattern_features': pattern_features,
+                'pattern_evidence': pattern_evidence,
+                'context': asdict(context),
+                'ml_prediction': confidence,
+                'region': {
+                    'label': instructions[0].get('label'),
+                    'line_start': instructions[0].get('line_num'),
+                    'line_end': instructions[-1].get('line_num')
+                }
+            },
+            location_start=start,
+            location_end=end,
+            risk_level=risk_level,
+            false_positive_likelihood=fp_likelihood,
+            exploit_requirements=exploit_reqs,
+            mitigation_factors=mitigations
+        )
+    
     def _is_obviously_safe(self, instructions: List[Dict], context: CodeContext) -> bool:
         """Pre-filter obviously safe code to reduce false positives"""
         
@@ -1028,7 +1136,9 @@ class ImprovedVulnerabilityScanner:
             is_duplicate = False
             for existing in filtered:
                 if (detection.vulnerability_type == existing.vulnerability_type and
-                    detection.assembly_file == existing.assembly_file):
+                    detection.assembly_file == existing.assembly_file and
+                    detection.location_start < existing.location_end and
+                    existing.location_start < detection.location_end):
                     
                     # If new detection is significantly better, replace
                     if detection.validation_score > existing.validation_score + 0.1:
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Compact, array-backed instruction corpus.
+
+The scanners and dataset builders used to hold one dict per instruction
+('line_num', 'raw_line', 'opcode', 'operands', and a 14-key 'semantics' dict),
+which is over a kilobyte per instruction once full repositories are parsed.
+An InstructionCorpus stores the same information column-wise:
+
+    strings         StringTable shared by raw lines, opcodes and operands
+    columns         one array.array per INSTRUCTION_DTYPE field
+    records         NumPy structured array of the same rows (built on demand)
+    operand_ids     int32 string ids of all operands, concatenated
+
+Semantics are a SEMANTIC_FLAGS bitfield and registers a register_mask()
+bitmask (see instruction_semantics.py), so most window statistics can be
+computed on the record columns directly.
+
+Indexing a corpus yields InstructionView objects: read-only Mappings with the
+old dict keys, so the detectors and the DSL matcher work on them unchanged.
+Slicing yields a CorpusWindow that shares the corpus arrays (no copying);
+windows slice further in the same way, and ``window.records`` is a NumPy view.
+
+Usage:
+    corpus = InstructionCorpus('arm64')
+    corpus.append(12, 'ldr x0, [x1]', 'ldr', ['x0,', '[x1]'], ('is_load', 'accesses_memory'))
+    window = corpus[0:10]               # zero-copy
+    window[0]['semantics']['is_load']   # True
+    window.records['semantics']         # uint16 bitfield column
+    window.to_dicts()                   # plain dicts, e.g. for JSON output
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from instruction_semantics import ARCHES, SEMANTIC_FLAGS, instruction_registers, register_mask, semantics_dict
+
+
+INSTRUCTION_DTYPE = np.dtype([
+    ('line_num', np.int32),
+    ('raw_line', np.int32),        # string id
+    ('opcode', np.int32),          # string id
+    ('operand_start', np.int32),   # offset into operand_ids
+    ('operand_count', np.int16),
+    ('semantics', np.uint16),      # SEMANTIC_FLAGS bits
+    ('registers', np.uint64),      # register_mask() bits
+])
+# array.array type codes of the same fields (columns are appended to before
+# the records array is built)
+_COLUMN_TYPECODES = {'line_num': 'i', 'raw_line': 'i', 'opcode': 'i', 'operand_start': 'i',
+                     'operand_count': 'h', 'semantics': 'H', 'registers': 'Q'}
+
+# Keys of an InstructionView, in the order of the dicts it replaces
+INSTRUCTION_KEYS = ('line_num', 'raw_line', 'opcode', 'operands', 'semantics')
+
+SEMANTIC_BITS: Dict[str, int] = {flag: 1 << i for i, flag in enumerate(SEMANTIC_FLAGS)}
+
+Semantics = Union[int, Mapping, Iterable[str]]
+
+
+def semantics_bits(semantics: Semantics) -> int:
+    """Bitfield of a semantics dict (truthy keys) or of an iterable of flag names."""
+    if isinstance(semantics, int):
+        return semantics
+    if isinstance(semantics, Mapping):
+        semantics = [flag for flag, value in semantics.items() if value]
+    bits = 0
+    for flag in semantics:
+        bits |= SEMANTIC_BITS.get(flag, 0)
+    return bits
+
+
+@lru_cache(maxsize=None)
+def semantics_mapping(bits: int) -> Mapping:
+    """Read-only semantics dict for a bitfield (one shared object per distinct value)."""
+    return MappingProxyType(semantics_dict(f for f, b in SEMANTIC_BITS.items() if bits & b))
+
+
+# =============================================================================
+# String table
+# =============================================================================
+
+class StringTable:
+    """Interned strings addressed by dense int ids. May be shared by several corpora."""
+
+    __slots__ = ('strings', 'ids')
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, text: str) -> int:
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return sid
+
+    def __getitem__(self, sid: int) -> str:
+        return self.strings[sid]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getstate__(self):
+        return (self.strings,)
+
+    def __setstate__(self, state):
+        strings, = state
+        self.strings = strings
+        self.ids = {text: sid for sid, text in enumerate(strings)}
+
+
+# =============================================================================
+# Views
+# =============================================================================
+
+class InstructionView(Mapping):
+    """One instruction of a corpus, readable like the old instruction dict."""
+
+    __slots__ = ('corpus', 'index')
+
+    def __init__(self, corpus: 'InstructionCorpus', index: int):
+        self.corpus = corpus
+        self.index = index
+
+    def __getitem__(self, key):
+        columns = self.corpus.columns
+        if key == 'semantics':
+            return semantics_mapping(columns['semantics'][self.index])
+        if key == 'opcode' or key == 'raw_line':
+            return self.corpus.strings.strings[columns[key][self.index]]
+        if key == 'operands':
+            return self.corpus.operands(self.index)
+        if key == 'line_num':
+            return columns['line_num'][self.index]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # Hot in the detectors (instr.get('semantics', {})): skip Mapping.get's try/except
+        if key in INSTRUCTION_KEYS:
+            return self[key]
+        return default
+
+    def __iter__(self):
+        return iter(INSTRUCTION_KEYS)
+
+    def __len__(self):
+        return len(INSTRUCTION_KEYS)
+
+    def __eq__(self, other):
+        if isinstance(other, InstructionView):
+            return self.corpus is other.corpus and self.index == other.index
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash((id(self.corpus), self.index))
+
+    def __repr__(self):
+        return f"InstructionView({self.to_dict()!r})"
+
+    @property
+    def registers(self) -> int:
+        return self.corpus.columns['registers'][self.index]
+
+    @property
+    def semantic_bits(self) -> int:
+        return self.corpus.columns['semantics'][self.index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {key: self[key] for key in INSTRUCTION_KEYS}
+        d['semantics'] = dict(d['semantics'])
+        return d
+
+
+class CorpusWindow(Sequence):
+    """Contiguous instructions [start, stop) of a corpus; slicing never copies."""
+
+    __slots__ = ('corpus', 'start', 'stop')
+
+    def __init__(self, corpus: 'InstructionCorpus', start: int, stop: int):
+        self.corpus = corpus
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        n = self.stop - self.start
+        if isinstance(item, slice):
+            start, stop, step = item.indices(n)
+            if step != 1:
+                return [InstructionView(self.corpus, self.start + i) for i in range(start, stop, step)]
+            return CorpusWindow(self.corpus, self.start + start, self.start + max(start, stop))
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError('instruction index out of range')
+        return InstructionView(self.corpus, self.start + item)
+
+    def __iter__(self):
+        corpus = self.corpus
+        for i in range(self.start, self.stop):
+            yield InstructionView(corpus, i)
+
+    def index(self, value, start=0, stop=None):
+        if isinstance(value, InstructionView) and value.corpus is self.corpus:
+            i = value.index - self.start
+            if 0 <= i < len(self) and start <= i and (stop is None or i < stop):
+                return i
+            raise ValueError('instruction is not in this window')
+        return super().index(value, start, len(self) if stop is None else stop)
+
+    def __repr__(self):
+        return f"CorpusWindow({self.corpus.arch}, {self.start}:{self.stop})"
+
+    @property
+    def records(self) -> np.ndarray:
+        """NumPy view of this window's INSTRUCTION_DTYPE rows."""
+        return self.corpus.records[self.start:self.stop]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [view.to_dict() for view in self]
+
+    def window_by_lines(self, start_line: int, end_line: int) -> 'CorpusWindow':
+        """Instructions with start_line <= line_num <= end_line (line numbers ascend)."""
+        lines = self.records['line_num']
+        lo = int(np.searchsorted(lines, start_line, side='left'))
+        hi = int(np.searchsorted(lines, end_line, side='right'))
+        return CorpusWindow(self.corpus, self.start + lo, self.start + max(lo, hi))
+
+
+# =============================================================================
+# Corpus
+# =============================================================================
+
+class InstructionCorpus(CorpusWindow):
+    """Growable instruction store; the whole corpus is itself a window.
+
+    Instructions are appended to compact array.array columns (which also
+    serve element access); the structured ``records`` array is built from
+    them on first use and rebuilt if more instructions are appended later.
+    """
+
+    __slots__ = ('arch', 'strings', 'columns', 'operand_ids', '_records')
+
+    def __init__(self, arch: str, strings: Optional[StringTable] = None):
+        super().__init__(self, 0, 0)
+        self.arch = arch
+        self.strings = strings if strings is not None else StringTable()
+        self.columns: Dict[str, array] = {name: array(code) for name, code in _COLUMN_TYPECODES.items()}
+        self.operand_ids = array('i')
+        self._records: Optional[np.ndarray] = None
+
+    def __getstate__(self):
+        return (self.arch, self.strings, self.columns, self.operand_ids)
+
+    def __setstate__(self, state):
+        arch, strings, self.columns, self.operand_ids = state
+        self.corpus, self.start, self.stop = self, 0, len(self.columns['line_num'])
+        self.arch, self.strings, self._records = arch, strings, None
+
+    def append(self, line_num: int, raw_line: str, opcode: str, operands: Iterable[str],
+               semantics: Semantics = 0, registers: Optional[int] = None) -> int:
+        """Add one instruction; returns its index. ``registers`` defaults to the
+        register_mask() of the registers in the raw line."""
+        intern = self.strings.intern
+        columns = self.columns
+        operand_start = len(self.operand_ids)
+        for operand in operands:
+            self.operand_ids.append(intern(operand))
+        if registers is None:
+            registers = register_mask(instruction_registers(raw_line, self.arch), self.arch) \
+                if self.arch in ARCHES else 0
+        columns['line_num'].append(line_num)
+        columns['raw_line'].append(intern(raw_line))
+        columns['opcode'].append(intern(opcode))
+        columns['operand_start'].append(operand_start)
+        columns['operand_count'].append(len(self.operand_ids) - operand_start)
+        columns['semantics'].append(semantics_bits(semantics))
+        columns['registers'].append(registers)
+        self.stop += 1
+        return self.stop - 1
+
+    @classmethod
+    def from_dicts(cls, instructions: Iterable[Mapping], arch: str,
+                   strings: Optional[StringTable] = None) -> 'InstructionCorpus':
+        """Corpus from instruction dicts ('raw'/'line' accepted for 'raw_line'/'line_num')."""
+        corpus = cls(arch, strings)
+        for instr in instructions:
+            corpus.append(
+                instr.get('line_num', instr.get('line', 0)),
+                instr.get('raw_line', instr.get('raw', '')),
+                instr.get('opcode', ''),
+                instr.get('operands', []),
+                instr.get('semantics') or 0,
+            )
+        return corpus
+
+    @property
+    def records(self) -> np.ndarray:
+        """INSTRUCTION_DTYPE rows of every instruction."""
+        if self._records is None or len(self._records) != self.stop:
+            records = np.empty(self.stop, dtype=INSTRUCTION_DTYPE)
+            for name, column in self.columns.items():
+                records[name] = np.frombuffer(column, dtype=INSTRUCTION_DTYPE[name]) \
+                    if len(column) else 0
+            self._records = records
+        return self._records
+
+    def operands(self, index: int) -> List[str]:
+        start = self.columns['operand_start'][index]
+        strings = self.strings.strings
+        return [strings[sid] for sid in self.operand_ids[start:start + self.columns['operand_count'][index]]]
+
+    def nbytes(self) -> int:
+        """Bytes held by the instruction columns (string table excluded)."""
+        return (sum(col.itemsize * len(col) for col in self.columns.values())
+                + self.operand_ids.itemsize * len(self.operand_ids))
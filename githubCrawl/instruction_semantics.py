@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Instruction decoding and semantics shared by the githubCrawl detectors, the
+instruction corpus and the scripts/ graph and feature builders.
+
+    decode(line) / decode_many(lines)   DecodedInstruction (line, opcode, operands,
+                                        words), cached per distinct line;
+                                        .view(fn) memoizes a consumer's per-line result
+    SEMANTIC_FLAGS / semantics_dict()   the per-instruction semantics record of
+                                        the detectors, in key order
+    MnemonicTable                       mnemonic -> value lookup (exact entries
+                                        plus ordered prefix rules), memoized
+                                        per mnemonic
+    MnemonicClasses                     per-ISA mnemonic -> class bitmask tables
+    SCANNER_SEMANTICS, DETECTOR_SEMANTICS, PDG_CLASSES, GRAPH_CLASSES,
+    FEATURE_CLASSES, SIMPLIFIED_TYPES   the mnemonic tables of every consumer,
+                                        built once at import
+    instruction_registers(line, arch)   registers named by one assembly line (cached)
+    register_mask(registers, arch)      64-bit mask of architectural registers
+                                        (aliases merged)
+
+Each consumer keeps its own taxonomy (node and window features that trained
+models were fit on), but its mnemonic rules live here as tables that
+reproduce its former regex / if-chain results, so a line is classified by
+dict lookups on its decoded words.
+
+Usage:
+    from instruction_semantics import decode, PDG_CLASSES
+    d = decode('ldr x0, [x1, x2, lsl #3]')
+    d.opcode, d.operands, PDG_CLASSES.classes(d.words) & PDG_CLASSES['load']
+
+scripts/ modules reach this file by appending githubCrawl/ to sys.path.
+"""
+
+import re
+from functools import lru_cache
+from typing import (Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence,
+                    Tuple, TypeVar, Union)
+
+
+ARCHES = ('x86_64', 'arm64', 'riscv64')
+
+
+# =============================================================================
+# TOKENIZATION
+# =============================================================================
+
+LINE_CACHE_SIZE = 1 << 16
+
+T = TypeVar('T')
+
+_WORD_RE = re.compile(r'\w+')
+# re.IGNORECASE also matches these four non-ASCII letters against ASCII ones
+_WORD_FOLD = str.maketrans('İıſK', 'iisk')
+
+
+def opcode_of(line: str) -> str:
+    return (line.split()[0].lower() if line else "").strip(",")
+
+
+def parse_operands(line):
+    """
+    Simple heuristic to split operands.
+    Assumes format: 'opcode op1, op2, op3'
+    """
+    parts = line.strip().split(None, 1)
+    if len(parts) < 2:
+        return []
+    operands_str = parts[1]
+    ops = [o.strip() for o in operands_str.split(',')]
+    return ops
+
+
+def line_words(line: str) -> FrozenSet[str]:
+    """Lowercased whole words (\\w+ runs) of a line, case-folded the way
+    re.IGNORECASE compares them."""
+    return frozenset(_WORD_RE.findall(line.translate(_WORD_FOLD).lower()))
+
+
+# =============================================================================
+# DECODED RECORD
+# =============================================================================
+
+class DecodedInstruction:
+    """One assembly line, tokenized once.
+
+    ``opcode`` is the lowercased first token ('' for a blank line),
+    ``operands`` the comma-separated rest and ``words`` the set of
+    line_words(), which the MnemonicClasses tables are looked up with.
+    Records are shared through the decode() cache, so they are never
+    mutated; consumer-specific results are attached with view() and must be
+    immutable too.
+    """
+
+    __slots__ = ('line', 'opcode', 'operands', 'words', '_views')
+
+    def __init__(self, line: str):
+        self.line = line
+        self.opcode = opcode_of(line) if line.strip() else ''
+        self.operands = tuple(parse_operands(line))
+        self.words = line_words(line)
+        self._views: Dict[Callable, object] = {}
+
+    def view(self, fn: Callable[['DecodedInstruction'], T]) -> T:
+        """fn(self), computed on first use and memoized on this record."""
+        try:
+            return self._views[fn]
+        except KeyError:
+            value = self._views[fn] = fn(self)
+            return value
+
+    def __repr__(self) -> str:
+        return f'DecodedInstruction({self.line!r})'
+
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def decode(line: str) -> DecodedInstruction:
+    """Decode one assembly line (cached per distinct line)."""
+    return DecodedInstruction(line)
+
+
+def decode_many(lines: Sequence[str]) -> List[DecodedInstruction]:
+    return [decode(line) for line in lines]
+
+
+# =============================================================================
+# SEMANTICS RECORD
+# =============================================================================
+
+SEMANTIC_FLAGS = (
+    'is_branch', 'is_conditional', 'is_indirect', 'is_call', 'is_return',
+    'is_load', 'is_store', 'accesses_memory', 'is_arithmetic', 'is_comparison',
+    'is_speculation_barrier', 'is_cache_operation', 'is_timing_sensitive', 'is_privileged',
+)
+
+
+def semantics_dict(flags: Iterable[str] = ()) -> Dict[str, bool]:
+    """Fresh semantics dict with ``flags`` set and every other SEMANTIC_FLAGS key False."""
+    semantics = dict.fromkeys(SEMANTIC_FLAGS, False)
+    for flag in flags:
+        semantics[flag] = True
+    return semantics
+
+
+# =============================================================================
+# MNEMONIC TABLES
+# =============================================================================
+
+PrefixValue = Union[object, Callable[[str], object]]
+
+
+class MnemonicTable:
+    """mnemonic -> value lookup for a detector's instruction taxonomy.
+
+    Exact entries win; otherwise the first matching prefix rule (in the order
+    given, mirroring the if/elif chain it replaces) supplies the value, either
+    directly or by calling it with the mnemonic; otherwise ``default``. The
+    resolved value is memoized as an exact entry, so each distinct mnemonic
+    is resolved once per process.
+    """
+
+    def __init__(self, exact: Optional[Dict[str, object]] = None,
+                 prefixes: Sequence[Tuple[str, PrefixValue]] = (), default: object = None):
+        self.exact: Dict[str, object] = dict(exact or {})
+        self.prefixes = list(prefixes)
+        self.default = default
+
+    @classmethod
+    def from_groups(cls, groups: Dict[object, str], prefixes: Sequence[Tuple[str, PrefixValue]] = (),
+                    default: object = None) -> 'MnemonicTable':
+        """Build from {value: 'space separated mnemonics'}."""
+        exact = {}
+        for value, names in groups.items():
+            for name in names.split():
+                exact[name] = value
+        return cls(exact, prefixes, default)
+
+    def __getitem__(self, mnemonic: str):
+        try:
+            return self.exact[mnemonic]
+        except KeyError:
+            pass
+        value = self.default
+        for prefix, rule in self.prefixes:
+            if mnemonic.startswith(prefix):
+                value = rule(mnemonic) if callable(rule) else rule
+                break
+        self.exact[mnemonic] = value
+        return value
+
+    get = __getitem__
+
+
+class MnemonicClasses:
+    """Named mnemonic classes compiled into mnemonic -> bitmask tables.
+
+    Built from {class name: {arch: 'space separated mnemonics'}} into one
+    dict per ISA in ARCHES plus ``merged``, their union, for callers that
+    see lines of any ISA. classes(words) ORs the masks of a line's words, so
+    a class is set exactly when one of its mnemonics occurs on the line as a
+    whole word: what the ``\\b(m1|m2|...)\\b`` regex it replaces matched.
+    Forms spanning several tokens (``b.ne``, ``dc civac``) are left to the
+    consumer.
+    """
+
+    def __init__(self, classes: Dict[str, Dict[str, str]]):
+        self.bits: Dict[str, int] = {}
+        self.by_arch: Dict[str, Dict[str, int]] = {arch: {} for arch in ARCHES}
+        self.merged: Dict[str, int] = {}
+        for i, (name, per_arch) in enumerate(classes.items()):
+            bit = self.bits[name] = 1 << i
+            for arch, mnemonics in per_arch.items():
+                table = self.by_arch[arch]
+                for mnemonic in mnemonics.split():
+                    table[mnemonic] = table.get(mnemonic, 0) | bit
+                    self.merged[mnemonic] = self.merged.get(mnemonic, 0) | bit
+
+    def __getitem__(self, name: str) -> int:
+        return self.bits[name]
+
+    def classes(self, words: Iterable[str], arch: Optional[str] = None) -> int:
+        """OR of the class bits of ``words`` (all ISAs unless ``arch`` is given)."""
+        table = self.merged if arch is None else self.by_arch[arch]
+        mask = 0
+        for word in words:
+            mask |= table.get(word, 0)
+        return mask
+
+
+# Mnemonic families shared by several tables, spelled as the graph builders'
+# branch regexes matched them (x86 Jcc forms such as jae/jle are not included).
+X86_CONDITIONAL_JUMPS = ('ja jb jc je jg jl jn jo jp js jz jna jnb jnc jne jng jnl jno jnp '
+                         'jns jnz jcxz jecxz jrcxz')
+ARM64_CONDITIONAL_BRANCHES = 'beq bne blt ble bgt bge bhs blo bhi bls bmi bpl cbz cbnz tbz tbnz'
+RISCV64_CONDITIONAL_BRANCHES = 'beq bne blt ble bgt bge'
+
+# --- githubCrawl detectors: mnemonic -> (flags, operand rule) ---
+#
+# Operand rules add flags from the operands (see semantic_flags()):
+# 'memory_load' (load when an operand is a memory reference), 'indirect_memory'
+# (indirect through memory) and 'indirect_call' (indirect through memory or a
+# register). Prefix rules took precedence over exact entries in the original
+# rule order, so the only exact x86 entry starting with 'j' (jmp) is what the
+# 'j' rule gives it, and no arm64 entry starts with 'b'.
+
+# github_vulnerability_scanner.py and build_dataset.py
+SCANNER_SEMANTICS = {
+    'x86_64': MnemonicTable.from_groups(
+        {
+            (('is_branch',), 'indirect_memory'): 'jmp',
+            (('is_call',), 'indirect_call'): 'call',
+            (('is_return',), None): 'ret',
+            ((), 'memory_load'): 'mov movzx movsx movzbl movzwl lea',
+            (('is_arithmetic',), None): 'add sub mul div xor and or shl shr',
+            (('is_comparison',), None): 'cmp test',
+            (('is_speculation_barrier',), None): 'lfence mfence sfence',
+            (('is_cache_operation',), None): 'clflush clwb clflushopt',
+            (('is_timing_sensitive',), None): 'rdtsc rdtscp',
+        },
+        prefixes=[('j', (('is_branch', 'is_conditional'), 'indirect_memory'))],
+        default=((), None),
+    ),
+    'arm64': MnemonicTable.from_groups(
+        {
+            (('is_return',), None): 'ret',
+            (('is_load', 'accesses_memory'), None): 'ldr ldrb ldrh ldp',
+            (('is_store', 'accesses_memory'), None): 'str strb strh stp',
+            (('is_arithmetic',), None): 'add sub mul div and orr eor lsl lsr',
+            (('is_comparison',), None): 'cmp subs',
+            (('is_speculation_barrier',), None): 'dsb isb dmb',
+            (('is_cache_operation',), None): 'dc ic',
+            (('is_timing_sensitive', 'is_privileged'), None): 'mrs',
+        },
+        # bl/blr/br are branches here too ('b' prefix); conditional ones have a '.'
+        prefixes=[('b', lambda op: (('is_branch',)
+                                    + (('is_conditional',) if '.' in op else ())
+                                    + (('is_indirect',) if op in ('br', 'blr') else ()), None))],
+        default=((), None),
+    ),
+}
+
+# robust_vulnerability_detector.py
+DETECTOR_SEMANTICS = {
+    'x86_64': MnemonicTable.from_groups(
+        {
+            (('is_call',), None): 'call',
+            (('is_return',), None): 'ret',
+            ((), 'memory_load'): 'mov movzx movsx lea',
+            (('is_arithmetic',), None): 'add sub mul div xor and or',
+            (('is_comparison',), None): 'cmp test',
+            (('is_speculation_barrier',), None): 'lfence mfence sfence',
+            (('is_cache_operation',), None): 'clflush clwb',
+            (('is_timing_sensitive',), None): 'rdtsc rdtscp',
+        },
+        prefixes=[('j', lambda op: (('is_branch',) if op == 'jmp' else ('is_branch', 'is_conditional'), None))],
+        default=((), None),
+    ),
+    'arm64': MnemonicTable.from_groups(
+        {
+            (('is_return',), None): 'ret',
+            (('is_load', 'accesses_memory'), None): 'ldr ldrb ldrh ldp',
+            (('is_store', 'accesses_memory'), None): 'str strb strh stp',
+            (('is_arithmetic',), None): 'add sub mul div and orr eor',
+            (('is_comparison',), None): 'cmp subs',
+            (('is_speculation_barrier',), None): 'dsb isb dmb',
+            (('is_cache_operation',), None): 'dc ic',
+            (('is_timing_sensitive', 'is_privileged'), None): 'mrs',
+        },
+        prefixes=[('b', lambda op: (('is_branch', 'is_conditional') if '.' in op else ('is_branch',), None))],
+        default=((), None),
+    ),
+}
+
+
+def semantic_flags(table: MnemonicTable, opcode: str, operands: Sequence[str]) -> Tuple[str, ...]:
+    """Semantic flag names of one instruction under a detector table
+    (mnemonic flags plus those of its operand rule)."""
+    flags, operand_rule = table[opcode]
+    if operand_rule == 'memory_load':
+        if any('[' in op for op in operands):
+            flags = flags + ('accesses_memory', 'is_load')
+    elif operand_rule == 'indirect_memory':
+        if any('[' in op for op in operands):
+            flags = flags + ('is_indirect',)
+    elif operand_rule == 'indirect_call':
+        if any('[' in op or '%' in op for op in operands):
+            flags = flags + ('is_indirect',)
+    return flags
+
+
+# --- scripts/pdg_builder.py: opcode category rules of PDG nodes ---
+PDG_CLASSES = MnemonicClasses({
+    'load': {
+        'arm64': 'ldr ldrb ldrh ldrs ldrd ldrq ldp ldur ldurb ldurh ldurs ldurd ldurq '
+                 'ldrsb ldrsh ldrsw lda ldar ldax ldaxr ldnp ldtr ldx ldxp ldxr',
+        'x86_64': 'mov movq movl movd movw movb movzx movsx movabs '
+                  'lods lodsb lodsw lodsd lodsq pop popq popl popd popw lea',
+    },
+    'store': {
+        'arm64': 'str strb strh strs strd strq stp stur sturb sturh sturs sturd sturq '
+                 'stlr stxr stnp sttr',
+        'x86_64': 'mov movq movl movd movw movb movnti '
+                  'stos stosb stosw stosd stosq push pushq pushl pushd pushw',
+    },
+    'branch_cond': {
+        'x86_64': X86_CONDITIONAL_JUMPS,
+        'arm64': ARM64_CONDITIONAL_BRANCHES,
+        'riscv64': RISCV64_CONDITIONAL_BRANCHES,
+    },
+    'branch_uncond': {'x86_64': 'jmp jmpq'},
+    'call': {'x86_64': 'call callq', 'arm64': 'bl', 'riscv64': 'call'},
+    'ret': {'x86_64': 'ret retq retw retl', 'arm64': 'ret', 'riscv64': 'ret'},
+    'indirect': {'arm64': 'br blr'},
+    'jump_indirect': {'x86_64': 'jmp jmpq', 'arm64': 'br'},
+    'compare': {'x86_64': 'cmp test', 'arm64': 'cmp cmn tst ccmp ccmn fcmp'},
+    'arithmetic': {
+        'x86_64': 'add sub mul div neg adc inc dec imul idiv',
+        'arm64': 'add sub mul udiv sdiv madd msub neg adc sbc',
+        'riscv64': 'add sub mul div neg',
+    },
+    'logic': {
+        'x86_64': 'and or xor not',
+        'arm64': 'and orr eor orn bic',
+        'riscv64': 'and or xor not',
+    },
+    'shift': {'x86_64': 'shl shr sar rol ror', 'arm64': 'lsl lsr asr ror'},
+    'fence': {'x86_64': 'lfence mfence sfence cpuid', 'arm64': 'dsb dmb isb'},
+    'cache': {'x86_64': 'clflush clflushopt clwb cldemote invlpg wbinvd'},
+    'timing': {'x86_64': 'rdtsc rdtscp rdpmc'},
+    'move': {'x86_64': 'mov movs', 'arm64': 'mov movz movk movn'},
+    'stack': {'x86_64': 'push pop'},
+})
+
+# --- scripts/semantic_graph_builder.py: semantic node type rules ---
+GRAPH_CLASSES = MnemonicClasses({
+    'load': {
+        'arm64': 'ldr ldp ldur ldrb ldrh ldrsb ldrsh ldrsw ldrex ldadd ldclr ldset '
+                 'ld1 ld2 ld3 ld4 ldnp ldtr ldxr ldar vldr vld1 vld2 vld3 vld4 '
+                 'mov movz movk movn',
+        'x86_64': 'mov movq movl movd movs movzx movsx movabs lods lodsb lodsw lodsd lodsq '
+                  'pop vmov vpbroadcast vbroadcast lea',
+    },
+    'store': {
+        'arm64': 'str stp stur strb strh stlr stxr stlxr st1 st2 st3 st4 stnp sttr '
+                 'vstr vst1 vst2 vst3 vst4',
+        'x86_64': 'mov movq movl movd movnti stos stosb stosw stosd stosq push vmov',
+    },
+    'branch_cond': {
+        'x86_64': X86_CONDITIONAL_JUMPS,
+        'arm64': ARM64_CONDITIONAL_BRANCHES,
+        'riscv64': RISCV64_CONDITIONAL_BRANCHES,
+    },
+    'branch_uncond': {'x86_64': 'jmp jmpq'},
+    'call': {'x86_64': 'call callq', 'arm64': 'bl', 'riscv64': 'call'},
+    'indirect': {'x86_64': 'ret', 'arm64': 'br blr ret', 'riscv64': 'ret'},
+    'ret': {'x86_64': 'ret retq retw retl', 'arm64': 'ret', 'riscv64': 'ret'},
+    'compare': {'x86_64': 'cmp test', 'arm64': 'cmp cmn tst ccmp ccmn fcmp'},
+    'fence': {'x86_64': 'lfence mfence sfence', 'arm64': 'dsb dmb isb'},
+    'cache': {'x86_64': 'clflush clflushopt clwb cldemote invlpg wbinvd invd'},
+    'timing': {'x86_64': 'rdtsc rdtscp rdpmc'},
+    'nop': {'x86_64': 'nop', 'arm64': 'nop', 'riscv64': 'nop'},
+    'arithmetic': {
+        'x86_64': 'add sub mul div and neg adc inc dec imul idiv shl shr sar rol ror',
+        'arm64': 'add sub mul udiv sdiv madd msub and orr eor orn bic lsl lsr asr ror '
+                 'adc sbc neg mvn fadd fsub fmul fdiv vadd vsub vmul vdiv',
+        'riscv64': 'add sub mul div and neg',
+    },
+})
+
+# --- scripts/extract_features_enhanced.py: per-line predicates ---
+FEATURE_CLASSES = MnemonicClasses({
+    'load': {'arm64': 'ldr ldrb ldrh ldrsh ldrsw'},
+    'store': {'arm64': 'str strb strh strw'},
+    'cache_flush': {'x86_64': 'clflush clflushopt clwb'},
+    'fence': {'x86_64': 'lfence mfence sfence', 'arm64': 'dsb dmb isb'},
+    'timing': {'x86_64': 'rdtsc rdtscp'},
+    'clear_reg': {'x86_64': 'xor', 'arm64': 'eor'},
+    'shift': {'x86_64': 'shl sal', 'arm64': 'lsl'},
+    'call': {'x86_64': 'call callq', 'arm64': 'bl', 'riscv64': 'call'},
+    'ret': {'x86_64': 'ret retq retn', 'arm64': 'ret', 'riscv64': 'ret'},
+})
+
+# extract_features_enhanced.get_simplified_type: lowercased opcode -> structural
+# type (None for nop). Prefix rules are in the order of the if-chain they replace.
+SIMPLIFIED_TYPES = MnemonicTable.from_groups(
+    {
+        None: 'nop',
+        'BRANCH_UNCOND': 'b bl br blr jmp',
+        'BARRIER': 'lfence mfence sfence',
+        'FLUSH': 'clflush',
+        'TIME': 'rdtsc',
+    },
+    prefixes=[
+        ('ret', 'RET'), ('call', 'BRANCH_UNCOND'),
+        ('b.', 'BRANCH_COND'), ('cb', 'BRANCH_COND'), ('tb', 'BRANCH_COND'),
+        ('ldr', 'LOAD'), ('ldp', 'LOAD'), ('ldu', 'LOAD'),
+        ('str', 'STORE'), ('stp', 'STORE'), ('stur', 'STORE'),
+        ('dsb', 'BARRIER'), ('dmb', 'BARRIER'), ('isb', 'BARRIER'),
+        ('j', 'BRANCH_COND'), ('mov', 'MOVE'),
+    ],
+    default='COMPUTE',
+)
+
+
+# =============================================================================
+# REGISTERS
+# =============================================================================
+
+_COMMENT_RE = re.compile(r'\s(?:;|//|@)\s.*$|\s#\s.*$')
+_X86_REG_RE = re.compile(r'%[a-z][a-z0-9]*', re.I)
+_ARM64_REG_RE = re.compile(r'\b(?:[xw](?:[0-9]|[12][0-9]|30)|sp|wsp|xzr|wzr|lr|fp)\b', re.I)
+_RISCV_REG_RE = re.compile(r'\b(?:zero|ra|sp|gp|tp|fp|t[0-6]|s(?:[0-9]|1[01])|a[0-7])\b', re.I)
+_REGISTER_RES = {'x86_64': _X86_REG_RE, 'arm64': _ARM64_REG_RE, 'riscv64': _RISCV_REG_RE}
+
+
+@lru_cache(maxsize=1 << 16)
+def instruction_registers(line: str, arch: str) -> Tuple[str, ...]:
+    """Lowercased register names in the operands of one line; () for blank
+    lines, labels, directives and comments."""
+    text = _COMMENT_RE.sub('', line.strip())
+    if not text or text[0] in '.#;/@' or text.endswith(':'):
+        return ()
+    parts = text.split(None, 1)
+    operand_text = parts[1] if len(parts) > 1 else ''
+    pattern = _REGISTER_RES.get(arch, _ARM64_REG_RE)
+    return tuple(r.lower() for r in pattern.findall(operand_text))
+
+
+# Register name (as returned by instruction_registers) -> bit, per architecture.
+# Sub-registers and ABI aliases share the bit of their architectural register
+# (w3/x3, eax/al/rax, fp/s0), so two masks intersect exactly when the
+# instructions name overlapping registers. Anything else (segment, control,
+# vector registers past the table) shares OTHER_REGISTER_BIT.
+OTHER_REGISTER_BIT = 63
+
+
+def _x86_64_register_bits() -> Dict[str, int]:
+    bits = {}
+    for i, base in enumerate(('ax', 'cx', 'dx', 'bx', 'sp', 'bp', 'si', 'di')):
+        names = ['r' + base, 'e' + base, base]
+        names += [base[0] + 'l', base[0] + 'h'] if base.endswith('x') else [base + 'l']
+        for name in names:
+            bits['%' + name] = i
+    for i in range(8, 16):
+        for suffix in ('', 'd', 'w', 'b'):
+            bits[f'%r{i}{suffix}'] = i
+    bits['%rip'] = bits['%eip'] = 16
+    for i in range(16):
+        for prefix in 'xyz':
+            bits[f'%{prefix}mm{i}'] = 17 + i
+    return bits
+
+
+def _arm64_register_bits() -> Dict[str, int]:
+    bits = {}
+    for i in range(31):
+        bits[f'x{i}'] = bits[f'w{i}'] = i
+    bits.update({'fp': 29, 'lr': 30, 'sp': 31, 'wsp': 31, 'xzr': 32, 'wzr': 32})
+    return bits
+
+
+def _riscv64_register_bits() -> Dict[str, int]:
+    abi = (['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1']
+           + [f'a{i}' for i in range(8)] + [f's{i}' for i in range(2, 12)]
+           + [f't{i}' for i in range(3, 7)])
+    bits = {name: i for i, name in enumerate(abi)}
+    bits['fp'] = 8
+    return bits
+
+
+REGISTER_BITS: Dict[str, Dict[str, int]] = {
+    'x86_64': _x86_64_register_bits(),
+    'arm64': _arm64_register_bits(),
+    'riscv64': _riscv64_register_bits(),
+}
+
+
+def register_mask(registers: Iterable[str], arch: Optional[str]) -> int:
+    """64-bit mask of the architectural registers in ``registers``."""
+    bits = REGISTER_BITS.get(arch, {})
+    mask = 0
+    for register in registers:
+        mask |= 1 << bits.get(register, OTHER_REGISTER_BIT)
+    return mask
@@ -7,13 +7,21 @@ span that still satisfies the DSL constraints.
 
 from __future__ import annotations
 
-from typing import List, Dict, Any, Tuple
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Sequence, Tuple
 
-from dsl_matcher import DSLMatcher
+from dsl_matcher import DEFAULT_DSL_PATH, DSLMatcher
 
 
-def reduce_to_minimal_window(instructions: List[Dict[str, Any]], vuln_type: str, arch: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    matcher = DSLMatcher()
+@lru_cache(maxsize=None)
+def _matcher(dsl_path: str) -> DSLMatcher:
+    # One matcher (and its compiled patterns) per DSL file per process
+    return DSLMatcher(dsl_path)
+
+
+def reduce_to_minimal_window(instructions: Sequence[Dict[str, Any]], vuln_type: str, arch: str) -> Tuple[Sequence[Dict[str, Any]], Dict[str, Any]]:
+    matcher = _matcher(str(Path(DEFAULT_DSL_PATH).resolve()))
     # Quick rejection
     ok, ev = matcher.validate_window(instructions, vuln_type, arch)
     if not ok:
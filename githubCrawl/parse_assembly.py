@@ -6,6 +6,8 @@ from collections import defaultdict, Counter
 import capstone
 import re
 
+from instruction_corpus import InstructionCorpus
+
 ASM_ROOT = "./assembly_outputs"
 OUTPUT_DIR = "parsed_assembly"
 VOCAB_FILE = "vocabulary.json"
@@ -143,8 +145,9 @@ def parse_assembly_file(file_path, normalizer):
             asm_content = f.read()
         
         # Extract machine code bytes (this is simplified - real assembly files need parsing)
-        # For now, we'll work with the assembly text directly
-        instructions = []
+        # For now, we'll work with the assembly text directly. Instructions go into
+        # a compact corpus (interned strings, array columns) with normalized operands.
+        instructions = InstructionCorpus(arch)
         
         # Parse assembly text line by line
         for line_num, line in enumerate(asm_content.split('\n')):
@@ -186,13 +189,7 @@ def parse_assembly_file(file_path, normalizer):
                         operands.append(norm_op)
                 
                 # Create normalized instruction
-                norm_instruction = {
-                    'opcode': opcode,
-                    'operands': operands,
-                    'line': line_num,
-                    'raw': line
-                }
-                instructions.append(norm_instruction)
+                instructions.append(line_num, line, opcode, operands)
                 
             except Exception as e:
                 continue
@@ -201,15 +198,25 @@ def parse_assembly_file(file_path, normalizer):
             return None
             
         # Convert to numerical representation
+        strings = instructions.strings.strings
+        columns = instructions.columns
         feature_sequence = []
-        for instr in instructions:
-            opcode_id = normalizer.get_vocab_id(instr['opcode'], normalizer.opcode_vocab)
-            operand_ids = [normalizer.get_vocab_id(op, normalizer.operand_vocab) for op in instr['operands']]
+        for opcode_sid, start, count in zip(columns['opcode'], columns['operand_start'], columns['operand_count']):
+            opcode_id = normalizer.get_vocab_id(strings[opcode_sid], normalizer.opcode_vocab)
+            operand_ids = [normalizer.get_vocab_id(strings[sid], normalizer.operand_vocab)
+                           for sid in instructions.operand_ids[start:start + count]]
             
             # Create feature vector: [opcode_id, num_operands, operand_ids...]
             feature_vec = [opcode_id, len(operand_ids)] + operand_ids
             feature_sequence.append(feature_vec)
         
+        # Keep first 10 for debugging, as plain dicts
+        raw_instructions = [
+            {'opcode': instr['opcode'], 'operands': instr['operands'],
+             'line': instr['line_num'], 'raw': instr['raw_line']}
+            for instr in instructions[:10]
+        ]
+        
         return {
             'file_path': str(file_path),
             'arch': arch,
@@ -217,7 +224,7 @@ def parse_assembly_file(file_path, normalizer):
             'opt_level': opt_level,
             'num_instructions': len(instructions),
             'feature_sequence': feature_sequence,
-            'raw_instructions': instructions[:10]  # Keep first 10 for debugging
+            'raw_instructions': raw_instructions
         }
         
     except Exception as e:
@@ -13,6 +13,7 @@ from collections import defaultdict, Counter
 from dataclasses import dataclass, field
 from typing import List, Dict, Set, Tuple, Optional, Any
 from pathlib import Path
+from difflib import SequenceMatcher
 import networkx as nx
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
@@ -29,6 +30,13 @@ except Exception:
     reduce_to_minimal_window = None
 # import capstone  # Optional - will work without it
 
+from instruction_semantics import DETECTOR_SEMANTICS, semantic_flags, semantics_dict
+
+# Window sizes scanned by detect_vulnerabilities()
+DETECTION_WINDOW_SIZES = [10, 15, 20]
+# Length of the vector built by _signature_to_feature_vector()
+SIGNATURE_FEATURE_DIM = 64
+
 @dataclass
 class VulnerabilitySignature:
     """Comprehensive signature of a vulnerability pattern"""
@@ -212,75 +220,10 @@ class RobustVulnerabilityDetector:
     
     def _analyze_instruction_semantics(self, opcode: str, operands: List[str], arch: str) -> Dict[str, bool]:
         """Analyze semantic properties of an instruction"""
-        semantics = {
-            'is_branch': False,
-            'is_conditional': False,
-            'is_indirect': False,
-            'is_call': False,
-            'is_return': False,
-            'is_load': False,
-            'is_store': False,
-            'accesses_memory': False,
-            'is_arithmetic': False,
-            'is_comparison': False,
-            'is_speculation_barrier': False,
-            'is_cache_operation': False,
-            'is_timing_sensitive': False,
-            'is_privileged': False
-        }
-        
-        if arch == 'x86_64':
-            # x86-64 instruction semantics
-            if opcode.startswith('j'):
-                semantics['is_branch'] = True
-                if opcode != 'jmp':
-                    semantics['is_conditional'] = True
-            elif opcode in ['call', 'ret']:
-                semantics['is_call'] = opcode == 'call'
-                semantics['is_return'] = opcode == 'ret'
-            elif opcode in ['mov', 'movzx', 'movsx', 'lea']:
-                if any('[' in op for op in operands):
-                    semantics['accesses_memory'] = True
-                    semantics['is_load'] = True
-            elif opcode in ['add', 'sub', 'mul', 'div', 'xor', 'and', 'or']:
-                semantics['is_arithmetic'] = True
-            elif opcode in ['cmp', 'test']:
-                semantics['is_comparison'] = True
-            elif opcode in ['lfence', 'mfence', 'sfence']:
-                semantics['is_speculation_barrier'] = True
-            elif opcode in ['clflush', 'clwb']:
-                semantics['is_cache_operation'] = True
-            elif opcode in ['rdtsc', 'rdtscp']:
-                semantics['is_timing_sensitive'] = True
-                
-        elif arch == 'arm64':
-            # ARM64 instruction semantics
-            if opcode.startswith('b'):
-                semantics['is_branch'] = True
-                if '.' in opcode:  # conditional branches like b.eq
-                    semantics['is_conditional'] = True
-            elif opcode in ['bl', 'blr', 'ret']:
-                semantics['is_call'] = opcode in ['bl', 'blr']
-                semantics['is_return'] = opcode == 'ret'
-            elif opcode in ['ldr', 'ldrb', 'ldrh', 'ldp']:
-                semantics['is_load'] = True
-                semantics['accesses_memory'] = True
-            elif opcode in ['str', 'strb', 'strh', 'stp']:
-                semantics['is_store'] = True
-                semantics['accesses_memory'] = True
-            elif opcode in ['add', 'sub', 'mul', 'div', 'and', 'orr', 'eor']:
-                semantics['is_arithmetic'] = True
-            elif opcode in ['cmp', 'subs']:
-                semantics['is_comparison'] = True
-            elif opcode in ['dsb', 'isb', 'dmb']:
-                semantics['is_speculation_barrier'] = True
-            elif opcode in ['dc', 'ic']:
-                semantics['is_cache_operation'] = True
-            elif opcode == 'mrs':
-                semantics['is_timing_sensitive'] = True
-                semantics['is_privileged'] = True
-        
-        return semantics
+        table = DETECTOR_SEMANTICS.get(arch)
+        if table is None:
+            return semantics_dict()
+        return semantics_dict(semantic_flags(table, opcode, operands))
     
     def _identify_functions(self, instructions: List[Dict]) -> Dict[str, List[Dict]]:
         """Identify function boundaries in assembly code"""
@@ -649,7 +592,7 @@ class RobustVulnerabilityDetector:
         features.append(sig.statistical_features.get('is_branch_ratio', 0.0))
         features.append(sig.statistical_features.get('accesses_memory_ratio', 0.0))
         # Keep total bounded
-        target_size = 64
+        target_size = SIGNATURE_FEATURE_DIM
         if len(features) < target_size:
             features.extend([0.0] * (target_size - len(features)))
         elif len(features) > target_size:
@@ -658,43 +601,31 @@ class RobustVulnerabilityDetector:
         return features
     
     def detect_vulnerabilities(self, target_instructions: List[Dict], 
-                             architecture: str) -> List[Dict[str, Any]]:
-        """Detect vulnerabilities in target assembly code"""
+                             architecture: str, batched: bool = True) -> List[Dict[str, Any]]:
+        """Detect vulnerabilities in target assembly code
+
+        batched=True scores every window of the file in one pass (see
+        _score_windows_batched); batched=False builds a full signature per
+        window. Both produce the same detections.
+        """
         print("🎯 Detecting vulnerabilities in target code...")
         
-        detections = []
-        
-        # Sliding window analysis
-        window_sizes = [10, 15, 20]
-        for window_size in window_sizes:
-            for i in range(len(target_instructions) - window_size + 1):
-                window = target_instructions[i:i + window_size]
-                
-                detection = self._analyze_window_for_vulnerabilities(
-                    window, architecture, i, window_size
-                )
-                if detection:
-                    # Optional DSL validation and minimality reduction
-                    if DSLMatcher is not None and reduce_to_minimal_window is not None:
-                        best_type = detection.get('vuln_type', detection.get('vulnerability_types', ['UNKNOWN']))
-                        if isinstance(best_type, list):
-                            best_type = best_type[0] if best_type else 'UNKNOWN'
-                        try:
-                            minimized, evidence = reduce_to_minimal_window(window, best_type, architecture)
-                            if minimized:
-                                # Update detection location using minimized span
-                                start_rel = window.index(minimized[0])
-                                end_rel = window.index(minimized[-1])
-                                detection['location'] = {
-                                    'start_line': window[start_rel].get('line_num', i),
-                                    'end_line': window[end_rel].get('line_num', i + window_size - 1)
-                                }
-                                detection['evidence'] = detection.get('evidence', {})
-                                detection['evidence']['dsl'] = evidence
-                                detection['evidence']['minimized_length'] = len(minimized)
-                        except Exception:
-                            pass
-                    detections.append(detection)
+        if batched:
+            detections = self._detect_vulnerabilities_batched(target_instructions, architecture)
+        else:
+            detections = []
+            
+            # Sliding window analysis
+            for window_size in DETECTION_WINDOW_SIZES:
+                for i in range(len(target_instructions) - window_size + 1):
+                    window = target_instructions[i:i + window_size]
+                    
+                    detection = self._analyze_window_for_vulnerabilities(
+                        window, architecture, i, window_size
+                    )
+                    if detection:
+                        self._refine_detection_with_dsl(detection, window, architecture, i, window_size)
+                        detections.append(detection)
         
         # Rank and filter detections
         detections = self._rank_and_filter_detections(detections)
@@ -702,6 +633,324 @@ class RobustVulnerabilityDetector:
         print(f"🔍 Found {len(detections)} potential vulnerabilities")
         return detections
     
+    def _refine_detection_with_dsl(self, detection: Dict[str, Any], window: List[Dict],
+                                   architecture: str, i: int, window_size: int):
+        """Optional DSL validation and minimality reduction (updates detection in place)"""
+        if DSLMatcher is None or reduce_to_minimal_window is None:
+            return
+        best_type = detection.get('vuln_type', detection.get('vulnerability_types', ['UNKNOWN']))
+        if isinstance(best_type, list):
+            best_type = best_type[0] if best_type else 'UNKNOWN'
+        try:
+            minimized, evidence = reduce_to_minimal_window(window, best_type, architecture)
+            if minimized:
+                # Update detection location using minimized span
+                start_rel = window.index(minimized[0])
+                end_rel = window.index(minimized[-1])
+                detection['location'] = {
+                    'start_line': window[start_rel].get('line_num', i),
+                    'end_line': window[end_rel].get('line_num', i + window_size - 1)
+                }
+                detection['evidence'] = detection.get('evidence', {})
+                detection['evidence']['dsl'] = evidence
+                detection['evidence']['minimized_length'] = len(minimized)
+        except Exception:
+            pass
+    
+    def _detect_vulnerabilities_batched(self, target_instructions: List[Dict],
+                                        architecture: str) -> List[Dict[str, Any]]:
+        """Sliding window analysis with every window of the file scored at once"""
+        detections = []
+        for (i, window_size), scores in self._score_windows_batched(target_instructions, architecture):
+            if not scores:
+                continue
+            best_type = max(scores.items(), key=lambda x: x[1])
+            if best_type[1] <= 0.3:  # Threshold
+                continue
+            window = target_instructions[i:i + window_size]
+            detection = {
+                'start_idx': i,
+                'end_idx': i + window_size,
+                'window_size': window_size,
+                'instructions': [instr['raw_line'] for instr in window],
+                'confidence_scores': scores,
+                'vulnerability_types': [best_type[0]],
+                'evidence': {},
+                'primary_confidence': best_type[1],
+                'vuln_type': best_type[0],
+            }
+            self._refine_detection_with_dsl(detection, window, architecture, i, window_size)
+            detections.append(detection)
+        return detections
+    
+    def _score_windows_batched(self, instructions: List[Dict],
+                               architecture: str) -> List[Tuple[Tuple[int, int], Dict[str, float]]]:
+        """Confidence scores for every (start, window_size) window, in the
+        order the per-window path visits them.
+
+        Per-instruction features are computed once, window feature rows are
+        derived with prefix sums, and the scaler, classifier and anomaly
+        detector each run once over the stacked rows of all window sizes.
+        """
+        arrays = self._instruction_feature_arrays(instructions)
+        blocks = [(w, self._window_feature_matrix(arrays, w))
+                  for w in DETECTION_WINDOW_SIZES if len(instructions) >= w]
+        if not blocks:
+            return []
+        
+        X = np.vstack([matrix for _, matrix in blocks])
+        proba = None
+        anomaly = None
+        if self.ml_classifier and self.scaler:
+            proba = self.ml_classifier.predict_proba(self.scaler.transform(X))
+        if self.anomaly_detector and self.scaler:
+            anomaly = self.anomaly_detector.decision_function(self.scaler.transform(X))
+        
+        tables = self._signature_match_tables(architecture)
+        results = []
+        row = 0
+        for window_size, matrix in blocks:
+            pattern_scores = self._match_windows_against_signatures(
+                arrays, tables, window_size, matrix
+            )
+            for i in range(matrix.shape[0]):
+                scores = dict(pattern_scores[i])
+                if proba is not None:
+                    for j, vuln_type in enumerate(self.ml_classifier.classes_):
+                        scores[f"ml_{vuln_type}"] = proba[row, j]
+                if anomaly is not None:
+                    # Same 0-1 mapping as _detect_anomaly
+                    scores['anomaly'] = max(0.0, min(1.0, (anomaly[row] + 0.5) / 1.0))
+                results.append(((i, window_size), scores))
+                row += 1
+        return results
+    
+    def _instruction_feature_arrays(self, instructions: List[Dict]) -> Dict[str, Any]:
+        """Per-instruction opcode ids, semantic flags and patterns, computed once per file"""
+        semantics = [instr['semantics'] for instr in instructions]
+        arrays: Dict[str, Any] = {
+            key: np.fromiter((bool(s.get(key, False)) for s in semantics),
+                             dtype=bool, count=len(semantics))
+            for key in ('is_branch', 'is_conditional', 'is_call', 'is_return',
+                        'is_load', 'is_store', 'accesses_memory', 'is_speculation_barrier',
+                        'is_cache_operation', 'is_timing_sensitive')
+        }
+        opcodes = [instr['opcode'] for instr in instructions]
+        vocab: Dict[str, int] = {}
+        arrays['opcodes'] = opcodes
+        arrays['opcode_ids'] = np.fromiter((vocab.setdefault(op, len(vocab)) for op in opcodes),
+                                           dtype=np.int64, count=len(opcodes))
+        # At most one branch / memory pattern per instruction (None if it has none)
+        arrays['branch_patterns'] = [(self._extract_branch_patterns([instr]) or [None])[0]
+                                     for instr in instructions]
+        arrays['memory_patterns'] = [(self._extract_memory_patterns([instr]) or [None])[0]
+                                     for instr in instructions]
+        return arrays
+    
+    def _window_feature_matrix(self, arrays: Dict[str, Any], window_size: int) -> np.ndarray:
+        """_signature_to_feature_vector() rows for every window of ``window_size``.
+
+        A window's CFG is a chain of fall-through edges: it has one edge per
+        non-branch or conditional-branch instruction before the last one and
+        no triangles, so avg_clustering is always 0.
+        """
+        ids = arrays['opcode_ids']
+        w = window_size
+        num_windows = len(ids) - w + 1
+        
+        def window_sum(mask: np.ndarray, length: int = w) -> np.ndarray:
+            prefix = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+            return prefix[length:length + num_windows] - prefix[:num_windows]
+        
+        # Distinct opcodes and most common opcode count per window
+        view = np.lib.stride_tricks.sliding_window_view(ids, w)
+        same = view[:, :, None] == view[:, None, :]
+        most_common = same.sum(axis=2).max(axis=1)
+        unique = w - np.tril(same, -1).any(axis=2).sum(axis=1)
+        
+        is_branch = arrays['is_branch']
+        branches = window_sum(is_branch)
+        accesses_memory = window_sum(arrays['accesses_memory'])
+        edges = window_sum(~is_branch | arrays['is_conditional'], w - 1)
+        
+        features = np.zeros((num_windows, SIGNATURE_FEATURE_DIM), dtype=np.float64)
+        # Statistical features
+        features[:, 0] = w
+        features[:, 1] = unique
+        features[:, 2] = most_common / w
+        features[:, 3] = branches / w
+        features[:, 4] = window_sum(arrays['is_load']) / w
+        features[:, 5] = window_sum(arrays['is_store']) / w
+        features[:, 6] = accesses_memory / w
+        # CFG features (column 10, avg_clustering, stays 0)
+        features[:, 7] = w
+        features[:, 8] = edges
+        features[:, 9] = edges / (w * (w - 1))
+        features[:, 11] = branches / w
+        # Pattern counts
+        features[:, 12] = branches
+        features[:, 13] = window_sum(arrays['is_call'] | arrays['is_return'])
+        features[:, 14] = accesses_memory
+        features[:, 15] = window_sum(arrays['is_speculation_barrier']
+                                     | (is_branch & arrays['is_conditional']))
+        features[:, 16] = window_sum(arrays['is_timing_sensitive'])
+        features[:, 17] = window_sum(arrays['is_cache_operation'])
+        # Extended engineered features
+        features[:, 18] = w
+        features[:, 19] = unique
+        features[:, 20] = branches / w
+        features[:, 21] = accesses_memory / w
+        return features
+    
+    def _signature_match_tables(self, architecture: str) -> Dict[str, Any]:
+        """Array form of the known signatures for _match_windows_against_signatures"""
+        sigs = self.vulnerability_signatures
+        tables: Dict[str, Any] = {
+            'vuln_types': list(dict.fromkeys(sig.vuln_type for sig in sigs)),
+            'same_arch': np.array([sig.architecture == architecture for sig in sigs], dtype=bool),
+            'matchers': {},
+        }
+        tables['type_ids'] = np.array([tables['vuln_types'].index(sig.vuln_type) for sig in sigs],
+                                      dtype=np.int64)
+        
+        def membership(items_per_sig: List[List[str]]) -> Tuple[Dict[str, int], np.ndarray]:
+            vocab: Dict[str, int] = {}
+            for items in items_per_sig:
+                for item in items:
+                    vocab.setdefault(item, len(vocab))
+            matrix = np.zeros((len(items_per_sig), len(vocab)), dtype=np.int64)
+            for k, items in enumerate(items_per_sig):
+                for item in items:
+                    matrix[k, vocab[item]] += 1
+            return vocab, matrix
+        
+        # Opcode multiset counts (for the quick_ratio upper bound) and pattern sets
+        tables['opcode_vocab'], tables['opcode_counts'] = membership(
+            [sig.opcode_sequence for sig in sigs])
+        tables['opcode_lengths'] = np.array([len(sig.opcode_sequence) for sig in sigs], dtype=np.int64)
+        for name, attr in (('branch', 'branch_patterns'), ('memory', 'memory_access_patterns')):
+            vocab, matrix = membership([sorted(set(getattr(sig, attr))) for sig in sigs])
+            tables[f'{name}_vocab'] = vocab
+            tables[f'{name}_sets'] = matrix
+            tables[f'{name}_sizes'] = matrix.sum(axis=1)
+        
+        # Statistical features, grouped by key layout (in practice one group)
+        groups: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for k, sig in enumerate(sigs):
+            groups[tuple(sig.statistical_features.keys())].append(k)
+        tables['stat_groups'] = [
+            (keys, np.array(members, dtype=np.int64),
+             np.array([[sigs[k].statistical_features[key] for key in keys] for k in members],
+                      dtype=np.float64).reshape(len(members), len(keys)))
+            for keys, members in groups.items()
+        ]
+        return tables
+    
+    def _set_similarity_to_signatures(self, items: Set[str], vocab: Dict[str, int],
+                                      sets: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """_set_similarity(items, known) for every known signature"""
+        cols = [vocab[item] for item in items if item in vocab]
+        inter = sets[:, cols].sum(axis=1)
+        union = len(items) + sizes - inter
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sim = inter / union
+        if not items:
+            return np.where(sizes == 0, 1.0, 0.0)
+        return np.where(sizes == 0, 0.0, sim)
+    
+    def _statistical_similarity_to_signatures(self, stats: Dict[str, float],
+                                              tables: Dict[str, Any]) -> np.ndarray:
+        """_statistical_similarity(stats, known) for every known signature,
+        summed in the same key order as the scalar version"""
+        out = np.zeros(len(self.vulnerability_signatures), dtype=np.float64)
+        for keys, members, values in tables['stat_groups']:
+            common = list(set(stats.keys()).intersection(set(keys)))
+            if not common:
+                continue
+            total = np.zeros(len(members), dtype=np.float64)
+            for key in common:
+                v1 = stats[key]
+                v2 = values[:, keys.index(key)]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    sim = 1.0 - np.abs(v1 - v2) / np.maximum(v1, v2)
+                if v1 == 0:
+                    sim = np.where(v2 == 0, 1.0, 0.0)
+                else:
+                    sim = np.where(v2 == 0, 0.0, sim)
+                total += sim
+            out[members] = total / len(common)
+        return out
+    
+    def _match_windows_against_signatures(self, arrays: Dict[str, Any], tables: Dict[str, Any],
+                                          window_size: int,
+                                          features: np.ndarray) -> List[Dict[str, float]]:
+        """_match_against_signatures() for every window of ``window_size``.
+
+        The set and statistical similarities are computed against all known
+        signatures at once. The opcode term only needs SequenceMatcher for
+        signatures that can still beat the best score of their type: quick_ratio
+        (multiset overlap) bounds ratio from above, so bounds <= best are skipped.
+        Windows with identical content share one result.
+        """
+        sigs = self.vulnerability_signatures
+        matchers = tables['matchers']
+        opcode_vocab = tables['opcode_vocab']
+        stat_keys = ['instruction_count', 'unique_opcodes', 'most_common_opcode_freq',
+                     'is_branch_ratio', 'is_load_ratio', 'is_store_ratio', 'accesses_memory_ratio']
+        candidates = [np.flatnonzero(tables['same_arch'] & (tables['type_ids'] == t))
+                      for t in range(len(tables['vuln_types']))]
+        
+        opcodes = arrays['opcodes']
+        branch_patterns = arrays['branch_patterns']
+        memory_patterns = arrays['memory_patterns']
+        memo: Dict[Tuple, Dict[str, float]] = {}
+        results = []
+        for i, stat_values in enumerate(features[:, :len(stat_keys)].tolist()):
+            window_ops = opcodes[i:i + window_size]
+            window_branches = frozenset(p for p in branch_patterns[i:i + window_size] if p is not None)
+            window_memory = frozenset(p for p in memory_patterns[i:i + window_size] if p is not None)
+            key = (tuple(window_ops), window_branches, window_memory, tuple(stat_values))
+            scores = memo.get(key)
+            if scores is None:
+                op_counts = Counter(window_ops)
+                cols = [opcode_vocab[op] for op in op_counts if op in opcode_vocab]
+                window_counts = np.array([op_counts[op] for op in op_counts if op in opcode_vocab],
+                                         dtype=np.int64)
+                matches = np.minimum(tables['opcode_counts'][:, cols], window_counts).sum(axis=1)
+                lengths = window_size + tables['opcode_lengths']
+                quick_ratio = np.where(tables['opcode_lengths'] > 0, 2.0 * matches / lengths, 0.0)
+                
+                branch_sim = self._set_similarity_to_signatures(
+                    window_branches, tables['branch_vocab'], tables['branch_sets'], tables['branch_sizes'])
+                memory_sim = self._set_similarity_to_signatures(
+                    window_memory, tables['memory_vocab'], tables['memory_sets'], tables['memory_sizes'])
+                stat_sim = self._statistical_similarity_to_signatures(
+                    dict(zip(stat_keys, stat_values)), tables)
+                # Same weighting as _compute_signature_similarity
+                rest = [(branch_sim * 0.2).tolist(), (memory_sim * 0.2).tolist(), (stat_sim * 0.3).tolist()]
+                bound = quick_ratio * 0.3 + branch_sim * 0.2 + memory_sim * 0.2 + stat_sim * 0.3
+                
+                scores = {}
+                for vuln_type, members in zip(tables['vuln_types'], candidates):
+                    best = 0.0
+                    for k in members[np.argsort(-bound[members], kind='stable')].tolist():
+                        if bound[k] <= best:
+                            break
+                        opcode_sim = 0.0
+                        if tables['opcode_lengths'][k] > 0:
+                            matcher = matchers.get(k)
+                            if matcher is None:
+                                matcher = matchers[k] = SequenceMatcher(None)
+                                matcher.set_seq2(sigs[k].opcode_sequence)
+                            matcher.set_seq1(window_ops)
+                            opcode_sim = matcher.ratio()
+                        similarity = sum([opcode_sim * 0.3, rest[0][k], rest[1][k], rest[2][k]])
+                        best = max(best, similarity)
+                    scores[vuln_type] = best
+                memo[key] = scores
+            results.append(scores)
+        return results
+    
     def _analyze_window_for_vulnerabilities(self, window: List[Dict], architecture: str,
                                           start_idx: int, window_size: int) -> Optional[Dict[str, Any]]:
         """Analyze a window of instructions for vulnerabilities"""
@@ -790,7 +1039,6 @@ class RobustVulnerabilityDetector:
             return 0.0
         
         # Use longest common subsequence
-        from difflib import SequenceMatcher
         matcher = SequenceMatcher(None, seq1, seq2)
         return matcher.ratio()
     
@@ -6,11 +6,14 @@ Validates that detected vulnerabilities in GitHub assembly code are actually exp
 
 import os
 import re
+import copy
 import json
 import sqlite3
+import argparse
 import subprocess
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from dataclasses import dataclass, asdict
 from collections import defaultdict
 import logging
@@ -29,11 +32,45 @@ class ValidationResult:
     source_code_context: Optional[str] = None
     exploit_vector: Optional[str] = None
 
+# Validator used by _validate_group_worker (set per process by _init_validation_worker)
+_WORKER_VALIDATOR: Optional['VulnerabilityValidator'] = None
+
+def _init_validation_worker(validator: 'VulnerabilityValidator'):
+    global _WORKER_VALIDATOR
+    _WORKER_VALIDATOR = validator
+
+def _validate_group_worker(group: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Tuple[int, ValidationResult]], List[Tuple[Any, str]]]:
+    """Validate the detections of one file; returns ((index, result) pairs, (detection id, error) pairs)"""
+    return _WORKER_VALIDATOR._validate_file_group(group)
+
 class VulnerabilityValidator:
     """Comprehensive framework for validating detected vulnerabilities"""
     
-    def __init__(self, db_path: str = "vulnerability_scan_results.db"):
+    SCHEMA = '''
+            CREATE TABLE IF NOT EXISTS validation_results (
+                id INTEGER PRIMARY KEY,
+                detection_id INTEGER,
+                vulnerability_type TEXT,
+                validation_methods TEXT,
+                is_exploitable BOOLEAN,
+                confidence_level TEXT,
+                evidence TEXT,
+                false_positive_likelihood REAL,
+                validation_notes TEXT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (detection_id) REFERENCES vulnerabilities (id)
+            )
+        '''
+    
+    def __init__(self, db_path: str = "vulnerability_scan_results.db", batch_size: int = 500):
         self.db_path = db_path
+        self.batch_size = batch_size
+        # Facts derived from the files of the current file group (file contents,
+        # mitigations, speculation-window estimates, function names, ...);
+        # cleared after each group
+        self._file_cache: Dict[Tuple, Any] = {}
+        # Source file lookups (repository tree globs) are kept across groups
+        self._source_path_cache: Dict[Tuple[str, str], Any] = {}
         self.validation_methods = {
             'source_code_analysis': self._validate_via_source_code,
             'microarchitectural_analysis': self._validate_via_microarch,
@@ -56,8 +93,14 @@ class VulnerabilityValidator:
         )
         self.logger = logging.getLogger(__name__)
     
-    def validate_all_detections(self) -> List[ValidationResult]:
-        """Validate all vulnerability detections in the database"""
+    def validate_all_detections(self, workers: int = 1) -> List[ValidationResult]:
+        """Validate all vulnerability detections in the database
+        
+        Detections are grouped by assembly file so every file is read and
+        analyzed once per group; workers > 1 validates groups in a process pool.
+        Results are written to the database in batches and returned in the
+        order of _load_detections.
+        """
         self.logger.info("Starting comprehensive vulnerability validation...")
         
         # Load all detections
@@ -66,26 +109,85 @@ class VulnerabilityValidator:
             self.logger.warning("No vulnerability detections found to validate")
             return []
         
-        validation_results = []
+        groups = defaultdict(list)
+        for i, detection in enumerate(detections):
+            groups[detection.get('assembly_file') or ''].append((i, detection))
+        groups = list(groups.values())
+        self.logger.info(f"Validating {len(detections)} detections from {len(groups)} files")
         
-        for i, detection in enumerate(detections, 1):
-            self.logger.info(f"Validating detection {i}/{len(detections)}: {detection['vulnerability_type']}")
-            
-            try:
-                result = self._validate_single_detection(detection)
-                validation_results.append(result)
-                
-                # Save intermediate results
-                self._save_validation_result(result)
+        pool = None
+        if workers > 1 and len(groups) > 1:
+            pool = Pool(workers, initializer=_init_validation_worker, initargs=(self,))
+            group_results = pool.imap_unordered(_validate_group_worker, groups)
+        else:
+            _init_validation_worker(self)
+            group_results = map(_validate_group_worker, groups)
+        
+        indexed_results = []
+        pending = []
+        done = 0
+        try:
+            for results, errors in group_results:
+                done += len(results) + len(errors)
+                self.logger.info(f"Validated {done}/{len(detections)} detections")
+                for detection_id, error in errors:
+                    self.logger.error(f"Failed to validate detection {detection_id}: {error}")
                 
-            except Exception as e:
-                self.logger.error(f"Failed to validate detection {detection['id']}: {e}")
+                indexed_results.extend(results)
+                pending.extend(result for _, result in results)
+                if len(pending) >= self.batch_size:
+                    self._save_validation_results(pending)
+                    pending = []
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            # Save whatever was validated, even if a group failed
+            if pending:
+                self._save_validation_results(pending)
+        
+        indexed_results.sort(key=lambda item: item[0])
+        validation_results = [result for _, result in indexed_results]
         
         # Generate validation report
         self._generate_validation_report(validation_results)
         
         return validation_results
     
+    def _validate_file_group(self, group: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Tuple[int, ValidationResult]], List[Tuple[Any, str]]]:
+        """Validate detections sharing an assembly file with one set of cached file facts"""
+        results = []
+        errors = []
+        try:
+            for index, detection in group:
+                try:
+                    results.append((index, self._validate_single_detection(detection)))
+                except Exception as e:
+                    errors.append((detection.get('id'), str(e)))
+        finally:
+            self._file_cache.clear()
+        return results, errors
+    
+    def _cached(self, key: Tuple, compute: Callable[[], Any], cache: Optional[Dict] = None) -> Any:
+        """Memoize compute() under key; a raised exception is cached and re-raised,
+        so every detection of a file sees the same failure as the first one."""
+        cache = self._file_cache if cache is None else cache
+        if key not in cache:
+            try:
+                cache[key] = (True, compute())
+            except Exception as e:
+                cache[key] = (False, e)
+        ok, value = cache[key]
+        if not ok:
+            raise value
+        return value
+    
+    def _read_file(self, path) -> str:
+        def read():
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        return self._cached(('content', str(path)), read)
+    
     def _load_detections(self) -> List[Dict[str, Any]]:
         """Load vulnerability detections from database"""
         if not os.path.exists(self.db_path):
@@ -225,7 +327,11 @@ class VulnerabilityValidator:
         
         # Construct path to source file
         repo_path = Path("repos") / repository
-        source_paths = list(repo_path.rglob(f"*{source_file}*"))
+        source_paths = self._cached(
+            (repository, source_file),
+            lambda: list(repo_path.rglob(f"*{source_file}*")),
+            self._source_path_cache,
+        )
         
         if not source_paths:
             evidence['status'] = 'source_file_not_accessible'
@@ -234,19 +340,26 @@ class VulnerabilityValidator:
         # Analyze source code for vulnerability patterns
         source_path = source_paths[0]
         try:
-            with open(source_path, 'r', encoding='utf-8', errors='ignore') as f:
-                source_content = f.read()
+            source_content = self._read_file(source_path)
             
             evidence['source_file_found'] = str(source_path)
-            evidence['source_lines'] = len(source_content.split('\n'))
+            evidence['source_lines'] = self._cached(
+                ('source_lines', str(source_path)), lambda: len(source_content.split('\n'))
+            )
             
             # Look for vulnerability indicators in source
             vuln_type = detection['vulnerability_type']
-            indicators = self._find_source_vulnerability_indicators(source_content, vuln_type)
+            indicators = list(self._cached(
+                ('source_indicators', str(source_path), vuln_type),
+                lambda: self._find_source_vulnerability_indicators(source_content, vuln_type),
+            ))
             evidence['vulnerability_indicators'] = indicators
             
-            # Check for mitigations
-            mitigations = self._find_source_mitigations(source_content, vuln_type)
+            # Check for mitigations (independent of the vulnerability type)
+            mitigations = list(self._cached(
+                ('source_mitigations', str(source_path)),
+                lambda: self._find_source_mitigations(source_content, vuln_type),
+            ))
             evidence['mitigations_found'] = mitigations
             
             # Calculate exploitability based on indicators vs mitigations
@@ -343,11 +456,14 @@ class VulnerabilityValidator:
         
         try:
             # Read assembly file
-            with open(assembly_file, 'r', encoding='utf-8', errors='ignore') as f:
-                asm_content = f.read()
+            asm_content = self._read_file(assembly_file)
             
-            # Extract microarchitectural features
-            microarch_features = self._extract_microarch_features(asm_content, vuln_type)
+            # Extract microarchitectural features (instruction counts and the
+            # speculation window estimate do not depend on the vulnerability type)
+            microarch_features = copy.deepcopy(self._cached(
+                ('microarch_features', assembly_file),
+                lambda: self._extract_microarch_features(asm_content, vuln_type),
+            ))
             evidence.update(microarch_features)
             
             # Calculate exploitability based on microarchitectural evidence
@@ -481,20 +597,25 @@ class VulnerabilityValidator:
             return None, evidence
         
         try:
-            with open(assembly_file, 'r', encoding='utf-8', errors='ignore') as f:
-                asm_content = f.read()
+            asm_content = self._read_file(assembly_file)
             
-            # Expert patterns for each vulnerability type
-            expert_patterns = self._get_expert_patterns(vuln_type)
+            def match_patterns():
+                # Expert patterns for each vulnerability type
+                expert_patterns = self._get_expert_patterns(vuln_type)
+                
+                pattern_matches = []
+                for pattern_name, pattern_regex in expert_patterns.items():
+                    matches = len(re.findall(pattern_regex, asm_content, re.IGNORECASE | re.MULTILINE))
+                    if matches > 0:
+                        pattern_matches.append({
+                            'pattern': pattern_name,
+                            'matches': matches
+                        })
+                return pattern_matches
             
-            pattern_matches = []
-            for pattern_name, pattern_regex in expert_patterns.items():
-                matches = len(re.findall(pattern_regex, asm_content, re.IGNORECASE | re.MULTILINE))
-                if matches > 0:
-                    pattern_matches.append({
-                        'pattern': pattern_name,
-                        'matches': matches
-                    })
+            pattern_matches = copy.deepcopy(self._cached(
+                ('expert_patterns', assembly_file, vuln_type), match_patterns
+            ))
             
             evidence['pattern_matches'] = pattern_matches
             evidence['total_patterns_matched'] = len(pattern_matches)
@@ -626,17 +747,16 @@ class VulnerabilityValidator:
         context = {}
         
         try:
-            with open(assembly_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            content = self._read_file(assembly_file)
             
-            # Extract function name from assembly
-            lines = content.split('\n')
-            function_name = None
+            def first_function_name():
+                # Extract function name from assembly
+                for line in content.split('\n'):
+                    if ':' in line and not line.strip().startswith('.'):
+                        return line.split(':')[0].strip()
+                return None
             
-            for line in lines:
-                if ':' in line and not line.strip().startswith('.'):
-                    function_name = line.split(':')[0].strip()
-                    break
+            function_name = self._cached(('function_name', assembly_file), first_function_name)
             
             context['function_name'] = function_name or 'unknown'
             
@@ -756,44 +876,32 @@ class VulnerabilityValidator:
     
     def _save_validation_result(self, result: ValidationResult):
         """Save validation result to database"""
-        # Create validation results table if it doesn't exist
+        self._save_validation_results([result])
+    
+    def _save_validation_results(self, results: List[ValidationResult]):
+        """Save a batch of validation results to the database in one transaction"""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS validation_results (
-                id INTEGER PRIMARY KEY,
-                detection_id INTEGER,
-                vulnerability_type TEXT,
-                validation_methods TEXT,
-                is_exploitable BOOLEAN,
-                confidence_level TEXT,
-                evidence TEXT,
-                false_positive_likelihood REAL,
-                validation_notes TEXT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (detection_id) REFERENCES vulnerabilities (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO validation_results 
-            (detection_id, vulnerability_type, validation_methods, is_exploitable, 
-             confidence_level, evidence, false_positive_likelihood, validation_notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            result.detection_id,
-            result.vulnerability_type,
-            ','.join(result.validation_methods),
-            result.is_exploitable,
-            result.confidence_level,
-            json.dumps(result.evidence),
-            result.false_positive_likelihood,
-            result.validation_notes
-        ))
-        
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                # Create validation results table if it doesn't exist
+                conn.execute(self.SCHEMA)
+                conn.executemany('''
+                    INSERT OR REPLACE INTO validation_results 
+                    (detection_id, vulnerability_type, validation_methods, is_exploitable, 
+                     confidence_level, evidence, false_positive_likelihood, validation_notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    result.detection_id,
+                    result.vulnerability_type,
+                    ','.join(result.validation_methods),
+                    result.is_exploitable,
+                    result.confidence_level,
+                    json.dumps(result.evidence),
+                    result.false_positive_likelihood,
+                    result.validation_notes
+                ) for result in results])
+        finally:
+            conn.close()
     
     def _generate_validation_report(self, results: List[ValidationResult]):
         """Generate comprehensive validation report"""
@@ -872,10 +980,16 @@ class VulnerabilityValidator:
 
 def main():
     """Run vulnerability validation"""
+    parser = argparse.ArgumentParser(description="Validate detected vulnerabilities")
+    parser.add_argument("--db", default="vulnerability_scan_results.db", help="Scan results database")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes validating file groups in parallel")
+    parser.add_argument("--batch-size", type=int, default=500, help="Validation results per database write")
+    args = parser.parse_args()
+    
     print("🔬 Starting Vulnerability Validation Framework")
     
-    validator = VulnerabilityValidator()
-    results = validator.validate_all_detections()
+    validator = VulnerabilityValidator(args.db, batch_size=args.batch_size)
+    results = validator.validate_all_detections(workers=args.workers)
     
     print(f"\n✅ Validation complete! Processed {len(results)} detections")
 
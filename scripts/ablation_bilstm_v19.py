@@ -10,8 +10,16 @@ Ablation dimensions:
     - Training: learning rate, batch size, max sequence length
     - Regularization: weight decay, label smoothing
 
+The dataset is tokenized and encoded once into memory-mapped arrays that all
+runs share. Configurations run concurrently in a worker pool (--workers, with
+--threads-per-worker torch threads each), can be pruned early with ASHA-style
+successive halving (--asha), and every finished run is appended to a results
+log (<out-dir>/ablation_log.jsonl) so an interrupted study resumes where it
+stopped.
+
 Usage:
     python scripts/ablation_bilstm_v19.py --in data/features/combined_v15_discriminative.jsonl
+    python scripts/ablation_bilstm_v19.py --workers 4 --threads-per-worker 2 --asha
 """
 
 import argparse
@@ -20,10 +28,13 @@ import pickle
 import random
 import time
 import itertools
+import multiprocessing as mp
+import os
+import threading
 from collections import Counter
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -233,6 +244,56 @@ class SeqDataset(Dataset):
         return torch.tensor(ids, dtype=torch.long), torch.tensor(y, dtype=torch.long)
 
 
+def encode_split(
+    records: List[Dict],
+    vocab: Dict[str, int],
+    label_to_id: Dict[str, int],
+    max_len: int,
+    prefix: Path
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode records once into <prefix>_ids.npy [N, max_len] (int32, 0-padded)
+    and <prefix>_labels.npy [N]; returns both arrays memory-mapped read-only."""
+    ids = np.lib.format.open_memmap(f"{prefix}_ids.npy", mode='w+', dtype=np.int32,
+                                    shape=(len(records), max_len))
+    labels = np.empty(len(records), dtype=np.int64)
+    for i, r in enumerate(records):
+        row = [vocab.get(t, 1) for t in r['tokens'][:max_len]]
+        ids[i, :len(row)] = row
+        ids[i, len(row):] = 0
+        labels[i] = label_to_id[r['label']]
+    ids.flush()
+    del ids
+    np.save(f"{prefix}_labels.npy", labels)
+    return load_split(prefix)
+
+
+def load_split(prefix: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """Memory-map an encoded split written by encode_split."""
+    return (np.load(f"{prefix}_ids.npy", mmap_mode='r'),
+            np.load(f"{prefix}_labels.npy", mmap_mode='r'))
+
+
+class EncodedSeqDataset(Dataset):
+    """SeqDataset over pre-encoded (memory-mapped) token ids.
+    
+    Rows are truncated to max_len, which gives the same tensors as SeqDataset
+    for any max_len up to the encoded width.
+    """
+    
+    def __init__(self, ids: np.ndarray, labels: np.ndarray, max_len: int = 128):
+        assert max_len <= ids.shape[1], "max_len exceeds the encoded sequence width"
+        self.ids = ids
+        self.labels = labels
+        self.max_len = max_len
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def __getitem__(self, idx):
+        x = torch.from_numpy(self.ids[idx, :self.max_len].astype(np.int64))
+        return x, torch.tensor(int(self.labels[idx]), dtype=torch.long)
+
+
 class BiLSTMClassifier(nn.Module):
     """Bidirectional LSTM for sequence classification."""
     
@@ -361,24 +422,45 @@ def run_single_ablation(
     seed: int = 42
 ) -> Dict:
     """Run a single ablation experiment."""
+    train_ds = SeqDataset(train_records, vocab, label_to_id, max_len=config.max_len)
+    test_ds = SeqDataset(test_records, vocab, label_to_id, max_len=config.max_len)
+    train_counts = Counter(label_to_id[r['label']] for r in train_records)
+    
+    return train_ablation_config(
+        config, train_ds, test_ds, len(vocab), train_counts, id_to_label, device, seed
+    )
+
+
+def train_ablation_config(
+    config: AblationConfig,
+    train_ds: Dataset,
+    test_ds: Dataset,
+    vocab_size: int,
+    train_counts: Dict[int, int],
+    id_to_label: Dict[int, str],
+    device: torch.device,
+    seed: int = 42,
+    should_stop: Optional[Callable[[int, float], bool]] = None
+) -> Dict:
+    """Train and evaluate one configuration.
+    
+    should_stop(epoch, best_test_acc) is asked after every epoch; returning True
+    ends training early (the run is then marked as pruned).
+    """
     
     # Set seeds
     random.seed(seed)
     np.random.seed(seed)
     torch.manual_seed(seed)
     
-    num_classes = len(label_to_id)
-    
-    # Create datasets
-    train_ds = SeqDataset(train_records, vocab, label_to_id, max_len=config.max_len)
-    test_ds = SeqDataset(test_records, vocab, label_to_id, max_len=config.max_len)
+    num_classes = len(id_to_label)
     
     train_loader = DataLoader(train_ds, batch_size=config.batch_size, shuffle=True, num_workers=0)
     test_loader = DataLoader(test_ds, batch_size=config.batch_size, shuffle=False, num_workers=0)
     
     # Create model
     model = BiLSTMClassifier(
-        vocab_size=len(vocab),
+        vocab_size=vocab_size,
         d_model=config.d_model,
         num_layers=config.num_layers,
         num_classes=num_classes,
@@ -393,9 +475,8 @@ def run_single_ablation(
     scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=config.epochs)
     
     # Class weights
-    train_counts = Counter(r['label'] for r in train_records)
     class_weights = torch.tensor(
-        [1.0 / max(1, train_counts.get(id_to_label[i], 1)) for i in range(num_classes)],
+        [1.0 / max(1, train_counts.get(i, 1)) for i in range(num_classes)],
         dtype=torch.float32,
         device=device
     )
@@ -408,6 +489,7 @@ def run_single_ablation(
     best_epoch = 0
     train_accs = []
     test_accs = []
+    pruned = False
     
     start_time = time.time()
     
@@ -423,6 +505,10 @@ def run_single_ablation(
         if test_acc > best_test_acc:
             best_test_acc = test_acc
             best_epoch = epoch + 1
+        
+        if should_stop is not None and epoch + 1 < config.epochs and should_stop(epoch + 1, best_test_acc):
+            pruned = True
+            break
     
     train_time = time.time() - start_time
     
@@ -440,6 +526,8 @@ def run_single_ablation(
         'train_accs': train_accs,
         'test_accs': test_accs,
         'train_time': train_time,
+        'pruned': pruned,
+        'epochs_run': len(test_accs),
         'train_report': train_report,
         'test_report': test_report,
         'y_test_true': y_test_true,
@@ -447,6 +535,226 @@ def run_single_ablation(
     }
 
 
+# ============================================================================
+# Scheduling: ASHA pruning, worker pool, resumable results log
+# ============================================================================
+
+class AshaPruner:
+    """ASHA-style early stopping (asynchronous successive halving).
+    
+    Rungs sit at grace_epochs * eta**k epochs. A run reaching a rung records
+    its best test accuracy there and is stopped unless it is within the top
+    1/eta of all scores recorded at that rung so far. Runs are never paused,
+    so workers stay busy; early runs are judged against fewer peers.
+    
+    rung_scores maps rung epoch -> recorded scores and may be a
+    multiprocessing.Manager dict shared by all workers (with a Manager lock).
+    """
+    
+    def __init__(self, rung_scores, lock, grace_epochs: int = 2, eta: int = 3):
+        assert grace_epochs >= 1 and eta >= 2
+        self.rung_scores = rung_scores
+        self.lock = lock
+        self.grace_epochs = grace_epochs
+        self.eta = eta
+    
+    def is_rung(self, epoch: int) -> bool:
+        rung = self.grace_epochs
+        while rung < epoch:
+            rung *= self.eta
+        return rung == epoch
+    
+    def record(self, epoch: int, score: float) -> List[float]:
+        with self.lock:
+            scores = list(self.rung_scores.get(epoch, [])) + [score]
+            self.rung_scores[epoch] = scores
+        return scores
+    
+    def should_stop(self, epoch: int, score: float) -> bool:
+        if not self.is_rung(epoch):
+            return False
+        scores = self.record(epoch, score)
+        cutoff = np.percentile(scores, 100 * (1 - 1 / self.eta))
+        return score < cutoff
+    
+    def seed_from_history(self, test_accs: List[float]):
+        """Record the rung scores of a run finished earlier (resumed study)."""
+        best = 0.0
+        for epoch, acc in enumerate(test_accs, 1):
+            best = max(best, acc)
+            if self.is_rung(epoch):
+                self.record(epoch, best)
+
+
+# Per-process state of ablation workers (set by _init_ablation_worker)
+_WORKER: Dict = {}
+
+
+def _init_ablation_worker(data_dir: str, vocab_size: int, id_to_label: Dict[int, str],
+                          device: str, seed: int, threads: int,
+                          pruner: Optional[AshaPruner]):
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set in this process
+    
+    train_ids, train_labels = load_split(Path(data_dir) / "train")
+    test_ids, test_labels = load_split(Path(data_dir) / "test")
+    _WORKER.update(
+        train=(train_ids, train_labels), test=(test_ids, test_labels),
+        train_counts=Counter(np.asarray(train_labels).tolist()),
+        vocab_size=vocab_size, id_to_label=id_to_label,
+        device=torch.device(device), seed=seed, pruner=pruner,
+    )
+
+
+def _run_ablation_worker(job: Tuple[int, AblationConfig]) -> Tuple[int, Optional[Dict], Optional[str]]:
+    """Run one configuration; returns (config index, result, error)."""
+    index, config = job
+    try:
+        train_ds = EncodedSeqDataset(*_WORKER['train'], max_len=config.max_len)
+        test_ds = EncodedSeqDataset(*_WORKER['test'], max_len=config.max_len)
+        pruner = _WORKER['pruner']
+        result = train_ablation_config(
+            config, train_ds, test_ds, _WORKER['vocab_size'], _WORKER['train_counts'],
+            _WORKER['id_to_label'], _WORKER['device'], _WORKER['seed'],
+            should_stop=pruner.should_stop if pruner is not None else None,
+        )
+        return index, result, None
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}"
+
+
+def summarize_result(result: Dict) -> Dict:
+    """Result without the large per-sample fields (as stored in the JSON outputs)."""
+    r_copy = {k: v for k, v in result.items()
+              if k not in ('train_report', 'test_report', 'y_test_true', 'y_test_pred')}
+    r_copy['train_accs'] = [float(x) for x in r_copy['train_accs']]
+    r_copy['test_accs'] = [float(x) for x in r_copy['test_accs']]
+    return r_copy
+
+
+class ResultsLog:
+    """Append-only JSONL log of finished runs, keyed by configuration and data setup.
+    
+    Runs whose key is already in the log are skipped on the next invocation.
+    """
+    
+    def __init__(self, path: Path, data_key: Dict):
+        self.path = path
+        self.data_key = data_key
+        self.done: Dict[str, Dict] = {}
+        if path.exists():
+            with path.open() as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partially written last line of an interrupted run
+                    if entry.get('data') == data_key:
+                        self.done[self.key(entry['result']['config'])] = entry['result']
+    
+    @staticmethod
+    def key(config: Dict) -> str:
+        return json.dumps(config, sort_keys=True)
+    
+    def get(self, config: AblationConfig) -> Optional[Dict]:
+        return self.done.get(self.key(asdict(config)))
+    
+    def append(self, result: Dict):
+        summary = summarize_result(result)
+        with self.path.open('a') as f:
+            f.write(json.dumps({'data': self.data_key, 'result': summary}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[self.key(summary['config'])] = summary
+
+
+def run_ablations(
+    configs: List[AblationConfig],
+    train_records: List[Dict],
+    test_records: List[Dict],
+    vocab: Dict[str, int],
+    label_to_id: Dict[str, int],
+    id_to_label: Dict[int, str],
+    device: torch.device,
+    out_dir: Path,
+    results_log: ResultsLog,
+    seed: int = 42,
+    workers: int = 1,
+    threads_per_worker: Optional[int] = None,
+    asha: Optional[Tuple[int, int]] = None
+) -> List[Dict]:
+    """Run all configurations (skipping those already in the results log).
+    
+    asha=(grace_epochs, eta) enables ASHA pruning. Results are returned in
+    config order; finished runs are appended to the log as they complete.
+    """
+    pending = [(i, c) for i, c in enumerate(configs) if results_log.get(c) is None]
+    if len(pending) < len(configs):
+        log(f"  Resuming: {len(configs) - len(pending)} configurations already in {results_log.path}")
+    
+    if pending:
+        # Tokenized records -> shared memory-mapped token ids (once for all runs)
+        data_dir = out_dir / "encoded"
+        data_dir.mkdir(parents=True, exist_ok=True)
+        width = max(c.max_len for _, c in pending)
+        log(f"  Encoding dataset to {data_dir} (width {width})...")
+        encode_split(train_records, vocab, label_to_id, width, data_dir / "train")
+        encode_split(test_records, vocab, label_to_id, width, data_dir / "test")
+        
+        workers = max(1, min(workers, len(pending)))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        
+        manager = None
+        pruner = None
+        if asha is not None:
+            if workers > 1:
+                manager = mp.get_context('spawn').Manager()
+                pruner = AshaPruner(manager.dict(), manager.Lock(), *asha)
+            else:
+                pruner = AshaPruner({}, threading.Lock(), *asha)
+            for c in configs:
+                done = results_log.get(c)
+                if done is not None:
+                    pruner.seed_from_history(done['test_accs'])
+        
+        init_args = (str(data_dir), len(vocab), id_to_label, str(device), seed, threads_per_worker, pruner)
+        pool = None
+        if workers > 1:
+            # Spawned workers start with fresh torch thread pools (and work with CUDA)
+            pool = mp.get_context('spawn').Pool(workers, initializer=_init_ablation_worker, initargs=init_args)
+            run_results = pool.imap_unordered(_run_ablation_worker, pending)
+        else:
+            _init_ablation_worker(*init_args)
+            run_results = map(_run_ablation_worker, pending)
+        
+        try:
+            for finished, (index, result, error) in enumerate(run_results, 1):
+                config = configs[index]
+                if error is not None:
+                    log(f"  [{finished}/{len(pending)}] {config.name} FAILED: {error}")
+                    continue
+                results_log.append(result)
+                status = f"pruned at epoch {result['epochs_run']}" if result['pruned'] else "done"
+                log(f"  [{finished}/{len(pending)}] {config.name}: test_acc={result['best_test_acc']:.4f} "
+                    f"(epoch {result['best_epoch']}), params={result['num_params']:,}, "
+                    f"time={result['train_time']:.1f}s, {status}")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if manager is not None:
+                manager.shutdown()
+    
+    return [results_log.get(c) for c in configs if results_log.get(c) is not None]
+
+
 def plot_ablation_results(results: List[Dict], out_dir: Path):
     """Plot ablation study results."""
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -671,6 +979,13 @@ def main():
     ap.add_argument("--test-size", type=float, default=0.2, help="Test split ratio")
     ap.add_argument("--seed", type=int, default=42, help="Random seed")
     ap.add_argument("--quick", action="store_true", help="Run quick ablation with fewer epochs")
+    ap.add_argument("--workers", type=int, default=1, help="Configurations trained concurrently")
+    ap.add_argument("--threads-per-worker", type=int, default=None,
+                    help="torch threads per worker (default: CPUs / workers)")
+    ap.add_argument("--asha", action="store_true", help="Prune weak configurations with ASHA-style successive halving")
+    ap.add_argument("--asha-grace", type=int, default=2, help="Epochs before the first ASHA rung")
+    ap.add_argument("--asha-eta", type=int, default=3, help="ASHA reduction factor (keep top 1/eta per rung)")
+    ap.add_argument("--fresh", action="store_true", help="Ignore the results log and rerun every configuration")
     args = ap.parse_args()
     
     # Set seeds
@@ -727,38 +1042,27 @@ def main():
     log(f"RUNNING {len(configs)} ABLATION EXPERIMENTS")
     log("=" * 60)
     
-    results = []
+    log_path = args.out_dir / "ablation_log.jsonl"
+    if args.fresh and log_path.exists():
+        log_path.unlink()
+    results_log = ResultsLog(log_path, {
+        'input': str(args.inp), 'seed': args.seed, 'test_size': args.test_size, 'vocab_size': len(vocab),
+    })
+    
+    results = run_ablations(
+        configs, train_records, test_records, vocab,
+        label_to_id, id_to_label, device, args.out_dir, results_log, args.seed,
+        workers=args.workers, threads_per_worker=args.threads_per_worker,
+        asha=(args.asha_grace, args.asha_eta) if args.asha else None,
+    )
     
-    for i, config in enumerate(configs):
-        log(f"\n[{i + 1}/{len(configs)}] Running: {config.name}")
-        log(f"  Config: d_model={config.d_model}, layers={config.num_layers}, "
-            f"dropout={config.dropout}, lr={config.lr}, batch={config.batch_size}")
-        
-        result = run_single_ablation(
-            config, train_records, test_records, vocab, 
-            label_to_id, id_to_label, device, args.seed
-        )
-        
-        results.append(result)
-        
-        log(f"  Result: test_acc={result['best_test_acc']:.4f} (epoch {result['best_epoch']}), "
-            f"params={result['num_params']:,}, time={result['train_time']:.1f}s")
+    if not results:
+        log("ERROR: No ablation run finished!")
+        return
     
     # Save all results
     with open(args.out_dir / "ablation_results.json", 'w') as f:
-        # Convert numpy arrays to lists for JSON serialization
-        results_json = []
-        for r in results:
-            r_copy = r.copy()
-            r_copy['train_accs'] = [float(x) for x in r_copy['train_accs']]
-            r_copy['test_accs'] = [float(x) for x in r_copy['test_accs']]
-            # Remove large fields for JSON
-            del r_copy['train_report']
-            del r_copy['test_report']
-            del r_copy['y_test_true']
-            del r_copy['y_test_pred']
-            results_json.append(r_copy)
-        json.dump(results_json, f, indent=2)
+        json.dump([summarize_result(r) for r in results], f, indent=2)
     
     log(f"\nSaved ablation results to {args.out_dir / 'ablation_results.json'}")
     
@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the detection pipeline.
+
+Times every stage of the pipeline on fixed corpora, so performance changes can
+be measured and regressions caught:
+
+    asm_parse             .s files -> InstructionCorpus (githubCrawl)
+    window_extraction     extract_large_windows() over the .s files
+    strip_boilerplate     strip_boilerplate() per window
+    pdg_build             PDGBuilder.build() per window
+    semantic_graph        SemanticGraphBuilder.build_graph() per window
+    feature_extraction    extract_features_enhanced() per window
+    gine_train_step       GINE v38 forward + backward + optimizer step per batch
+    ggnn_train_step       GGNN-BiLSTM v28 forward + backward + optimizer step per batch
+    rf_predict            RandomForest predict_proba over the feature matrix
+    dsl_minimization      DSLMatcher.validate_window() + minimal_window() per window
+
+Corpora:
+    synthetic             fixed-seed gadget windows (arm64 and x86_64), always available
+    asm_code              c_vulns/asm_code/*.s
+    vuln_processed        githubCrawl/vuln_assembly_processed/vuln_features.pkl
+                          (written by preprocess_vuln_assembly.py; skipped if absent)
+
+Inputs of a stage (windows, features, datasets, fitted models) are prepared
+outside the timed region. Each stage runs --warmup untimed and --repeat timed
+passes; the median pass is reported with its per-item time and throughput.
+Memory is reported as the process peak RSS after the stage and as the growth
+of that peak during the stage (the peak never decreases, so only growth can be
+attributed to a stage). Stages whose dependencies are missing are recorded as
+skipped.
+
+Usage:
+    python scripts/benchmark_pipeline.py --out bench/baseline.json
+    python scripts/benchmark_pipeline.py --out bench/current.json --compare bench/baseline.json
+    python scripts/benchmark_pipeline.py --stages pdg_build,semantic_graph --repeat 5
+    python scripts/benchmark_pipeline.py --load bench/current.json --compare bench/baseline.json
+
+With --compare, stages whose per-item time grew by more than --threshold (or
+whose peak RSS growth rose by more than --rss-threshold and --rss-slack-mb)
+are flagged and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Feature extraction without the learned sequence encoder (as in profile_feature_extraction.py)
+os.environ['DISABLE_SEQUENCE_ENCODER'] = '1'
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.append(str(REPO_ROOT / 'githubCrawl'))
+
+ASM_CODE_DIR = REPO_ROOT / 'c_vulns' / 'asm_code'
+VULN_PROCESSED_DIR = REPO_ROOT / 'githubCrawl' / 'vuln_assembly_processed'
+DSL_PATH = REPO_ROOT / 'githubCrawl' / 'dsl' / 'vuln_patterns.json'
+
+CORPORA = ('synthetic', 'asm_code', 'vuln_processed')
+
+# Used by dsl_minimization when githubCrawl/dsl/vuln_patterns.json is not present
+FALLBACK_DSL = {
+    'vulnerabilities': {
+        'SPECTRE_V1': {
+            'constraints': {
+                'sequence': [
+                    {'semantic': 'COMPARISON'},
+                    {'semantic': 'BRANCH_CONDITIONAL', 'within': 3},
+                    {'semantic': 'MEMORY_LOAD', 'within': 8},
+                ],
+                'requires_memory_access': True,
+            },
+            'anti_patterns': [{'opcode': 'lfence', 'arch': 'x86_64'}, {'opcode': 'csdb', 'arch': 'arm64'}],
+        },
+        'BRANCH_HISTORY_INJECTION': {
+            'constraints': {'requires_indirect_branch': True, 'requires_memory_access': True},
+        },
+        'RETBLEED': {
+            'constraints': {'requires_call_or_indirect_call': True, 'requires_return_instruction': True},
+        },
+        'INCEPTION': {
+            'constraints': {'requires_call_or_indirect_call': True, 'requires_return_instruction': True},
+        },
+        'MDS': {
+            'constraints': {'requires_dependent_load': True, 'requires_memory_access': True},
+        },
+        'L1TF': {
+            'constraints': {'requires_dependent_load': True, 'requires_memory_access': True},
+        },
+    }
+}
+
+
+# =============================================================================
+# MEMORY / TIMING
+# =============================================================================
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+@dataclass
+class StageResult:
+    """Timing of one stage; times are of the median pass."""
+    name: str
+    status: str = 'ok'                  # ok | skipped | error
+    unit: str = 'items'
+    items: int = 0
+    seconds: float = 0.0
+    seconds_min: float = 0.0
+    seconds_all: List[float] = field(default_factory=list)
+    ms_per_item: float = 0.0
+    throughput: float = 0.0             # items per second
+    peak_rss_mb: float = 0.0
+    peak_rss_growth_mb: float = 0.0
+    rss_after_mb: float = 0.0
+    note: str = ''
+
+
+def time_stage(name: str, unit: str, run: Callable[[], int], repeat: int, warmup: int) -> StageResult:
+    """Time ``run`` (which returns the number of items it processed)."""
+    peak_before = peak_rss_mb()
+    for _ in range(warmup):
+        run()
+    times = []
+    items = 0
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        items = run()
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    peak_after = peak_rss_mb()
+    return StageResult(
+        name=name,
+        unit=unit,
+        items=items,
+        seconds=seconds,
+        seconds_min=min(times),
+        seconds_all=times,
+        ms_per_item=1000.0 * seconds / items if items else 0.0,
+        throughput=items / seconds if seconds > 0 else 0.0,
+        peak_rss_mb=peak_after,
+        peak_rss_growth_mb=peak_after - peak_before,
+        rss_after_mb=current_rss_mb(),
+    )
+
+
+class StageSkipped(Exception):
+    """Raised by a stage setup when its dependencies or inputs are unavailable."""
+
+
+# =============================================================================
+# CORPORA
+# =============================================================================
+
+ARM64_FILLER = [
+    'add x{a}, x{b}, #{imm}', 'sub x{a}, x{b}, x{c}', 'mov x{a}, x{b}', 'lsl x{a}, x{b}, #{sh}',
+    'and w{a}, w{b}, #0xff', 'ldr x{a}, [sp, #{off}]', 'str x{a}, [sp, #{off}]', 'orr x{a}, x{b}, x{c}',
+    'eor x{a}, x{b}, x{c}', 'mul x{a}, x{b}, x{c}', 'stp x29, x30, [sp, #-{off}]!', 'nop',
+]
+X86_FILLER = [
+    'addq ${imm}, %r{r}', 'subq %rax, %rbx', 'movq %rdi, %rsi', 'shlq ${sh}, %rcx',
+    'andl $255, %eax', 'movq {off}(%rsp), %rdx', 'movq %rax, {off}(%rsp)', 'orq %rbx, %rcx',
+    'xorl %eax, %eax', 'imulq %rsi, %rdi', 'pushq %rbp', 'nop',
+]
+
+ARM64_GADGETS = {
+    'SPECTRE_V1': ['cmp x0, x1', 'b.hs .Lout', 'ldrb w2, [x3, x0]', 'lsl x2, x2, #12', 'ldrb w4, [x5, x2]'],
+    'BRANCH_HISTORY_INJECTION': ['ldr x8, [x0, #8]', 'cmp x1, #0', 'b.eq .Lskip', 'blr x8', 'ldr x2, [x3, x0]'],
+    'RETBLEED': ['bl victim_call', 'ldr x30, [sp, #8]', 'add sp, sp, #16', 'ret', 'ldr x0, [x1]'],
+    'MDS': ['ldr x0, [x1]', 'ldr x2, [x0]', 'dsb sy', 'ldr x3, [x2, #64]', 'mrs x4, cntvct_el0'],
+    'L1TF': ['dc civac, x0', 'dsb ish', 'ldr x1, [x0]', 'ldr x2, [x3, x1]', 'isb'],
+    'INCEPTION': ['bl target_fn', 'add x0, x0, #1', 'ret', 'blr x9', 'ldr x1, [x0]'],
+    'BENIGN': ['mov x0, #0', 'add x0, x0, #1', 'cmp x0, #10', 'b.lt .Lloop', 'ret'],
+}
+X86_GADGETS = {
+    'SPECTRE_V1': ['cmpq %rsi, %rdi', 'jae .Lout', 'movzbl (%rdx,%rdi), %eax', 'shlq $12, %rax', 'movzbl (%rcx,%rax), %eax'],
+    'BRANCH_HISTORY_INJECTION': ['movq 8(%rdi), %rax', 'testq %rsi, %rsi', 'je .Lskip', 'call *%rax', 'movq (%rdx,%rdi), %rcx'],
+    'RETBLEED': ['call victim_call', 'popq %rbp', 'addq $16, %rsp', 'ret', 'movq (%rsi), %rax'],
+    'MDS': ['movq (%rsi), %rax', 'movq (%rax), %rbx', 'verw (%rsp)', 'movq 64(%rbx), %rcx', 'rdtscp'],
+    'L1TF': ['clflush (%rdi)', 'mfence', 'movq (%rdi), %rax', 'movq (%rsi,%rax), %rbx', 'lfence'],
+    'INCEPTION': ['call target_fn', 'addq $1, %rax', 'ret', 'jmp *%rcx', 'movq (%rdi), %rax'],
+    'BENIGN': ['xorl %eax, %eax', 'addl $1, %eax', 'cmpl $10, %eax', 'jl .Lloop', 'ret'],
+}
+
+
+def synthetic_records(n: int, seed: int) -> List[Dict]:
+    """Fixed-seed windows: filler instructions around one labelled gadget."""
+    rng = random.Random(seed)
+    labels = sorted(ARM64_GADGETS)
+    records = []
+    for i in range(n):
+        label = labels[i % len(labels)]
+        arch = 'arm64' if (i // len(labels)) % 2 == 0 else 'x86_64'
+        filler, gadgets = (ARM64_FILLER, ARM64_GADGETS) if arch == 'arm64' else (X86_FILLER, X86_GADGETS)
+
+        def fill(k):
+            return [rng.choice(filler).format(
+                a=rng.randrange(16), b=rng.randrange(16), c=rng.randrange(16),
+                imm=rng.randrange(1, 256), sh=rng.randrange(1, 13), off=8 * rng.randrange(1, 16),
+                r=rng.randrange(8, 16)) for _ in range(k)]
+
+        sequence = fill(rng.randrange(5, 25)) + list(gadgets[label]) + fill(rng.randrange(5, 25))
+        records.append({'sequence': sequence, 'label': label, 'arch': arch, 'source': 'synthetic'})
+    return records
+
+
+def asm_arch(lines: List[str]) -> str:
+    """Same heuristic as extract_large_windows: AT&T syntax means x86_64."""
+    return 'x86_64' if any('%' in l for l in lines[:100]) else 'arm64'
+
+
+def vuln_processed_records(path: Path) -> List[Dict]:
+    """Instruction windows of preprocess_vuln_assembly.py output (20-instruction, stride 10)."""
+    with open(path, 'rb') as f:
+        vuln_data = pickle.load(f)
+    records = []
+    for file_data in vuln_data:
+        lines = [instr.get('raw_line', instr.get('raw', '')) for instr in file_data.get('raw_instructions', [])
+                 if isinstance(instr, dict)]
+        lines = [l for l in lines if l]
+        arch = file_data.get('architecture', file_data.get('arch', 'arm64'))
+        label = file_data.get('vulnerability_type', 'UNKNOWN')
+        for start in range(0, max(1, len(lines) - 19), 10):
+            window = lines[start:start + 20]
+            if len(window) >= 5:
+                records.append({'sequence': window, 'label': label, 'arch': arch, 'source': 'vuln_processed'})
+    return records
+
+
+# =============================================================================
+# CONTEXT (untimed, lazily prepared stage inputs)
+# =============================================================================
+
+class BenchmarkContext:
+    def __init__(self, args):
+        self.args = args
+        self.corpus_counts: Dict[str, int] = {}
+        self.corpus_notes: Dict[str, str] = {}
+        self._records: Optional[List[Dict]] = None
+        self._features: Optional[List[Dict]] = None
+        self._matrix = None
+
+    @property
+    def asm_files(self) -> List[Path]:
+        if 'asm_code' not in self.args.corpora:
+            return []
+        return sorted(ASM_CODE_DIR.glob('*.s'))
+
+    @property
+    def records(self) -> List[Dict]:
+        """Windows of every selected corpus (label, arch, sequence)."""
+        if self._records is None:
+            records = []
+            if 'synthetic' in self.args.corpora:
+                synthetic = synthetic_records(self.args.synthetic, self.args.seed)
+                self.corpus_counts['synthetic'] = len(synthetic)
+                records += synthetic
+            if 'asm_code' in self.args.corpora:
+                from extract_large_windows import extract_large_windows
+                windows = []
+                for path in self.asm_files:
+                    for w in extract_large_windows(path):
+                        windows.append({'sequence': w['sequence'], 'label': w['label'],
+                                        'arch': w['arch'], 'source': 'asm_code'})
+                self.corpus_counts['asm_code'] = len(windows)
+                records += windows
+            if 'vuln_processed' in self.args.corpora:
+                path = VULN_PROCESSED_DIR / 'vuln_features.pkl'
+                if path.exists():
+                    windows = vuln_processed_records(path)
+                    self.corpus_counts['vuln_processed'] = len(windows)
+                    records += windows
+                else:
+                    self.corpus_notes['vuln_processed'] = f"{path} missing (run preprocess_vuln_assembly.py)"
+            if self.args.max_windows:
+                records = records[:self.args.max_windows]
+            self._records = records
+        return self._records
+
+    @property
+    def features(self) -> List[Dict]:
+        """Numeric, finite extract_features_enhanced() output per record."""
+        if self._features is None:
+            from extract_features_enhanced import extract_features_enhanced
+            features = []
+            for rec in self.records:
+                feats = extract_features_enhanced({'sequence': rec['sequence'], 'arch': rec['arch'], 'features': {}})
+                features.append({k: float(v) for k, v in feats.items()
+                                 if isinstance(v, (int, float)) and not isinstance(v, bool) and np.isfinite(v)})
+            self._features = features
+        return self._features
+
+    @property
+    def feature_names(self) -> List[str]:
+        names = set()
+        for feats in self.features:
+            names.update(feats)
+        return sorted(names)
+
+    @property
+    def labelled(self) -> List[Dict]:
+        """Records with their features, as the trainers expect them."""
+        return [dict(rec, features=feats) for rec, feats in zip(self.records, self.features)]
+
+    @property
+    def label_to_id(self) -> Dict[str, int]:
+        return {label: i for i, label in enumerate(sorted({r['label'] for r in self.records}))}
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            names = self.feature_names
+            matrix = np.array([[feats.get(n, 0.0) for n in names] for feats in self.features], dtype=np.float32)
+            self._matrix = np.clip(matrix, -1e6, 1e6)
+        return self._matrix
+
+    def require_records(self) -> List[Dict]:
+        if not self.records:
+            raise StageSkipped('no windows in the selected corpora')
+        return self.records
+
+
+# =============================================================================
+# STAGES
+# =============================================================================
+# A stage setup prepares its inputs (untimed) and returns (unit, run), where
+# run() performs the timed work once and returns the number of items.
+
+def stage_asm_parse(ctx: BenchmarkContext):
+    from instruction_corpus import InstructionCorpus
+    from build_dataset import _instruction_semantics
+    from parse_asm_to_jsonl import read_file, normalize_line
+
+    files = [(path, read_file(path)) for path in ctx.asm_files]
+    if not files:
+        raise StageSkipped(f"no .s files in {ASM_CODE_DIR} (or asm_code corpus not selected)")
+    files = [(path, lines, asm_arch(lines)) for path, lines in files]
+
+    def run():
+        n = 0
+        for _, lines, arch in files:
+            corpus = InstructionCorpus(arch)
+            for i, line in enumerate(lines):
+                line = normalize_line(line)
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split()
+                opcode = parts[0].lower()
+                semantics = _instruction_semantics(opcode, parts[1:], arch)
+                corpus.append(i + 1, line, opcode, parts[1:], semantics)
+            n += len(corpus)
+        return n
+    return 'instructions', run
+
+
+def stage_window_extraction(ctx: BenchmarkContext):
+    from extract_large_windows import extract_large_windows
+
+    paths = ctx.asm_files
+    if not paths:
+        raise StageSkipped(f"no .s files in {ASM_CODE_DIR} (or asm_code corpus not selected)")
+
+    def run():
+        return sum(len(extract_large_windows(path)) for path in paths)
+    return 'windows', run
+
+
+def stage_strip_boilerplate(ctx: BenchmarkContext):
+    from strip_boilerplate import strip_boilerplate
+
+    sequences = [r['sequence'] for r in ctx.require_records()]
+
+    def run():
+        for seq in sequences:
+            strip_boilerplate(seq)
+        return len(sequences)
+    return 'windows', run
+
+
+def stage_pdg_build(ctx: BenchmarkContext):
+    from pdg_builder import PDGBuilder
+
+    builder = PDGBuilder(speculative_window=10)
+    sequences = [r['sequence'] for r in ctx.require_records()]
+
+    def run():
+        for seq in sequences:
+            builder.build(seq)
+        return len(sequences)
+    return 'windows', run
+
+
+def stage_semantic_graph(ctx: BenchmarkContext):
+    from semantic_graph_builder import SemanticGraphBuilder
+
+    builder = SemanticGraphBuilder()
+    sequences = [r['sequence'] for r in ctx.require_records()]
+
+    def run():
+        for seq in sequences:
+            builder.build_graph(seq)
+        return len(sequences)
+    return 'windows', run
+
+
+def stage_feature_extraction(ctx: BenchmarkContext):
+    from extract_features_enhanced import extract_features_enhanced
+
+    records = [{'sequence': r['sequence'], 'arch': r['arch'], 'features': {}} for r in ctx.require_records()]
+
+    def run():
+        for rec in records:
+            extract_features_enhanced(rec)
+        return len(records)
+    return 'windows', run
+
+
+def _train_step_loop(model, batches, step):
+    import torch
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+    model.train()
+
+    def run():
+        n = 0
+        for batch in batches:
+            optimizer.zero_grad()
+            loss = step(batch)
+            loss.backward()
+            optimizer.step()
+            n += batch['label'].shape[0]
+        return n
+    return run
+
+
+def stage_gine_train_step(ctx: BenchmarkContext):
+    try:
+        import torch
+        import torch.nn.functional as F
+        from train_gine_v38 import GINEDatasetV38, make_loader, model_forward
+        from gine_classifier_v38 import GINEClassifier, SupervisedContrastiveLoss
+        from pdg_builder import NUM_EDGE_TYPES
+    except ImportError as e:
+        raise StageSkipped(f"GINE v38 unavailable: {e}")
+
+    torch.manual_seed(ctx.args.seed)
+    dataset = GINEDatasetV38(ctx.labelled, ctx.label_to_id, ctx.feature_names, strip_bp=True)
+    if len(dataset) == 0:
+        raise StageSkipped('no valid GINE samples')
+    batches = list(make_loader(dataset, ctx.args.batch_size, shuffle=False))[:ctx.args.max_batches or None]
+    model = GINEClassifier(
+        node_feat_dim=batches[0]['node_features'].shape[-1],
+        num_edge_types=NUM_EDGE_TYPES,
+        hidden_dim=128,
+        num_layers=4,
+        num_classes=len(ctx.label_to_id),
+        handcrafted_dim=len(ctx.feature_names),
+    )
+    contrastive = SupervisedContrastiveLoss()
+    device = torch.device('cpu')
+
+    def step(batch):
+        logits, proj, _ = model_forward(model, batch, device, return_projection=True)
+        return F.cross_entropy(logits, batch['label']) + 0.5 * contrastive(proj, batch['label'])
+    return 'samples', _train_step_loop(model, batches, step)
+
+
+def stage_ggnn_train_step(ctx: BenchmarkContext):
+    try:
+        import torch
+        import torch.nn.functional as F
+        from torch.utils.data import DataLoader
+        from train_ggnn_bilstm_v28 import PDGDataset, collate_fn, NODE_FEATURE_DIM
+        from ggnn_bilstm_v28 import HybridGGNNBiLSTMv28
+    except ImportError as e:
+        raise StageSkipped(f"GGNN-BiLSTM v28 unavailable: {e}")
+
+    torch.manual_seed(ctx.args.seed)
+    dataset = PDGDataset(ctx.labelled, ctx.label_to_id, ctx.feature_names)
+    if len(dataset) == 0:
+        raise StageSkipped('no valid GGNN samples')
+    loader = DataLoader(dataset, batch_size=ctx.args.batch_size, shuffle=False, collate_fn=collate_fn)
+    batches = list(loader)[:ctx.args.max_batches or None]
+    model = HybridGGNNBiLSTMv28(
+        node_feature_dim=NODE_FEATURE_DIM,
+        num_classes=len(ctx.label_to_id),
+        handcrafted_dim=len(ctx.feature_names),
+    )
+
+    def step(batch):
+        logits = model(
+            batch['node_features'], batch['adj_data'], batch['adj_control'],
+            batch['topo_order'], batch['node_mask'], batch['seq_length'], batch['handcrafted'],
+        )
+        return F.cross_entropy(logits, batch['label'])
+    return 'samples', _train_step_loop(model, batches, step)
+
+
+def stage_rf_predict(ctx: BenchmarkContext):
+    try:
+        from sklearn.ensemble import RandomForestClassifier
+    except ImportError as e:
+        raise StageSkipped(f"scikit-learn unavailable: {e}")
+
+    ctx.require_records()
+    X = ctx.matrix
+    y = [r['label'] for r in ctx.records]
+    rf = RandomForestClassifier(n_estimators=100, random_state=ctx.args.seed, n_jobs=1)
+    rf.fit(X, y)
+
+    def run():
+        rf.predict_proba(X)
+        return len(X)
+    return 'windows', run
+
+
+def stage_dsl_minimization(ctx: BenchmarkContext):
+    from dsl_matcher import DSLMatcher
+    from instruction_corpus import InstructionCorpus
+    from build_dataset import _instruction_semantics
+
+    if DSL_PATH.exists():
+        matcher = DSLMatcher(str(DSL_PATH))
+    else:
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(FALLBACK_DSL, f)
+        try:
+            matcher = DSLMatcher(f.name)
+        finally:
+            os.unlink(f.name)
+    known = set(matcher.list_vulnerability_types())
+
+    windows = []
+    for rec in ctx.require_records():
+        arch = rec['arch']
+        corpus = InstructionCorpus(arch)
+        for i, line in enumerate(rec['sequence']):
+            parts = line.split()
+            if parts:
+                opcode = parts[0].lower()
+                corpus.append(i + 1, line, opcode, parts[1:], _instruction_semantics(opcode, parts[1:], arch))
+        vuln_type = rec['label'] if rec['label'] in known else 'SPECTRE_V1'
+        windows.append((corpus, vuln_type, arch))
+
+    def run():
+        for corpus, vuln_type, arch in windows:
+            ok, _ = matcher.validate_window(corpus, vuln_type, arch)
+            if ok:
+                matcher.minimal_window(corpus, vuln_type, arch)
+        return len(windows)
+    return 'windows', run
+
+
+STAGES: Dict[str, Callable] = {
+    'asm_parse': stage_asm_parse,
+    'window_extraction': stage_window_extraction,
+    'strip_boilerplate': stage_strip_boilerplate,
+    'pdg_build': stage_pdg_build,
+    'semantic_graph': stage_semantic_graph,
+    'feature_extraction': stage_feature_extraction,
+    'gine_train_step': stage_gine_train_step,
+    'ggnn_train_step': stage_ggnn_train_step,
+    'rf_predict': stage_rf_predict,
+    'dsl_minimization': stage_dsl_minimization,
+}
+
+
+def run_stages(ctx: BenchmarkContext, names: List[str]) -> Dict[str, StageResult]:
+    results = {}
+    for name in names:
+        print(f"[{name}] preparing ...", file=sys.stderr)
+        try:
+            unit, run = STAGES[name](ctx)
+            result = time_stage(name, unit, run, ctx.args.repeat, ctx.args.warmup)
+        except StageSkipped as e:
+            result = StageResult(name=name, status='skipped', note=str(e))
+        except Exception as e:
+            result = StageResult(name=name, status='error', note=f"{type(e).__name__}: {e}")
+        results[name] = result
+        if result.status == 'ok':
+            print(f"[{name}] {result.items} {result.unit} in {result.seconds:.3f}s "
+                  f"({result.ms_per_item:.3f} ms/item, {result.throughput:.1f} {result.unit}/s, "
+                  f"peak RSS {result.peak_rss_mb:.0f} MB)", file=sys.stderr)
+        else:
+            print(f"[{name}] {result.status}: {result.note}", file=sys.stderr)
+    return results
+
+
+# =============================================================================
+# REPORT / COMPARE
+# =============================================================================
+
+def environment_info() -> Dict:
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float,
+                    rss_threshold: float, rss_slack_mb: float) -> List[str]:
+    """Print a per-stage comparison; returns the regression messages."""
+    regressions = []
+    print(f"\n{'stage':<20} {'base ms/item':>13} {'ms/item':>10} {'change':>8}  "
+          f"{'base peak+MB':>12} {'peak+MB':>8}")
+    print('-' * 80)
+    for name, cur in current['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if base is None or cur.get('status') != 'ok' or base.get('status') != 'ok':
+            status = 'new' if base is None else f"{base.get('status')} -> {cur.get('status')}"
+            print(f"{name:<20} {'':>13} {'':>10} {'':>8}  {status}")
+            continue
+        flags = []
+        base_ms, cur_ms = base['ms_per_item'], cur['ms_per_item']
+        change = cur_ms / base_ms - 1.0 if base_ms > 0 else 0.0
+        if change > threshold:
+            flags.append('SLOWER')
+            regressions.append(f"{name}: {base_ms:.4f} -> {cur_ms:.4f} ms/item ({change:+.1%})")
+        base_rss, cur_rss = base['peak_rss_growth_mb'], cur['peak_rss_growth_mb']
+        if cur_rss > base_rss * (1.0 + rss_threshold) and cur_rss - base_rss > rss_slack_mb:
+            flags.append('MEMORY')
+            regressions.append(f"{name}: peak RSS growth {base_rss:.1f} -> {cur_rss:.1f} MB")
+        print(f"{name:<20} {base_ms:>13.4f} {cur_ms:>10.4f} {change:>+8.1%}  "
+              f"{base_rss:>12.1f} {cur_rss:>8.1f}  {' '.join(flags)}")
+    if baseline.get('environment') != current.get('environment'):
+        print("\nNote: baseline was recorded in a different environment")
+    return regressions
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def parse_list(value: str, choices, what: str) -> List[str]:
+    names = [v.strip() for v in value.split(',') if v.strip()]
+    unknown = [n for n in names if n not in choices]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown {what}: {', '.join(unknown)} (choose from {', '.join(choices)})")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the detection pipeline stage by stage')
+    parser.add_argument('--stages', type=lambda v: parse_list(v, STAGES, 'stage'), default=list(STAGES),
+                        help=f"Comma-separated stages (default: all): {', '.join(STAGES)}")
+    parser.add_argument('--corpora', type=lambda v: parse_list(v, CORPORA, 'corpus'), default=list(CORPORA),
+                        help=f"Comma-separated corpora (default: all): {', '.join(CORPORA)}")
+    parser.add_argument('--synthetic', type=int, default=512, help='Number of synthetic windows')
+    parser.add_argument('--max-windows', type=int, default=0, help='Cap on windows over all corpora (0 = none)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes per stage (median reported)')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed passes per stage')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size of the GNN train steps')
+    parser.add_argument('--max-batches', type=int, default=8, help='Batches per GNN pass (0 = all)')
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0 = torch default)')
+    parser.add_argument('--out', type=Path, default=None, help='Write results JSON here')
+    parser.add_argument('--load', type=Path, default=None,
+                        help='Compare an existing results JSON instead of running the benchmark')
+    parser.add_argument('--compare', type=Path, default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative ms/item increase flagged as a regression')
+    parser.add_argument('--rss-threshold', type=float, default=0.25,
+                        help='Relative peak RSS growth increase flagged as a regression')
+    parser.add_argument('--rss-slack-mb', type=float, default=16.0,
+                        help='Peak RSS growth increases below this many MB are never flagged')
+    args = parser.parse_args()
+
+    if args.load is not None:
+        with open(args.load) as f:
+            results = json.load(f)
+    else:
+        if args.threads:
+            try:
+                import torch
+                torch.set_num_threads(args.threads)
+            except ImportError:
+                pass
+        ctx = BenchmarkContext(args)
+        started = time.time()
+        stage_results = run_stages(ctx, args.stages)
+        results = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+            'environment': environment_info(),
+            'config': {k: v for k, v in vars(args).items()
+                       if k in ('stages', 'corpora', 'synthetic', 'max_windows', 'seed', 'repeat',
+                                'warmup', 'batch_size', 'max_batches', 'threads')},
+            'corpora': {'windows': ctx.corpus_counts, 'notes': ctx.corpus_notes,
+                        'asm_files': len(ctx.asm_files)},
+            'stages': {name: asdict(r) for name, r in stage_results.items()},
+        }
+        if args.out is not None:
+            args.out.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.out}", file=sys.stderr)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold,
+                                      args.rss_threshold, args.rss_slack_mb)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for msg in regressions:
+                print(f"  {msg}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
+    elif args.out is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,30 @@
 #!/usr/bin/env python3
+"""
+Build the MLM pretraining corpus.
+
+The text corpus (one whitespace-tokenized sentence per line) can also be
+encoded into a binary corpus for scripts/mlm_pretrain.py:
+    <prefix>.tokens.npy   all token ids, concatenated (uint16, or uint32 for
+                          vocabularies over 65536 entries)
+    <prefix>.offsets.npy  int64 [num_sentences + 1]; sentence i is
+                          tokens[offsets[i]:offsets[i + 1]]
+    <prefix>.vocab.json   token -> id
+Both arrays are memory-mapped when loaded, and encoding streams the text
+twice, so the corpus never has to fit in RAM.
+
+Usage:
+    python scripts/build_mlm_corpus.py --binary
+    python scripts/build_mlm_corpus.py --from-text data/dataset/mlm_corpus.txt
+"""
 import argparse
 import json
+from collections import Counter
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SPECIAL_TOKENS = ['<pad>', '<unk>', '<mask>']
 
 
 def load_jsonl(p: Path):
@@ -24,13 +47,90 @@ def tokens_from_sequence(seq):
     return toks
 
 
+def iter_sentences(text_path: Path) -> Iterator[List[str]]:
+    with text_path.open() as f:
+        for line in f:
+            toks = line.split()
+            if toks:
+                yield toks
+
+
+def binary_corpus_paths(prefix: Path) -> Dict[str, Path]:
+    return {name: prefix.parent / f"{prefix.name}.{name}.{ext}"
+            for name, ext in (('tokens', 'npy'), ('offsets', 'npy'), ('vocab', 'json'))}
+
+
+def is_binary_corpus(prefix: Path) -> bool:
+    return all(p.exists() for p in binary_corpus_paths(prefix).values())
+
+
+def build_binary_corpus(text_path: Path, prefix: Path, vocab: Optional[Dict[str, int]] = None,
+                        chunk_tokens: int = 1 << 20) -> Dict:
+    """Encode a text corpus into the memory-mapped binary format.
+
+    Without a vocab, it is built like MLMDataset's: special tokens, then the
+    sorted unique tokens. Tokens missing from a given vocab map to <unk>.
+    """
+    # Pass 1: vocabulary and sizes
+    counts = Counter()
+    num_sentences = 0
+    for toks in iter_sentences(text_path):
+        counts.update(toks)
+        num_sentences += 1
+    num_tokens = sum(counts.values())
+    if vocab is None:
+        vocab = {t: i for i, t in enumerate(SPECIAL_TOKENS)}
+        for t in sorted(counts):
+            if t not in vocab:
+                vocab[t] = len(vocab)
+    dtype = np.uint16 if len(vocab) <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+    # Pass 2: token ids and sentence offsets
+    paths = binary_corpus_paths(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    tokens = np.lib.format.open_memmap(paths['tokens'], mode='w+', dtype=dtype, shape=(num_tokens,))
+    offsets = np.lib.format.open_memmap(paths['offsets'], mode='w+', dtype=np.int64, shape=(num_sentences + 1,))
+    offsets[0] = 0
+    pos = 0
+    buf: List[int] = []
+    for i, toks in enumerate(iter_sentences(text_path), 1):
+        buf.extend(vocab.get(t, 1) for t in toks)
+        offsets[i] = pos + len(buf)
+        if len(buf) >= chunk_tokens:
+            tokens[pos:pos + len(buf)] = buf
+            pos += len(buf)
+            buf = []
+    tokens[pos:pos + len(buf)] = buf
+    tokens.flush()
+    offsets.flush()
+    del tokens, offsets
+    paths['vocab'].write_text(json.dumps(vocab))
+    return {'sentences': num_sentences, 'tokens': num_tokens, 'vocab_size': len(vocab), 'dtype': np.dtype(dtype).name}
+
+
+def load_binary_corpus(prefix: Path) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """(tokens, offsets, vocab) of a binary corpus; the arrays are read-only memmaps."""
+    paths = binary_corpus_paths(prefix)
+    return (np.load(paths['tokens'], mmap_mode='r'),
+            np.load(paths['offsets'], mmap_mode='r'),
+            json.loads(paths['vocab'].read_text()))
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--gadgets", type=Path, default=Path("c_vulns/extracted_gadgets/gadgets.jsonl"))
     ap.add_argument("--augmented", type=Path, default=Path("data/dataset/augmented_windows.jsonl"))
     ap.add_argument("--out", type=Path, default=Path("data/dataset/mlm_corpus.txt"))
+    ap.add_argument("--binary", action="store_true", help="Also encode the corpus into the binary memmap format")
+    ap.add_argument("--from-text", type=Path, default=None,
+                    help="Only encode an existing text corpus into the binary format")
+    ap.add_argument("--vocab", type=Path, default=None, help="Encode with an existing vocab (JSON token -> id)")
     args = ap.parse_args()
 
+    if args.from_text is not None:
+        encode(args.from_text, args.vocab)
+        return
+
     args.out.parent.mkdir(parents=True, exist_ok=True)
     n = 0
     with args.out.open('w') as fout:
@@ -50,6 +150,16 @@ def main():
             if toks:
                 fout.write(' '.join(toks) + '\n'); n += 1
     print(f"Wrote {n} sentences to {args.out}")
+    if args.binary:
+        encode(args.out, args.vocab)
+
+
+def encode(text_path: Path, vocab_path: Optional[Path] = None):
+    prefix = text_path.with_suffix('')
+    vocab = json.loads(vocab_path.read_text()) if vocab_path else None
+    stats = build_binary_corpus(text_path, prefix, vocab)
+    print(f"Encoded {stats['sentences']} sentences / {stats['tokens']} tokens "
+          f"(vocab {stats['vocab_size']}, {stats['dtype']}) to {prefix}.*.npy")
 
 
 if __name__ == '__main__':
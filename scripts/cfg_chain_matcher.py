@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Multi-gadget matcher for branch-broken semantic chains.
+
+cfg_vulnerability_scan.py and relabel_utils.py model a window as the CFG built
+by build_cfg_from_semantics: one node per semantic type, with an edge
+i -> i+1 unless instruction i is a BRANCH. Such a graph is a set of disjoint
+paths ("blocks"), each ending at a BRANCH or at the end of the sequence, and
+a BRANCH can only be the last node of a block.
+
+For this family, networkx's (induced) subgraph isomorphism check
+``DiGraphMatcher(window, gadget).subgraph_is_isomorphic()`` reduces to:
+every gadget block must occur as a contiguous run of types in the window,
+with the occurrences pairwise disjoint and not joined by a window edge
+(two runs may only touch if the first one ends at a BRANCH).
+
+ChainMatcher compiles the blocks of all gadgets into one Aho-Corasick
+automaton. A window is scanned once; gadgets whose blocks all occur are then
+checked for a disjoint placement of their blocks (a small backtracking search
+over the occurrences, usually decided by the first choice). The result is
+identical to running the isomorphism check for every gadget.
+
+Usage:
+    matcher = ChainMatcher()
+    for seq in gadget_semantic_sequences:
+        matcher.add(seq)
+    matcher.match(window_semantic_sequence)  # indices of matching gadgets
+"""
+
+from collections import deque
+from typing import Dict, Hashable, List, Sequence
+
+BRANCH = "BRANCH"
+
+
+def split_blocks(semantic_seq: Sequence[Hashable]) -> List[tuple]:
+    """Blocks (weakly connected components) of build_cfg_from_semantics(semantic_seq)."""
+    blocks = []
+    start = 0
+    for i, sem_type in enumerate(semantic_seq):
+        if sem_type == BRANCH:
+            blocks.append(tuple(semantic_seq[start:i + 1]))
+            start = i + 1
+    if start < len(semantic_seq):
+        blocks.append(tuple(semantic_seq[start:]))
+    return blocks
+
+
+class ChainMatcher:
+    """Aho-Corasick automaton over the semantic-type blocks of a set of gadgets."""
+
+    def __init__(self):
+        self.patterns: List[tuple] = []             # pattern id -> block
+        self.pattern_ids: Dict[tuple, int] = {}
+        self.gadgets: List[List[int]] = []          # gadget -> pattern id per block
+        self.pattern_gadgets: List[List[int]] = []  # pattern id -> gadgets using it
+        # Trie / automaton (state 0 is the root)
+        self.goto: List[Dict[Hashable, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]         # pattern ids ending at a state
+        self._compiled = True
+
+    def __len__(self):
+        return len(self.gadgets)
+
+    def add(self, semantic_seq: Sequence[Hashable]) -> int:
+        """Register a gadget; returns its index (the value reported by match)."""
+        pids = []
+        for block in split_blocks(semantic_seq):
+            pid = self.pattern_ids.get(block)
+            if pid is None:
+                pid = self.pattern_ids[block] = len(self.patterns)
+                self.patterns.append(block)
+                self.pattern_gadgets.append([])
+                self._insert(block, pid)
+            pids.append(pid)
+        gadget = len(self.gadgets)
+        for pid in set(pids):
+            self.pattern_gadgets[pid].append(gadget)
+        self.gadgets.append(pids)
+        return gadget
+
+    def _insert(self, block: tuple, pid: int):
+        state = 0
+        for sem_type in block:
+            nxt = self.goto[state].get(sem_type)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][sem_type] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append(pid)
+        self._compiled = False
+
+    def _compile(self):
+        """Breadth-first fail links; outputs are merged along them."""
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for sem_type, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and sem_type not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(sem_type, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+                queue.append(nxt)
+        self._compiled = True
+
+    def occurrences(self, semantic_seq: Sequence[Hashable]) -> Dict[int, List[int]]:
+        """Start positions of every pattern in the window, in ascending order.
+
+        Blocks only contain a BRANCH as their last element, so no pattern can
+        span a window block boundary and the whole sequence is scanned in one pass.
+        """
+        if not self._compiled:
+            self._compile()
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        found: Dict[int, List[int]] = {}
+        state = 0
+        for i, sem_type in enumerate(semantic_seq):
+            while state and sem_type not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(sem_type, 0)
+            for pid in output[state]:
+                found.setdefault(pid, []).append(i + 1 - len(patterns[pid]))
+        return found
+
+    def match(self, semantic_seq: Sequence[Hashable]) -> List[int]:
+        """Indices (ascending) of the gadgets whose CFG is isomorphic to a subgraph of the window's."""
+        found = self.occurrences(semantic_seq)
+
+        hits: Dict[int, int] = {}
+        for pid in found:
+            for gadget in self.pattern_gadgets[pid]:
+                hits[gadget] = hits.get(gadget, 0) + 1
+
+        matches = [g for g, pids in enumerate(self.gadgets) if not pids]  # empty gadgets
+        is_branch = [sem_type == BRANCH for sem_type in semantic_seq]
+        for gadget, count in hits.items():
+            pids = self.gadgets[gadget]
+            if count == len(set(pids)) and self._place(pids, found, is_branch):
+                matches.append(gadget)
+        matches.sort()
+        return matches
+
+    def _place(self, pids: List[int], found: Dict[int, List[int]], is_branch: List[bool]) -> bool:
+        """Whether the blocks can take disjoint, non-adjacent occurrences in the window."""
+        if len(pids) == 1:
+            return True
+        # Rarest blocks first; identical blocks are interchangeable, so they are
+        # kept together and assigned occurrences in increasing order.
+        order = sorted(pids, key=lambda pid: (len(found[pid]), pid))
+        chosen: List[tuple] = []  # (start, end) of placed blocks
+
+        def free(start: int, end: int) -> bool:
+            for s, e in chosen:
+                if not (end < s or e < start
+                        or (end == s and is_branch[end - 1])
+                        or (e == start and is_branch[e - 1])):
+                    return False
+            return True
+
+        def place(k: int, prev: int) -> bool:
+            if k == len(order):
+                return True
+            pid = order[k]
+            starts = found[pid]
+            size = len(self.patterns[pid])
+            first = prev + 1 if k and order[k - 1] == pid else 0
+            for idx in range(first, len(starts)):
+                start = starts[idx]
+                if free(start, start + size):
+                    chosen.append((start, start + size))
+                    if place(k + 1, idx):
+                        return True
+                    chosen.pop()
+            return False
+
+        return place(0, -1)
@@ -6,6 +6,8 @@ from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import sys
 
+from cfg_chain_matcher import ChainMatcher
+
 # --- Utilities copied/adapted from augment_asm_windows.py for consistency ---
 
 def get_semantic_type_from_negatives(instr_obj: Dict[str, Any]) -> str:
@@ -61,6 +63,8 @@ def build_cfg_from_semantics(semantic_seq: List[str]) -> nx.DiGraph:
 def compare_cfgs(g_window: nx.DiGraph, g_vuln: nx.DiGraph) -> bool:
     """
     Checks if g_vuln is isomorphic to a SUBGRAPH of g_window, respecting node types.
+    Reference implementation of ChainMatcher.match (cfg_chain_matcher.py), which
+    answers this for all gadgets at once.
     """
     nm = nx.algorithms.isomorphism.categorical_node_match("type", "COMPUTE")
     matcher = nx.algorithms.isomorphism.DiGraphMatcher(g_window, g_vuln, node_match=nm)
@@ -84,16 +88,16 @@ def main():
         print(f"Error: Could not find {args.vuln_gadgets}")
         sys.exit(1)
 
-    # Pre-build vulnerable CFGs
+    # Compile all vulnerable CFGs into one chain matcher
+    matcher = ChainMatcher()
     vuln_cfgs = []
     for key, entry in vuln_data.items():
         instructions = entry.get("instructions", [])
         sem_seq = [get_semantic_type_from_gadgets(instr) for instr in instructions]
-        cfg = build_cfg_from_semantics(sem_seq)
+        matcher.add(sem_seq)
         vuln_cfgs.append({
             "name": entry.get("name", key),
             "type": entry.get("vulnerability_type", "UNKNOWN"),
-            "cfg": cfg,
             "seq_len": len(sem_seq)
         })
     
@@ -121,18 +125,9 @@ def main():
                 instrs = record.get("instructions", [])
                 sem_seq = [get_semantic_type_from_negatives(instr) for instr in instrs]
                 
-                # Build CFG
-                cand_cfg = build_cfg_from_semantics(sem_seq)
-                
-                # Compare against all known vulns
-                matches = []
-                for v in vuln_cfgs:
-                    # Optimization: Window must be at least as large as the gadget
-                    if len(sem_seq) < v["seq_len"]:
-                        continue
-                        
-                    if compare_cfgs(cand_cfg, v["cfg"]):
-                        matches.append(v["name"])
+                # Compare against all known vulns in one pass
+                # (same result as compare_cfgs on the window CFG for each gadget)
+                matches = [vuln_cfgs[i]["name"] for i in matcher.match(sem_seq)]
                 
                 status = "SAFE"
                 if matches:
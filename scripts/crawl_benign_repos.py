@@ -10,17 +10,27 @@ This script:
 5. Extracts instruction windows as benign samples
 6. Outputs JSONL file ready for merging with the training dataset
 
+Steps 2-5 run as a pipeline of bounded stages (clone threads, source discovery,
+a compile pool and window extraction), so cloning, compiling and extraction
+overlap; windows are streamed to the output as they are produced.
+
 Usage:
     python scripts/crawl_benign_repos.py --output data/benign_samples_new.jsonl
+
+    # Offline, against pre-cloned repos laid out as <repos-dir>/<owner>/<repo>
+    python scripts/crawl_benign_repos.py --offline --repos-dir githubCrawl/repos_benign
 """
 
 import argparse
 import json
 import os
+import queue
 import random
 import re
 import subprocess
 import sys
+import threading
+from collections import Counter
 from pathlib import Path
 from multiprocessing import Pool, cpu_count
 from typing import List, Dict, Optional, Tuple
@@ -277,6 +287,18 @@ def extract_windows(asm_path: Path, window_size: int = 30, stride: int = 15, min
     return windows
 
 
+def label_windows(windows: List[Dict], owner: str, repo: str, arch: str, compiler: str, opt: str) -> List[Dict]:
+    """Attach the benign label and provenance fields to extracted windows."""
+    for w in windows:
+        w['arch'] = arch
+        w['label'] = 'BENIGN'
+        w['vuln_label'] = 'BENIGN'
+        w['group'] = f"github_{owner}_{repo}"
+        w['compiler'] = compiler
+        w['opt_level'] = opt
+    return windows
+
+
 def process_repo(repo_url: str, repos_dir: Path, asm_dir: Path, max_files: int = 150) -> List[Dict]:
     """Process a single repository: clone, find files, compile, extract windows.
     
@@ -321,20 +343,246 @@ def process_repo(repo_url: str, repos_dir: Path, asm_dir: Path, max_files: int =
                 )
                 if asm_path:
                     compiled_count += 1
-                    windows = extract_windows(asm_path)
-                    for w in windows:
-                        w['arch'] = arch
-                        w['label'] = 'BENIGN'
-                        w['vuln_label'] = 'BENIGN'
-                        w['group'] = f"github_{owner}_{repo}"
-                        w['compiler'] = compiler
-                        w['opt_level'] = opt
+                    windows = label_windows(extract_windows(asm_path), owner, repo, arch, compiler, opt)
                     all_windows.extend(windows)
     
     log(f"  Compiled {compiled_count} assembly files, extracted {len(all_windows)} windows (min 12 instructions each)")
     return all_windows
 
 
+# Marks the end of a stage's input; see _start_stage
+_DONE = object()
+
+
+def _start_stage(name: str, fn, in_q: queue.Queue, out_q: queue.Queue, workers: int,
+                 stop: threading.Event, stats: Counter, stats_lock: threading.Lock) -> List[threading.Thread]:
+    """Run ``fn(item, emit)`` on ``workers`` threads, reading ``in_q`` and emitting into ``out_q``.
+
+    The last worker to see _DONE forwards it downstream. Once ``stop`` is set the
+    workers keep draining their input without doing any work, so blocked
+    upstream puts always complete.
+    """
+    remaining = [workers]
+
+    def emit(item):
+        if not stop.is_set():
+            out_q.put(item)
+
+    def worker():
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                in_q.put(_DONE)  # let sibling workers see it too
+                break
+            if stop.is_set():
+                continue
+            try:
+                fn(item, emit)
+            except Exception as e:
+                log(f"  [{name}] {e}")
+                with stats_lock:
+                    stats[f'{name}_errors'] += 1
+        with stats_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            out_q.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def local_repos(repos_dir: Path) -> List[Tuple[str, str, Optional[str]]]:
+    """Every <owner>/<repo> directory under ``repos_dir`` (for offline runs)."""
+    repos = []
+    for owner_dir in sorted(p for p in repos_dir.iterdir() if p.is_dir()):
+        for repo_dir in sorted(p for p in owner_dir.iterdir() if p.is_dir()):
+            repos.append((owner_dir.name, repo_dir.name, None))
+    return repos
+
+
+def run_pipeline(repos: List[Tuple[str, str, Optional[str]]], repos_dir: Path, asm_dir: Path,
+                 output: Path, target_samples: int, max_files: int = 150,
+                 clone_workers: int = 4, compile_workers: int = None,
+                 seed: int = 42) -> Tuple[Counter, List[Dict]]:
+    """Crawl ``repos`` ((owner, repo, url) with url=None for pre-cloned repos) through
+    bounded clone -> discover -> compile -> extract stages, streaming windows to ``output``.
+
+    Bounded queues between the stages give backpressure: cloning never runs more
+    than a few repos ahead of compilation, and compilation never runs far ahead of
+    extraction. Compilation happens in compiler subprocesses, so threads are enough
+    to keep every core busy.
+
+    The sample is the same as a serial crawl's: whole repos are taken in list
+    order until ``target_samples`` windows are reached (the stages stop once
+    that prefix of repos is complete), then shuffled with ``seed`` and
+    truncated. Windows of later repos that were already streamed are dropped
+    by select_output. Returns the stats and the arch/group of each sample.
+    """
+    compile_workers = compile_workers or cpu_count()
+    stop = threading.Event()
+    stats: Counter = Counter()
+    stats_lock = threading.Lock()
+
+    # Per-repo completion, to find the shortest prefix of repos reaching the target
+    pending_jobs: Dict[int, int] = {}
+    repo_windows: Counter = Counter()
+    finished = set()
+    progress = {'frontier': 0, 'windows': 0, 'cutoff': None}
+
+    def repo_done(idx: int):
+        with stats_lock:
+            finished.add(idx)
+            while progress['frontier'] in finished:
+                progress['windows'] += repo_windows[progress['frontier']]
+                progress['frontier'] += 1
+                if progress['cutoff'] is None and progress['windows'] >= target_samples:
+                    progress['cutoff'] = progress['frontier']
+                    log(f"\nReached target of {target_samples} samples "
+                        f"with the first {progress['cutoff']} repos")
+                    stop.set()
+
+    def job_done(idx: int):
+        with stats_lock:
+            pending_jobs[idx] -= 1
+            done = pending_jobs[idx] == 0
+        if done:
+            repo_done(idx)
+
+    repo_q: queue.Queue = queue.Queue()
+    discover_q: queue.Queue = queue.Queue(maxsize=max(2, clone_workers))
+    compile_q: queue.Queue = queue.Queue(maxsize=compile_workers * 4)
+    extract_q: queue.Queue = queue.Queue(maxsize=compile_workers * 4)
+    write_q: queue.Queue = queue.Queue(maxsize=1024)
+
+    def clone(item, emit):
+        idx, (owner, repo, url) = item
+        repo_path = repos_dir / owner / repo
+        try:
+            cloned = url is None or clone_repo(url, repo_path)
+        except Exception:
+            repo_done(idx)
+            raise
+        if not cloned:
+            repo_done(idx)
+            return
+        if not repo_path.is_dir():
+            log(f"  Not found locally: {repo_path}")
+            repo_done(idx)
+            return
+        with stats_lock:
+            stats['repos'] += 1
+        emit((idx, owner, repo, repo_path))
+
+    def discover(item, emit):
+        idx, owner, repo, repo_path = item
+        try:
+            c_files = find_c_files(repo_path, max_files=max_files)
+        except Exception:
+            repo_done(idx)
+            raise
+        log(f"  {owner}/{repo}: found {len(c_files)} C/C++ files (processing up to {max_files})")
+        jobs = [(idx, owner, repo, src_file, arch, compiler, march, opt)
+                for src_file in c_files[:max_files]
+                for arch, compiler, march in COMPILE_TARGETS
+                for opt in OPT_LEVELS]
+        with stats_lock:
+            stats['source_files'] += len(c_files[:max_files])
+            pending_jobs[idx] = len(jobs)
+        if not jobs:
+            repo_done(idx)
+        for job in jobs:
+            emit(job)
+
+    def compile_job(item, emit):
+        idx, owner, repo, src_file, arch, compiler, march, opt = item
+        asm_path = None
+        try:
+            asm_path = compile_to_asm(src_file, asm_dir / arch / compiler / opt / owner / repo,
+                                      arch, compiler, march, opt)
+        finally:
+            with stats_lock:
+                stats['compiled' if asm_path else 'compile_failed'] += 1
+            if not asm_path:
+                job_done(idx)
+        if asm_path:
+            emit((idx, owner, repo, asm_path, arch, compiler, opt))
+
+    def extract(item, emit):
+        idx, owner, repo, asm_path, arch, compiler, opt = item
+        try:
+            windows = label_windows(extract_windows(asm_path), owner, repo, arch, compiler, opt)
+            with stats_lock:
+                repo_windows[idx] += len(windows)
+            for window in windows:
+                emit((idx, window))
+        finally:
+            job_done(idx)
+
+    for item in enumerate(repos):
+        repo_q.put(item)
+    repo_q.put(_DONE)
+    threads = []
+    threads += _start_stage('clone', clone, repo_q, discover_q, clone_workers, stop, stats, stats_lock)
+    threads += _start_stage('discover', discover, discover_q, compile_q, 1, stop, stats, stats_lock)
+    threads += _start_stage('compile', compile_job, compile_q, extract_q, compile_workers, stop, stats, stats_lock)
+    threads += _start_stage('extract', extract, extract_q, write_q, 1, stop, stats, stats_lock)
+
+    # Stream windows to the output as they arrive; every window emitted before
+    # the stop (which includes all windows of the selected repos) is written
+    line_repos: List[int] = []
+    with open(output, 'w') as f:
+        while True:
+            item = write_q.get()
+            if item is _DONE:
+                break
+            idx, window = item
+            f.write(json.dumps(window) + '\n')
+            line_repos.append(idx)
+            stats['windows'] += 1
+            if stats['windows'] % 1000 == 0:
+                f.flush()
+                log(f"  {stats['windows']} windows written "
+                    f"({stats['repos']} repos, {stats['compiled']} assembly files)")
+    for t in threads:
+        t.join()
+
+    cutoff = progress['cutoff'] if progress['cutoff'] is not None else len(repos)
+    keep = [idx < cutoff for idx in line_repos]
+    log(f"\nSelecting samples from the first {cutoff} repos in {output}...")
+    samples = select_output(output, keep, target_samples, seed)
+    stats['samples'] = len(samples)
+    return stats, samples
+
+
+def select_output(path: Path, keep: List[bool], target_samples: int, seed: int) -> List[Dict]:
+    """Keep the flagged lines of the streamed output, shuffle them with ``seed``
+    and truncate to ``target_samples``, in place.
+
+    Lines are sorted first so the result does not depend on the order the
+    concurrent stages finished in. Returns the arch and group of each sample.
+    """
+    keyed = []
+    with open(path) as f:
+        for line, kept in zip((line for line in f if line.strip()), keep):
+            if not kept:
+                continue
+            sample = json.loads(line)
+            keyed.append(((sample['source_file'], sample['start_line'], line), line,
+                          {'arch': sample.get('arch'), 'group': sample.get('group')}))
+    keyed.sort(key=lambda x: x[0])
+    random.Random(seed).shuffle(keyed)
+    keyed = keyed[:target_samples]
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        for _, line, _ in keyed:
+            f.write(line)
+    os.replace(tmp_path, path)
+    return [meta for _, _, meta in keyed]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Crawl GitHub repos for benign assembly samples")
     parser.add_argument("--output", type=Path, default=Path("data/benign_samples_v24.jsonl"),
@@ -350,10 +598,14 @@ def main():
     parser.add_argument("--max-files-per-repo", type=int, default=150,
                         help="Maximum C/C++ files to process per repository")
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clone-workers", type=int, default=4,
+                        help="Concurrent git clones")
+    parser.add_argument("--compile-workers", type=int, default=cpu_count(),
+                        help="Concurrent compiler processes")
+    parser.add_argument("--offline", action="store_true",
+                        help="Do not clone; process every <owner>/<repo> already in --repos-dir")
     args = parser.parse_args()
     
-    random.seed(args.seed)
-    
     # Create directories
     args.repos_dir.mkdir(parents=True, exist_ok=True)
     args.asm_dir.mkdir(parents=True, exist_ok=True)
@@ -363,38 +615,28 @@ def main():
     log("BENIGN SAMPLE COLLECTION PIPELINE")
     log("=" * 60)
     
-    repos_to_process = ADDITIONAL_C_REPOS
+    if args.offline:
+        repos_to_process = local_repos(args.repos_dir)
+    else:
+        repos_to_process = []
+        for url in ADDITIONAL_C_REPOS:
+            owner, repo = get_owner_repo(url)
+            if owner and repo:
+                repos_to_process.append((owner, repo, url))
     if args.max_repos:
         repos_to_process = repos_to_process[:args.max_repos]
     
     log(f"Processing {len(repos_to_process)} repositories...")
     log(f"Target samples: {args.target_samples}")
     
-    all_samples = []
-    
-    for i, repo_url in enumerate(repos_to_process):
-        log(f"\n[{i+1}/{len(repos_to_process)}] {repo_url}")
-        
-        samples = process_repo(repo_url, args.repos_dir, args.asm_dir, max_files=args.max_files_per_repo)
-        all_samples.extend(samples)
-        
-        log(f"  Total samples so far: {len(all_samples)}")
-        
-        # Check if we have enough
-        if len(all_samples) >= args.target_samples:
-            log(f"\nReached target of {args.target_samples} samples")
-            break
-    
-    # Shuffle and potentially subsample
-    random.shuffle(all_samples)
-    if len(all_samples) > args.target_samples:
-        all_samples = all_samples[:args.target_samples]
-    
-    # Write output
-    log(f"\nWriting {len(all_samples)} samples to {args.output}...")
-    with open(args.output, 'w') as f:
-        for sample in all_samples:
-            f.write(json.dumps(sample) + '\n')
+    stats, all_samples = run_pipeline(
+        repos_to_process, args.repos_dir, args.asm_dir, args.output,
+        target_samples=args.target_samples, max_files=args.max_files_per_repo,
+        clone_workers=args.clone_workers, compile_workers=args.compile_workers,
+        seed=args.seed,
+    )
+    log(f"\nRepos processed: {stats['repos']}, assembly files: {stats['compiled']} "
+        f"({stats['compile_failed']} failed to compile), windows streamed: {stats['windows']}")
     
     # Print statistics
     log("\n" + "=" * 60)
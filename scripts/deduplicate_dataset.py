@@ -1,18 +1,199 @@
+import os
 import json
+import zlib
 import hashlib
-from collections import defaultdict
+import argparse
+from collections import Counter, defaultdict
 from pathlib import Path
 
+import numpy as np
+
+DEFAULT_INPUT = Path("data/dataset/merged_dataset_v5.jsonl")
+DEFAULT_OUTPUT = Path("data/dataset/merged_dataset_v5_deduped.jsonl")
+
+# Near-duplicate (MinHash) mode: opcodes only, so register renaming does not
+# change a window's shingles, and NOPs are dropped so padding/NOP insertion
+# does not either. Labels, directives and comments are skipped.
+NOP_OPCODES = {"nop", "nopw", "nopl", "hint"}
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
 def get_sequence_hash(sequence):
     """Create a hash of the instruction sequence content."""
     # Join all instructions to create a unique string for the sequence
     content = "|".join([s.strip() for s in sequence])
     return hashlib.md5(content.encode('utf-8')).hexdigest()
 
-def main():
-    input_path = Path("data/dataset/merged_dataset_v5.jsonl")
-    output_path = Path("data/dataset/merged_dataset_v5_deduped.jsonl")
-    
+def normalized_opcodes(sequence):
+    """Lowercased opcodes of the real instructions in a window, NOPs removed."""
+    opcodes = []
+    for line in sequence:
+        line = line.strip()
+        if not line or line[0] in ";#/@." or line.endswith(":"):
+            continue
+        op = line.split()[0].lower().strip(",")
+        if op.endswith(":") or op in NOP_OPCODES:
+            continue
+        opcodes.append(op)
+    return opcodes
+
+def opcode_shingles(opcodes, n):
+    """Distinct opcode n-grams; windows shorter than n form a single shingle."""
+    if len(opcodes) <= n:
+        return {" ".join(opcodes)}
+    return {" ".join(opcodes[i:i + n]) for i in range(len(opcodes) - n + 1)}
+
+class MinHasher:
+    """MinHash signatures with num_perm universal hash permutations of crc32 shingle hashes."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % MERSENNE_PRIME
+        self.b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % MERSENNE_PRIME
+
+    def signature(self, shingles):
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # uint64 wrap-around in a * h is intended (same scheme as datasketch)
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self.a[None, :] + self.b[None, :]) % MERSENNE_PRIME
+        return (permuted & MAX_HASH).min(axis=0).astype(np.uint32)
+
+class NearDuplicateIndex:
+    """LSH index of cluster representatives.
+
+    Each band of a signature maps to the first cluster that produced it, so
+    memory grows with the number of clusters (one signature and one dict
+    entry per band each), never with the number of records.
+    """
+
+    def __init__(self, num_perm, bands, threshold):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self.size = 0
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query_or_add(self, signature):
+        """Cluster id of the closest representative with estimated Jaccard >= threshold,
+        or a new cluster id (with the signature added) and a flag telling which."""
+        keys = self._band_keys(signature)
+        candidates = {self.buckets[i][key] for i, key in enumerate(keys) if key in self.buckets[i]}
+        best, best_sim = None, -1.0
+        for cluster in sorted(candidates):
+            sim = float(np.mean(self.signatures[cluster] == signature))
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+        if best is not None and best_sim >= self.threshold:
+            return best, False
+
+        cluster = self.size
+        if cluster == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.zeros_like(self.signatures)])
+        self.signatures[cluster] = signature
+        self.size += 1
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, cluster)
+        return cluster, True
+
+def dedup_minhash(input_path, output_path, ngram=3, num_perm=64, bands=16, threshold=0.8,
+                  drop_conflicts=True, conflicts_path=None, seed=1):
+    """One streaming pass over input_path that writes the first record of every
+    near-duplicate cluster. Clusters whose members carry different labels are
+    reported to conflicts_path and, with drop_conflicts, removed from the output
+    by a filtering pass over the (already deduplicated) output."""
+    hasher = MinHasher(num_perm, seed)
+    index = NearDuplicateIndex(num_perm, bands, threshold)
+    label_ids = {}
+    label_names = []
+    cluster_label = []        # label id of each cluster representative
+    cluster_size = []
+    cluster_rep = []          # id (or line number) of each representative
+    conflicts = {}            # cluster -> Counter of labels, only for conflicting clusters
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    total_read = 0
+    errors = 0
+    print(f"Reading from {input_path} (MinHash, {ngram}-gram opcode shingles, "
+          f"{bands}x{index.rows} LSH bands, threshold {threshold})...")
+    with open(input_path, "r") as fin, open(tmp_path, "w") as fout:
+        for line_no, line in enumerate(fin):
+            if not line.strip():
+                continue
+            total_read += 1
+            try:
+                record = json.loads(line)
+                seq = record["sequence"]
+                label = record["label"]
+            except Exception as e:
+                print(f"Error parsing line {line_no + 1}: {e}")
+                errors += 1
+                continue
+
+            signature = hasher.signature(opcode_shingles(normalized_opcodes(seq), ngram))
+            cluster, is_new = index.query_or_add(signature)
+            label_id = label_ids.get(label)
+            if label_id is None:
+                label_id = label_ids[label] = len(label_names)
+                label_names.append(label)
+            if total_read % 100000 == 0:
+                print(f"  {total_read} records, {index.size} clusters, {len(conflicts)} conflicting")
+            if is_new:
+                cluster_label.append(label_id)
+                cluster_size.append(1)
+                cluster_rep.append(record.get("id", line_no))
+                fout.write(line if line.endswith("\n") else line + "\n")
+                continue
+
+            cluster_size[cluster] += 1
+            if cluster in conflicts:
+                conflicts[cluster][label] += 1
+            elif label_id != cluster_label[cluster]:
+                rep_label = label_names[cluster_label[cluster]]
+                conflicts[cluster] = Counter({rep_label: cluster_size[cluster] - 1, label: 1})
+
+    print(f"Total records read: {total_read} ({errors} unparseable)")
+    print(f"Near-duplicate clusters: {index.size}")
+    print(f"Found {len(conflicts)} clusters with conflicting labels.")
+
+    if conflicts_path is None:
+        conflicts_path = output_path.with_name(output_path.stem + ".conflicts.jsonl")
+    with open(conflicts_path, "w") as f:
+        for cluster in sorted(conflicts):
+            f.write(json.dumps({
+                "cluster": cluster,
+                "representative": cluster_rep[cluster],
+                "size": cluster_size[cluster],
+                "labels": dict(conflicts[cluster]),
+            }) + "\n")
+    print(f"Wrote label conflicts to {conflicts_path}")
+
+    kept = index.size
+    if drop_conflicts and conflicts:
+        # Output line k is the representative of cluster k
+        filtered_path = output_path.with_name(output_path.name + ".filtered")
+        with open(tmp_path, "r") as fin, open(filtered_path, "w") as fout:
+            for cluster, line in enumerate(fin):
+                if cluster not in conflicts:
+                    fout.write(line)
+        os.replace(filtered_path, tmp_path)
+        kept -= len(conflicts)
+    os.replace(tmp_path, output_path)
+
+    dropped = total_read - errors - kept
+    print(f"\nWrote {kept} records to {output_path}")
+    print(f"Dropped {dropped} records (near-duplicates"
+          f"{' or in conflicting clusters' if drop_conflicts else ''}).")
+    print("Done.")
+
+def dedup_exact(input_path, output_path):
     print(f"Reading from {input_path}...")
     
     # Store (hash -> set of labels seen for this sequence)
@@ -91,6 +272,31 @@ def main():
             
     print("Done.")
 
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate and ambiguous windows from a dataset")
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--mode", choices=["exact", "minhash"], default="exact",
+                        help="exact: MD5 of the raw sequence (in memory); "
+                             "minhash: streaming near-duplicate clustering over opcode n-grams")
+    parser.add_argument("--ngram", type=int, default=3, help="Opcode shingle length (minhash)")
+    parser.add_argument("--num-perm", type=int, default=64, help="MinHash permutations (minhash)")
+    parser.add_argument("--bands", type=int, default=16, help="LSH bands; num-perm must divide evenly")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="Estimated Jaccard similarity to count as a near-duplicate")
+    parser.add_argument("--keep-conflicts", action="store_true",
+                        help="Keep clusters with conflicting labels (they are still reported)")
+    parser.add_argument("--conflicts-out", type=Path, default=None,
+                        help="Label-conflict report (default: <output stem>.conflicts.jsonl)")
+    args = parser.parse_args()
+
+    if args.mode == "exact":
+        dedup_exact(args.input, args.output)
+    else:
+        dedup_minhash(args.input, args.output, ngram=args.ngram, num_perm=args.num_perm,
+                      bands=args.bands, threshold=args.threshold,
+                      drop_conflicts=not args.keep_conflicts, conflicts_path=args.conflicts_out)
+
 if __name__ == "__main__":
     main()
 
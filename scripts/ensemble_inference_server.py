@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Long-lived inference service for the V32 ensemble (RF v18 + GGNN-BiLSTM V28).
+
+Scanning jobs used to start a Python process and load both models for every
+invocation. This server loads them once and answers JSONL requests, either
+on stdin/stdout or on a Unix socket (one JSON object per line each way):
+
+    request:   {"id": "f.s:120", "sequence": ["ldr x0, [x1]", ...], "features": {...}}
+    response:  {"id": "f.s:120", "label": "SPECTRE_V1", "confidence": 0.91,
+                "probs": {"BENIGN": 0.02, ...}}
+    error:     {"id": "f.s:120", "error": "..."}
+    stats:     {"cmd": "stats"}  ->  {"stats": {"requests": ..., "batches": ..., ...}}
+
+Requests are micro-batched: the first pending request opens a batch that is
+closed after --max-batch requests or --max-wait-ms, whichever comes first.
+Identical windows (same sequence and features) within a batch are scored
+once, graph tensors are built for the whole batch and RF and GGNN each run
+once per batch. Scored responses keep request order per client; malformed
+lines are answered as soon as they are read.
+
+Usage:
+    python scripts/ensemble_inference_server.py --rf-model-dir models/rf_v18_seq_emb \\
+        --ggnn-model-dir models/ggnn_bilstm_v28 < windows.jsonl > predictions.jsonl
+
+    python scripts/ensemble_inference_server.py --socket /tmp/ensemble.sock &
+    socat - UNIX-CONNECT:/tmp/ensemble.sock < windows.jsonl
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from train_ensemble_v32 import (
+    CLASSES, IDX_TO_LABEL, EnsembleModel, GGNNModelWrapper, RFModelWrapper,
+    HybridGGNNBiLSTMv28,
+)
+
+
+_STOP = object()
+
+
+@dataclass
+class InferenceRequest:
+    """One window waiting to be scored; ``reply`` sends its response."""
+    request_id: object
+    sequence: List[str]
+    features: Dict
+    reply: Callable[[Dict], None]
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+def window_key(sequence: List[str], features: Dict) -> tuple:
+    """Identity of a window for deduplication within a batch."""
+    return (tuple(sequence), json.dumps(features, sort_keys=True))
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class EnsembleInferenceServer:
+    """Micro-batching front end for an EnsembleModel.
+
+    Any number of producers call submit(); a single worker thread (run())
+    drains the queue in batches, so the models are only used from one thread.
+    """
+
+    def __init__(self, ensemble: EnsembleModel, max_batch: int = 256, max_wait: float = 0.01):
+        self.ensemble = ensemble
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: "queue.Queue" = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'batches': 0, 'unique_windows': 0,
+                      'duplicates': 0, 'inference_seconds': 0.0}
+
+    def _count(self, **deltas):
+        with self.stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def submit(self, line: str, reply: Callable[[Dict], None]) -> Optional[InferenceRequest]:
+        """Parse one request line and queue it. Malformed requests and
+        commands are answered immediately (returns None for those)."""
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._count(errors=1)
+            reply({'id': None, 'error': f"invalid JSON: {e}"})
+            return None
+
+        if not isinstance(obj, dict):
+            self._count(errors=1)
+            reply({'id': None, 'error': "request must be a JSON object"})
+            return None
+        if obj.get('cmd') == 'stats':
+            with self.stats_lock:
+                reply({'stats': dict(self.stats)})
+            return None
+
+        request_id = obj.get('id')
+        features = obj.get('features')
+        sequence = obj.get('sequence') or []
+        if not isinstance(features, dict):
+            self._count(errors=1)
+            reply({'id': request_id, 'error': "missing 'features' object"})
+            return None
+        if not isinstance(sequence, list):
+            self._count(errors=1)
+            reply({'id': request_id, 'error': "'sequence' must be a list of instructions"})
+            return None
+
+        request = InferenceRequest(request_id, sequence, features, reply)
+        self.queue.put(request)
+        return request
+
+    def stop(self):
+        self.queue.put(_STOP)
+
+    def _next_batch(self) -> Optional[List[InferenceRequest]]:
+        """Block for one request, then gather more until the batch is full or
+        max_wait has passed. Returns None once stop() was called and the
+        queue is drained."""
+        first = self.queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                # Past the deadline, still take whatever is already queued
+                if timeout > 0:
+                    item = self.queue.get(timeout=timeout)
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch first, then stop
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _process(self, batch: List[InferenceRequest]):
+        slots: Dict[tuple, int] = {}
+        unique: List[InferenceRequest] = []
+        assignment = []
+        for request in batch:
+            key = window_key(request.sequence, request.features)
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(unique)
+                unique.append(request)
+            assignment.append(slot)
+
+        start = time.perf_counter()
+        try:
+            probs = self.ensemble.predict_proba(
+                [r.features for r in unique],
+                [r.sequence for r in unique],
+            )
+        except Exception as e:
+            self._count(errors=len(batch), batches=1)
+            for request in batch:
+                request.reply({'id': request.request_id, 'error': f"inference failed: {e}"})
+                request.done.set()
+            return
+        elapsed = time.perf_counter() - start
+
+        for request, slot in zip(batch, assignment):
+            row = probs[slot]
+            best = int(row.argmax())
+            request.reply({
+                'id': request.request_id,
+                'label': IDX_TO_LABEL[best],
+                'confidence': float(row[best]),
+                'probs': {cls: float(p) for cls, p in zip(CLASSES, row)},
+            })
+            request.done.set()
+
+        self._count(requests=len(batch), batches=1, unique_windows=len(unique),
+                    duplicates=len(batch) - len(unique), inference_seconds=elapsed)
+
+    def run(self):
+        """Serve batches until stop() is called."""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._process(batch)
+
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+def serve_stdio(server: EnsembleInferenceServer):
+    """Read requests from stdin, write responses to stdout; exit at EOF."""
+    out_lock = threading.Lock()
+
+    def reply(obj):
+        with out_lock:
+            sys.stdout.write(json.dumps(obj) + '\n')
+            sys.stdout.flush()
+
+    def reader():
+        for line in sys.stdin:
+            if line.strip():
+                server.submit(line, reply)
+        server.stop()
+
+    threading.Thread(target=reader, name='stdin-reader', daemon=True).start()
+    server.run()
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """One client connection; requests from all clients share the batches."""
+
+    def handle(self):
+        inference: EnsembleInferenceServer = self.server.inference
+        out_lock = threading.Lock()
+        pending = []
+
+        def reply(obj):
+            with out_lock:
+                try:
+                    self.wfile.write((json.dumps(obj) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+                except OSError:
+                    pass  # client went away
+
+        for raw in self.rfile:
+            line = raw.decode('utf-8', errors='replace')
+            if line.strip():
+                request = inference.submit(line, reply)
+                if request is not None:
+                    pending.append(request)
+            if len(pending) > 1024:
+                pending = [r for r in pending if not r.done.is_set()]
+
+        # The client closed its write side: answer what is still queued
+        for request in pending:
+            request.done.wait()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(server: EnsembleInferenceServer, path: Path):
+    """Accept clients on a Unix socket until interrupted."""
+    if path.exists():
+        path.unlink()
+    unix_server = _UnixServer(str(path), _ConnectionHandler)
+    unix_server.inference = server
+    threading.Thread(target=server.run, name='inference', daemon=True).start()
+    print(f"Serving on {path}", file=sys.stderr)
+    try:
+        unix_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        unix_server.server_close()
+        server.stop()
+        if path.exists():
+            os.unlink(path)
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def load_ensemble(args) -> EnsembleModel:
+    rf_model = RFModelWrapper(args.rf_model_dir)
+    ggnn_model = None
+    if not args.rf_only and HybridGGNNBiLSTMv28 is not None:
+        ggnn_model = GGNNModelWrapper(args.ggnn_model_dir)
+    return EnsembleModel(
+        rf_model=rf_model,
+        ggnn_model=ggnn_model,
+        strategy=args.strategy,
+        rf_weight=args.rf_weight,
+        ggnn_weight=args.ggnn_weight,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='V32 ensemble inference server (JSONL)')
+    parser.add_argument('--rf-model-dir', type=Path, default=Path('models/rf_v18_seq_emb'),
+                        help='RF v18 model directory')
+    parser.add_argument('--ggnn-model-dir', type=Path, default=Path('models/ggnn_bilstm_v28'),
+                        help='GGNN V28 model directory')
+    parser.add_argument('--rf-only', action='store_true', help='Serve the RF model only')
+    # Stacking needs a meta-classifier trained in-process, so it is not offered here
+    parser.add_argument('--strategy', choices=['soft_voting', 'weighted_voting'],
+                        default='weighted_voting', help='Ensemble strategy')
+    parser.add_argument('--rf-weight', type=float, default=0.6, help='RF weight for weighted voting')
+    parser.add_argument('--ggnn-weight', type=float, default=0.4, help='GGNN weight for weighted voting')
+    parser.add_argument('--max-batch', type=int, default=256, help='Maximum requests per batch')
+    parser.add_argument('--max-wait-ms', type=float, default=10.0,
+                        help='How long an open batch waits for more requests')
+    parser.add_argument('--socket', type=Path, default=None,
+                        help='Listen on this Unix socket instead of stdin/stdout')
+    args = parser.parse_args()
+
+    # stdout carries the protocol; model loading messages go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        ensemble = load_ensemble(args)
+    server = EnsembleInferenceServer(ensemble, max_batch=args.max_batch,
+                                     max_wait=args.max_wait_ms / 1000.0)
+
+    if args.socket is not None:
+        serve_socket(server, args.socket)
+    else:
+        serve_stdio(server)
+    with server.stats_lock:
+        print(f"Served {server.stats['requests']} requests in {server.stats['batches']} batches "
+              f"({server.stats['duplicates']} duplicates, {server.stats['errors']} errors)",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 import argparse
+import itertools
 import json
 import re
+import sys
+from multiprocessing import Pool
 from pathlib import Path
 from collections import Counter
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'githubCrawl'))
+from instruction_semantics import FEATURE_CLASSES, SIMPLIFIED_TYPES, decode_many, opcode_of, parse_operands
+
 # Try to import networkx for graph features
 try:
     import networkx as nx
@@ -57,30 +63,12 @@ def load_jsonl(path: Path):
 def is_barrier(line: str) -> bool:
     return any(p.search(line) for p in ARM64_BARRIER_RES)
 
-def opcode_of(line: str) -> str:
-    return (line.split()[0].lower() if line else "").strip(",")
-
 def ngrams(tokens, n):
     return ["::".join(tokens[i:i+n]) for i in range(len(tokens) - n + 1)]
 
 def get_simplified_type(op: str) -> str:
-    op = op.lower()
-    if op == 'nop':
-        return None
-    if op.startswith('ret'): return 'RET'
-    if op.startswith('call'): return 'BRANCH_UNCOND'
-    if op.startswith('b.') or op.startswith('cb') or op.startswith('tb'): return 'BRANCH_COND'
-    if op in ['b', 'bl', 'br', 'blr']: return 'BRANCH_UNCOND'
-    if op.startswith('ldr') or op.startswith('ldp') or op.startswith('ldu'): return 'LOAD'
-    if op.startswith('str') or op.startswith('stp') or op.startswith('stur'): return 'STORE'
-    if op.startswith('dsb') or op.startswith('dmb') or op.startswith('isb'): return 'BARRIER'
-    if op == 'jmp': return 'BRANCH_UNCOND'
-    if op.startswith('j'): return 'BRANCH_COND'
-    if op.startswith('mov'): return 'MOVE'
-    if op in ['lfence', 'mfence', 'sfence']: return 'BARRIER'
-    if op == 'clflush': return 'FLUSH'
-    if op == 'rdtsc': return 'TIME'
-    return 'COMPUTE'
+    """Structural type of an opcode (None for nop), from SIMPLIFIED_TYPES."""
+    return SIMPLIFIED_TYPES[op.lower()]
 
 # --- Indirect Branch Detection ---
 
@@ -220,6 +208,206 @@ RETURN_CONTROL_RE = re.compile(
     r'(ret|retq)',
     re.IGNORECASE | re.DOTALL
 )
+# With DOTALL every '.*' above matches anything, so RETURN_CONTROL_RE only asks
+# whether these tokens occur in order. Scanning for them directly avoids the
+# regex's catastrophic backtracking on long windows.
+RETURN_CONTROL_TOKENS = (('mov', 'str'), ('[',), ('sp',), (']',), ('\n',), ('ret',))
+
+
+def _has_ordered_tokens(text, tokens):
+    """True if one alternative from each entry of `tokens` occurs in order,
+    non-overlapping (earliest match per step is always optimal)."""
+    pos = 0
+    for alternatives in tokens:
+        best = -1
+        for tok in alternatives:
+            j = text.find(tok, pos)
+            if j != -1 and (best == -1 or j < best):
+                best = j
+        if best == -1:
+            return False
+        pos = best + len(alternatives[0])
+    return True
+
+
+def search_return_control(text):
+    """Same result as bool(RETURN_CONTROL_RE.search(text)) for lowercased text."""
+    if not text.isascii():
+        # IGNORECASE folds a few non-ASCII letters onto ASCII; defer to the regex
+        return bool(RETURN_CONTROL_RE.search(text))
+    return _has_ordered_tokens(text, RETURN_CONTROL_TOKENS)
+
+
+# --- Single-pass instruction decoding ---
+#
+# Every analyze_* function used to re-run the same per-line regexes over the
+# same sequence. decode_sequence() decodes each line once through the shared
+# instruction decoder and takes this module's per-line view of it (predicate
+# bits, ARM64 branch condition, simplified category, register ids), then
+# memoizes whole-window regex results, so extract_features_enhanced() decodes
+# once and all analyzers share it. Mnemonic predicates are FEATURE_CLASSES
+# lookups that match what the per-line regexes below matched, so the feature
+# dict is unchanged; forms spanning several tokens (dc civac, mrs ... cntvct,
+# xor %eax) are still searched, but only when their mnemonic is on the line.
+
+I_LOAD = 1 << 0             # ARM64_LOAD_RE
+I_STORE = 1 << 1            # ARM64_STORE_RE
+I_CACHE_FLUSH = 1 << 2      # CACHE_FLUSH_RE
+I_FENCE = 1 << 3            # FENCE_RE
+I_TIMING = 1 << 4           # TIMING_RE
+I_CLEAR_REG = 1 << 5        # CLEAR_REG_RE
+I_SHIFT = 1 << 6            # SHIFT_OPS_RE
+I_HAS_MOV = 1 << 7          # 'mov' anywhere in the line
+I_INDIRECT = 1 << 8         # is_indirect_branch()
+I_CALL = 1 << 9             # CALL_INSTR_RE
+I_RET = 1 << 10             # RET_INSTR_RE
+I_INDIRECT_CALL = 1 << 11   # INDIRECT_CALL_RE
+I_ADDR_SETUP = 1 << 12      # mov/ldr/adrp/lea anywhere in the line
+I_RETVAL_USE = 1 << 13      # x0/rax/eax referenced
+I_MEM = 1 << 14             # '[' and ']' in the line
+
+# Line predicates that are FEATURE_CLASSES lookups, and the multi-token forms
+# of their regexes (searched only when the mnemonic is on the line)
+_CLASS_FLAGS = tuple((FEATURE_CLASSES[name], bit) for name, bit in (
+    ('load', I_LOAD), ('store', I_STORE), ('cache_flush', I_CACHE_FLUSH),
+    ('fence', I_FENCE), ('timing', I_TIMING), ('shift', I_SHIFT),
+    ('call', I_CALL), ('ret', I_RET),
+))
+_CLEAR_REG = FEATURE_CLASSES['clear_reg']
+DC_FLUSH_RE = re.compile(r"\bdc\s+(civac|cvac)\b", re.IGNORECASE)
+CNTVCT_READ_RE = re.compile(r"\bmrs\s+.*cntvct\b", re.IGNORECASE)
+
+ADDR_SETUP_RE = re.compile(r'(mov|ldr|adrp|lea)', re.IGNORECASE)
+REG_TOKEN_RE = re.compile(r"\b[wx][0-9]+\b")
+RETVAL_REG_RE = re.compile(r'\b(x0|rax|eax)\b', re.IGNORECASE)
+
+# Register interning table shared by all decoded sequences in this process
+_REG_IDS = {}
+
+
+def _intern(table, key):
+    idx = table.get(key)
+    if idx is None:
+        idx = table[key] = len(table)
+    return idx
+
+
+def _dependency_regs(opcode, operands):
+    """
+    Registers read (uses) and written (defs) by one instruction.
+    Heuristic: ARM/x86 usually 'op dest, src1, src2 ...'; stores, cmp and
+    branches only read their operands.
+    """
+    uses = []
+    new_defs = []
+
+    if opcode.startswith('str') or opcode.startswith('stp') or opcode == 'cmp':
+        # All operands are effectively USES (stores write to memory, not register defs)
+        for op in operands:
+            uses.extend(get_regs_in_string(op))
+    elif opcode.startswith('b') or opcode.startswith('j') or opcode.startswith('ret'):
+        # Branches use operands
+        for op in operands:
+            uses.extend(get_regs_in_string(op))
+    elif len(operands) > 0:
+        # Assume 1st operand is Dest (Def), others are Src (Uses)
+        # e.g. 'add x0, x1, x2' -> Def x0, Use x1, x2
+        # e.g. 'ldr x0, [x1]' -> Def x0, Use x1
+        if '[' in operands[0] and ('mov' in opcode):
+            # x86: mov [rax], rbx -> moving TO memory, store-like behavior
+            uses.extend(get_regs_in_string(operands[0]))
+            if len(operands) > 1:
+                uses.extend(get_regs_in_string(operands[1]))
+        else:
+            new_defs.extend(get_regs_in_string(operands[0]))
+            for op in operands[1:]:
+                uses.extend(get_regs_in_string(op))
+
+    return uses, new_defs
+
+
+def _instruction_view(ins):
+    """This module's per-line view of a decoded instruction:
+    (predicate bits, ARM64 branch condition, simplified category, register
+    ids used, register ids defined)."""
+    line = ins.line
+    op = ins.opcode
+    words = ins.words
+
+    classes = FEATURE_CLASSES.classes(words)
+    flags = 0
+    for class_bit, flag in _CLASS_FLAGS:
+        if classes & class_bit: flags |= flag
+    if 'dc' in words and DC_FLUSH_RE.search(line): flags |= I_CACHE_FLUSH
+    if 'mrs' in words and CNTVCT_READ_RE.search(line): flags |= I_TIMING
+    if classes & _CLEAR_REG and CLEAR_REG_RE.search(line): flags |= I_CLEAR_REG
+    if 'mov' in line.lower(): flags |= I_HAS_MOV
+    if is_indirect_branch(line): flags |= I_INDIRECT
+    if INDIRECT_CALL_RE.search(line): flags |= I_INDIRECT_CALL
+    if ADDR_SETUP_RE.search(line): flags |= I_ADDR_SETUP
+    if RETVAL_REG_RE.search(line): flags |= I_RETVAL_USE
+    if '[' in line and ']' in line: flags |= I_MEM
+
+    m = ARM64_BRANCH_RE.search(line) if 'b' in words else None
+    branch_cond = m.group("cond").lower() if m else None
+
+    # Structural type of every non-empty line, as get_simplified_type(opcode)
+    category = get_simplified_type(op) if line else None
+
+    # Register def/use lists (analyze_dependencies heuristics), as interned
+    # register ids. Uses keep duplicates: each one is a counted dependency.
+    uses, new_defs = _dependency_regs(op, ins.operands)
+    uses = tuple(_intern(_REG_IDS, r) for r in uses)
+    defs = tuple(_intern(_REG_IDS, r) for r in new_defs)
+    return flags, branch_cond, category, uses, defs
+
+
+class DecodedSequence:
+    """A decoded window: per-instruction records and views (parallel lists,
+    one entry per line) plus memoized whole-text regexes."""
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.text = '\n'.join(sequence).lower()
+        self.instrs = decode_many(sequence)
+        self.opcodes = [ins.opcode for ins in self.instrs]
+        views = [ins.view(_instruction_view) for ins in self.instrs]
+        self.flags = [v[0] for v in views]
+        self.branch_conds = [v[1] for v in views]
+        self.categories = [v[2] for v in views]
+        self.uses = [v[3] for v in views]
+        self.defs = [v[4] for v in views]
+        self._search = {}
+        self._findall = {}
+
+    def __len__(self):
+        return len(self.instrs)
+
+    def search(self, pattern):
+        """bool(pattern.search(self.text)), computed once per pattern."""
+        hit = self._search.get(pattern)
+        if hit is None:
+            hit = self._search[pattern] = bool(pattern.search(self.text))
+        return hit
+
+    def count(self, pattern):
+        """len(pattern.findall(self.text)), computed once per pattern."""
+        n = self._findall.get(pattern)
+        if n is None:
+            n = self._findall[pattern] = len(pattern.findall(self.text))
+        return n
+
+    def any_in(self, start, stop, mask):
+        """True if any instruction in [start, stop) has one of the `mask` bits."""
+        flags = self.flags
+        for j in range(start, stop):
+            if flags[j] & mask:
+                return True
+        return False
+
+
+def decode_sequence(sequence):
+    return sequence if isinstance(sequence, DecodedSequence) else DecodedSequence(sequence)
 
 
 def analyze_mds_patterns(sequence):
@@ -233,7 +421,9 @@ def analyze_mds_patterns(sequence):
     - MDS has explicit zombieload/RIDL patterns
     - SPECTRE_V1 is about bounds check bypass (different mechanism)
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    flags = d.flags
+    n = len(d)
     
     # Initialize features
     feats = {
@@ -257,80 +447,73 @@ def analyze_mds_patterns(sequence):
     }
     
     # Count cache flushes
-    flush_matches = CACHE_FLUSH_RE.findall(seq_text)
-    feats['cache_flush_count'] = len(flush_matches)
-    feats['has_cache_flush'] = 1 if flush_matches else 0
+    feats['cache_flush_count'] = d.count(CACHE_FLUSH_RE)
+    feats['has_cache_flush'] = 1 if feats['cache_flush_count'] else 0
     
     # Count fences
-    fence_matches = FENCE_RE.findall(seq_text)
-    feats['fence_count'] = len(fence_matches)
-    feats['has_fence'] = 1 if fence_matches else 0
+    feats['fence_count'] = d.count(FENCE_RE)
+    feats['has_fence'] = 1 if feats['fence_count'] else 0
     
     # Check for timing measurement
-    if TIMING_RE.search(seq_text):
+    if d.search(TIMING_RE):
         feats['has_timing'] = 1
     
     # Check for clear-before-load pattern (MDS signature)
     # Pattern: xor/eor followed by load within a few instructions
-    for i, line in enumerate(sequence):
-        if CLEAR_REG_RE.search(line):
-            # Look ahead for a load
-            for j in range(i + 1, min(i + 5, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]) or 'mov' in sequence[j].lower():
-                    feats['has_clear_before_load'] = 1
-                    break
+    for i in range(n):
+        if flags[i] & I_CLEAR_REG and d.any_in(i + 1, min(i + 5, n), I_LOAD | I_HAS_MOV):
+            feats['has_clear_before_load'] = 1
+            break
     
     # Check for shift-then-load pattern (MDS probe access)
-    for i, line in enumerate(sequence):
-        if SHIFT_OPS_RE.search(line):
-            # Look ahead for a load
-            for j in range(i + 1, min(i + 4, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]):
-                    feats['has_shift_then_load'] = 1
-                    break
+    for i in range(n):
+        if flags[i] & I_SHIFT and d.any_in(i + 1, min(i + 4, n), I_LOAD):
+            feats['has_shift_then_load'] = 1
+            break
     
     # Check for flush -> fence -> load sequence (MDS core pattern)
     flush_idx = None
     fence_idx = None
-    for i, line in enumerate(sequence):
-        if CACHE_FLUSH_RE.search(line):
+    for i in range(n):
+        f = flags[i]
+        if f & I_CACHE_FLUSH:
             flush_idx = i
-        elif flush_idx is not None and FENCE_RE.search(line):
+        elif flush_idx is not None and f & I_FENCE:
             fence_idx = i
-        elif fence_idx is not None and ARM64_LOAD_RE.search(line):
+        elif fence_idx is not None and f & I_LOAD:
             if fence_idx > flush_idx and i > fence_idx:
                 feats['has_flush_fence_load'] = 1
                 break
     
     # MDS probe pattern: eor/xor + ldrb/movb + lsl/shl + ldr/mov
-    if MDS_PROBE_RE.search(seq_text):
+    if d.search(MDS_PROBE_RE):
         feats['has_mds_probe_pattern'] = 1
     
     # NEW: MDS vs SPECTRE_V1 discriminative features
     
     # VERW instruction: used to clear microarchitectural buffers
-    if VERW_RE.search(seq_text):
+    if d.search(VERW_RE):
         feats['mds_has_verw'] = 1
     
     # Fill buffer probe: specific pattern for LFB/fill buffer access
     # Pattern: memory access that triggers fill buffer usage
-    if FILL_BUFFER_RE.search(seq_text):
+    if d.search(FILL_BUFFER_RE):
         feats['mds_fill_buffer_probe'] = 1
     
     # Line fill buffer pattern: access to recently flushed line
-    if LFB_RE.search(seq_text):
+    if d.search(LFB_RE):
         feats['mds_line_fill_buffer'] = 1
     
     # Explicit zombieload pattern: look for zombieload-related function names or comments
-    if ZOMBIELOAD_RE.search(seq_text):
+    if d.search(ZOMBIELOAD_RE):
         feats['mds_explicit_zombieload'] = 1
     
     # Store buffer probe: store followed by load to same address (store buffer bypass)
-    if STORE_BUFFER_RE.search(seq_text):
+    if d.search(STORE_BUFFER_RE):
         feats['mds_store_buffer_probe'] = 1
     
     # No bounds check: MDS doesn't need bounds check (unlike SPECTRE_V1)
-    if not BOUNDS_CHECK_MULTILINE_RE.search(seq_text):
+    if not d.search(BOUNDS_CHECK_MULTILINE_RE):
         feats['mds_no_bounds_check'] = 1
     
     # Calculate MDS gadget score (higher = more likely MDS)
@@ -377,7 +560,8 @@ def analyze_spectre_v1_patterns(sequence):
     - SPECTRE_V1 has explicit bounds check pattern (cmp + jae/jb)
     - SPECTRE_V1 has array index load pattern after branch
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    n = len(d)
     
     feats = {
         'has_bounds_check': 0,
@@ -392,39 +576,35 @@ def analyze_spectre_v1_patterns(sequence):
     }
     
     # Look for bounds check pattern: cmp/subs followed by conditional branch
-    if BOUNDS_CHECK_RE.search(seq_text):
+    if d.search(BOUNDS_CHECK_RE):
         feats['has_bounds_check'] = 1
     
     # Look for conditional branch then load
-    for i, line in enumerate(sequence):
-        opcode = opcode_of(line)
+    for i, opcode in enumerate(d.opcodes):
         if opcode.startswith('b.') or opcode.startswith('j') and opcode != 'jmp':
             # Look for load after branch
-            for j in range(i + 1, min(i + 6, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]):
-                    feats['has_cond_branch_then_load'] = 1
-                    break
-            if feats['has_cond_branch_then_load']:
+            if d.any_in(i + 1, min(i + 6, n), I_LOAD):
+                feats['has_cond_branch_then_load'] = 1
                 break
     
     # NEW: SPECTRE_V1 vs L1TF discriminative features
     
     # SPECTRE_V1 typically has lfence guard (L1TF doesn't)
-    has_lfence = bool(LFENCE_RE.search(seq_text))
+    has_lfence = d.search(LFENCE_RE)
     if has_lfence:
         feats['spectre_v1_lfence_guarded'] = 1
     
     # Explicit bounds check pattern: cmp with immediate + jae/jb (unsigned comparison)
-    if BOUNDS_CMP_RE.search(seq_text):
+    if d.search(BOUNDS_CMP_RE):
         feats['spectre_v1_bounds_cmp_pattern'] = 1
     
     # Array index load: load with register offset (typical array[index] pattern)
     # Pattern: ldr/mov with [base, index, shift] or similar
-    if ARRAY_LOAD_RE.search(seq_text) or X86_ARRAY_LOAD_RE.search(seq_text):
+    if d.search(ARRAY_LOAD_RE) or d.search(X86_ARRAY_LOAD_RE):
         feats['spectre_v1_array_index_load'] = 1
     
     # Index masking pattern: AND to constrain index before load
-    if INDEX_MASK_RE.search(seq_text):
+    if d.search(INDEX_MASK_RE):
         feats['spectre_v1_index_masking'] = 1
     
     # Speculation barrier missing: has bounds check but no lfence after
@@ -464,7 +644,8 @@ def analyze_bhi_patterns(sequence):
     - BHI has mix of conditional and indirect branches for training
     - INCEPTION is more focused on phantom speculation via indirect branches
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    opcodes = d.opcodes
     
     feats = {
         'has_multiple_indirect_branches': 0,
@@ -481,22 +662,23 @@ def analyze_bhi_patterns(sequence):
     }
     
     # Count indirect branches
-    indirect_count = sum(1 for line in sequence if is_indirect_branch(line))
+    indirect_count = sum(1 for f in d.flags if f & I_INDIRECT)
     feats['indirect_branch_count'] = indirect_count
     feats['has_multiple_indirect_branches'] = 1 if indirect_count >= 2 else 0
     
     # Look for branch training pattern (repeated branch sequences)
-    branch_count = sum(1 for line in sequence if opcode_of(line).startswith('b') or opcode_of(line).startswith('j'))
+    branch_ops_list = [op for op in opcodes if op.startswith('b') or op.startswith('j')]
+    branch_count = len(branch_ops_list)
     if branch_count >= 3 and indirect_count >= 1:
         feats['has_branch_training_loop'] = 1
     
     # NEW: BHI vs INCEPTION discriminative features
     
     # History training loop: repeated conditional branches training BHB
-    cond_branch_count = sum(1 for line in sequence 
-                           if opcode_of(line).startswith('b.') or 
-                              opcode_of(line).startswith('cb') or
-                              (opcode_of(line).startswith('j') and opcode_of(line) != 'jmp'))
+    cond_branch_count = sum(1 for op in opcodes
+                           if op.startswith('b.') or 
+                              op.startswith('cb') or
+                              (op.startswith('j') and op != 'jmp'))
     if cond_branch_count >= 4:
         feats['bhi_history_training_loop'] = 1
     
@@ -505,27 +687,24 @@ def analyze_bhi_patterns(sequence):
         feats['bhi_mixed_branch_types'] = 1
     
     # Explicit CNTVCT timing (ARM64 counter): used in BHI for timing measurement
-    if CNTVCT_RE.search(seq_text):
+    if d.search(CNTVCT_RE):
         feats['bhi_explicit_cntvct_timing'] = 1
     
     # Branch diversity: count different branch instruction types
     branch_types = set()
-    for line in sequence:
-        op = opcode_of(line)
+    for op in opcodes:
         if op.startswith('b') or op.startswith('j') or op.startswith('cb'):
             branch_types.add(op[:3])  # First 3 chars to group similar branches
     feats['bhi_branch_diversity'] = len(branch_types)
     
     # Repeated branch pattern: same branch instruction appearing multiple times
-    branch_ops_list = [opcode_of(line) for line in sequence 
-                       if opcode_of(line).startswith('b') or opcode_of(line).startswith('j')]
     if len(branch_ops_list) > 0:
         branch_freq = Counter(branch_ops_list)
         if any(count >= 3 for count in branch_freq.values()):
             feats['bhi_repeated_branch_pattern'] = 1
     
     # DSB + ISB pattern: barrier sequence common in BHI gadgets
-    if DSB_ISB_RE.search(seq_text):
+    if d.search(DSB_ISB_RE):
         feats['bhi_has_dsb_isb'] = 1
     
     # Calculate BHI score
@@ -572,13 +751,12 @@ def build_cfg_for_features(sequence):
     Conditional branches get out-degree=2 (fall-through + taken path marker)
     even though we can't resolve branch targets in assembly windows.
     """
-    n = len(sequence)
+    d = decode_sequence(sequence)
+    n = len(d)
     adj = {i: [] for i in range(n)}
     num_cond_branches = 0
 
-    for i, line in enumerate(sequence):
-        op = opcode_of(line)
-
+    for i, op in enumerate(d.opcodes):
         if op in ['ret', 'retq', 'retn']:
             # Return instruction - no successors in this window
             continue
@@ -610,12 +788,12 @@ def build_dfg_for_features(sequence):
     Build a data flow graph based on register def-use chains.
     Returns adjacency list mapping producer index to consumer indices.
     """
+    d = decode_sequence(sequence)
     # Track last definition of each register
     last_def = {}  # reg -> instruction index
-    dfg = {i: [] for i in range(len(sequence))}
+    dfg = {i: [] for i in range(len(d))}
     
-    for i, line in enumerate(sequence):
-        op = opcode_of(line)
+    for i, (line, op) in enumerate(zip(d.sequence, d.opcodes)):
         if not op or op.endswith(':'):
             continue
             
@@ -658,12 +836,13 @@ def analyze_graph_features(sequence):
         'graph_density': 0.0,
     }
 
-    n = len(sequence)
+    d = decode_sequence(sequence)
+    n = len(d)
     if n == 0:
         return feats
 
     # Build CFG (now returns adjacency + conditional branch count)
-    cfg, num_cond_branches = build_cfg_for_features(sequence)
+    cfg, num_cond_branches = build_cfg_for_features(d)
 
     # CFG metrics — count real edges (exclude sentinel -1 targets)
     cfg_edges = sum(1 for targets in cfg.values() for t in targets if t >= 0)
@@ -690,7 +869,7 @@ def analyze_graph_features(sequence):
     feats['cfg_cyclomatic_complexity'] = num_cond_branches + 1
     
     # Build DFG
-    dfg = build_dfg_for_features(sequence)
+    dfg = build_dfg_for_features(d)
     
     # DFG metrics
     dfg_edges = sum(len(targets) for targets in dfg.values())
@@ -736,6 +915,7 @@ def analyze_graph_features(sequence):
 INVLPG_RE = re.compile(r"\b(invlpg|tlbi)\b", re.IGNORECASE)  # TLB invalidation
 PAGE_FAULT_HINTS_RE = re.compile(r"\b(ud2|int\s+3|int\s+14|brk)\b", re.IGNORECASE)  # Fault triggers
 PTE_MANIPULATION_RE = re.compile(r"\b(invlpg|clflush|wbinvd|tlbi)\b", re.IGNORECASE)
+L1TF_BOUNDS_CMP_RE = re.compile(r'(cmp|test|subs).*\n.*\b(b\.|j[aeglnz])', re.IGNORECASE)
 
 def analyze_l1tf_patterns(sequence):
     """
@@ -752,7 +932,9 @@ def analyze_l1tf_patterns(sequence):
     - L1TF has NO lfence before speculative loads (unlike SPECTRE_V1)
     - L1TF specifically targets terminal page faults
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    flags = d.flags
+    n = len(d)
     
     feats = {
         'l1tf_has_flush_reload': 0,
@@ -771,74 +953,68 @@ def analyze_l1tf_patterns(sequence):
     }
     
     # Check for TLB invalidation instructions
-    if INVLPG_RE.search(seq_text):
+    if d.search(INVLPG_RE):
         feats['l1tf_has_tlb_invalidation'] = 1
     
     # Check for PTE manipulation hints
-    if PTE_MANIPULATION_RE.search(seq_text):
+    if d.search(PTE_MANIPULATION_RE):
         feats['l1tf_has_pte_manipulation'] = 1
     
     # Check for fault triggers (ud2, int 3, brk)
-    if PAGE_FAULT_HINTS_RE.search(seq_text):
+    if d.search(PAGE_FAULT_HINTS_RE):
         feats['l1tf_has_fault_trigger'] = 1
     
     # FLUSH + RELOAD pattern: clflush followed by timing + load
     flush_idx = None
     timing_idx = None
-    for i, line in enumerate(sequence):
-        if CACHE_FLUSH_RE.search(line):
+    for i in range(n):
+        f = flags[i]
+        if f & I_CACHE_FLUSH:
             flush_idx = i
-        elif flush_idx is not None and TIMING_RE.search(line):
+        elif flush_idx is not None and f & I_TIMING:
             timing_idx = i
-        elif timing_idx is not None and ARM64_LOAD_RE.search(line):
+        elif timing_idx is not None and f & I_LOAD:
             if timing_idx > flush_idx and i > timing_idx:
                 feats['l1tf_has_flush_reload'] = 1
                 break
     
     # Flush then access (simpler pattern)
-    for i, line in enumerate(sequence):
-        if CACHE_FLUSH_RE.search(line):
-            # Look for load within next few instructions
-            for j in range(i + 1, min(i + 8, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]):
-                    feats['l1tf_flush_then_access'] = 1
-                    break
-            if feats['l1tf_flush_then_access']:
-                break
+    for i in range(n):
+        # Look for load within next few instructions
+        if flags[i] & I_CACHE_FLUSH and d.any_in(i + 1, min(i + 8, n), I_LOAD):
+            feats['l1tf_flush_then_access'] = 1
+            break
     
     # Timing around load: rdtsc -> load -> rdtsc
-    timing_before_load = False
-    for i, line in enumerate(sequence):
-        if TIMING_RE.search(line):
+    for i in range(n):
+        if flags[i] & I_TIMING:
             # Look for load followed by another timing
-            for j in range(i + 1, min(i + 6, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]):
-                    for k in range(j + 1, min(j + 6, len(sequence))):
-                        if TIMING_RE.search(sequence[k]):
-                            feats['l1tf_has_timing_around_load'] = 1
-                            break
+            for j in range(i + 1, min(i + 6, n)):
+                if flags[j] & I_LOAD:
+                    if d.any_in(j + 1, min(j + 6, n), I_TIMING):
+                        feats['l1tf_has_timing_around_load'] = 1
                     break
     
     # Cache timing pattern: specific sequence for cache probing
-    if CACHE_TIMING_RE.search(seq_text):
+    if d.search(CACHE_TIMING_RE):
         feats['l1tf_cache_timing_pattern'] = 1
     
     # NEW: L1TF vs SPECTRE_V1 discriminative features
     
     # L1TF has NO fence before speculative load (unlike SPECTRE_V1 which uses lfence)
-    has_fence = bool(LFENCE_FULL_RE.search(seq_text))
-    has_load = bool(ARM64_LOAD_RE.search(seq_text))
+    has_fence = d.search(LFENCE_FULL_RE)
+    has_load = d.search(ARM64_LOAD_RE)
     if has_load and not has_fence:
         feats['l1tf_no_fence_before_load'] = 1
     
     # Terminal fault setup: access pattern suggesting unmapped memory
     # Look for patterns like: mov to address, then access that triggers fault
-    if TERMINAL_FAULT_RE.search(seq_text) and feats['l1tf_has_fault_trigger']:
+    if d.search(TERMINAL_FAULT_RE) and feats['l1tf_has_fault_trigger']:
         feats['l1tf_terminal_fault_setup'] = 1
     
     # Unmapped access pattern: flush followed by access without bounds check
     # L1TF doesn't need bounds check (it's about PTE not index)
-    has_bounds_cmp = bool(re.search(r'(cmp|test|subs).*\n.*\b(b\.|j[aeglnz])', seq_text, re.IGNORECASE))
+    has_bounds_cmp = d.search(L1TF_BOUNDS_CMP_RE)
     if feats['l1tf_flush_then_access'] and not has_bounds_cmp:
         feats['l1tf_unmapped_access_pattern'] = 1
     
@@ -879,6 +1055,9 @@ def analyze_l1tf_patterns(sequence):
 
 # --- BENIGN Code Counter-Features ---
 
+BENIGN_ARITH_OPS = frozenset(['add', 'sub', 'mul', 'and', 'orr', 'eor', 'lsl', 'lsr', 'asr',
+                              'xor', 'shl', 'shr', 'inc', 'dec', 'neg', 'not', 'imul'])
+
 def analyze_benign_patterns(sequence):
     """
     Analyze patterns typical of benign/normal code.
@@ -891,7 +1070,11 @@ def analyze_benign_patterns(sequence):
     - Regular function prologue/epilogue patterns
     - Absence of speculation attack primitives
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    sequence = d.sequence
+    flags = d.flags
+    opcodes = d.opcodes
+    n = len(d)
     
     feats = {
         'benign_simple_control_flow': 0,
@@ -907,31 +1090,28 @@ def analyze_benign_patterns(sequence):
     }
     
     # Count instruction types
-    load_count = sum(1 for line in sequence if ARM64_LOAD_RE.search(line))
-    store_count = sum(1 for line in sequence if ARM64_STORE_RE.search(line))
-    push_count = len(PUSH_INSTR_RE.findall(seq_text))
-    pop_count = len(POP_INSTR_RE.findall(seq_text))
-    call_count = len(CALL_INSTR_RE.findall(seq_text))
-    ret_count = len(RET_INSTR_RE.findall(seq_text))
+    push_count = d.count(PUSH_INSTR_RE)
+    pop_count = d.count(POP_INSTR_RE)
     
     # Check for timing operations (absence = benign)
-    if TIMING_RE.search(seq_text):
+    if d.search(TIMING_RE):
         feats['benign_no_timing_ops'] = 0
     
     # Check for cache operations (absence = benign)
-    if CACHE_FLUSH_RE.search(seq_text):
+    if d.search(CACHE_FLUSH_RE):
         feats['benign_no_cache_ops'] = 0
     
     # Check for indirect branches (absence = benign)
-    if any(is_indirect_branch(line) for line in sequence):
+    has_indirect = d.any_in(0, n, I_INDIRECT)
+    if has_indirect:
         feats['benign_no_indirect_branch'] = 0
     
     # Simple control flow: 0-1 branches, no complex patterns
-    branch_count = sum(1 for line in sequence 
-                       if opcode_of(line).startswith('b.') or 
-                          opcode_of(line).startswith('j') or
-                          opcode_of(line).startswith('cb'))
-    if branch_count <= 2 and not any(is_indirect_branch(line) for line in sequence):
+    branch_count = sum(1 for op in opcodes
+                       if op.startswith('b.') or 
+                          op.startswith('j') or
+                          op.startswith('cb'))
+    if branch_count <= 2 and not has_indirect:
         feats['benign_simple_control_flow'] = 1
     
     # Balanced push/pop (typical function patterns)
@@ -939,22 +1119,20 @@ def analyze_benign_patterns(sequence):
         feats['benign_balanced_push_pop'] = 1
     
     # Stack frame pattern: push/stp at start, pop/ldp at end
-    if STACK_FRAME_RE.search(seq_text):
+    if d.search(STACK_FRAME_RE):
         # Check for corresponding epilogue
-        if EPILOGUE_RE.search(seq_text):
+        if d.search(EPILOGUE_RE):
             feats['benign_stack_frame_pattern'] = 1
     
     # Pure arithmetic: mostly add/sub/mul/shift with no memory side effects
-    arith_ops = ['add', 'sub', 'mul', 'and', 'orr', 'eor', 'lsl', 'lsr', 'asr', 
-                 'xor', 'shl', 'shr', 'inc', 'dec', 'neg', 'not', 'imul']
-    arith_count = sum(1 for line in sequence if opcode_of(line) in arith_ops)
-    total_ops = len([l for l in sequence if opcode_of(l) and not opcode_of(l).endswith(':')])
+    arith_count = sum(1 for op in opcodes if op in BENIGN_ARITH_OPS)
+    total_ops = sum(1 for op in opcodes if op and not op.endswith(':'))
     if total_ops > 0 and arith_count / total_ops > 0.6:
         feats['benign_pure_arithmetic'] = 1
     
     # Loop pattern: conditional branch backward (simple loop)
-    for i, line in enumerate(sequence):
-        opcode = opcode_of(line)
+    for i, opcode in enumerate(opcodes):
+        line = sequence[i]
         if opcode.startswith('b.') or opcode.startswith('cb'):
             # Check if branch target might be backward (label reference)
             if any(char.isalpha() for char in line.split()[-1] if len(line.split()) > 1):
@@ -962,13 +1140,11 @@ def analyze_benign_patterns(sequence):
                 break
     
     # Function call pattern: call followed by using return value
-    for i, line in enumerate(sequence):
-        if CALL_INSTR_RE.search(line):
-            # Look for use of return register (x0, rax, eax) after call
-            for j in range(i + 1, min(i + 4, len(sequence))):
-                if re.search(r'\b(x0|rax|eax)\b', sequence[j], re.IGNORECASE):
-                    feats['benign_function_call_pattern'] = 1
-                    break
+    for i in range(n):
+        # Look for use of return register (x0, rax, eax) after call
+        if flags[i] & I_CALL and d.any_in(i + 1, min(i + 4, n), I_RETVAL_USE):
+            feats['benign_function_call_pattern'] = 1
+            break
     
     # Calculate benign score
     score = 0.0
@@ -983,9 +1159,9 @@ def analyze_benign_patterns(sequence):
     score += feats['benign_function_call_pattern'] * 0.1
     
     # Penalty for attack-like patterns
-    if len(CACHE_FLUSH_RE.findall(seq_text)) > 0:
+    if d.count(CACHE_FLUSH_RE) > 0:
         score -= 0.3
-    if TIMING_RE.search(seq_text):
+    if d.search(TIMING_RE):
         score -= 0.25
     
     feats['benign_score'] = max(0.0, min(1.0, score))
@@ -1019,7 +1195,10 @@ def analyze_retbleed_patterns(sequence):
     - RETBLEED is about RSB underflow (many calls, then ret misprediction)
     - INCEPTION is about phantom speculation via indirect branches
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    sequence = d.sequence
+    flags = d.flags
+    n = len(d)
     
     feats = {
         'ret_count': 0,
@@ -1040,27 +1219,25 @@ def analyze_retbleed_patterns(sequence):
     }
     
     # Count ret instructions
-    ret_matches = RET_INSTR_RE.findall(seq_text)
-    feats['ret_count'] = len(ret_matches)
+    feats['ret_count'] = d.count(RET_INSTR_RE)
     
     # Count call instructions
-    call_matches = CALL_INSTR_RE.findall(seq_text)
-    feats['call_count'] = len(call_matches)
+    feats['call_count'] = d.count(CALL_INSTR_RE)
     
     # Calculate call/ret ratio (RSB balance indicator)
     if feats['ret_count'] > 0:
         feats['call_ret_ratio'] = feats['call_count'] / feats['ret_count']
     
     # Check for leave + ret pattern (common in function epilogues being exploited)
-    if LEAVE_RET_RE.search(seq_text):
+    if d.search(LEAVE_RET_RE):
         feats['has_leave_ret_pattern'] = 1
     
     # Check for recursive call pattern (call to same or nearby label)
     # Look for patterns like: call <label> ... <label>: ... call <label>
     # Simplified: multiple calls to the same target within the window
     call_targets = []
-    for line in sequence:
-        if CALL_INSTR_RE.search(line):
+    for line, f in zip(sequence, flags):
+        if f & I_CALL:
             parts = line.strip().split()
             if len(parts) > 1:
                 target = parts[-1].strip()
@@ -1075,8 +1252,8 @@ def analyze_retbleed_patterns(sequence):
     # Deep call pattern: multiple sequential calls (RSB filling)
     consecutive_calls = 0
     max_consecutive_calls = 0
-    for line in sequence:
-        if CALL_INSTR_RE.search(line):
+    for f in flags:
+        if f & I_CALL:
             consecutive_calls += 1
             max_consecutive_calls = max(max_consecutive_calls, consecutive_calls)
         else:
@@ -1086,8 +1263,8 @@ def analyze_retbleed_patterns(sequence):
         feats['has_deep_call_pattern'] = 1
     
     # Push/pop imbalance (RSB manipulation)
-    push_count = len(PUSH_INSTR_RE.findall(seq_text))
-    pop_count = len(POP_INSTR_RE.findall(seq_text))
+    push_count = d.count(PUSH_INSTR_RE)
+    pop_count = d.count(POP_INSTR_RE)
     feats['push_pop_imbalance'] = abs(push_count - pop_count)
     
     # RSB manipulation: multiple rets without corresponding calls
@@ -1096,13 +1273,10 @@ def analyze_retbleed_patterns(sequence):
     
     # Also check for call + ret sequences that could deplete RSB
     call_ret_pairs = 0
-    for i, line in enumerate(sequence):
-        if CALL_INSTR_RE.search(line):
-            # Look for ret within next few instructions
-            for j in range(i + 1, min(i + 5, len(sequence))):
-                if RET_INSTR_RE.search(sequence[j]):
-                    call_ret_pairs += 1
-                    break
+    for i in range(n):
+        # Look for ret within next few instructions
+        if flags[i] & I_CALL and d.any_in(i + 1, min(i + 5, n), I_RET):
+            call_ret_pairs += 1
     
     if call_ret_pairs >= 2:
         feats['has_rsb_manipulation'] = 1
@@ -1112,11 +1286,11 @@ def analyze_retbleed_patterns(sequence):
     # Call chain depth: count consecutive calls before any ret
     call_chain = 0
     max_call_chain = 0
-    for line in sequence:
-        if CALL_INSTR_RE.search(line):
+    for f in flags:
+        if f & I_CALL:
             call_chain += 1
             max_call_chain = max(max_call_chain, call_chain)
-        elif RET_INSTR_RE.search(line):
+        elif f & I_RET:
             call_chain = 0  # Reset on ret
     feats['retbleed_call_chain_depth'] = max_call_chain
     
@@ -1125,7 +1299,7 @@ def analyze_retbleed_patterns(sequence):
         feats['retbleed_unbalanced_ret'] = 1
     
     # RSB flush pattern: call; ret; call sequence (depletes RSB)
-    if RSB_FLUSH_RE.search(seq_text):
+    if d.search(RSB_FLUSH_RE):
         feats['retbleed_rsb_flush_pattern'] = 1
     
     # Ret after many calls: classic RSB underflow setup
@@ -1133,8 +1307,7 @@ def analyze_retbleed_patterns(sequence):
         feats['retbleed_ret_after_many_calls'] = 1
     
     # No indirect branch: RETBLEED uses ret, not indirect branches (unlike INCEPTION)
-    has_indirect = any(is_indirect_branch(line) for line in sequence)
-    if not has_indirect:
+    if not d.any_in(0, n, I_INDIRECT):
         feats['retbleed_no_indirect_branch'] = 1
     
     # Calculate RETBLEED score
@@ -1201,7 +1374,9 @@ def analyze_inception_patterns(sequence):
     - INCEPTION uses indirect branches (br, blr, jmp *reg)
     - RETBLEED uses return instructions (ret)
     """
-    seq_text = '\n'.join(sequence).lower()
+    d = decode_sequence(sequence)
+    flags = d.flags
+    n = len(d)
     
     feats = {
         'inception_indirect_branch_count': 0,
@@ -1215,7 +1390,7 @@ def analyze_inception_patterns(sequence):
     }
     
     # Count indirect branches (the core of INCEPTION)
-    indirect_count = sum(1 for line in sequence if is_indirect_branch(line))
+    indirect_count = sum(1 for f in flags if f & I_INDIRECT)
     feats['inception_indirect_branch_count'] = indirect_count
     
     # BTB pollution: multiple indirect branches training the BTB
@@ -1223,43 +1398,35 @@ def analyze_inception_patterns(sequence):
         feats['inception_btb_pollution'] = 1
     
     # Inline assembly markers suggest speculation window
-    if INLINE_ASM_RE.search(seq_text):
+    if d.search(INLINE_ASM_RE):
         feats['inception_has_inline_asm'] = 1
     
     # Phantom speculation window: indirect branch followed by speculative instructions
-    for i, line in enumerate(sequence):
-        if is_indirect_branch(line):
-            # Look for memory access after indirect branch (speculation)
-            for j in range(i + 1, min(i + 6, len(sequence))):
-                if ARM64_LOAD_RE.search(sequence[j]) or ARM64_STORE_RE.search(sequence[j]):
-                    feats['inception_phantom_window'] = 1
-                    break
-            if feats['inception_phantom_window']:
-                break
+    for i in range(n):
+        # Look for memory access after indirect branch (speculation)
+        if flags[i] & I_INDIRECT and d.any_in(i + 1, min(i + 6, n), I_LOAD | I_STORE):
+            feats['inception_phantom_window'] = 1
+            break
     
     # Call target mismatch: indirect call where target could be controlled
-    if INDIRECT_CALL_RE.search(seq_text):
+    if d.search(INDIRECT_CALL_RE):
         # Check for register loading before the call
-        for i, line in enumerate(sequence):
-            if INDIRECT_CALL_RE.search(line):
-                # Look for register setup before
-                for j in range(max(0, i - 4), i):
-                    if re.search(r'(mov|ldr|adrp|lea)', sequence[j], re.IGNORECASE):
-                        feats['inception_call_target_mismatch'] = 1
-                        break
+        for i in range(n):
+            # Look for register setup before
+            if flags[i] & I_INDIRECT_CALL and d.any_in(max(0, i - 4), i, I_ADDR_SETUP):
+                feats['inception_call_target_mismatch'] = 1
+                break
     
     # Return target control: manipulation of return address on stack
     # Pattern: mov/str to stack pointer area followed by ret
-    if RETURN_CONTROL_RE.search(seq_text):
+    if search_return_control(d.text):
         feats['inception_return_target_control'] = 1
     
     # Speculative store: store in speculation window (can leak data)
-    for i, line in enumerate(sequence):
-        if is_indirect_branch(line):
-            for j in range(i + 1, min(i + 4, len(sequence))):
-                if ARM64_STORE_RE.search(sequence[j]):
-                    feats['inception_speculative_store'] = 1
-                    break
+    for i in range(n):
+        if flags[i] & I_INDIRECT and d.any_in(i + 1, min(i + 4, n), I_STORE):
+            feats['inception_speculative_store'] = 1
+            break
     
     # Calculate INCEPTION score
     score = 0.0
@@ -1400,20 +1567,6 @@ def compute_mutual_exclusion_scores(feats: dict) -> dict:
 
 # --- New Dependency Analysis Logic ---
 
-def parse_operands(line):
-    """
-    Simple heuristic to split operands.
-    Assumes format: 'opcode op1, op2, op3'
-    """
-    parts = line.strip().split(None, 1)
-    if len(parts) < 2:
-        return []
-    operands_str = parts[1]
-    # Split by comma, ignoring commas inside brackets if possible (simple split for now)
-    # Better: split by comma
-    ops = [o.strip() for o in operands_str.split(',')]
-    return ops
-
 def get_regs_in_string(s, arch='unknown'):
     """Extract registers from a string."""
     regs = set()
@@ -1426,11 +1579,18 @@ def get_regs_in_string(s, arch='unknown'):
         regs.add(clean)
     return list(regs)
 
+DEP_ARITH_OPS = frozenset(['add', 'sub', 'mul', 'lsl', 'lsr', 'and', 'orr', 'eor',
+                           'xor', 'inc', 'dec', 'shl', 'shr'])
+
+
 def analyze_dependencies(sequence):
     """
     Analyze data dependencies in the instruction sequence.
     Returns a dictionary of dependency features.
+
+    Register uses/defs come from the decoded window (see _dependency_regs).
     """
+    d = decode_sequence(sequence)
     # definitions: reg -> (instruction_index, type)
     # type: 'LOAD', 'ARITH', 'OTHER'
     defs = {}
@@ -1439,55 +1599,20 @@ def analyze_dependencies(sequence):
     feat_dep_arith_load = 0
     feat_dep_distances = []
     
-    for i, line in enumerate(sequence):
-        opcode = opcode_of(line)
+    for i, ins in enumerate(d.instrs):
+        opcode = ins.opcode
         if opcode == 'nop' or opcode.endswith(':'):
             continue
             
         # Determine operation type
         op_type = 'OTHER'
-        if opcode.startswith('ldr') or opcode.startswith('ldp') or (opcode.startswith('mov') and '[' in line):
+        if opcode.startswith('ldr') or opcode.startswith('ldp') or (opcode.startswith('mov') and '[' in ins.line):
             op_type = 'LOAD'
-        elif opcode in ['add', 'sub', 'mul', 'lsl', 'lsr', 'and', 'orr', 'eor', 'xor', 'inc', 'dec', 'shl', 'shr']:
+        elif opcode in DEP_ARITH_OPS:
             op_type = 'ARITH'
             
-        operands = parse_operands(line)
-        
-        # Heuristic for Dest vs Source
-        # ARM/x86 usually: Op Dest, Src1, Src2 ...
-        # Stores are: Str Src, [Dest]  (Dest is memory address, so it's a register USE)
-        # CMP is: Cmp Src1, Src2 (Both uses)
-        
-        uses = []
-        new_defs = []
-        
-        if opcode.startswith('str') or opcode.startswith('stp') or opcode == 'cmp':
-            # All operands are effectively USES (stores write to memory, not register defs)
-            for op in operands:
-                uses.extend(get_regs_in_string(op))
-        elif opcode.startswith('b') or opcode.startswith('j') or opcode.startswith('ret'):
-             # Branches use operands
-             for op in operands:
-                uses.extend(get_regs_in_string(op))
-        else:
-            # Assume 1st operand is Dest (Def), others are Src (Uses)
-            # e.g. 'add x0, x1, x2' -> Def x0, Use x1, x2
-            # e.g. 'ldr x0, [x1]' -> Def x0, Use x1
-            if len(operands) > 0:
-                # Special case: Memory operands in first position?
-                # x86: mov [rax], rbx -> Store (caught above if opcode classification is perfect, but 'mov' is tricky)
-                if '[' in operands[0] and ('mov' in opcode):
-                    # Moving TO memory -> Store-like behavior
-                    uses.extend(get_regs_in_string(operands[0]))
-                    if len(operands) > 1:
-                         uses.extend(get_regs_in_string(operands[1]))
-                else:
-                    new_defs.extend(get_regs_in_string(operands[0]))
-                    for op in operands[1:]:
-                        uses.extend(get_regs_in_string(op))
-                        
         # --- Analyze Uses ---
-        for reg in uses:
+        for reg in d.uses[i]:
             if reg in defs:
                 def_idx, def_type = defs[reg]
                 dist = i - def_idx
@@ -1502,7 +1627,7 @@ def analyze_dependencies(sequence):
                         feat_dep_arith_load += 1 # Calculated address
                         
         # --- Update Defs ---
-        for reg in new_defs:
+        for reg in d.defs[i]:
             defs[reg] = (i, op_type)
             
     # Aggregate stats
@@ -1519,10 +1644,14 @@ def analyze_dependencies(sequence):
         "dep_count": len(feat_dep_distances)
     }
 
+MEM_OPERAND_RE = re.compile(r"\[(.*?)\]")
+
+
 def analyze_memory_semantics(sequence):
     """
     Analyze memory access patterns and addressing modes.
     """
+    d = decode_sequence(sequence)
     stack_regs = {'sp', 'rsp', 'rbp', 'esp', 'ebp'}
     
     feat_mem_stack = 0
@@ -1535,14 +1664,15 @@ def analyze_memory_semantics(sequence):
     
     mem_ops_total = 0
     
-    for i, line in enumerate(sequence):
-        opcode = opcode_of(line)
+    for i, ins in enumerate(d.instrs):
+        line = ins.line
+        opcode = ins.opcode
         if opcode == 'nop' or opcode.endswith(':'):
             continue
             
         # Is it a memory op?
-        is_load = ARM64_LOAD_RE.search(line) or (opcode.startswith('mov') and '[' in line and line.strip().split(',')[1].strip().startswith('['))
-        is_store = ARM64_STORE_RE.search(line) or (opcode.startswith('mov') and '[' in line and line.strip().split(',')[0].strip().startswith('['))
+        is_load = d.flags[i] & I_LOAD or (opcode.startswith('mov') and '[' in line and line.strip().split(',')[1].strip().startswith('['))
+        is_store = d.flags[i] & I_STORE or (opcode.startswith('mov') and '[' in line and line.strip().split(',')[0].strip().startswith('['))
         
         if not (is_load or is_store):
             continue
@@ -1551,7 +1681,7 @@ def analyze_memory_semantics(sequence):
         
         # Extract content inside [...]
         # Heuristic: Find [...]
-        m = re.search(r"\[(.*?)\]", line)
+        m = MEM_OPERAND_RE.search(line)
         if m:
             content = m.group(1)
             # Check for stack pointer
@@ -1780,19 +1910,24 @@ def compute_base_structural_features(sequence, opcodes):
 
 def extract_features_enhanced(rec: dict) -> dict:
     raw_seq = rec.get("sequence", [])
+    # Decode once; every analyzer below shares the decoded window
+    decoded = decode_sequence(raw_seq)
     # Use original sequence for dependency analysis (context matters)
     # But filter NOPs for structural features
-    seq_no_nop = [l for l in raw_seq if opcode_of(l) != 'nop']
+    no_nop = [i for i, op in enumerate(decoded.opcodes) if op != 'nop']
+    seq_no_nop = [decoded.sequence[i] for i in no_nop]
+    flags_no_nop = [decoded.flags[i] for i in no_nop]
     
     # 1. Standard Features (Reusing logic)
     feats = {}
-    tokens = [opcode_of(l) for l in seq_no_nop if l]
+    lines_no_nop = [i for i in no_nop if decoded.sequence[i]]
+    tokens = [decoded.opcodes[i] for i in lines_no_nop]
     
     feats["op_trace"] = " ".join(tokens)
     
     struc_tokens = []
-    for t in tokens:
-        st = get_simplified_type(t)
+    for i in lines_no_nop:
+        st = decoded.categories[i]
         if st: struc_tokens.append(st)
     feats["struc_trace"] = " ".join(struc_tokens)
     
@@ -1802,60 +1937,57 @@ def extract_features_enhanced(rec: dict) -> dict:
             feats[f"ng_{n}:{k}"] = int(v)
             
     # Operand categories
-    feats["num_mem_ops"] = sum(1 for l in seq_no_nop if "[" in l and "]" in l)
-    feats["num_store_ops"] = sum(1 for l in seq_no_nop if ARM64_STORE_RE.search(l))
-    feats["num_load_ops"] = sum(1 for l in seq_no_nop if ARM64_LOAD_RE.search(l))
-    feats["num_reg_tokens"] = sum(len(re.findall(r"\b[wx][0-9]+\b", l)) for l in seq_no_nop)
+    feats["num_mem_ops"] = sum(1 for f in flags_no_nop if f & I_MEM)
+    feats["num_store_ops"] = sum(1 for f in flags_no_nop if f & I_STORE)
+    feats["num_load_ops"] = sum(1 for f in flags_no_nop if f & I_LOAD)
+    feats["num_reg_tokens"] = sum(len(REG_TOKEN_RE.findall(l)) for l in seq_no_nop)
     
     # Branch info
-    branch_types = Counter()
-    for l in seq_no_nop:
-        m = ARM64_BRANCH_RE.search(l)
-        if m: branch_types[m.group("cond").lower()] += 1
+    branch_types = Counter(decoded.branch_conds[i] for i in no_nop if decoded.branch_conds[i] is not None)
     for cond, v in branch_types.items():
         feats[f"branch_{cond}"] = int(v)
     feats["num_branches"] = int(sum(branch_types.values()))
     feats["window_length"] = int(len(tokens))
     
     # 2. New Dependency Features
-    dep_feats = analyze_dependencies(raw_seq) # Analyze raw sequence for accurate distance
+    dep_feats = analyze_dependencies(decoded) # Analyze raw sequence for accurate distance
     feats.update(dep_feats)
     
     # 3. Memory Semantics
-    mem_feats = analyze_memory_semantics(raw_seq)
+    mem_feats = analyze_memory_semantics(decoded)
     feats.update(mem_feats)
     
     # 4. Indirect Branch Features
-    num_indirect = sum(1 for l in seq_no_nop if is_indirect_branch(l))
+    num_indirect = sum(1 for f in flags_no_nop if f & I_INDIRECT)
     feats["num_indirect_branches"] = num_indirect
     feats["has_indirect_branch"] = 1 if num_indirect > 0 else 0
     
     # 5. MDS-Specific Features (NEW)
-    mds_feats = analyze_mds_patterns(raw_seq)
+    mds_feats = analyze_mds_patterns(decoded)
     feats.update(mds_feats)
     
     # 6. Spectre V1 Features (NEW)
-    spectre_v1_feats = analyze_spectre_v1_patterns(raw_seq)
+    spectre_v1_feats = analyze_spectre_v1_patterns(decoded)
     feats.update(spectre_v1_feats)
     
     # 7. BHI Features (NEW)
-    bhi_feats = analyze_bhi_patterns(raw_seq)
+    bhi_feats = analyze_bhi_patterns(decoded)
     feats.update(bhi_feats)
     
     # 8. RETBLEED Features (NEW)
-    retbleed_feats = analyze_retbleed_patterns(raw_seq)
+    retbleed_feats = analyze_retbleed_patterns(decoded)
     feats.update(retbleed_feats)
     
     # 8b. INCEPTION Features (NEW)
-    inception_feats = analyze_inception_patterns(raw_seq)
+    inception_feats = analyze_inception_patterns(decoded)
     feats.update(inception_feats)
     
     # 9. L1TF Features (NEW)
-    l1tf_feats = analyze_l1tf_patterns(raw_seq)
+    l1tf_feats = analyze_l1tf_patterns(decoded)
     feats.update(l1tf_feats)
     
     # 10. BENIGN Counter-Features (NEW)
-    benign_feats = analyze_benign_patterns(raw_seq)
+    benign_feats = analyze_benign_patterns(decoded)
     feats.update(benign_feats)
     
     # 10b. Mutual Exclusion Scores (NEW v22)
@@ -1864,7 +1996,7 @@ def extract_features_enhanced(rec: dict) -> dict:
     feats.update(mutual_exclusion_feats)
     
     # 11. Graph-based Features (CFG + DFG)
-    graph_feats = analyze_graph_features(raw_seq)
+    graph_feats = analyze_graph_features(decoded)
     feats.update(graph_feats)
     
     # 12. Sequence Embedding Features (NEW - captures long-range dependencies)
@@ -1899,43 +2031,103 @@ def canonical_id_from_source(path: str) -> str:
             return name.split(marker)[0]
     return name.rsplit(".", 1)[0]
 
+def build_output_record(rec: dict, index: int) -> dict:
+    """Feature record for the index-th input record (index drives the id)."""
+    feats = extract_features_enhanced(rec)
+    
+    # Metadata handling
+    label = rec.get("vuln_label")
+    if not label or label == "UNKNOWN":
+         label = rec.get("label", "unknown")
+    
+    grp = rec.get("group")
+    src = rec.get("source_file", "unknown")
+    
+    if not grp or grp == "unknown" or grp == "github_negatives":
+        if "github" in src.lower() or "repos/" in src:
+            grp = src
+        else:
+            grp = Path(src).stem
+    
+    return {
+        "id": f"{canonical_id_from_source(src)}:{index}",
+        "label": label,
+        "arch": rec.get("arch", "unknown"),
+        "features": feats,
+        "group": grp,
+        "confidence": rec.get("confidence", 0.0),
+        "weight": rec.get("weight", 1.0)
+    }
+
+
+def _process_line(item):
+    """Pool worker: (index, raw JSONL line) -> serialized output line."""
+    index, line = item
+    return json.dumps(build_output_record(json.loads(line), index)) + "\n"
+
+
+def iter_input_lines(path: Path):
+    """Non-empty raw JSONL lines, in order (same records as load_jsonl)."""
+    with path.open() as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def recover_output(path: Path) -> int:
+    """
+    Prepare a partially written output for --resume.
+    Drops a trailing incomplete line (crash mid-write) and returns the number
+    of complete records, which is also the index of the next input record.
+    """
+    if not path.exists():
+        return 0
+    with path.open("rb+") as f:
+        data = f.read()
+        keep = data.rfind(b"\n") + 1
+        if keep < len(data):
+            f.truncate(keep)
+    return data.count(b"\n", 0, keep)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="inp", type=Path, required=True)
     ap.add_argument("--out", dest="out", type=Path, required=True)
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Worker processes (default: 1, serial)")
+    ap.add_argument("--chunk-size", type=int, default=256,
+                    help="Records per worker task; each batch is chunk-size * workers * 4 records")
+    ap.add_argument("--resume", action="store_true",
+                    help="Keep complete records in --out and continue after them")
     args = ap.parse_args()
 
     args.out.parent.mkdir(parents=True, exist_ok=True)
-    count = 0
-    with args.out.open("w") as fout:
-        for rec in load_jsonl(args.inp):
-            feats = extract_features_enhanced(rec)
-            
-            # Metadata handling
-            label = rec.get("vuln_label")
-            if not label or label == "UNKNOWN":
-                 label = rec.get("label", "unknown")
-            
-            grp = rec.get("group")
-            src = rec.get("source_file", "unknown")
-            
-            if not grp or grp == "unknown" or grp == "github_negatives":
-                if "github" in src.lower() or "repos/" in src:
-                    grp = src
-                else:
-                    grp = Path(src).stem
-            
-            out = {
-                "id": f"{canonical_id_from_source(src)}:{count}",
-                "label": label,
-                "arch": rec.get("arch", "unknown"),
-                "features": feats,
-                "group": grp,
-                "confidence": rec.get("confidence", 0.0),
-                "weight": rec.get("weight", 1.0)
-            }
-            fout.write(json.dumps(out) + "\n")
-            count += 1
+    count = recover_output(args.out) if args.resume else 0
+    if count:
+        print(f"Resuming after {count} existing records in {args.out}")
+
+    items = itertools.islice(enumerate(iter_input_lines(args.inp)), count, None)
+    with args.out.open("a" if args.resume else "w") as fout:
+        if args.workers <= 1:
+            for item in items:
+                fout.write(_process_line(item))
+                count += 1
+        else:
+            # Stream bounded batches through the pool (imap keeps input order)
+            # and flush after each one, so a crash loses at most one batch.
+            batch_size = args.chunk_size * args.workers * 4
+            with Pool(processes=args.workers) as pool:
+                while True:
+                    batch = list(itertools.islice(items, batch_size))
+                    if not batch:
+                        break
+                    for out_line in pool.imap(_process_line, batch, chunksize=args.chunk_size):
+                        fout.write(out_line)
+                    fout.flush()
+                    count += len(batch)
+                    print(f"  {count} records written", flush=True)
     print(f"Wrote {count} enhanced feature records to {args.out}")
 
 if __name__ == "__main__":
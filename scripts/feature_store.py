@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Columnar feature store for handcrafted-feature datasets.
+
+The trainers used to json.loads every record of a multi-GB features JSONL and
+walk a Python dict per record to build their feature vectors. A feature store
+keeps the same data column-wise so it can be memory-mapped instead:
+
+    schema.json                 num_rows, feature_names, string/float columns
+    features.npy                float32 [N, F], NaN where a record lacks a feature
+    <col>.offsets.npy           int64 [N + 1] (one pair per string column)
+    <col>.data.npy              uint8 UTF-8 bytes of all values, concatenated
+    <col>.npy                   float32 [N] (float columns, NaN = missing)
+
+Feature columns are the sorted union of every numeric key seen in the input,
+so each trainer can still pick its own subset by name. Missing features are
+NaN on disk and read back as 0 (the default every trainer already used).
+String-valued features (op_trace, struc_trace) are not stored; their names
+are recorded in schema.json as dropped_string_features.
+
+Usage:
+    python scripts/feature_store.py --in data/features/combined_v22_enhanced.jsonl \\
+        --out data/features/combined_v22_enhanced.store --with-sequence
+
+    from feature_store import FeatureStore
+    store = FeatureStore('data/features/combined_v22_enhanced.store')
+    X = store.matrix(feature_names)       # float32 [N, len(feature_names)]
+    records = store.records()             # dict records, features read lazily
+"""
+
+import argparse
+import json
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FEATURE_STORE_VERSION = 1
+DEFAULT_STRING_COLUMNS = ('id', 'label', 'vuln_label', 'group', 'arch', 'source_file')
+DEFAULT_FLOAT_COLUMNS = ('weight', 'confidence')
+SEQUENCE_COLUMN = 'sequence'
+
+
+def is_feature_store(path) -> bool:
+    """True if ``path`` is a feature store directory (rather than a JSONL file)."""
+    return (Path(path) / 'schema.json').is_file()
+
+
+def _iter_records(path: Path) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _is_numeric(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+# =============================================================================
+# Writer
+# =============================================================================
+
+def write_feature_store(in_path: Path, out_dir: Path,
+                        string_columns: Sequence[str] = DEFAULT_STRING_COLUMNS,
+                        float_columns: Sequence[str] = DEFAULT_FLOAT_COLUMNS,
+                        include_sequence: bool = False,
+                        exclude_prefixes: Sequence[str] = ()) -> int:
+    """Convert a features JSONL into a feature store. Returns the row count.
+
+    Two streaming passes over ``in_path``: the first fixes the column schema,
+    the second fills a preallocated memmap, so memory stays bounded by the
+    string columns.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    exclude_prefixes = tuple(exclude_prefixes)
+
+    # Pass 1: schema
+    names = set()
+    string_names = set()
+    num_rows = 0
+    for rec in _iter_records(in_path):
+        for k, v in rec.get('features', {}).items():
+            if k.startswith(exclude_prefixes):
+                continue
+            if _is_numeric(v):
+                names.add(k)
+            elif isinstance(v, str):
+                string_names.add(k)
+        num_rows += 1
+    feature_names = sorted(names)
+    col = {name: j for j, name in enumerate(feature_names)}
+
+    # Pass 2: values
+    features = np.lib.format.open_memmap(
+        out_dir / 'features.npy', mode='w+', dtype=np.float32,
+        shape=(num_rows, len(feature_names)),
+    )
+    str_cols = list(string_columns) + ([SEQUENCE_COLUMN] if include_sequence else [])
+    str_data = {c: bytearray() for c in str_cols}
+    str_offsets = {c: np.zeros(num_rows + 1, dtype=np.int64) for c in str_cols}
+    float_data = {c: np.full(num_rows, np.nan, dtype=np.float32) for c in float_columns}
+
+    row = np.empty(len(feature_names), dtype=np.float32)
+    for i, rec in enumerate(_iter_records(in_path)):
+        row.fill(np.nan)
+        for k, v in rec.get('features', {}).items():
+            j = col.get(k)
+            if j is not None and _is_numeric(v):
+                row[j] = v
+        features[i] = row
+
+        for c in str_cols:
+            value = rec.get(c)
+            if c == SEQUENCE_COLUMN and value is not None:
+                value = '\n'.join(value)
+            if value is not None:
+                str_data[c] += str(value).encode('utf-8')
+            str_offsets[c][i + 1] = len(str_data[c])
+        for c in float_columns:
+            value = rec.get(c)
+            if _is_numeric(value):
+                float_data[c][i] = value
+    features.flush()
+    del features
+
+    for c in str_cols:
+        np.save(out_dir / f'{c}.offsets.npy', str_offsets[c])
+        np.save(out_dir / f'{c}.data.npy', np.frombuffer(bytes(str_data[c]), dtype=np.uint8))
+    for c in float_columns:
+        np.save(out_dir / f'{c}.npy', float_data[c])
+
+    # schema.json is written last: its presence marks a complete store
+    tmp_path = out_dir / 'schema.json.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'version': FEATURE_STORE_VERSION,
+            'num_rows': num_rows,
+            'feature_names': feature_names,
+            'string_columns': str_cols,
+            'float_columns': list(float_columns),
+            'dropped_string_features': sorted(string_names),
+        }, f)
+    os.replace(tmp_path, out_dir / 'schema.json')
+    return num_rows
+
+
+# =============================================================================
+# Reader
+# =============================================================================
+
+class FeatureRow(Mapping):
+    """Read-only dict view of one row's features (absent features are skipped),
+    so code written against record['features'] dicts keeps working."""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: 'FeatureStore', index: int):
+        self.store = store
+        self.index = index
+
+    def _values(self) -> np.ndarray:
+        return self.store.features[self.index]
+
+    def __getitem__(self, name):
+        j = self.store.column_index.get(name)
+        if j is None:
+            raise KeyError(name)
+        value = self._values()[j]
+        if np.isnan(value):
+            raise KeyError(name)
+        return float(value)
+
+    def __iter__(self):
+        names = self.store.feature_names
+        for j in np.flatnonzero(~np.isnan(self._values())):
+            yield names[j]
+
+    def __len__(self):
+        return int((~np.isnan(self._values())).sum())
+
+    def items(self):
+        names = self.store.feature_names
+        values = self._values()
+        return [(names[j], float(values[j])) for j in np.flatnonzero(~np.isnan(values))]
+
+    def take(self, names: Sequence[str]) -> np.ndarray:
+        """float32 vector of ``names`` in order; absent features are 0."""
+        return self.store._select(self._values()[None, :], names)[0]
+
+
+class FeatureStore:
+    """Memory-mapped reader for a directory written by write_feature_store()."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'schema.json') as f:
+            schema = json.load(f)
+        if schema.get('version') != FEATURE_STORE_VERSION:
+            raise ValueError(f"Unsupported feature store version in {self.path}: "
+                             f"{schema.get('version')}")
+        self.num_rows = schema['num_rows']
+        self.feature_names: List[str] = schema['feature_names']
+        self.string_columns: List[str] = schema['string_columns']
+        self.float_columns: List[str] = schema['float_columns']
+        # String-valued input features that were not stored (unknown for older stores)
+        self.dropped_string_features: Optional[List[str]] = schema.get('dropped_string_features')
+        self.column_index: Dict[str, int] = {n: j for j, n in enumerate(self.feature_names)}
+        self.features = np.load(self.path / 'features.npy', mmap_mode='r')
+        self._columns_cache: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self):
+        return self.num_rows
+
+    @property
+    def has_sequences(self) -> bool:
+        return SEQUENCE_COLUMN in self.string_columns
+
+    def columns_for(self, names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(store column indices, positions in ``names``) for the names the store has."""
+        key = tuple(names)
+        cached = self._columns_cache.get(key)
+        if cached is None:
+            pos = [i for i, n in enumerate(key) if n in self.column_index]
+            cols = [self.column_index[key[i]] for i in pos]
+            cached = (np.array(cols, dtype=np.int64), np.array(pos, dtype=np.int64))
+            self._columns_cache[key] = cached
+        return cached
+
+    def _select(self, data: np.ndarray, names: Sequence[str]) -> np.ndarray:
+        cols, pos = self.columns_for(names)
+        out = np.zeros((data.shape[0], len(names)), dtype=np.float32)
+        values = np.asarray(data[:, cols])
+        # Only NaN means "absent"; +/-inf values are passed through unchanged
+        out[:, pos] = np.where(np.isnan(values), 0.0, values)
+        return out
+
+    def matrix(self, names: Optional[Sequence[str]] = None,
+               rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dense float32 [rows, len(names)] copy with absent features as 0."""
+        if names is None:
+            names = self.feature_names
+        data = self.features if rows is None else self.features[np.asarray(rows)]
+        return self._select(data, names)
+
+    def _string_arrays(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.load(self.path / f'{name}.offsets.npy', mmap_mode='r')
+        data = np.load(self.path / f'{name}.data.npy', mmap_mode='r')
+        return offsets, data
+
+    def column(self, name: str) -> List[str]:
+        """All values of a string column ('' where the record had none)."""
+        offsets, data = self._string_arrays(name)
+        blob = data.tobytes()
+        offsets = offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(self.num_rows)]
+
+    def float_column(self, name: str) -> np.ndarray:
+        """float32 [N] values of a float column (NaN where the record had none)."""
+        return np.load(self.path / f'{name}.npy', mmap_mode='r')
+
+    def sequences(self) -> List[List[str]]:
+        return [text.split('\n') if text else [] for text in self.column(SEQUENCE_COLUMN)]
+
+    def records(self) -> List[dict]:
+        """Records shaped like the JSONL ones. 'features' is a lazy FeatureRow;
+        keys whose value was missing in the source are left out."""
+        records = [{'features': FeatureRow(self, i)} for i in range(self.num_rows)]
+        for name in self.string_columns:
+            values = self.sequences() if name == SEQUENCE_COLUMN else self.column(name)
+            for rec, value in zip(records, values):
+                if value or name == SEQUENCE_COLUMN:
+                    rec[name] = value
+        for name in self.float_columns:
+            values = self.float_column(name).tolist()
+            for rec, value in zip(records, values):
+                if value == value:  # not NaN
+                    rec[name] = value
+        return records
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a features JSONL into a feature store")
+    ap.add_argument('--in', dest='inp', type=Path, required=True)
+    ap.add_argument('--out', type=Path, required=True)
+    ap.add_argument('--with-sequence', action='store_true',
+                    help="Also store instruction sequences (needed by the graph/sequence trainers)")
+    ap.add_argument('--exclude-prefix', action='append', default=[],
+                    help="Drop feature columns with this prefix (repeatable, e.g. ng_)")
+    args = ap.parse_args()
+
+    n = write_feature_store(args.inp, args.out, include_sequence=args.with_sequence,
+                            exclude_prefixes=args.exclude_prefix)
+    store = FeatureStore(args.out)
+    print(f"Wrote {n} rows x {len(store.feature_names)} features to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,29 @@ import numpy as np
 # GGNN LAYER
 # =============================================================================
 
+def propagate(adj: torch.Tensor, msg: torch.Tensor) -> torch.Tensor:
+    """
+    Aggregate neighbor messages: out[b, i] = sum_j adj[b, i, j] * msg[b, j].
+
+    adj is either a dense [batch, nodes, nodes] matrix or a sparse COO tensor
+    of the same shape; the sparse path gathers/scatters only the stored edges,
+    so memory and compute scale with the number of edges.
+    """
+    if not adj.is_sparse:
+        return torch.bmm(adj, msg)
+    
+    batch_size, num_nodes, hidden_dim = msg.shape
+    adj = adj if adj.is_coalesced() else adj.coalesce()
+    b, rows, cols = adj.indices()
+    weights = adj.values().to(msg.dtype).unsqueeze(-1)
+    
+    msg_flat = msg.reshape(batch_size * num_nodes, hidden_dim)
+    out = torch.zeros_like(msg_flat).index_add_(
+        0, b * num_nodes + rows, msg_flat[b * num_nodes + cols] * weights
+    )
+    return out.view(batch_size, num_nodes, hidden_dim)
+
+
 class GGNNLayer(nn.Module):
     """
     Gated Graph Neural Network Layer
@@ -69,7 +92,7 @@ class GGNNLayer(nn.Module):
         Args:
             h: Node embeddings [batch, nodes, hidden_dim]
             adj_list: List of adjacency matrices per edge type
-                     Each: [batch, nodes, nodes]
+                     Each: [batch, nodes, nodes], dense or sparse COO
         
         Returns:
             Updated node embeddings [batch, nodes, hidden_dim]
@@ -85,7 +108,7 @@ class GGNNLayer(nn.Module):
             
             # Aggregate: for each node, sum transformed embeddings of neighbors
             # adj[i,j] = 1 means edge from j to i
-            msg = torch.bmm(adj, h_transformed)  # [batch, nodes, hidden]
+            msg = propagate(adj, h_transformed)  # [batch, nodes, hidden]
             
             messages = messages + msg
         
@@ -165,8 +188,8 @@ class GGNN(nn.Module):
         # Initial projection
         h = self.input_proj(x)
         
-        # Message passing steps
-        adj_list = [adj_data, adj_control]
+        # Message passing steps; coalesce sparse adjacencies once rather than in every step
+        adj_list = [adj.coalesce() if adj.is_sparse else adj for adj in (adj_data, adj_control)]
         
         for t in range(self.num_steps):
             h_new = self.ggnn_layer(h, adj_list)
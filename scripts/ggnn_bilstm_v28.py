@@ -20,6 +20,8 @@ import torch.nn.functional as F
 from typing import Tuple, Optional, List
 import numpy as np
 
+from ggnn_bilstm import propagate
+
 
 # =============================================================================
 # EDGE-TYPE ATTENTION GGNN LAYER
@@ -96,7 +98,7 @@ class EdgeTypeAttentionGGNNLayer(nn.Module):
         Args:
             h: Node embeddings [batch, nodes, hidden_dim]
             adj_list: List of adjacency matrices per edge type
-                     Each: [batch, nodes, nodes]
+                     Each: [batch, nodes, nodes], dense or sparse COO (see propagate)
         
         Returns:
             h_new: Updated node embeddings [batch, nodes, hidden_dim]
@@ -113,12 +115,8 @@ class EdgeTypeAttentionGGNNLayer(nn.Module):
             # Transform node embeddings for this edge type
             h_transformed = edge_transform(h)  # [batch, nodes, hidden]
             
-            # Create attention mask from adjacency (1 = attend, 0 = mask)
-            # MultiheadAttention expects True = masked out
-            attn_mask = (adj == 0)  # [batch, nodes, nodes]
-            
             # Apply multi-head attention for neighbor aggregation
-            # Query: h, Key/Value: h_transformed, Mask: attn_mask
+            # Query: h, Key/Value: h_transformed
             msg, _ = neighbor_attn(
                 query=h,
                 key=h_transformed,
@@ -128,7 +126,7 @@ class EdgeTypeAttentionGGNNLayer(nn.Module):
             )
             
             # Weight by adjacency for proper neighborhood aggregation
-            msg_weighted = torch.bmm(adj, msg)  # [batch, nodes, hidden]
+            msg_weighted = propagate(adj, msg)  # [batch, nodes, hidden]
             
             messages_per_type.append(msg_weighted)
         
@@ -233,7 +231,8 @@ class EdgeTypeAttentionGGNN(nn.Module):
         # Initial projection
         h = self.input_proj(x)
         
-        adj_list = [adj_data, adj_control]
+        # Coalesce sparse adjacencies once rather than in every step
+        adj_list = [adj.coalesce() if adj.is_sparse else adj for adj in (adj_data, adj_control)]
         edge_attn_all = []
         
         # Message passing steps
@@ -22,6 +22,8 @@ import torch.nn.functional as F
 from typing import Tuple, Optional, List
 import numpy as np
 
+from ggnn_bilstm import propagate
+
 
 # =============================================================================
 # EDGE-TYPE ATTENTION GGNN LAYER (from V28)
@@ -30,6 +32,8 @@ import numpy as np
 class EdgeTypeAttentionGGNNLayer(nn.Module):
     """
     GGNN Layer with Edge-Type Specific Attention
+
+    Adjacencies may be dense [batch, nodes, nodes] or sparse COO (see propagate).
     """
     
     def __init__(
@@ -99,7 +103,7 @@ class EdgeTypeAttentionGGNNLayer(nn.Module):
                 attn_mask=None,
             )
             
-            msg_weighted = torch.bmm(adj, msg)
+            msg_weighted = propagate(adj, msg)
             messages_per_type.append(msg_weighted)
         
         # Stack and compute edge-type attention
@@ -177,7 +181,8 @@ class EdgeTypeAttentionGGNN(nn.Module):
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         h = self.input_proj(x)
         
-        adj_list = [adj_data, adj_control]
+        # Coalesce sparse adjacencies once rather than in every step
+        adj_list = [adj.coalesce() if adj.is_sparse else adj for adj in (adj_data, adj_control)]
         edge_attn_all = []
         
         for ggnn_layer, ln in zip(self.ggnn_layers, self.layer_norms):
@@ -437,7 +442,9 @@ class HybridGGNNBiLSTMv29(nn.Module):
         Args:
             node_features: [batch, max_nodes, node_feature_dim]
             adj_data: Data dependency adjacency [batch, max_nodes, max_nodes]
+                (dense, or sparse COO)
             adj_control: Control dependency adjacency [batch, max_nodes, max_nodes]
+                (dense, or sparse COO)
             topo_order: Topological ordering indices [batch, max_nodes]
             node_mask: Valid node mask [batch, max_nodes]
             seq_lengths: Number of valid nodes per sample [batch]
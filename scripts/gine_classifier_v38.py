@@ -24,6 +24,14 @@ All other v35 architecture is unchanged:
 - Sum pooling graph readout
 - Dual-path fusion (graph 256 + features 256 = 512)
 - Supervised contrastive loss with hard negative mining
+
+Sparse batch mode (forward_sparse / encode_graph_sparse):
+   Graphs are concatenated PyG-style — node_features [N_total, F],
+   edge_index [2, E_total] with global node ids, and a `batch` vector [N_total]
+   mapping each node to its graph. Message passing, the virtual node and the
+   sum readout use index_add_ segment sums, so no FLOPs or memory are spent on
+   padding. Parameters are shared with the padded path; only BatchNorm
+   statistics differ slightly because padded rows are no longer included.
 """
 
 import torch
@@ -84,6 +92,18 @@ class GINELayer(nn.Module):
             h_new = h_new * node_mask.unsqueeze(-1).float()
         return h_new
 
+    def forward_sparse(self, h, edge_index, edge_attr, edge_weight=None):
+        """Sparse variant: h [N, H], edge_index [2, E] (global ids), edge_attr [E, H]."""
+        src_idx, dst_idx = edge_index[0], edge_index[1]
+        messages = F.relu(h[src_idx] + edge_attr)
+        if edge_weight is not None:
+            messages = messages * edge_weight.unsqueeze(-1)
+
+        agg = torch.zeros_like(h).index_add_(0, dst_idx, messages)
+
+        h_new = (1 + self.eps) * h + agg
+        return self.bn(self.mlp(h_new))
+
 
 # =============================================================================
 # VIRTUAL NODE (unchanged from v35)
@@ -120,6 +140,17 @@ class VirtualNodeUpdate(nn.Module):
             h_updated = h_updated * node_mask.unsqueeze(-1).float()
         return h_updated, vn_new
 
+    def forward_sparse(self, h, vn, batch):
+        """Sparse variant: h [N, H], vn [B, H], batch [N] graph id per node."""
+        node_sum = torch.zeros_like(vn).index_add_(0, batch, h)
+        vn_new = vn + node_sum
+        vn_new = self.mlp(vn_new)
+        vn_new = self.bn(vn_new)
+        vn_new = vn_new + vn
+        gate_val = torch.sigmoid(self.gate)
+        h_updated = h + gate_val * vn_new[batch]
+        return h_updated, vn_new
+
 
 # =============================================================================
 # GINE CLASSIFIER v38
@@ -277,13 +308,60 @@ class GINEClassifier(nn.Module):
 
         return graph_repr
 
+    def encode_graph_sparse(self, node_features, edge_index, edge_type, batch,
+                            num_graphs, edge_weight=None):
+        """Sparse-batch encode_graph.
+
+        Args:
+            node_features: [N_total, node_feat_dim] concatenated node features
+            edge_index: [2, E_total] edge list with global node ids
+            edge_type: [E_total] edge types
+            batch: [N_total] graph index of each node
+            num_graphs: number of graphs B in the batch
+            edge_weight: optional [E_total] edge weights
+
+        Returns:
+            [B, raw_graph_dim] graph representations
+        """
+        h = self.node_encoder(node_features)
+
+        edge_attr = self.edge_encoder(edge_type)  # [E, H]
+        edge_attr = edge_attr * self.edge_type_scale[edge_type].unsqueeze(-1)
+
+        if self.use_virtual_node:
+            vn = self.vn_init.expand(num_graphs, -1)
+
+        layer_outputs = [h]
+
+        for layer_idx in range(self.num_layers):
+            h_new = self.gine_layers[layer_idx].forward_sparse(
+                h, edge_index, edge_attr, edge_weight
+            )
+            h = self.layer_norms[layer_idx](h + h_new)
+            if self.use_virtual_node:
+                h, vn = self.vn_updates[layer_idx].forward_sparse(h, vn, batch)
+            layer_outputs.append(h)
+
+        if self.jk_mode == "cat":
+            h_jk = torch.cat(layer_outputs, dim=-1)
+        elif self.jk_mode == "sum":
+            h_jk = torch.stack(layer_outputs, dim=0).sum(dim=0)
+        else:
+            h_jk = layer_outputs[-1]
+
+        # Segment-sum readout
+        graph_repr = h_jk.new_zeros(num_graphs, h_jk.shape[-1]).index_add_(0, batch, h_jk)
+        return graph_repr
+
     def forward(self, node_features, edge_index, edge_type, node_mask,
                 handcrafted_features, return_projection=False,
                 edge_mask=None, edge_weight=None):
         graph_repr_raw = self.encode_graph(
             node_features, edge_index, edge_type, node_mask, edge_mask, edge_weight
         )
+        return self._head(graph_repr_raw, handcrafted_features, return_projection)
 
+    def _head(self, graph_repr_raw, handcrafted_features, return_projection=False):
         graph_repr = self.graph_projector(graph_repr_raw)
         feat_repr = self.feature_encoder(handcrafted_features)
         combined = torch.cat([graph_repr, feat_repr], dim=-1)
@@ -298,6 +376,16 @@ class GINEClassifier(nn.Module):
 
         return logits
 
+    def forward_sparse(self, node_features, edge_index, edge_type, batch,
+                       handcrafted_features, return_projection=False,
+                       edge_weight=None):
+        """forward() for sparse (concatenated) batches; see encode_graph_sparse."""
+        graph_repr_raw = self.encode_graph_sparse(
+            node_features, edge_index, edge_type, batch,
+            handcrafted_features.shape[0], edge_weight
+        )
+        return self._head(graph_repr_raw, handcrafted_features, return_projection)
+
     def get_edge_type_scales(self) -> dict:
         """Return current learned edge-type scale values for logging."""
         from pdg_builder import EDGE_TYPES
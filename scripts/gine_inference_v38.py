@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Standalone CPU inference for the V38 GINE classifier.
+
+Scanning with the v38 model used to mean building the training GINEDatasetV38
+and running evaluate() from train_gine_v38.py. This module provides:
+
+export   Trace a trained GINEClassifier (virtual node and edge-type scaling
+         included) to TorchScript or ONNX with a dynamic batch dimension.
+         BatchNorm layers are folded into the preceding Linear layers and,
+         with --quantize, the Linear layers of every MLP are dynamically
+         quantized to int8 (TorchScript only). A <model>.json sidecar carries
+         the labels, handcrafted feature names and graph caps.
+
+predict  Score raw instruction windows (JSONL, one {"id", "sequence",
+         "features"?} object per line) in batches with a tuned number of
+         CPU threads. Accepts a training checkpoint (gine_best.pt) or an
+         exported model. Graph construction and, for windows without
+         'features', extract_features_enhanced() run in --workers processes.
+
+The exported model runs GINEClassifier.forward_sparse on concatenated graphs
+(the sparse GINETensorStore batch layout of train_gine_v38.py) and returns class
+probabilities. In eval mode this equals the padded forward, but no work is
+spent on padding nodes and edges, which dominate a padded CPU batch:
+
+    node_features [N, 35]   edge_index [2, E]   edge_type [E]   edge_weight [E]
+    batch [N] (graph of each node)   handcrafted [B, n_features]  ->  probs [B, n_classes]
+
+Usage:
+    python scripts/gine_inference_v38.py export --checkpoint viz_v38_gine_stripped/gine_best.pt \\
+        --out models/gine_v38.ts --quantize
+    python scripts/gine_inference_v38.py predict --model models/gine_v38.ts \\
+        --input windows.jsonl --output predictions.jsonl --threads 8 --workers 4
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pdg_builder import PDGBuilder, NUM_EDGE_TYPES
+from pdg_cache import build_pdg_arrays
+from gine_classifier_v38 import GINEClassifier, GINELayer, VirtualNodeUpdate
+from gine_samples_v38 import (
+    MAX_NODES, MAX_EDGES, NODE_FEATURE_DIM, gine_graph_arrays, handcrafted_vector,
+)
+
+INPUT_NAMES = ['node_features', 'edge_index', 'edge_type', 'edge_weight', 'batch', 'handcrafted']
+# Dynamic axes: total nodes N, total edges E and graphs B vary per batch
+DYNAMIC_AXES = {
+    'node_features': {0: 'nodes'}, 'edge_index': {1: 'edges'}, 'edge_type': {0: 'edges'},
+    'edge_weight': {0: 'edges'}, 'batch': {0: 'nodes'}, 'handcrafted': {0: 'graphs'},
+    'probs': {0: 'graphs'},
+}
+
+
+# =============================================================================
+# MODEL PREPARATION
+# =============================================================================
+
+class GINEProbabilities(nn.Module):
+    """Sparse-batch GINEClassifier returning softmax probabilities (the export graph)."""
+
+    def __init__(self, model: GINEClassifier):
+        super().__init__()
+        self.model = model
+
+    def forward(self, node_features, edge_index, edge_type, edge_weight, batch, handcrafted):
+        logits = self.model.forward_sparse(node_features, edge_index, edge_type, batch,
+                                           handcrafted, edge_weight=edge_weight)
+        return F.softmax(logits, dim=-1)
+
+
+def load_checkpoint(path: Path) -> Tuple[GINEClassifier, Dict]:
+    """GINEClassifier (eval mode) and inference metadata of a train_gine_v38 checkpoint."""
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    args = checkpoint.get('args', {})
+    label_to_id = checkpoint['label_to_id']
+    feature_names = checkpoint['feature_names']
+    model = GINEClassifier(
+        node_feat_dim=NODE_FEATURE_DIM,
+        num_edge_types=NUM_EDGE_TYPES,
+        hidden_dim=args.get('hidden_dim', 256),
+        num_layers=args.get('num_layers', 4),
+        num_classes=len(label_to_id),
+        handcrafted_dim=len(feature_names),
+        dropout=args.get('dropout', 0.3),
+        use_virtual_node=not args.get('no_virtual_node', False),
+        jk_mode=args.get('jk_mode', 'cat'),
+    )
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    meta = {
+        'labels': [label for label, _ in sorted(label_to_id.items(), key=lambda kv: kv[1])],
+        'feature_names': feature_names,
+        'max_nodes': MAX_NODES,
+        'max_edges': MAX_EDGES,
+        'strip_boilerplate': not args.get('no_strip', False),
+        'speculative_window': args.get('speculative_window', 10),
+        'source_checkpoint': str(path),
+        'epoch': checkpoint.get('epoch'),
+    }
+    return model, meta
+
+
+def _fold_linear_bn(linear: nn.Linear, bn: nn.BatchNorm1d) -> nn.Linear:
+    return torch.nn.utils.fusion.fuse_linear_bn_eval(linear, bn)
+
+
+def fold_batchnorm(model: nn.Module) -> nn.Module:
+    """Fold every eval-mode BatchNorm1d into the Linear layer that feeds it (in place).
+
+    Covers Linear -> BatchNorm1d pairs inside Sequentials and the trailing
+    BatchNorm of GINELayer / VirtualNodeUpdate, which follows the last Linear
+    of their MLP. The folded model computes the same function.
+    """
+    assert not model.training, "fold_batchnorm needs an eval-mode model"
+    for module in model.modules():
+        if isinstance(module, nn.Sequential):
+            for i in range(len(module) - 1):
+                if isinstance(module[i], nn.Linear) and isinstance(module[i + 1], nn.BatchNorm1d):
+                    module[i] = _fold_linear_bn(module[i], module[i + 1])
+                    module[i + 1] = nn.Identity()
+        if isinstance(module, (GINELayer, VirtualNodeUpdate)) and isinstance(module.bn, nn.BatchNorm1d):
+            module.mlp[-1] = _fold_linear_bn(module.mlp[-1], module.bn)
+            module.bn = nn.Identity()
+    return model
+
+
+def quantize_int8(module: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of all Linear layers (weights int8, activations quantized per batch)."""
+    return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+
+
+def example_inputs(meta: Dict, batch_size: int = 2, seed: int = 0) -> Tuple[torch.Tensor, ...]:
+    """Random sparse batch of chain graphs with 2..max_nodes nodes, for tracing and checks."""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for _ in range(batch_size):
+        n = int(rng.integers(2, meta['max_nodes'] + 1))
+        samples.append({
+            'node_features': rng.random((n, NODE_FEATURE_DIM), dtype=np.float32),
+            'edge_index': np.stack([np.arange(n - 1), np.arange(1, n)]).astype(np.int64),
+            'edge_type': rng.integers(0, NUM_EDGE_TYPES, n - 1).astype(np.int64),
+            'edge_weight': np.ones(n - 1, dtype=np.float32),
+            'handcrafted': rng.standard_normal(len(meta['feature_names'])).astype(np.float32),
+        })
+    return concat_batch(samples)
+
+
+def export_model(checkpoint: Path, out: Path, fmt: str = 'torchscript',
+                 quantize: bool = False, opset: int = 17) -> Dict:
+    """Export a checkpoint to TorchScript or ONNX; writes <out>.json and returns the metadata."""
+    model, meta = load_checkpoint(checkpoint)
+    reference = GINEProbabilities(model).eval()
+    module = GINEProbabilities(fold_batchnorm(copy.deepcopy(model))).eval()
+    if quantize:
+        if fmt != 'torchscript':
+            raise ValueError("int8 quantization is only supported for TorchScript export")
+        module = quantize_int8(module)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    inputs = example_inputs(meta)
+    with torch.no_grad():
+        if fmt == 'torchscript':
+            traced = torch.jit.freeze(torch.jit.trace(module, inputs))
+            torch.jit.save(traced, str(out))
+            # Check the trace generalizes to another batch size
+            check = example_inputs(meta, batch_size=5, seed=1)
+            diff = (traced(*check) - reference(*check)).abs().max().item()
+        else:
+            torch.onnx.export(
+                module, inputs, str(out),
+                input_names=INPUT_NAMES, output_names=['probs'],
+                dynamic_axes=DYNAMIC_AXES,
+                opset_version=opset, dynamo=False,
+            )
+            diff = None
+
+    meta.update({'format': fmt, 'quantized': quantize, 'batchnorm_folded': True})
+    if diff is not None:
+        meta['max_abs_diff_vs_checkpoint'] = diff
+    with open(sidecar_path(out), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def sidecar_path(model_path: Path) -> Path:
+    return model_path.with_name(model_path.name + '.json')
+
+
+# =============================================================================
+# FEATURIZATION
+# =============================================================================
+
+_worker_state: Dict = {}
+
+
+def _init_featurizer(meta: Dict):
+    _worker_state['builder'] = PDGBuilder(speculative_window=meta['speculative_window'])
+    _worker_state['meta'] = meta
+
+
+def _featurize(window: Dict) -> Optional[Dict]:
+    """Unpadded model inputs of one window, or None if it has too few instructions/nodes."""
+    meta = _worker_state['meta']
+    sequence = window.get('sequence') or []
+    if len(sequence) < 3:
+        return None
+    graph = build_pdg_arrays(_worker_state['builder'], sequence, meta['strip_boilerplate'])
+    if graph['node_features'].shape[0] < 2:
+        return None
+    sample = gine_graph_arrays(graph, meta['max_nodes'], meta['max_edges'], pad=False)
+
+    features = window.get('features')
+    if not isinstance(features, dict):
+        from extract_features_enhanced import extract_features_enhanced
+        features = extract_features_enhanced({'sequence': sequence, 'arch': window.get('arch', 'unknown'),
+                                              'features': {}})
+    sample['handcrafted'] = handcrafted_vector(features, meta['feature_names'])
+    return sample
+
+
+def concat_batch(samples: List[Dict]) -> Tuple[torch.Tensor, ...]:
+    """Concatenate unpadded samples into model inputs (as a sparse GINETensorStore batch does)."""
+    num_nodes = np.array([s['node_features'].shape[0] for s in samples])
+    offsets = np.cumsum(num_nodes) - num_nodes
+    return (
+        torch.from_numpy(np.concatenate([s['node_features'] for s in samples])),
+        torch.from_numpy(np.concatenate([s['edge_index'] + off for s, off in zip(samples, offsets)], axis=1)),
+        torch.from_numpy(np.concatenate([s['edge_type'] for s in samples])),
+        torch.from_numpy(np.concatenate([s['edge_weight'] for s in samples])),
+        torch.from_numpy(np.repeat(np.arange(len(samples)), num_nodes)),
+        torch.from_numpy(np.stack([s['handcrafted'] for s in samples])),
+    )
+
+
+# =============================================================================
+# PREDICTOR
+# =============================================================================
+
+class GINEPredictor:
+    """Batched CPU inference from a checkpoint or an exported model.
+
+    A checkpoint is loaded eagerly (BatchNorm folded, optionally int8
+    quantized); a path with a <model>.json sidecar is loaded as an exported
+    TorchScript or ONNX model.
+    """
+
+    def __init__(self, model_path: Path, threads: int = 0, quantize: bool = False,
+                 batch_size: int = 256, workers: int = 1):
+        model_path = Path(model_path)
+        if threads:
+            torch.set_num_threads(threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass  # already set (inter-op pool started)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.session = None
+        self._pool = None
+
+        sidecar = sidecar_path(model_path)
+        if sidecar.exists():
+            with open(sidecar) as f:
+                self.meta = json.load(f)
+            if self.meta['format'] == 'onnx':
+                try:
+                    import onnxruntime as ort
+                except ImportError as e:
+                    raise ImportError("ONNX models need onnxruntime (pip install onnxruntime)") from e
+                options = ort.SessionOptions()
+                if threads:
+                    options.intra_op_num_threads = threads
+                    options.inter_op_num_threads = 1
+                self.session = ort.InferenceSession(str(model_path), options,
+                                                    providers=['CPUExecutionProvider'])
+                self.module = None
+            else:
+                self.module = torch.jit.load(str(model_path), map_location='cpu')
+        else:
+            model, self.meta = load_checkpoint(model_path)
+            self.module = GINEProbabilities(fold_batchnorm(model)).eval()
+            if quantize:
+                self.module = quantize_int8(self.module)
+            self.meta.update({'format': 'checkpoint', 'quantized': quantize})
+        self.labels = self.meta['labels']
+
+    def _run(self, inputs: Tuple[torch.Tensor, ...]) -> np.ndarray:
+        if self.session is not None:
+            feeds = {name: t.numpy() for name, t in zip(INPUT_NAMES, inputs)}
+            return self.session.run(['probs'], feeds)[0]
+        with torch.inference_mode():
+            return self.module(*inputs).numpy()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _samples(self, windows: List[Dict]) -> Iterator[Optional[Dict]]:
+        if self.workers > 1 and len(windows) > 1:
+            if self._pool is None:
+                self._pool = Pool(self.workers, initializer=_init_featurizer, initargs=(self.meta,))
+            chunksize = max(1, min(64, len(windows) // (4 * self.workers)))
+            yield from self._pool.imap(_featurize, windows, chunksize=chunksize)
+        else:
+            _init_featurizer(self.meta)
+            for window in windows:
+                yield _featurize(window)
+
+    def predict_proba(self, windows: List[Dict]) -> List[Optional[np.ndarray]]:
+        """Class probabilities per window (None for windows that cannot be scored)."""
+        results: List[Optional[np.ndarray]] = [None] * len(windows)
+        pending: List[Tuple[int, Dict]] = []
+
+        def flush():
+            probs = self._run(concat_batch([s for _, s in pending]))
+            for (i, _), row in zip(pending, probs):
+                results[i] = row
+            pending.clear()
+
+        for i, sample in enumerate(self._samples(windows)):
+            if sample is not None:
+                pending.append((i, sample))
+                if len(pending) >= self.batch_size:
+                    flush()
+        if pending:
+            flush()
+        return results
+
+    def predict(self, windows: List[Dict]) -> List[Dict]:
+        """Response dicts in the ensemble_inference_server format."""
+        responses = []
+        for window, row in zip(windows, self.predict_proba(windows)):
+            if row is None:
+                responses.append({'id': window.get('id'), 'error': 'window too small for a PDG'})
+                continue
+            best = int(row.argmax())
+            responses.append({
+                'id': window.get('id'),
+                'label': self.labels[best],
+                'confidence': float(row[best]),
+                'probs': {label: float(p) for label, p in zip(self.labels, row)},
+            })
+        return responses
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def read_windows(path: Optional[Path]) -> Iterable[Dict]:
+    f = open(path) if path is not None else sys.stdin
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if path is not None:
+            f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GINE v38 export and batched CPU inference')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_export = sub.add_parser('export', help='Export a checkpoint to TorchScript or ONNX')
+    p_export.add_argument('--checkpoint', type=Path, required=True, help='gine_best.pt from train_gine_v38.py')
+    p_export.add_argument('--out', type=Path, required=True, help='Output model path')
+    p_export.add_argument('--format', choices=['torchscript', 'onnx'], default='torchscript')
+    p_export.add_argument('--quantize', action='store_true', help='Dynamic int8 quantization (TorchScript)')
+    p_export.add_argument('--opset', type=int, default=17, help='ONNX opset version')
+
+    p_predict = sub.add_parser('predict', help='Score instruction windows (JSONL in, JSONL out)')
+    p_predict.add_argument('--model', type=Path, required=True,
+                           help='Exported model (with .json sidecar) or training checkpoint')
+    p_predict.add_argument('--input', type=Path, default=None, help='Windows JSONL (default: stdin)')
+    p_predict.add_argument('--output', type=Path, default=None, help='Predictions JSONL (default: stdout)')
+    p_predict.add_argument('--batch-size', type=int, default=256)
+    p_predict.add_argument('--threads', type=int, default=0, help='Intra-op CPU threads (0 = torch default)')
+    p_predict.add_argument('--workers', type=int, default=1, help='Featurization processes')
+    p_predict.add_argument('--quantize', action='store_true',
+                           help='int8-quantize a checkpoint on load (exported models are used as exported)')
+    p_predict.add_argument('--chunk', type=int, default=8192, help='Windows read per featurization chunk')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        meta = export_model(args.checkpoint, args.out, args.format, args.quantize, args.opset)
+        print(f"Exported {args.checkpoint} -> {args.out} ({args.format}"
+              f"{', int8' if args.quantize else ''}, {len(meta['labels'])} classes)")
+        if 'max_abs_diff_vs_checkpoint' in meta:
+            print(f"  max |probs - checkpoint probs| on a check batch: {meta['max_abs_diff_vs_checkpoint']:.2e}")
+        print(f"  Metadata: {sidecar_path(args.out)}")
+        return
+
+    predictor = GINEPredictor(args.model, threads=args.threads, quantize=args.quantize,
+                              batch_size=args.batch_size, workers=args.workers)
+    out = open(args.output, 'w') if args.output is not None else sys.stdout
+    n = 0
+    start = time.perf_counter()
+    try:
+        chunk: List[Dict] = []
+        for window in read_windows(args.input):
+            chunk.append(window)
+            if len(chunk) >= args.chunk:
+                for response in predictor.predict(chunk):
+                    out.write(json.dumps(response) + '\n')
+                n += len(chunk)
+                chunk = []
+        if chunk:
+            for response in predictor.predict(chunk):
+                out.write(json.dumps(response) + '\n')
+            n += len(chunk)
+    finally:
+        predictor.close()
+        if args.output is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {n} windows in {elapsed:.1f}s ({n / max(elapsed, 1e-9):.1f} windows/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
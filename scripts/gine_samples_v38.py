@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Model inputs of one V38 GINE sample, shared by train_gine_v38.py and
+gine_inference_v38.py so that training and inference build identical tensors.
+
+    gine_graph_arrays(graph)          PDG arrays (pdg_cache.build_pdg_arrays output)
+                                      -> positional node feature, node/edge caps,
+                                      optional padding and masks
+    handcrafted_vector(features, names)
+                                      handcrafted feature vector in training order
+
+Usage:
+    from gine_samples_v38 import gine_graph_arrays, handcrafted_vector
+    sample = gine_graph_arrays(cache.get_or_build(sequence), pad=False)
+    sample['handcrafted'] = handcrafted_vector(rec['features'], feature_names)
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from pdg_cache import truncate_pdg_arrays
+from feature_store import FeatureRow
+
+# Graph caps shared by train_gine_v38.py and gine_inference_v38.py
+MAX_NODES = 64
+MAX_EDGES = 512
+NODE_FEATURE_DIM = 35  # 34 base + 1 positional
+
+
+# =============================================================================
+# SAMPLE CONSTRUCTION
+# =============================================================================
+
+def gine_graph_arrays(graph: Dict[str, np.ndarray], max_nodes: int = MAX_NODES,
+                      max_edges: int = MAX_EDGES, pad: bool = True) -> Dict:
+    """Model inputs of one PDG (build_pdg_arrays output).
+
+    Adds the relative-position node feature (34 -> 35 dims), truncates to the
+    node/edge caps and, with pad=True, pads to them and adds node/edge masks.
+    """
+    base_features, edge_index, edge_type, edge_weight = truncate_pdg_arrays(graph, max_nodes)
+    n_nodes = base_features.shape[0]
+
+    # Positional encoding: instruction_index / total_instructions
+    pos_enc = (np.arange(n_nodes) / max(n_nodes - 1, 1)).astype(np.float32)[:, None]
+    node_features = np.concatenate([base_features, pos_enc], axis=1)
+
+    n_edges = edge_index.shape[1]
+    if n_edges > max_edges:
+        edge_index = edge_index[:, :max_edges]
+        edge_type = edge_type[:max_edges]
+        edge_weight = edge_weight[:max_edges]
+        n_edges = max_edges
+
+    node_mask = edge_mask = None
+    if pad:
+        node_features = np.pad(node_features, ((0, max_nodes - n_nodes), (0, 0)))
+        pad_size = max_edges - n_edges
+        edge_index = np.pad(edge_index, ((0, 0), (0, pad_size)), constant_values=0)
+        edge_type = np.pad(edge_type, (0, pad_size), constant_values=0)
+        edge_weight = np.pad(edge_weight, (0, pad_size), constant_values=0.0)
+
+        node_mask = np.zeros(max_nodes, dtype=bool)
+        node_mask[:n_nodes] = True
+        edge_mask = np.zeros(max_edges, dtype=bool)
+        edge_mask[:n_edges] = True
+
+    return {
+        'node_features': node_features.astype(np.float32),
+        'edge_index': edge_index.astype(np.int64),
+        'edge_type': edge_type.astype(np.int64),
+        'edge_weight': edge_weight.astype(np.float32),
+        'node_mask': node_mask,
+        'edge_mask': edge_mask,
+        'n_edges': n_edges,
+    }
+
+
+def handcrafted_vector(features, feature_names: List[str]) -> np.ndarray:
+    """Handcrafted feature vector in training order; non-finite -> 0, clipped to [-100, 100]."""
+    if isinstance(features, FeatureRow):
+        values = features.take(feature_names)
+        return np.where(np.isfinite(values), np.clip(values, -100, 100), 0.0).astype(np.float32)
+    values = np.zeros(len(feature_names), dtype=np.float32)
+    for i, name in enumerate(feature_names):
+        val = features.get(name, 0.0)
+        if isinstance(val, (int, float)) and np.isfinite(val):
+            values[i] = np.clip(val, -100, 100)
+    return values
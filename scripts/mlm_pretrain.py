@@ -1,44 +1,116 @@
 #!/usr/bin/env python3
 import argparse
 from pathlib import Path
-import random
+import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, Sampler
+
+from build_mlm_corpus import is_binary_corpus, load_binary_corpus
 
 
 class MLMDataset(Dataset):
+    """Text corpus (one sentence per line), encoded once in memory; for small corpora."""
+
     def __init__(self, corpus: Path, vocab=None, max_len: int = 64, mask_prob: float = 0.15):
-        self.lines = [l.strip().split() for l in corpus.read_text().splitlines() if l.strip()]
+        lines = [l.strip().split() for l in corpus.read_text().splitlines() if l.strip()]
         self.max_len = max_len
         self.mask_prob = mask_prob
         # build vocab
         if vocab is None:
-            uniq = set(t for line in self.lines for t in line)
+            uniq = set(t for line in lines for t in line)
             self.vocab = {'<pad>': 0, '<unk>': 1, '<mask>': 2}
             for t in sorted(uniq):
                 if t not in self.vocab:
                     self.vocab[t] = len(self.vocab)
         else:
             self.vocab = vocab
+        self.ids = [np.array([self.vocab.get(t, 1) for t in line[: max_len]], dtype=np.int64) for line in lines]
+        self.lengths = np.array([len(x) for x in self.ids], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, idx):
+        # unmasked, unpadded ids; MLMCollator pads and masks per batch
+        return self.ids[idx]
+
+
+class MemmapMLMDataset(Dataset):
+    """Binary corpus from build_mlm_corpus.py (memory-mapped token ids + offsets index)."""
+
+    def __init__(self, prefix: Path, max_len: int = 64, mask_prob: float = 0.15):
+        self.prefix = prefix
+        self.max_len = max_len
+        self.mask_prob = mask_prob
+        tokens, offsets, self.vocab = load_binary_corpus(prefix)
+        self.lengths = np.minimum(np.diff(offsets), max_len)
+        self._tokens = self._offsets = None  # opened lazily in each DataLoader worker
 
     def __len__(self):
-        return len(self.lines)
+        return len(self.lengths)
 
     def __getitem__(self, idx):
-        toks = self.lines[idx][: self.max_len]
-        ids = [self.vocab.get(t, 1) for t in toks]
-        # pad
-        if len(ids) < self.max_len:
-            ids += [0] * (self.max_len - len(ids))
-        input_ids = ids.copy()
-        labels = [-100] * len(ids)
-        # mask some tokens
-        for i in range(len(toks)):
-            if random.random() < self.mask_prob:
-                labels[i] = ids[i]
-                input_ids[i] = self.vocab.get('<mask>', 2)
-        return torch.tensor(input_ids, dtype=torch.long), torch.tensor(labels, dtype=torch.long)
+        if self._tokens is None:
+            self._tokens, self._offsets, _ = load_binary_corpus(self.prefix)
+        start = int(self._offsets[idx])
+        return self._tokens[start: start + int(self.lengths[idx])].astype(np.int64)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tokens'] = state['_offsets'] = None
+        return state
+
+
+class MLMCollator:
+    """Pads a batch to its longest sentence and masks it in one vectorized step."""
+
+    def __init__(self, mask_id: int = 2, mask_prob: float = 0.15):
+        self.mask_id = mask_id
+        self.mask_prob = mask_prob
+
+    def __call__(self, batch):
+        width = max(len(x) for x in batch)
+        ids = torch.zeros(len(batch), width, dtype=torch.long)
+        for i, x in enumerate(batch):
+            ids[i, : len(x)] = torch.from_numpy(x)
+        mask = (torch.rand(ids.shape) < self.mask_prob) & ids.ne(0)
+        labels = torch.where(mask, ids, torch.full_like(ids, -100))
+        return ids.masked_fill(mask, self.mask_id), labels
+
+
+class LengthBucketSampler(Sampler):
+    """Batch sampler grouping sentences of similar length, to keep padding small.
+
+    Each epoch the indices are shuffled, cut into pools of `pool_batches`
+    batches, sorted by length within a pool and split into batches; the
+    batch order is shuffled again.
+    """
+
+    def __init__(self, lengths, batch_size: int, pool_batches: int = 100, drop_last: bool = False):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.pool_size = batch_size * pool_batches
+        self.drop_last = drop_last
+
+    def __iter__(self):
+        perm = torch.randperm(len(self.lengths)).numpy()
+        batches = []
+        for p in range(0, len(perm), self.pool_size):
+            pool = perm[p: p + self.pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind='stable')]
+            for b in range(0, len(pool), self.batch_size):
+                batch = pool[b: b + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch.tolist())
+        for i in torch.randperm(len(batches)).tolist():
+            yield batches[i]
+
+    def __len__(self):
+        n = len(self.lengths)
+        if self.drop_last:
+            return sum((min(self.pool_size, n - p)) // self.batch_size for p in range(0, n, self.pool_size))
+        return sum(-(-min(self.pool_size, n - p) // self.batch_size) for p in range(0, n, self.pool_size))
 
 
 class TinyMLM(nn.Module):
@@ -58,13 +130,30 @@ class TinyMLM(nn.Module):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--corpus', type=Path, default=Path('data/dataset/mlm_corpus.txt'))
+    ap.add_argument('--corpus', type=Path, default=Path('data/dataset/mlm_corpus.txt'),
+                    help='Text corpus; its binary form (build_mlm_corpus.py) is used when present')
     ap.add_argument('--epochs', type=int, default=3)
     ap.add_argument('--batch-size', type=int, default=64)
+    ap.add_argument('--max-len', type=int, default=64)
+    ap.add_argument('--mask-prob', type=float, default=0.15)
+    ap.add_argument('--num-workers', type=int, default=0, help='DataLoader worker processes')
+    ap.add_argument('--no-bucket', action='store_true', help='Plain shuffled batches instead of length buckets')
     args = ap.parse_args()
 
-    ds = MLMDataset(args.corpus, max_len=64)
-    dl = DataLoader(ds, batch_size=args.batch_size, shuffle=True)
+    prefix = args.corpus.with_suffix('') if args.corpus.suffix == '.txt' else args.corpus
+    if is_binary_corpus(prefix):
+        print(f'Using binary corpus {prefix}.*.npy')
+        ds = MemmapMLMDataset(prefix, max_len=args.max_len, mask_prob=args.mask_prob)
+    else:
+        ds = MLMDataset(args.corpus, max_len=args.max_len, mask_prob=args.mask_prob)
+    collate = MLMCollator(ds.vocab.get('<mask>', 2), args.mask_prob)
+    if args.no_bucket:
+        dl = DataLoader(ds, batch_size=args.batch_size, shuffle=True, collate_fn=collate,
+                        num_workers=args.num_workers)
+    else:
+        dl = DataLoader(ds, batch_sampler=LengthBucketSampler(ds.lengths, args.batch_size),
+                        collate_fn=collate, num_workers=args.num_workers,
+                        persistent_workers=args.num_workers > 0)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model = TinyMLM(len(ds.vocab)).to(device)
     opt = torch.optim.AdamW(model.parameters(), lr=1e-3)
@@ -18,12 +18,19 @@ Node features include:
 - Speculative flags (serializing, cache-probing, branch, etc.)
 """
 
+import os
 import re
-from typing import List, Dict, Tuple, Set, Optional
+import sys
+import multiprocessing as mp
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from dataclasses import dataclass, field
 from collections import defaultdict
 import numpy as np
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'githubCrawl'))
+from instruction_semantics import PDG_CLASSES, decode
+
 
 # =============================================================================
 # CONSTANTS & PATTERNS
@@ -91,51 +98,24 @@ EDGE_TYPES = {
 
 NUM_EDGE_TYPES = len(EDGE_TYPES)
 
-# Pre-compiled regex patterns
-PATTERNS = {
-    # Loads
-    'load_arm': re.compile(r'\b(ldr[bhsdq]?|ldp|ldur[bhsdq]?|ldrs[bhw]|ldax?r?|ldnp|ldtr|ldx[pr]?)\b', re.I),
-    'load_x86': re.compile(r'\b(mov[qldwb]?|movzx|movsx|movabs|lods[bwdq]?|pop[qldw]?|lea)\b', re.I),
-
-    # Stores
-    'store_arm': re.compile(r'\b(str[bhsdq]?|stp|stur[bhsdq]?|stlr|stxr|stnp|sttr)\b', re.I),
-    'store_x86': re.compile(r'\b(mov[qldwb]?|movnti|stos[bwdq]?|push[qldw]?)\b', re.I),
-
-    # Branches
-    'branch_cond': re.compile(
-        r'\b(b\.(eq|ne|lt|le|gt|ge|hs|lo|hi|ls|mi|pl|vs|vc|al)|'
-        r'beq|bne|blt|ble|bgt|bge|bhs|blo|bhi|bls|bmi|bpl|'
-        r'cbz|cbnz|tbz|tbnz|'
-        r'j[elgnas]|jn?[elgzsa]|j[abp]|jn?[abp]|jo|jno|jc|jnc|js|jns|jp|jnp|jcxz|jecxz|jrcxz)\b', re.I),
-    'branch_uncond': re.compile(r'\b(b\s|b$|jmp|jmpq)\b', re.I),
-
-    # Calls and returns
-    'call': re.compile(r'\b(bl|call|callq)\b', re.I),
-    'ret': re.compile(r'\b(ret|retq|retw|retl)\b', re.I),
-    'indirect': re.compile(r'\b(br|blr)\b|\b(jmpq?|callq?)\s*\*|\[x[0-9]+\]', re.I),
-
-    # Comparisons
-    'compare': re.compile(r'\b(cmp|cmn|test|tst|ccmp|ccmn|fcmp)\b', re.I),
+# Bump whenever PDGBuilder.build() output changes (node features, edge rules,
+# weights) so that on-disk PDG caches keyed on it are invalidated.
+PDG_BUILDER_VERSION = 1
 
-    # Arithmetic/Logic
-    'arithmetic': re.compile(r'\b(add|sub|mul|div|udiv|sdiv|madd|msub|neg|adc|sbc|inc|dec|imul|idiv)\b', re.I),
-    'logic': re.compile(r'\b(and|orr|eor|orn|bic|not|xor|or)\b', re.I),
-    'shift': re.compile(r'\b(lsl|lsr|asr|ror|shl|shr|sar|rol)\b', re.I),
-
-    # Fences
-    'fence': re.compile(r'\b(lfence|mfence|sfence|dsb|dmb|isb|cpuid)\b', re.I),
-
-    # Cache
-    'cache': re.compile(r'\b(clflush|clflushopt|clwb|cldemote|dc\s+(civac|cvac|cvau|zva|ivac)|invlpg|wbinvd)\b', re.I),
-
-    # Timing
-    'timing': re.compile(r'\b(rdtsc|rdtscp|rdpmc|mrs\s+.*cntvct|mrs\s+.*pmccntr)\b', re.I),
+# Opcode rules are mnemonic lookups in PDG_CLASSES (instruction_semantics).
+# These are the operand and register patterns, plus the rule forms that span
+# several tokens, which are only searched when their mnemonic is on the line.
+PATTERNS = {
+    # Branches: b.<cond>, and a bare 'b' (followed by whitespace or at the end)
+    'branch_cond_arm': re.compile(r'\bb\.(eq|ne|lt|le|gt|ge|hs|lo|hi|ls|mi|pl|vs|vc|al)\b', re.I),
+    'branch_uncond_arm': re.compile(r'\b(b\s|b$)\b', re.I),
 
-    # Moves
-    'move': re.compile(r'\b(mov[zskn]?)\b', re.I),
+    # Indirect through memory or a register (br/blr are PDG_CLASSES 'indirect')
+    'indirect': re.compile(r'\b(jmpq?|callq?)\s*\*|\[x[0-9]+\]', re.I),
 
-    # Stack
-    'stack_op': re.compile(r'\b(push|pop)\b', re.I),
+    # Cache maintenance and timer reads
+    'cache_dc': re.compile(r'\bdc\s+(civac|cvac|cvau|zva|ivac)\b', re.I),
+    'timing_mrs': re.compile(r'\b(mrs\s+.*cntvct|mrs\s+.*pmccntr)\b', re.I),
 
     # Memory patterns
     'stack_access': re.compile(r'\[sp|\[x29|\[fp|%[re]?sp|%[re]?bp|\[%[re]?[sb]p\]', re.I),
@@ -256,6 +236,29 @@ class PDG:
 
         return adj_data, adj_control
 
+    def get_sparse_adjacency(self, max_nodes: int) -> Tuple[Tuple[np.ndarray, np.ndarray],
+                                                            Tuple[np.ndarray, np.ndarray]]:
+        """Sparse form of get_adjacency_matrices: ((index, weight) data, (index, weight) control).
+
+        index is a row-major sorted [2, E] int64 array of (src, dst) pairs and
+        weight the matching [E] float32 values, i.e. exactly the nonzero
+        entries of the dense matrices (a repeated pair keeps the last weight).
+        """
+        n = min(len(self.nodes), max_nodes)
+        families = ({}, {})  # (src, dst) -> weight, data / control
+        for edge in self.edges:
+            if edge.src < n and edge.dst < n:
+                family = families[0 if edge.edge_type == EDGE_TYPES['DATA_DEP'] else 1]
+                family[(edge.src, edge.dst)] = edge.weight
+
+        result = []
+        for family in families:
+            pairs = sorted(p for p, w in family.items() if w != 0)
+            index = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+            weight = np.array([family[p] for p in pairs], dtype=np.float32)
+            result.append((np.ascontiguousarray(index), weight))
+        return result[0], result[1]
+
     def get_adjacency_matrices_all(self, max_nodes: int) -> List[np.ndarray]:
         """Get separate adjacency matrices for all edge types"""
         n = min(len(self.nodes), max_nodes)
@@ -337,6 +340,219 @@ class PDG:
         return order
 
 
+# =============================================================================
+# NODE DECODING
+# =============================================================================
+
+# PDG_CLASSES bits of the opcode rules
+_FENCE = PDG_CLASSES['fence']
+_CACHE = PDG_CLASSES['cache']
+_TIMING = PDG_CLASSES['timing']
+_RET = PDG_CLASSES['ret']
+_CALL = PDG_CLASSES['call']
+_INDIRECT = PDG_CLASSES['indirect']
+_JUMP_INDIRECT = PDG_CLASSES['jump_indirect']
+_BRANCH_COND = PDG_CLASSES['branch_cond']
+_BRANCH_UNCOND = PDG_CLASSES['branch_uncond']
+_COMPARE = PDG_CLASSES['compare']
+_STACK = PDG_CLASSES['stack']
+_STORE = PDG_CLASSES['store']
+_LOAD = PDG_CLASSES['load']
+_MOVE = PDG_CLASSES['move']
+_ARITHMETIC = PDG_CLASSES['arithmetic']
+_LOGIC = PDG_CLASSES['logic']
+_SHIFT = PDG_CLASSES['shift']
+
+
+def _is_indirect(ins, classes: int) -> bool:
+    return bool(classes & _INDIRECT) or bool(PATTERNS['indirect'].search(ins.line))
+
+
+def _classify_opcode(ins, classes: int) -> int:
+    """Classify instruction into opcode category"""
+    instr = ins.line
+    words = ins.words
+
+    # Check patterns in priority order
+    if classes & _FENCE:
+        return OPCODE_CATEGORIES['FENCE']
+    if classes & _CACHE or ('dc' in words and PATTERNS['cache_dc'].search(instr)):
+        return OPCODE_CATEGORIES['CACHE']
+    if classes & _TIMING or ('mrs' in words and PATTERNS['timing_mrs'].search(instr)):
+        return OPCODE_CATEGORIES['TIMING']
+    if classes & _RET:
+        return OPCODE_CATEGORIES['RET']
+
+    # Indirect checks before regular branch/call
+    is_indirect = _is_indirect(ins, classes)
+
+    if classes & _CALL:
+        return OPCODE_CATEGORIES['CALL_INDIRECT'] if is_indirect else OPCODE_CATEGORIES['CALL']
+
+    if is_indirect and classes & _JUMP_INDIRECT:
+        return OPCODE_CATEGORIES['JUMP_INDIRECT']
+
+    if classes & _BRANCH_COND or ('b' in words and PATTERNS['branch_cond_arm'].search(instr)):
+        return OPCODE_CATEGORIES['BRANCH_COND']
+    if classes & _BRANCH_UNCOND or ('b' in words and PATTERNS['branch_uncond_arm'].search(instr)):
+        return OPCODE_CATEGORIES['BRANCH_UNCOND']
+
+    if classes & _COMPARE:
+        return OPCODE_CATEGORIES['COMPARE']
+
+    if classes & _STACK:
+        return OPCODE_CATEGORIES['STACK']
+
+    # Memory operations - check for memory operand
+    has_mem = bool(PATTERNS['memory_operand'].search(instr))
+
+    if has_mem:
+        if classes & _STORE:
+            if 'push' in instr.lower():
+                return OPCODE_CATEGORIES['STACK']
+            return OPCODE_CATEGORIES['STORE']
+        if classes & _LOAD:
+            if 'pop' in instr.lower():
+                return OPCODE_CATEGORIES['STACK']
+            return OPCODE_CATEGORIES['LOAD']
+
+    if classes & _MOVE:
+        return OPCODE_CATEGORIES['MOVE']
+
+    if classes & _ARITHMETIC:
+        return OPCODE_CATEGORIES['ARITHMETIC']
+    if classes & _LOGIC:
+        return OPCODE_CATEGORIES['LOGIC']
+    if classes & _SHIFT:
+        return OPCODE_CATEGORIES['SHIFT']
+
+    if 'nop' in instr.lower():
+        return OPCODE_CATEGORIES['NOP']
+
+    return OPCODE_CATEGORIES['OTHER']
+
+
+def _extract_registers(instr: str, category: int) -> Tuple[Set[str], Set[str]]:
+    """Extract destination and source registers"""
+    dest_regs = set()
+    src_regs = set()
+
+    # Find all registers
+    arm_regs = [r.lower() for r in PATTERNS['arm_reg'].findall(instr)]
+    x86_regs = [r.lower() for r in PATTERNS['x86_reg'].findall(instr)]
+    all_regs = arm_regs + x86_regs
+
+    if not all_regs:
+        return dest_regs, src_regs
+
+    # Heuristic: First register is dest for most instructions
+    # Exceptions: stores, compares, branches (all sources)
+    is_all_source = category in [
+        OPCODE_CATEGORIES['STORE'],
+        OPCODE_CATEGORIES['COMPARE'],
+        OPCODE_CATEGORIES['BRANCH_COND'],
+        OPCODE_CATEGORIES['BRANCH_UNCOND'],
+        OPCODE_CATEGORIES['CALL'],
+        OPCODE_CATEGORIES['CALL_INDIRECT'],
+    ]
+
+    if is_all_source:
+        src_regs = set(all_regs)
+    else:
+        if len(all_regs) > 0:
+            dest_regs.add(all_regs[0])
+        if len(all_regs) > 1:
+            src_regs = set(all_regs[1:])
+
+    return dest_regs, src_regs
+
+
+def _get_memory_access_type(ins, classes: int) -> int:
+    """Determine memory access type"""
+    instr = ins.line
+    if not PATTERNS['memory_operand'].search(instr):
+        return MEM_ACCESS_TYPES['NONE']
+
+    if PATTERNS['stack_access'].search(instr):
+        return MEM_ACCESS_TYPES['STACK']
+
+    if PATTERNS['indexed_access'].search(instr):
+        return MEM_ACCESS_TYPES['INDEXED']
+
+    if _is_indirect(ins, classes):
+        return MEM_ACCESS_TYPES['INDIRECT']
+
+    return MEM_ACCESS_TYPES['HEAP']
+
+
+def _compute_spec_flags(instr: str, category: int, mem_type: int) -> np.ndarray:
+    """Compute speculative primitive flags"""
+    flags = np.zeros(NUM_SPEC_FLAGS, dtype=np.float32)
+
+    # Serializing instructions
+    if category == OPCODE_CATEGORIES['FENCE'] or 'cpuid' in instr.lower():
+        flags[SPEC_FLAGS['is_serializing']] = 1.0
+
+    # Cache probing
+    if category == OPCODE_CATEGORIES['CACHE']:
+        flags[SPEC_FLAGS['is_cache_probe']] = 1.0
+
+    # Branch instructions
+    if category in [OPCODE_CATEGORIES['BRANCH_COND'], OPCODE_CATEGORIES['BRANCH_UNCOND'],
+                   OPCODE_CATEGORIES['CALL'], OPCODE_CATEGORIES['CALL_INDIRECT'],
+                   OPCODE_CATEGORIES['JUMP_INDIRECT'], OPCODE_CATEGORIES['RET']]:
+        flags[SPEC_FLAGS['is_branch']] = 1.0
+
+    # Indirect branches
+    if category in [OPCODE_CATEGORIES['CALL_INDIRECT'], OPCODE_CATEGORIES['JUMP_INDIRECT']]:
+        flags[SPEC_FLAGS['is_indirect_branch']] = 1.0
+
+    # Memory access
+    if category in [OPCODE_CATEGORIES['LOAD'], OPCODE_CATEGORIES['STORE'], OPCODE_CATEGORIES['STACK']]:
+        flags[SPEC_FLAGS['is_memory_access']] = 1.0
+
+    # Timing source
+    if category == OPCODE_CATEGORIES['TIMING']:
+        flags[SPEC_FLAGS['is_timing_source']] = 1.0
+
+    # Secret source (indexed loads are suspicious)
+    if category == OPCODE_CATEGORIES['LOAD'] and mem_type == MEM_ACCESS_TYPES['INDEXED']:
+        flags[SPEC_FLAGS['is_secret_source']] = 1.0
+
+    # Transmitter (load after potential secret, approximated by indexed access)
+    if category == OPCODE_CATEGORIES['LOAD'] and mem_type in [MEM_ACCESS_TYPES['INDEXED'], MEM_ACCESS_TYPES['INDIRECT']]:
+        flags[SPEC_FLAGS['is_transmitter']] = 1.0
+
+    return flags
+
+
+def _pdg_node_view(ins):
+    """Everything a node needs from one decoded line, or None for a blank line:
+    (opcode, category, dest regs, src regs, memory access type, spec flags).
+    Runs once per distinct line, through DecodedInstruction.view()."""
+    # Extract opcode
+    parts = ins.line.split()
+    if not parts:
+        return None
+    opcode = parts[0].rstrip(':').lower()
+
+    # Classify opcode category
+    classes = PDG_CLASSES.classes(ins.words)
+    category = _classify_opcode(ins, classes)
+
+    # Extract registers
+    dest_regs, src_regs = _extract_registers(ins.line, category)
+
+    # Determine memory access type
+    mem_type = _get_memory_access_type(ins, classes)
+
+    # Compute speculative flags
+    spec_flags = _compute_spec_flags(ins.line, category, mem_type)
+    spec_flags.flags.writeable = False
+
+    return opcode, category, frozenset(dest_regs), frozenset(src_regs), mem_type, spec_flags
+
+
 # =============================================================================
 # PDG BUILDER
 # =============================================================================
@@ -355,6 +571,24 @@ def _is_security_relevant(node: PDGNode) -> bool:
             sf[SPEC_FLAGS['is_timing_source']] > 0)
 
 
+# Per-process state for PDGBuilder.build_many (set by the pool initializer)
+_WORKER_BUILDER: Optional['PDGBuilder'] = None
+_WORKER_TRANSFORM: Optional[Callable[['PDG'], Any]] = None
+
+
+def _init_build_worker(speculative_window: int, cache_window: int,
+                       transform: Optional[Callable[['PDG'], Any]]):
+    global _WORKER_BUILDER, _WORKER_TRANSFORM
+    _WORKER_BUILDER = PDGBuilder(speculative_window=speculative_window)
+    _WORKER_BUILDER.cache_window = cache_window
+    _WORKER_TRANSFORM = transform
+
+
+def _build_in_worker(sequence: List[str]) -> Any:
+    pdg = _WORKER_BUILDER.build(sequence)
+    return _WORKER_TRANSFORM(pdg) if _WORKER_TRANSFORM is not None else pdg
+
+
 class PDGBuilder:
     """
     Builds Program Dependency Graphs from assembly instruction sequences.
@@ -551,187 +785,64 @@ class PDGBuilder:
 
         return PDG(nodes=nodes, edges=edges)
 
+    def build_many(
+        self,
+        sequences: Iterable[List[str]],
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        transform: Optional[Callable[[PDG], Any]] = None,
+    ) -> Iterator[Any]:
+        """Build PDGs for many sequences across a process pool.
+
+        Results are yielded lazily and in input order, so the output is
+        identical to ``[self.build(s) for s in sequences]`` regardless of the
+        number of workers.
+
+        Args:
+            sequences: Iterable of instruction sequences (consumed lazily)
+            workers: Number of processes (None = all cores, <=1 = serial)
+            chunksize: Sequences handed to a worker per task
+            transform: Optional picklable (module-level) function applied to
+                each PDG inside the worker, e.g. to return compact NumPy
+                arrays instead of pickling full PDG objects back
+
+        Yields:
+            One PDG (or transform(PDG)) per input sequence
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1:
+            for seq in sequences:
+                pdg = self.build(seq)
+                yield transform(pdg) if transform is not None else pdg
+            return
+
+        with mp.get_context().Pool(
+            processes=workers,
+            initializer=_init_build_worker,
+            initargs=(self.speculative_window, self.cache_window, transform),
+        ) as pool:
+            yield from pool.imap(_build_in_worker, sequences, chunksize=chunksize)
+
     def _create_node(self, position: int, instr: str, node_id: int) -> Optional[PDGNode]:
         """Create a PDG node from an instruction"""
-        # Extract opcode
-        parts = instr.split()
-        if not parts:
+        decoded = decode(instr).view(_pdg_node_view)
+        if decoded is None:
             return None
-        opcode = parts[0].rstrip(':').lower()
-
-        # Classify opcode category
-        category = self._classify_opcode(instr)
-
-        # Extract registers
-        dest_regs, src_regs = self._extract_registers(instr, category)
-
-        # Determine memory access type
-        mem_type = self._get_memory_access_type(instr)
-
-        # Compute speculative flags
-        spec_flags = self._compute_spec_flags(instr, category, mem_type)
+        opcode, category, dest_regs, src_regs, mem_type, spec_flags = decoded
 
         return PDGNode(
             id=node_id,
             raw_instruction=instr,
             opcode=opcode,
             opcode_category=category,
-            dest_regs=dest_regs,
-            src_regs=src_regs,
+            dest_regs=set(dest_regs),
+            src_regs=set(src_regs),
             mem_access_type=mem_type,
-            spec_flags=spec_flags,
+            spec_flags=spec_flags.copy(),
         )
 
-    def _classify_opcode(self, instr: str) -> int:
-        """Classify instruction into opcode category"""
-        # Check patterns in priority order
-        if PATTERNS['fence'].search(instr):
-            return OPCODE_CATEGORIES['FENCE']
-        if PATTERNS['cache'].search(instr):
-            return OPCODE_CATEGORIES['CACHE']
-        if PATTERNS['timing'].search(instr):
-            return OPCODE_CATEGORIES['TIMING']
-        if PATTERNS['ret'].search(instr):
-            return OPCODE_CATEGORIES['RET']
-
-        # Indirect checks before regular branch/call
-        is_indirect = bool(PATTERNS['indirect'].search(instr))
-
-        if PATTERNS['call'].search(instr):
-            return OPCODE_CATEGORIES['CALL_INDIRECT'] if is_indirect else OPCODE_CATEGORIES['CALL']
-
-        if is_indirect and re.search(r'\b(jmpq?|br)\b', instr, re.I):
-            return OPCODE_CATEGORIES['JUMP_INDIRECT']
-
-        if PATTERNS['branch_cond'].search(instr):
-            return OPCODE_CATEGORIES['BRANCH_COND']
-        if PATTERNS['branch_uncond'].search(instr):
-            return OPCODE_CATEGORIES['BRANCH_UNCOND']
-
-        if PATTERNS['compare'].search(instr):
-            return OPCODE_CATEGORIES['COMPARE']
-
-        if PATTERNS['stack_op'].search(instr):
-            return OPCODE_CATEGORIES['STACK']
-
-        # Memory operations - check for memory operand
-        has_mem = bool(PATTERNS['memory_operand'].search(instr))
-
-        if has_mem:
-            if PATTERNS['store_arm'].search(instr) or PATTERNS['store_x86'].search(instr):
-                if 'push' in instr.lower():
-                    return OPCODE_CATEGORIES['STACK']
-                return OPCODE_CATEGORIES['STORE']
-            if PATTERNS['load_arm'].search(instr) or PATTERNS['load_x86'].search(instr):
-                if 'pop' in instr.lower():
-                    return OPCODE_CATEGORIES['STACK']
-                return OPCODE_CATEGORIES['LOAD']
-
-        if PATTERNS['move'].search(instr):
-            return OPCODE_CATEGORIES['MOVE']
-
-        if PATTERNS['arithmetic'].search(instr):
-            return OPCODE_CATEGORIES['ARITHMETIC']
-        if PATTERNS['logic'].search(instr):
-            return OPCODE_CATEGORIES['LOGIC']
-        if PATTERNS['shift'].search(instr):
-            return OPCODE_CATEGORIES['SHIFT']
-
-        if 'nop' in instr.lower():
-            return OPCODE_CATEGORIES['NOP']
-
-        return OPCODE_CATEGORIES['OTHER']
-
-    def _extract_registers(self, instr: str, category: int) -> Tuple[Set[str], Set[str]]:
-        """Extract destination and source registers"""
-        dest_regs = set()
-        src_regs = set()
-
-        # Find all registers
-        arm_regs = [r.lower() for r in PATTERNS['arm_reg'].findall(instr)]
-        x86_regs = [r.lower() for r in PATTERNS['x86_reg'].findall(instr)]
-        all_regs = arm_regs + x86_regs
-
-        if not all_regs:
-            return dest_regs, src_regs
-
-        # Heuristic: First register is dest for most instructions
-        # Exceptions: stores, compares, branches (all sources)
-        is_all_source = category in [
-            OPCODE_CATEGORIES['STORE'],
-            OPCODE_CATEGORIES['COMPARE'],
-            OPCODE_CATEGORIES['BRANCH_COND'],
-            OPCODE_CATEGORIES['BRANCH_UNCOND'],
-            OPCODE_CATEGORIES['CALL'],
-            OPCODE_CATEGORIES['CALL_INDIRECT'],
-        ]
-
-        if is_all_source:
-            src_regs = set(all_regs)
-        else:
-            if len(all_regs) > 0:
-                dest_regs.add(all_regs[0])
-            if len(all_regs) > 1:
-                src_regs = set(all_regs[1:])
-
-        return dest_regs, src_regs
-
-    def _get_memory_access_type(self, instr: str) -> int:
-        """Determine memory access type"""
-        if not PATTERNS['memory_operand'].search(instr):
-            return MEM_ACCESS_TYPES['NONE']
-
-        if PATTERNS['stack_access'].search(instr):
-            return MEM_ACCESS_TYPES['STACK']
-
-        if PATTERNS['indexed_access'].search(instr):
-            return MEM_ACCESS_TYPES['INDEXED']
-
-        if PATTERNS['indirect'].search(instr):
-            return MEM_ACCESS_TYPES['INDIRECT']
-
-        return MEM_ACCESS_TYPES['HEAP']
-
-    def _compute_spec_flags(self, instr: str, category: int, mem_type: int) -> np.ndarray:
-        """Compute speculative primitive flags"""
-        flags = np.zeros(NUM_SPEC_FLAGS, dtype=np.float32)
-
-        # Serializing instructions
-        if category == OPCODE_CATEGORIES['FENCE'] or 'cpuid' in instr.lower():
-            flags[SPEC_FLAGS['is_serializing']] = 1.0
-
-        # Cache probing
-        if category == OPCODE_CATEGORIES['CACHE']:
-            flags[SPEC_FLAGS['is_cache_probe']] = 1.0
-
-        # Branch instructions
-        if category in [OPCODE_CATEGORIES['BRANCH_COND'], OPCODE_CATEGORIES['BRANCH_UNCOND'],
-                       OPCODE_CATEGORIES['CALL'], OPCODE_CATEGORIES['CALL_INDIRECT'],
-                       OPCODE_CATEGORIES['JUMP_INDIRECT'], OPCODE_CATEGORIES['RET']]:
-            flags[SPEC_FLAGS['is_branch']] = 1.0
-
-        # Indirect branches
-        if category in [OPCODE_CATEGORIES['CALL_INDIRECT'], OPCODE_CATEGORIES['JUMP_INDIRECT']]:
-            flags[SPEC_FLAGS['is_indirect_branch']] = 1.0
-
-        # Memory access
-        if category in [OPCODE_CATEGORIES['LOAD'], OPCODE_CATEGORIES['STORE'], OPCODE_CATEGORIES['STACK']]:
-            flags[SPEC_FLAGS['is_memory_access']] = 1.0
-
-        # Timing source
-        if category == OPCODE_CATEGORIES['TIMING']:
-            flags[SPEC_FLAGS['is_timing_source']] = 1.0
-
-        # Secret source (indexed loads are suspicious)
-        if category == OPCODE_CATEGORIES['LOAD'] and mem_type == MEM_ACCESS_TYPES['INDEXED']:
-            flags[SPEC_FLAGS['is_secret_source']] = 1.0
-
-        # Transmitter (load after potential secret, approximated by indexed access)
-        if category == OPCODE_CATEGORIES['LOAD'] and mem_type in [MEM_ACCESS_TYPES['INDEXED'], MEM_ACCESS_TYPES['INDIRECT']]:
-            flags[SPEC_FLAGS['is_transmitter']] = 1.0
-
-        return flags
-
 
 # =============================================================================
 # TESTING
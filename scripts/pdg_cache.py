@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for PDG construction.
+
+Building PDGs (plus boilerplate stripping) for every record is the dominant
+start-up cost of the GINE trainers. This cache stores the *unpadded* graph of
+each sequence as packed NumPy arrays so repeat runs and hyperparameter sweeps
+only rebuild records that are new or changed.
+
+Layout of a cache directory:
+    index.json                    key -> [shard, node_off, n_nodes, edge_off, n_edges, len_after]
+    index.lock                    lock file guarding index.json updates
+    shard_<id>.node_features.npy  float32 [total_nodes, 34]
+    shard_<id>.edge_index.npy     int32   [2, total_edges]
+    shard_<id>.edge_type.npy      int8    [total_edges]
+    shard_<id>.edge_weight.npy    float32 [total_edges]
+
+Shards are append-only: every flush writes one new shard containing only the
+entries added since the last flush. Shards are opened with mmap_mode='r', so
+loading a warm cache costs one JSON parse plus page faults on the rows used.
+
+Several runs may share a cache directory: shard ids are unique per flush
+(pid + random suffix), and each flush re-reads index.json under a file lock,
+merges its entries in and atomically replaces it.
+
+Keys hash (PDG_BUILDER_VERSION, speculative_window, strip flag, sequence);
+bumping PDG_BUILDER_VERSION in pdg_builder.py invalidates every entry.
+
+Usage:
+    from pdg_cache import PDGCache
+    cache = PDGCache('cache/pdg', speculative_window=10, strip_bp=True)
+    graph = cache.get_or_build(sequence)
+    ...
+    cache.flush()
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, unique shard names still apply
+    fcntl = None
+
+import numpy as np
+
+from pdg_builder import PDG, PDGBuilder, PDG_BUILDER_VERSION
+from strip_boilerplate import strip_boilerplate
+
+
+NODE_FEATURE_DIM = 34  # PDGNode.get_feature_vector()
+ARRAY_NAMES = ('node_features', 'edge_index', 'edge_type', 'edge_weight')
+
+
+def pdg_cache_key(sequence: List[str], speculative_window: int, strip_bp: bool) -> str:
+    """Content hash identifying the PDG built from ``sequence``."""
+    payload = json.dumps(
+        [PDG_BUILDER_VERSION, speculative_window, bool(strip_bp), sequence],
+        separators=(',', ':'),
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def pdg_to_arrays(pdg: PDG) -> Dict[str, np.ndarray]:
+    """Full, unpadded PDG arrays: node_features [N, 34], edge_index [2, E],
+    edge_type [E], edge_weight [E]. Module-level so it can run in pool workers."""
+    n = len(pdg.nodes)
+    edge_index, edge_type = pdg.get_edge_index_and_type(n)
+    return {
+        'node_features': pdg.get_node_features(n),
+        'edge_index': edge_index,
+        'edge_type': edge_type,
+        'edge_weight': pdg.get_edge_weights(n),
+    }
+
+
+def build_pdg_arrays(builder: PDGBuilder, sequence: List[str],
+                     strip_bp: bool) -> Dict[str, np.ndarray]:
+    """Strip (optionally) and build the full, unpadded PDG arrays for a sequence.
+
+    Returns the pdg_to_arrays() dict plus the scalar len_after (sequence
+    length after stripping).
+    """
+    if strip_bp:
+        sequence = strip_boilerplate(sequence)
+    graph = pdg_to_arrays(builder.build(sequence))
+    graph['len_after'] = len(sequence)
+    return graph
+
+
+def truncate_pdg_arrays(graph: Dict[str, np.ndarray],
+                        max_nodes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Apply the ``max_nodes`` cut exactly as PDG.get_* would.
+
+    Returns (node_features [n, 34], edge_index [2, E'], edge_type [E'], edge_weight [E'])
+    with n = min(N, max_nodes) and only edges whose endpoints are both < n,
+    in their original order.
+    """
+    n = min(graph['node_features'].shape[0], max_nodes)
+    node_features = np.asarray(graph['node_features'][:n], dtype=np.float32)
+    edge_index = np.asarray(graph['edge_index'], dtype=np.int64)
+    keep = (edge_index[0] < n) & (edge_index[1] < n)
+    return (
+        node_features,
+        edge_index[:, keep],
+        np.asarray(graph['edge_type'], dtype=np.int64)[keep],
+        np.asarray(graph['edge_weight'], dtype=np.float32)[keep],
+    )
+
+
+@contextmanager
+def _locked(lock_path: Path):
+    """Exclusive advisory lock on ``lock_path`` (held for the with-block)."""
+    with open(lock_path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class PDGCache:
+    """Append-only, memory-mapped PDG cache keyed by content hash."""
+
+    def __init__(self, cache_dir: Optional[str], speculative_window: int = 10,
+                 strip_bp: bool = True, builder: Optional[PDGBuilder] = None):
+        # cache_dir=None gives a purely in-memory cache (flush() is a no-op)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.speculative_window = speculative_window
+        self.strip_bp = strip_bp
+        self.builder = builder or PDGBuilder(speculative_window=speculative_window)
+
+        self.index_path = self.cache_dir / 'index.json' if self.cache_dir else None
+        self.lock_path = self.cache_dir / 'index.lock' if self.cache_dir else None
+        self.index: Dict[str, list] = {}
+        if self.index_path is not None:
+            self.index = self._read_index()
+
+        self._shards: Dict[Union[int, str], Dict[str, np.ndarray]] = {}
+        self._pending: Dict[str, Dict[str, np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.index) + len(self._pending)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index or key in self._pending
+
+    def key(self, sequence: List[str]) -> str:
+        return pdg_cache_key(sequence, self.speculative_window, self.strip_bp)
+
+    def _read_index(self) -> Dict[str, list]:
+        """Entries of index.json ({} if missing or built by another PDG version)."""
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != PDG_BUILDER_VERSION:
+            return {}
+        return meta['entries']
+
+    def _shard_path(self, shard: Union[int, str], name: str) -> Path:
+        # Integer shard ids come from indexes written before shard ids were unique
+        shard_id = f'{shard:05d}' if isinstance(shard, int) else shard
+        return self.cache_dir / f'shard_{shard_id}.{name}.npy'
+
+    def _open_shard(self, shard: Union[int, str]) -> Dict[str, np.ndarray]:
+        if shard not in self._shards:
+            self._shards[shard] = {
+                name: np.load(self._shard_path(shard, name), mmap_mode='r')
+                for name in ARRAY_NAMES
+            }
+        return self._shards[shard]
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Return cached arrays (read-only views into the shard) or None."""
+        if key in self._pending:
+            return self._pending[key]
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        shard, node_off, n_nodes, edge_off, n_edges, len_after = entry
+        arrays = self._open_shard(shard)
+        return {
+            'node_features': arrays['node_features'][node_off:node_off + n_nodes],
+            'edge_index': arrays['edge_index'][:, edge_off:edge_off + n_edges],
+            'edge_type': arrays['edge_type'][edge_off:edge_off + n_edges],
+            'edge_weight': arrays['edge_weight'][edge_off:edge_off + n_edges],
+            'len_after': len_after,
+        }
+
+    def put(self, key: str, graph: Dict[str, np.ndarray]):
+        """Stage arrays for the next flush()."""
+        self._pending[key] = graph
+
+    def get_or_build(self, sequence: List[str]) -> Dict[str, np.ndarray]:
+        key = self.key(sequence)
+        graph = self.get(key)
+        if graph is not None:
+            self.hits += 1
+            return graph
+        self.misses += 1
+        graph = build_pdg_arrays(self.builder, sequence, self.strip_bp)
+        self.put(key, graph)
+        return graph
+
+    def prefetch(self, sequences: List[List[str]], workers: Optional[int] = None,
+                 chunksize: int = 64) -> int:
+        """Build every missing entry for ``sequences`` across a process pool.
+
+        Stripping runs in this process (it is cheap); PDG construction is fanned
+        out with PDGBuilder.build_many. Returns the number of entries built.
+        """
+        missing: Dict[str, List[str]] = {}
+        for seq in sequences:
+            key = self.key(seq)
+            if key not in self and key not in missing:
+                missing[key] = strip_boilerplate(seq) if self.strip_bp else seq
+        if not missing:
+            return 0
+
+        keys = list(missing.keys())
+        graphs = self.builder.build_many(
+            (missing[k] for k in keys), workers=workers,
+            chunksize=chunksize, transform=pdg_to_arrays,
+        )
+        for key, graph in zip(keys, graphs):
+            graph['len_after'] = len(missing[key])
+            self.put(key, graph)
+        return len(keys)
+
+    def flush(self):
+        """Write all staged entries into a new shard and merge them into the index."""
+        if not self._pending or self.cache_dir is None:
+            return
+
+        shard = f'{os.getpid()}_{uuid.uuid4().hex[:12]}'
+        keys = list(self._pending.keys())
+        graphs = [self._pending[k] for k in keys]
+
+        node_counts = [g['node_features'].shape[0] for g in graphs]
+        edge_counts = [g['edge_type'].shape[0] for g in graphs]
+        node_offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(int)
+        edge_offsets = np.concatenate([[0], np.cumsum(edge_counts)[:-1]]).astype(int)
+
+        packed = {
+            'node_features': np.concatenate(
+                [g['node_features'].reshape(-1, NODE_FEATURE_DIM) for g in graphs]
+            ).astype(np.float32),
+            'edge_index': np.concatenate(
+                [g['edge_index'].reshape(2, -1) for g in graphs], axis=1
+            ).astype(np.int32),
+            'edge_type': np.concatenate([g['edge_type'] for g in graphs]).astype(np.int8),
+            'edge_weight': np.concatenate([g['edge_weight'] for g in graphs]).astype(np.float32),
+        }
+        for name, arr in packed.items():
+            np.save(self._shard_path(shard, name), arr)
+
+        new_entries = {
+            k: [shard, int(no), int(nn_), int(eo), int(ne), int(g['len_after'])]
+            for k, g, no, nn_, eo, ne in zip(keys, graphs, node_offsets, node_counts,
+                                             edge_offsets, edge_counts)
+        }
+
+        # Merge with entries other runs flushed since we loaded the index, then
+        # replace it atomically so a crash never leaves a half-written index
+        with _locked(self.lock_path):
+            merged = self._read_index()
+            merged.update(new_entries)
+            tmp_path = self.index_path.with_name(f'index.json.{shard}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': PDG_BUILDER_VERSION, 'entries': merged}, f)
+            os.replace(tmp_path, self.index_path)
+        self.index = merged
+        self._pending.clear()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"PDG cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
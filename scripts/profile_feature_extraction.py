@@ -16,6 +16,7 @@ efe.HAS_SEQUENCE_ENCODER = False
 
 from extract_features_enhanced import (
     extract_features_enhanced,
+    decode_sequence,
     analyze_mds_patterns,
     analyze_spectre_v1_patterns,
     analyze_bhi_patterns,
@@ -25,9 +26,31 @@ from extract_features_enhanced import (
     analyze_inception_patterns,
     analyze_graph_features,
     analyze_dependencies,
+    analyze_memory_semantics,
     compute_mutual_exclusion_scores,
 )
 
+ANALYZERS = [
+    ('mds', analyze_mds_patterns),
+    ('spectre_v1', analyze_spectre_v1_patterns),
+    ('bhi', analyze_bhi_patterns),
+    ('l1tf', analyze_l1tf_patterns),
+    ('benign', analyze_benign_patterns),
+    ('retbleed', analyze_retbleed_patterns),
+    ('inception', analyze_inception_patterns),
+    ('graph', analyze_graph_features),
+    ('dependencies', analyze_dependencies),
+    ('memory', analyze_memory_semantics),
+]
+
+
+def _time_ms(func, num_runs):
+    start = time.perf_counter()
+    for _ in range(num_runs):
+        func()
+    return (time.perf_counter() - start) / num_runs * 1000
+
+
 def profile_single_record(rec, num_runs=10):
     """Profile each function on a single record."""
     seq = rec.get('sequence', [])
@@ -36,25 +59,19 @@ def profile_single_record(rec, num_runs=10):
     
     timings = {}
     
-    # Profile each analysis function
-    functions = [
-        ('mds', lambda: analyze_mds_patterns(seq)),
-        ('spectre_v1', lambda: analyze_spectre_v1_patterns(seq)),
-        ('bhi', lambda: analyze_bhi_patterns(seq)),
-        ('l1tf', lambda: analyze_l1tf_patterns(seq)),
-        ('benign', lambda: analyze_benign_patterns(seq)),
-        ('retbleed', lambda: analyze_retbleed_patterns(seq)),
-        ('inception', lambda: analyze_inception_patterns(seq)),
-        ('graph', lambda: analyze_graph_features(seq)),
-        ('dependencies', lambda: analyze_dependencies(seq)),
-    ]
+    # Profile each analysis function on the raw sequence (each call decodes it)
+    for name, func in ANALYZERS:
+        timings[name] = _time_ms(lambda: func(seq), num_runs)
+    timings['decode'] = _time_ms(lambda: decode_sequence(seq), num_runs)
     
-    for name, func in functions:
-        start = time.perf_counter()
-        for _ in range(num_runs):
-            func()
-        elapsed = (time.perf_counter() - start) / num_runs
-        timings[name] = elapsed * 1000  # ms
+    # All analyzers, decoding per analyzer vs decoding once and sharing it
+    timings['analyzers_separate'] = _time_ms(
+        lambda: [func(seq) for _, func in ANALYZERS], num_runs)
+    
+    def shared():
+        decoded = decode_sequence(seq)
+        return [func(decoded) for _, func in ANALYZERS]
+    timings['analyzers_shared'] = _time_ms(shared, num_runs)
     
     # Profile full extraction
     enhanced_rec = {
@@ -112,6 +129,10 @@ def main():
         pct = (avg_ms / avg_timings.get('FULL', avg_ms)) * 100
         print(f"  {name:20s}: {avg_ms:8.3f} ms ({pct:5.1f}%)")
     
+    if 'analyzers_shared' in avg_timings:
+        speedup = avg_timings['analyzers_separate'] / max(avg_timings['analyzers_shared'], 1e-9)
+        print(f"\n  Shared decode speedup over per-analyzer decode: {speedup:.2f}x")
+    
     print("\n" + "=" * 60)
     expected_rate = 1000 / avg_timings.get('FULL', 1)
     print(f"Expected processing rate: {expected_rate:.1f} records/second")
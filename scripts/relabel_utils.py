@@ -4,9 +4,10 @@ import re
 import sys
 import argparse
 from pathlib import Path
-import networkx as nx
 from typing import List, Dict, Any
 
+from cfg_chain_matcher import ChainMatcher
+
 # --- Semantic Analysis ---
 
 def get_semantic_type_from_gadgets(instr_obj: Dict[str, Any]) -> str:
@@ -53,23 +54,6 @@ def get_semantic_type_from_asm(asm_line: str) -> str:
     # Compute (Arithmetic, Logical, Compare, etc.)
     return "COMPUTE"
 
-def build_cfg_from_semantics(semantic_seq: List[str]) -> nx.DiGraph:
-    G = nx.DiGraph()
-    for i, sem_type in enumerate(semantic_seq):
-        G.add_node(i, type=sem_type)
-    
-    for i in range(len(semantic_seq)):
-        current_type = semantic_seq[i]
-        if current_type != "BRANCH":
-            if i + 1 < len(semantic_seq):
-                G.add_edge(i, i + 1)
-    return G
-
-def compare_cfgs(g_window: nx.DiGraph, g_vuln: nx.DiGraph) -> bool:
-    nm = nx.algorithms.isomorphism.categorical_node_match("type", "COMPUTE")
-    matcher = nx.algorithms.isomorphism.DiGraphMatcher(g_window, g_vuln, node_match=nm)
-    return matcher.subgraph_is_isomorphic()
-
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", type=Path, default=Path("data/dataset/merged_dataset_v4.jsonl"))
@@ -81,16 +65,15 @@ def main():
     with open(args.gadgets) as f:
         vuln_data = json.load(f)
 
+    matcher = ChainMatcher()
     vuln_cfgs = []
     for key, entry in vuln_data.items():
         instructions = entry.get("instructions", [])
         sem_seq = [get_semantic_type_from_gadgets(instr) for instr in instructions]
-        cfg = build_cfg_from_semantics(sem_seq)
+        matcher.add(sem_seq)
         vuln_cfgs.append({
             "name": entry.get("name", key),
             "type": entry.get("vulnerability_type", "UNKNOWN"),
-            "cfg": cfg,
-            "seq_len": len(sem_seq)
         })
 
     print(f"Processing {args.input} -> {args.output}...")
@@ -138,13 +121,7 @@ def main():
                 seq = rec.get("sequence", [])
                 # Infer semantics
                 sem_seq = [get_semantic_type_from_asm(line) for line in seq]
-                cand_cfg = build_cfg_from_semantics(sem_seq)
-                
-                matches = []
-                for v in vuln_cfgs:
-                    if len(sem_seq) < v["seq_len"]: continue
-                    if compare_cfgs(cand_cfg, v["cfg"]):
-                        matches.append(v["type"])
+                matches = [vuln_cfgs[i]["type"] for i in matcher.match(sem_seq)]
                 
                 if matches:
                     # Found a vulnerability match!
@@ -13,11 +13,16 @@ Key improvements over previous approaches:
 """
 
 import re
-from typing import List, Dict, Tuple, Set, Optional
+import sys
+from pathlib import Path
+from typing import FrozenSet, List, Dict, Tuple, Set, Optional
 from dataclasses import dataclass, field
 from collections import defaultdict
 import numpy as np
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'githubCrawl'))
+from instruction_semantics import GRAPH_CLASSES, decode
+
 
 # =============================================================================
 # SEMANTIC NODE TYPES
@@ -92,113 +97,71 @@ class SemanticGraph:
         self.adjacency = defaultdict(list)
         for edge in self.edges:
             self.adjacency[edge.src].append((edge.dst, edge.edge_type))
+    
+    def edge_index(self, max_nodes: Optional[int] = None,
+                   edge_types: Optional[Set[str]] = None,
+                   undirected: bool = False) -> np.ndarray:
+        """
+        COO edge list [2, E] (int64, deduplicated, row-major sorted).
+        
+        Only edges between the first max_nodes nodes and (optionally) of the
+        given edge types are kept; undirected=True adds every reverse edge.
+        """
+        limit = len(self.nodes) if max_nodes is None else max_nodes
+        pairs = set()
+        for edge in self.edges:
+            if edge.src < limit and edge.dst < limit and \
+                    (edge_types is None or edge.edge_type in edge_types):
+                pairs.add((edge.src, edge.dst))
+                if undirected:
+                    pairs.add((edge.dst, edge.src))
+        index = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2).T
+        return np.ascontiguousarray(index)
+    
+    def edge_index_by_type(self, max_nodes: Optional[int] = None,
+                           undirected: bool = False) -> Dict[str, np.ndarray]:
+        """COO edge list per edge type (see edge_index), for typed message passing."""
+        types = (EdgeType.SEQUENTIAL, EdgeType.DATA_DEP, EdgeType.CONTROL, EdgeType.MEMORY_DEP)
+        return {t: self.edge_index(max_nodes, {t}, undirected) for t in types}
 
 
 # =============================================================================
 # INSTRUCTION CLASSIFICATION
 # =============================================================================
 
-# Pre-compiled regex patterns for efficiency
-LOAD_PATTERNS = re.compile(
-    r'\b(ldr|ldp|ldur|ldrb|ldrh|ldrsb|ldrsh|ldrsw|ldrex|ldadd|ldclr|ldset|'
-    r'mov[zsk]?|movz|movk|movn|'  # ARM moves that can load
-    r'ld[1-4]|ldnp|ldtr|ldxr|ldar|'  # ARM SIMD/atomic loads
-    r'vldr|vld[1-4])\b',  # ARM NEON loads
-    re.IGNORECASE
-)
-
-STORE_PATTERNS = re.compile(
-    r'\b(str|stp|stur|strb|strh|stlr|stxr|stlxr|'
-    r'st[1-4]|stnp|sttr|'  # ARM stores
-    r'vstr|vst[1-4])\b',  # ARM NEON stores
-    re.IGNORECASE
-)
-
-X86_LOAD_PATTERNS = re.compile(
-    r'\b(mov[qld]?|movzx|movsx|movabs|'
-    r'lods|lodsb|lodsw|lodsd|lodsq|'
-    r'pop|'  # Stack load
-    r'vmov|vpbroadcast|vbroadcast|'  # AVX
-    r'lea)\b',  # Load effective address
-    re.IGNORECASE
-)
-
-X86_STORE_PATTERNS = re.compile(
-    r'\b(mov[qld]?|movnti|'
-    r'stos|stosb|stosw|stosd|stosq|'
-    r'push|'  # Stack store
-    r'vmov)\b',
+# Mnemonic rules are lookups in GRAPH_CLASSES (instruction_semantics). These
+# are the rule forms that span several tokens, only searched when their
+# mnemonic is on the line.
+ARM_BRANCH_COND_PATTERN = re.compile(
+    r'\bb\.(eq|ne|lt|le|gt|ge|hs|lo|hi|ls|mi|pl|vs|vc|al)\b',  # ARM conditional
     re.IGNORECASE
 )
 
-BRANCH_COND_PATTERNS = re.compile(
-    r'\b(b\.(eq|ne|lt|le|gt|ge|hs|lo|hi|ls|mi|pl|vs|vc|al)|'  # ARM conditional
-    r'beq|bne|blt|ble|bgt|bge|bhs|blo|bhi|bls|bmi|bpl|'  # ARM
-    r'cbz|cbnz|tbz|tbnz|'  # ARM compare-branch
-    r'j[elgnas]|jn?[elgzsa]|j[abp]|jn?[abp]|jo|jno|jc|jnc|js|jns|jp|jnp|jcxz|jecxz|jrcxz)\b',  # x86
+ARM_BRANCH_UNCOND_PATTERN = re.compile(
+    r'\b(b\s|b$)\b',
     re.IGNORECASE
 )
 
-BRANCH_UNCOND_PATTERNS = re.compile(
-    r'\b(b\s|b$|jmp|jmpq)\b',
-    re.IGNORECASE
-)
-
-CALL_PATTERNS = re.compile(
-    r'\b(bl|call|callq)\b',
-    re.IGNORECASE
-)
-
-INDIRECT_BRANCH_PATTERNS = re.compile(
-    r'\b(br|blr|ret|'  # ARM indirect
-    r'jmp\s*\*|call\s*\*)\b|'  # x86 indirect
+INDIRECT_OPERAND_PATTERN = re.compile(
+    r'\b(jmp\s*\*|call\s*\*)\b|'  # x86 indirect
     r'\[x[0-9]+\]|'  # ARM register indirect addressing
     r'\*%[re]?[abcd]x|\*%r[0-9]+',  # x86 indirect through register
     re.IGNORECASE
 )
 
-RET_PATTERNS = re.compile(
-    r'\b(ret|retq|retw|retl)\b',
-    re.IGNORECASE
-)
-
-COMPARE_PATTERNS = re.compile(
-    r'\b(cmp|cmn|test|tst|ccmp|ccmn|fcmp)\b',
-    re.IGNORECASE
-)
-
-FENCE_PATTERNS = re.compile(
-    r'\b(lfence|mfence|sfence|dsb|dmb|isb)\b',
+CACHE_MAINTENANCE_PATTERN = re.compile(
+    r'\b(dc\s+(civac|cvac|cvau|zva|ivac)|'  # ARM data cache
+    r'ic\s+(ivau|iallu))\b',  # ARM instruction cache
     re.IGNORECASE
 )
 
-CACHE_PATTERNS = re.compile(
-    r'\b(clflush|clflushopt|clwb|cldemote|'
-    r'dc\s+(civac|cvac|cvau|zva|ivac)|'  # ARM data cache
-    r'ic\s+(ivau|iallu)|'  # ARM instruction cache
-    r'invlpg|wbinvd|invd)\b',
+TIMER_READ_PATTERN = re.compile(
+    r'\b(mrs\s+.*cntvct|mrs\s+.*pmccntr)\b',  # ARM timing
     re.IGNORECASE
 )
 
-TIMING_PATTERNS = re.compile(
-    r'\b(rdtsc|rdtscp|rdpmc|'
-    r'mrs\s+.*cntvct|mrs\s+.*pmccntr)\b',  # ARM timing
-    re.IGNORECASE
-)
-
-NOP_PATTERNS = re.compile(
-    r'\b(nop|hint\s+#0)\b',
-    re.IGNORECASE
-)
-
-ARITHMETIC_PATTERNS = re.compile(
-    r'\b(add|sub|mul|div|udiv|sdiv|madd|msub|'
-    r'and|orr|eor|orn|bic|'  # Logical
-    r'lsl|lsr|asr|ror|'  # Shift
-    r'adc|sbc|neg|mvn|'  # Other arithmetic
-    r'inc|dec|imul|idiv|shl|shr|sar|rol|ror|'  # x86
-    r'fadd|fsub|fmul|fdiv|'  # Float
-    r'vadd|vsub|vmul|vdiv)\b',  # SIMD
+HINT_NOP_PATTERN = re.compile(
+    r'\bhint\s+#0\b',
     re.IGNORECASE
 )
 
@@ -223,19 +186,46 @@ ARM_REG_PATTERN = re.compile(r'\b([xwbhsdq][0-9]+|sp|lr|fp|pc|xzr|wzr)\b', re.IG
 X86_REG_PATTERN = re.compile(r'%([re]?[abcd]x|[re]?[sd]i|[re]?[sb]p|r[0-9]+[dwb]?)', re.IGNORECASE)
 
 
+# GRAPH_CLASSES bits of the node type rules
+_LOAD = GRAPH_CLASSES['load']
+_STORE = GRAPH_CLASSES['store']
+_BRANCH_COND = GRAPH_CLASSES['branch_cond']
+_BRANCH_UNCOND = GRAPH_CLASSES['branch_uncond']
+_CALL = GRAPH_CLASSES['call']
+_INDIRECT = GRAPH_CLASSES['indirect']
+_RET = GRAPH_CLASSES['ret']
+_COMPARE = GRAPH_CLASSES['compare']
+_FENCE = GRAPH_CLASSES['fence']
+_CACHE = GRAPH_CLASSES['cache']
+_TIMING = GRAPH_CLASSES['timing']
+_NOP = GRAPH_CLASSES['nop']
+_ARITHMETIC = GRAPH_CLASSES['arithmetic']
+
+
+def _is_branch_cond(instr: str, classes: int, words: FrozenSet[str]) -> bool:
+    return bool(classes & _BRANCH_COND) or ('b' in words and bool(ARM_BRANCH_COND_PATTERN.search(instr)))
+
+
+def _is_branch_uncond(instr: str, classes: int, words: FrozenSet[str]) -> bool:
+    return bool(classes & _BRANCH_UNCOND) or ('b' in words and bool(ARM_BRANCH_UNCOND_PATTERN.search(instr)))
+
+
 def classify_instruction(instr: str) -> Tuple[str, Dict]:
     """
     Classify an instruction into semantic type with attributes.
-    
+
     Returns:
         (node_type, attributes_dict)
     """
     instr_lower = instr.lower().strip()
-    
+
     # Skip labels and directives
     if instr_lower.endswith(':') or instr_lower.startswith('.'):
         return NodeType.NOP, {}
-    
+
+    words = decode(instr).words
+    classes = GRAPH_CLASSES.classes(words)
+
     attrs = {
         'reads_memory': False,
         'writes_memory': False,
@@ -243,69 +233,69 @@ def classify_instruction(instr: str) -> Tuple[str, Dict]:
         'uses_stack': bool(STACK_ACCESS_PATTERN.search(instr)),
         'uses_index': bool(INDEXED_ACCESS_PATTERN.search(instr)),
     }
-    
+
     # Check for indirect patterns first (highest priority for security)
-    is_indirect = bool(INDIRECT_BRANCH_PATTERNS.search(instr))
+    is_indirect = bool(classes & _INDIRECT) or bool(INDIRECT_OPERAND_PATTERN.search(instr))
     attrs['is_indirect'] = is_indirect
-    
+
     # Return instructions
-    if RET_PATTERNS.search(instr):
+    if classes & _RET:
         return NodeType.RET, attrs
-    
+
     # Indirect jump/call (before regular branch check)
-    if is_indirect and (CALL_PATTERNS.search(instr) or 'blr' in instr_lower):
+    if is_indirect and (classes & _CALL or 'blr' in instr_lower):
         return NodeType.CALL_INDIRECT, attrs
-    
+
     if is_indirect and ('br ' in instr_lower or 'jmp' in instr_lower):
         return NodeType.JUMP_INDIRECT, attrs
-    
+
     # Regular calls
-    if CALL_PATTERNS.search(instr):
+    if classes & _CALL:
         return NodeType.CALL, attrs
-    
+
     # Conditional branches
-    if BRANCH_COND_PATTERNS.search(instr):
+    if _is_branch_cond(instr, classes, words):
         return NodeType.BRANCH_COND, attrs
-    
+
     # Unconditional branches
-    if BRANCH_UNCOND_PATTERNS.search(instr):
+    if _is_branch_uncond(instr, classes, words):
         return NodeType.BRANCH_UNCOND, attrs
-    
+
     # Fences (memory barriers)
-    if FENCE_PATTERNS.search(instr):
+    if classes & _FENCE:
         return NodeType.FENCE, attrs
-    
+
     # Cache operations
-    if CACHE_PATTERNS.search(instr):
+    if classes & _CACHE or (('dc' in words or 'ic' in words) and CACHE_MAINTENANCE_PATTERN.search(instr)):
         return NodeType.CACHE_OP, attrs
-    
+
     # Timing operations
-    if TIMING_PATTERNS.search(instr):
+    if classes & _TIMING or ('mrs' in words and TIMER_READ_PATTERN.search(instr)):
         return NodeType.TIMING, attrs
-    
+
     # Comparisons
-    if COMPARE_PATTERNS.search(instr):
+    if classes & _COMPARE:
         return NodeType.COMPARE, attrs
-    
+
     # NOPs
-    if NOP_PATTERNS.search(instr):
+    if classes & _NOP or ('hint' in words and HINT_NOP_PATTERN.search(instr)):
         return NodeType.NOP, attrs
-    
+
     # Memory operations - need to check for memory operand presence
     has_memory_operand = '[' in instr or ('(' in instr and '%' in instr)
-    
+
     # Determine if load or store based on instruction and operand position
     # ARM: ldr dest, [src] -> load; str src, [dest] -> store
     # x86: mov src, dest with memory
-    
-    if STORE_PATTERNS.search(instr) or X86_STORE_PATTERNS.search(instr):
+
+    if classes & _STORE:
         if has_memory_operand or 'push' in instr_lower:
             attrs['writes_memory'] = True
             if attrs['uses_stack']:
                 return NodeType.STORE_STACK, attrs
             return NodeType.STORE, attrs
-    
-    if LOAD_PATTERNS.search(instr) or X86_LOAD_PATTERNS.search(instr):
+
+    if classes & _LOAD:
         if has_memory_operand or 'pop' in instr_lower:
             attrs['reads_memory'] = True
             if attrs['uses_stack']:
@@ -313,47 +303,48 @@ def classify_instruction(instr: str) -> Tuple[str, Dict]:
             if attrs['uses_index']:
                 return NodeType.LOAD_INDEXED, attrs
             return NodeType.LOAD, attrs
-    
+
     # General arithmetic/compute
-    if ARITHMETIC_PATTERNS.search(instr):
+    if classes & _ARITHMETIC:
         return NodeType.COMPUTE, attrs
-    
+
     # Default to COMPUTE for anything else that looks like an instruction
     if any(c.isalpha() for c in instr):
         return NodeType.COMPUTE, attrs
-    
+
     return NodeType.UNKNOWN, attrs
 
 
 def extract_registers(instr: str) -> Tuple[Set[str], Set[str]]:
     """
     Extract defined and used registers from an instruction.
-    
+
     Returns:
         (defs_set, uses_set)
     """
     # Simple heuristic: first operand is usually dest (def), rest are sources (uses)
     # This is architecture-dependent but works as approximation
-    
+
     defs = set()
     uses = set()
-    
+
     # Find all registers
     arm_regs = ARM_REG_PATTERN.findall(instr)
     x86_regs = X86_REG_PATTERN.findall(instr)
     all_regs = [r.lower() for r in arm_regs + x86_regs]
-    
+
     if not all_regs:
         return defs, uses
-    
+
     # Simple heuristic: first register is dest (defined), rest are used
     # Exception: store instructions define memory, not the first register
-    instr_lower = instr.lower()
-    
-    is_store = STORE_PATTERNS.search(instr) or X86_STORE_PATTERNS.search(instr)
-    is_cmp = COMPARE_PATTERNS.search(instr)
-    is_branch = BRANCH_COND_PATTERNS.search(instr) or BRANCH_UNCOND_PATTERNS.search(instr)
-    
+    words = decode(instr).words
+    classes = GRAPH_CLASSES.classes(words)
+
+    is_store = classes & _STORE
+    is_cmp = classes & _COMPARE
+    is_branch = _is_branch_cond(instr, classes, words) or _is_branch_uncond(instr, classes, words)
+
     if is_store or is_cmp or is_branch:
         # All registers are used (sources)
         uses = set(all_regs)
@@ -363,7 +354,7 @@ def extract_registers(instr: str) -> Tuple[Set[str], Set[str]]:
             defs.add(all_regs[0])
         if len(all_regs) > 1:
             uses = set(all_regs[1:])
-    
+
     return defs, uses
 
 
@@ -404,6 +395,19 @@ def extract_memory_address(instr: str) -> Optional[str]:
     return None
 
 
+def _node_view(ins) -> Tuple[str, Dict, Tuple[str, ...], Tuple[str, ...], Optional[str]]:
+    """classify_instruction, extract_registers and extract_memory_address as a
+    view of a decoded instruction, so they run once per distinct line (see
+    instruction_semantics.decode). Registers come back as tuples (in set
+    iteration order) and attrs must not be mutated: results are shared."""
+    instr = ins.line
+    node_type, attrs = classify_instruction(instr)
+    if node_type in (NodeType.NOP, NodeType.UNKNOWN):
+        return node_type, attrs, (), (), None
+    defs, uses = extract_registers(instr)
+    return node_type, attrs, tuple(defs), tuple(uses), extract_memory_address(instr)
+
+
 # =============================================================================
 # GRAPH BUILDER
 # =============================================================================
@@ -453,19 +457,13 @@ class SemanticGraphBuilder:
             if not instr.strip():
                 continue
             
-            # Classify instruction
-            node_type, attrs = classify_instruction(instr)
+            # Classify instruction, extract register usage and memory address
+            node_type, attrs, defs, uses, mem_addr = decode(instr).view(_node_view)
             
             # Skip NOPs and UNKNOWNs for cleaner graphs
             if node_type in (NodeType.NOP, NodeType.UNKNOWN):
                 continue
             
-            # Extract register usage
-            defs, uses = extract_registers(instr)
-            
-            # Extract memory address
-            mem_addr = extract_memory_address(instr)
-            
             # Create node
             node = SemanticNode(
                 id=len(nodes),
@@ -476,8 +474,8 @@ class SemanticGraphBuilder:
                 is_indirect=attrs.get('is_indirect', False),
                 uses_stack=attrs.get('uses_stack', False),
                 uses_index=attrs.get('uses_index', False),
-                defs=defs,
-                uses=uses,
+                defs=set(defs),
+                uses=set(uses),
                 memory_addr=mem_addr,
             )
             nodes.append(node)
@@ -524,26 +522,22 @@ class SemanticGraphBuilder:
         
         return SemanticGraph(nodes=nodes, edges=edges)
     
-    def to_adjacency_matrix(self, graph: SemanticGraph, 
-                           max_nodes: int = 128) -> Tuple[np.ndarray, np.ndarray]:
+    # Node features: one-hot node type + attributes
+    # Node types: 16 types + 5 binary attributes = 21 features per node
+    NODE_FEATURE_TYPES = [
+        NodeType.LOAD, NodeType.STORE, NodeType.LOAD_INDEXED, 
+        NodeType.LOAD_STACK, NodeType.STORE_STACK,
+        NodeType.BRANCH_COND, NodeType.BRANCH_UNCOND,
+        NodeType.CALL, NodeType.CALL_INDIRECT, NodeType.RET,
+        NodeType.JUMP_INDIRECT, NodeType.COMPARE, NodeType.COMPUTE,
+        NodeType.FENCE, NodeType.CACHE_OP, NodeType.TIMING
+    ]
+    
+    def node_feature_matrix(self, graph: SemanticGraph, max_nodes: int = 128) -> np.ndarray:
         """
-        Convert graph to adjacency matrix and node feature matrix.
-        
-        Returns:
-            (adjacency_matrix, node_features)
+        Node feature matrix [max_nodes, 21].
         """
-        n_nodes = min(len(graph.nodes), max_nodes)
-        
-        # Node features: one-hot node type + attributes
-        # Node types: 16 types + 5 binary attributes = 21 features per node
-        node_types = [
-            NodeType.LOAD, NodeType.STORE, NodeType.LOAD_INDEXED, 
-            NodeType.LOAD_STACK, NodeType.STORE_STACK,
-            NodeType.BRANCH_COND, NodeType.BRANCH_UNCOND,
-            NodeType.CALL, NodeType.CALL_INDIRECT, NodeType.RET,
-            NodeType.JUMP_INDIRECT, NodeType.COMPARE, NodeType.COMPUTE,
-            NodeType.FENCE, NodeType.CACHE_OP, NodeType.TIMING
-        ]
+        node_types = self.NODE_FEATURE_TYPES
         type_to_idx = {t: i for i, t in enumerate(node_types)}
         
         n_type_features = len(node_types)
@@ -551,7 +545,6 @@ class SemanticGraphBuilder:
         n_features = n_type_features + n_attr_features
         
         node_features = np.zeros((max_nodes, n_features), dtype=np.float32)
-        adjacency = np.zeros((max_nodes, max_nodes), dtype=np.float32)
         
         for i, node in enumerate(graph.nodes[:max_nodes]):
             # One-hot node type
@@ -565,12 +558,22 @@ class SemanticGraphBuilder:
             node_features[i, n_type_features + 3] = float(node.uses_stack)
             node_features[i, n_type_features + 4] = float(node.uses_index)
         
-        # Build adjacency matrix
-        for edge in graph.edges:
-            if edge.src < max_nodes and edge.dst < max_nodes:
-                adjacency[edge.src, edge.dst] = 1.0
-                # Make undirected for message passing
-                adjacency[edge.dst, edge.src] = 1.0
+        return node_features
+    
+    def to_adjacency_matrix(self, graph: SemanticGraph, 
+                           max_nodes: int = 128) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert graph to adjacency matrix and node feature matrix.
+        
+        Returns:
+            (adjacency_matrix, node_features)
+        """
+        node_features = self.node_feature_matrix(graph, max_nodes)
+        adjacency = np.zeros((max_nodes, max_nodes), dtype=np.float32)
+        
+        # Build adjacency matrix (undirected for message passing)
+        src, dst = graph.edge_index(max_nodes, undirected=True)
+        adjacency[src, dst] = 1.0
         
         return adjacency, node_features
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Differential test for the multi-gadget chain matcher
+Checks ChainMatcher.match against the networkx subgraph isomorphism of
+compare_cfgs on seeded random gadget and window semantic sequences
+"""
+
+import random
+from typing import List
+
+import networkx as nx
+
+from cfg_chain_matcher import ChainMatcher, split_blocks
+from cfg_vulnerability_scan import build_cfg_from_semantics, compare_cfgs
+
+SEMANTIC_TYPES = ['BRANCH', 'LOAD', 'COMPUTE', 'STORE']
+
+
+def random_sequence(rng: random.Random, max_len: int, types: List[str]) -> List[str]:
+    return [rng.choice(types) for _ in range(rng.randint(0, max_len))]
+
+
+def test_split_blocks_are_cfg_components():
+    """split_blocks gives the weakly connected components of the CFG, in order."""
+    print("🔬 split_blocks vs build_cfg_from_semantics components")
+    rng = random.Random(3)
+    for _ in range(2000):
+        seq = random_sequence(rng, 12, SEMANTIC_TYPES)
+        components = sorted(sorted(c) for c in nx.weakly_connected_components(build_cfg_from_semantics(seq)))
+        assert [tuple(seq[i] for i in c) for c in components] == split_blocks(seq), seq
+    print("✅ 2000 sequences agree")
+
+
+def test_chain_matcher_matches_compare_cfgs():
+    """match(window) is exactly the set of gadgets compare_cfgs accepts."""
+    print("🔬 ChainMatcher.match vs compare_cfgs")
+    rng = random.Random(7)
+    checks = 0
+    for _ in range(150):
+        # Fewer types give more repeated blocks and placement conflicts
+        types = rng.sample(SEMANTIC_TYPES, rng.randint(2, 4))
+        if 'BRANCH' not in types:
+            types.append('BRANCH')
+        gadgets = [random_sequence(rng, 6, types) for _ in range(12)]
+        gadget_cfgs = [build_cfg_from_semantics(g) for g in gadgets]
+        matcher = ChainMatcher()
+        for i, gadget in enumerate(gadgets):
+            assert matcher.add(gadget) == i
+        assert len(matcher) == len(gadgets)
+        for _ in range(12):
+            window = random_sequence(rng, 14, types)
+            window_cfg = build_cfg_from_semantics(window)
+            expected = [i for i, g in enumerate(gadget_cfgs) if compare_cfgs(window_cfg, g)]
+            assert matcher.match(window) == expected, (window, gadgets)
+            checks += 1
+    print(f"✅ {checks} windows agree")
+
+
+def test_gadgets_added_after_matching():
+    """Gadgets registered after a match are picked up by the next one."""
+    print("🔬 ChainMatcher.add after match")
+    rng = random.Random(11)
+    matcher = ChainMatcher()
+    gadget_cfgs = []
+    for _ in range(60):
+        gadget = random_sequence(rng, 5, SEMANTIC_TYPES)
+        matcher.add(gadget)
+        gadget_cfgs.append(build_cfg_from_semantics(gadget))
+        window = random_sequence(rng, 12, SEMANTIC_TYPES)
+        window_cfg = build_cfg_from_semantics(window)
+        expected = [i for i, g in enumerate(gadget_cfgs) if compare_cfgs(window_cfg, g)]
+        assert matcher.match(window) == expected, window
+    print("✅ 60 incremental matches agree")
+
+
+def main():
+    """Run the chain matcher differential tests"""
+    print("🧪 CFG Chain Matcher Differential Tests")
+    print("=" * 60)
+    test_split_blocks_are_cfg_components()
+    test_chain_matcher_matches_compare_cfgs()
+    test_gadgets_added_after_matching()
+
+
+if __name__ == "__main__":
+    main()
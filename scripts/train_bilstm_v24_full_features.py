@@ -29,6 +29,9 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(Path(__file__).parent))
+from feature_store import FeatureRow, FeatureStore, is_feature_store
+
 # ============================================================================
 # Rich Token Representation (same as v23)
 # ============================================================================
@@ -128,7 +131,10 @@ def rich_tokens_from_sequence(seq: List[str]) -> List[str]:
 # ============================================================================
 
 def load_jsonl(path: Path, max_samples: int = None):
-    """Load JSONL dataset with pre-computed features."""
+    """Load JSONL dataset (or feature store directory) with pre-computed features."""
+    if is_feature_store(path):
+        records = FeatureStore(path).records()
+        return records[:max_samples] if max_samples else records
     records = []
     with open(path) as f:
         for i, line in enumerate(f):
@@ -195,16 +201,19 @@ class HybridDatasetFullFeatures(Dataset):
         len_tensor = torch.tensor(seq_len, dtype=torch.long)
         
         # Extract features in consistent order
-        feat_values = []
-        for key in self.feature_keys:
-            val = features_dict.get(key, 0)
-            if isinstance(val, bool):
-                val = float(val)
-            elif not isinstance(val, (int, float)):
-                val = 0.0
-            feat_values.append(float(val))
-        
-        feat_tensor = torch.tensor(feat_values, dtype=torch.float32)
+        if isinstance(features_dict, FeatureRow):
+            feat_tensor = torch.from_numpy(features_dict.take(self.feature_keys))
+        else:
+            feat_values = []
+            for key in self.feature_keys:
+                val = features_dict.get(key, 0)
+                if isinstance(val, bool):
+                    val = float(val)
+                elif not isinstance(val, (int, float)):
+                    val = 0.0
+                feat_values.append(float(val))
+            
+            feat_tensor = torch.tensor(feat_values, dtype=torch.float32)
         
         return seq_tensor, len_tensor, feat_tensor, self.label_to_id[label]
 
@@ -454,7 +463,8 @@ def plot_training_history(history, save_path):
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--input', default='data/features/combined_v22_enhanced.jsonl')
+    parser.add_argument('--input', default='data/features/combined_v22_enhanced.jsonl',
+                        help='Features JSONL, or a feature store written with --with-sequence')
     parser.add_argument('--epochs', type=int, default=50)
     parser.add_argument('--batch-size', type=int, default=32)
     parser.add_argument('--patience', type=int, default=10)
@@ -45,6 +45,7 @@ import seaborn as sns
 sys.path.insert(0, str(Path(__file__).parent))
 
 from semantic_graph_builder import SemanticGraphBuilder, NodeType, EdgeType
+from feature_store import FeatureStore, is_feature_store
 
 
 # =============================================================================
@@ -60,6 +61,19 @@ CLASSES = [
 LABEL_TO_IDX = {label: idx for idx, label in enumerate(CLASSES)}
 IDX_TO_LABEL = {idx: label for label, idx in LABEL_TO_IDX.items()}
 
+# PDG node features: one-hot node type + 5 attribute flags
+PDG_NODE_TYPES = [
+    NodeType.LOAD, NodeType.STORE, NodeType.LOAD_INDEXED,
+    NodeType.LOAD_STACK, NodeType.STORE_STACK,
+    NodeType.BRANCH_COND, NodeType.BRANCH_UNCOND,
+    NodeType.CALL, NodeType.CALL_INDIRECT, NodeType.RET,
+    NodeType.JUMP_INDIRECT, NodeType.COMPARE, NodeType.COMPUTE,
+    NodeType.FENCE, NodeType.CACHE_OP, NodeType.TIMING,
+    NodeType.NOP, NodeType.UNKNOWN,
+]
+PDG_TYPE_TO_IDX = {t: i for i, t in enumerate(PDG_NODE_TYPES)}
+PDG_NODE_ATTR_FEATURES = 5
+
 
 # =============================================================================
 # RF MODEL WRAPPER
@@ -211,7 +225,8 @@ class GGNNModelWrapper:
         self.model.eval()
         
         self.max_nodes = config.get('max_nodes', 64)
-        self.use_handcrafted = model_config['handcrafted_dim'] > 0
+        self.handcrafted_dim = model_config['handcrafted_dim']
+        self.use_handcrafted = self.handcrafted_dim > 0
         
         print(f"  GGNN model loaded")
     
@@ -221,82 +236,99 @@ class GGNNModelWrapper:
         features: Optional[Dict] = None,
     ) -> Tuple[torch.Tensor, ...]:
         """Build PDG tensors from instruction sequence."""
-        graph = self.graph_builder.build_graph(sequence)
-        
-        # Node features
-        node_types = [
-            NodeType.LOAD, NodeType.STORE, NodeType.LOAD_INDEXED,
-            NodeType.LOAD_STACK, NodeType.STORE_STACK,
-            NodeType.BRANCH_COND, NodeType.BRANCH_UNCOND,
-            NodeType.CALL, NodeType.CALL_INDIRECT, NodeType.RET,
-            NodeType.JUMP_INDIRECT, NodeType.COMPARE, NodeType.COMPUTE,
-            NodeType.FENCE, NodeType.CACHE_OP, NodeType.TIMING,
-            NodeType.NOP, NodeType.UNKNOWN,
-        ]
-        type_to_idx = {t: i for i, t in enumerate(node_types)}
-        n_type_features = len(node_types)
-        n_attr_features = 5
-        n_features = n_type_features + n_attr_features
-        
+        return self._build_pdg_batch([sequence], [features] if features else None)
+    
+    def _build_pdg_batch(
+        self,
+        sequences: List[List[str]],
+        features: Optional[List[Dict]] = None,
+    ) -> Tuple[torch.Tensor, ...]:
+        """
+        Build PDG tensors for a batch of sequences in one go.
+        
+        The padded node arrays are allocated once for the whole batch and the
+        adjacencies are batched sparse COO tensors [batch, nodes, nodes] built
+        from the graphs' symmetric edge lists (DATA_DEP edges -> data, all
+        other edge types -> control), so the per-sequence work is only graph
+        building. Handcrafted features are included when ``features`` is
+        given (one truthy dict per sequence).
+        """
+        n_type_features = len(PDG_NODE_TYPES)
+        n_features = n_type_features + PDG_NODE_ATTR_FEATURES
         max_nodes = self.max_nodes
-        n_nodes = min(len(graph.nodes), max_nodes)
-        
-        node_features = np.zeros((max_nodes, n_features), dtype=np.float32)
-        for i, node in enumerate(graph.nodes[:max_nodes]):
-            type_idx = type_to_idx.get(node.node_type, len(node_types) - 1)
-            if type_idx < n_type_features:
-                node_features[i, type_idx] = 1.0
-            node_features[i, n_type_features] = float(node.reads_memory)
-            node_features[i, n_type_features + 1] = float(node.writes_memory)
-            node_features[i, n_type_features + 2] = float(node.is_indirect)
-            node_features[i, n_type_features + 3] = float(node.uses_stack)
-            node_features[i, n_type_features + 4] = float(node.uses_index)
-        
-        # Adjacency matrices
-        adj_data = np.zeros((max_nodes, max_nodes), dtype=np.float32)
-        adj_control = np.zeros((max_nodes, max_nodes), dtype=np.float32)
-        
-        for edge in graph.edges:
-            if edge.src < max_nodes and edge.dst < max_nodes:
-                if edge.edge_type == EdgeType.DATA_DEP:
-                    adj_data[edge.src, edge.dst] = 1.0
-                    adj_data[edge.dst, edge.src] = 1.0
-                else:
-                    adj_control[edge.src, edge.dst] = 1.0
-                    adj_control[edge.dst, edge.src] = 1.0
+        batch_size = len(sequences)
+        
+        node_features = np.zeros((batch_size, max_nodes, n_features), dtype=np.float32)
+        seq_lengths = np.zeros(batch_size, dtype=np.int64)
+        # [3, E] (batch, src, dst) index blocks per adjacency
+        data_edges = []
+        control_edges = []
+        
+        for b, sequence in enumerate(sequences):
+            graph = self.graph_builder.build_graph(sequence)
+            nodes = graph.nodes[:max_nodes]
+            n_nodes = len(nodes)
+            seq_lengths[b] = n_nodes
+            
+            if n_nodes:
+                type_idx = [PDG_TYPE_TO_IDX.get(node.node_type, n_type_features - 1) for node in nodes]
+                node_features[b, np.arange(n_nodes), type_idx] = 1.0
+                node_features[b, :n_nodes, n_type_features:] = [
+                    (node.reads_memory, node.writes_memory, node.is_indirect,
+                     node.uses_stack, node.uses_index)
+                    for node in nodes
+                ]
+            
+            edges = graph.edge_index_by_type(max_nodes, undirected=True)
+            data = edges.pop(EdgeType.DATA_DEP)
+            # A pair may carry several non-data edge types; keep it once
+            control = np.unique(np.concatenate(list(edges.values()), axis=1), axis=1)
+            for target, index in ((data_edges, data), (control_edges, control)):
+                target.append(np.concatenate([np.full((1, index.shape[1]), b, dtype=np.int64), index]))
+        
+        adj_data, adj_control = (
+            self._sparse_adjacency(np.concatenate(blocks, axis=1), batch_size)
+            for blocks in (data_edges, control_edges)
+        )
         
         # Topological order
-        topo_order = np.arange(max_nodes)
+        topo_order = np.broadcast_to(np.arange(max_nodes), (batch_size, max_nodes))
         
         # Node mask
-        node_mask = np.zeros(max_nodes, dtype=np.bool_)
-        node_mask[:n_nodes] = True
-        
-        # Convert to tensors
-        node_features_t = torch.from_numpy(node_features).unsqueeze(0)
-        adj_data_t = torch.from_numpy(adj_data).unsqueeze(0)
-        adj_control_t = torch.from_numpy(adj_control).unsqueeze(0)
-        topo_order_t = torch.from_numpy(topo_order).unsqueeze(0).long()
-        node_mask_t = torch.from_numpy(node_mask).unsqueeze(0)
-        seq_lengths_t = torch.tensor([n_nodes])
-        
-        # Handcrafted features
+        node_mask = np.arange(max_nodes)[None, :] < seq_lengths[:, None]
+        
+        # Handcrafted features (must match the model's input width)
         if self.use_handcrafted and features:
-            hc_features = self._extract_handcrafted(features)
-            hc_features_t = torch.from_numpy(hc_features).unsqueeze(0)
+            hc_features = np.zeros((batch_size, self.handcrafted_dim), dtype=np.float32)
+            for b, feat in enumerate(features):
+                hc = self._extract_handcrafted(feat)
+                if len(hc) != self.handcrafted_dim:
+                    raise ValueError(
+                        f"Handcrafted feature vector has {len(hc)} values, "
+                        f"but the GGNN model expects {self.handcrafted_dim}"
+                    )
+                hc_features[b] = hc
+            hc_features_t = torch.from_numpy(hc_features)
         else:
             hc_features_t = None
         
         return (
-            node_features_t,
-            adj_data_t,
-            adj_control_t,
-            topo_order_t,
-            node_mask_t,
-            seq_lengths_t,
+            torch.from_numpy(node_features),
+            adj_data,
+            adj_control,
+            torch.from_numpy(topo_order.copy()).long(),
+            torch.from_numpy(node_mask),
+            torch.from_numpy(seq_lengths),
             hc_features_t,
         )
     
+    def _sparse_adjacency(self, index: np.ndarray, batch_size: int) -> torch.Tensor:
+        """Unit-weight sparse COO adjacency from a sorted [3, E] (batch, src, dst) index."""
+        return torch.sparse_coo_tensor(
+            torch.from_numpy(index), torch.ones(index.shape[1]),
+            (batch_size, self.max_nodes, self.max_nodes), is_coalesced=True,
+        )
+    
     def _extract_handcrafted(self, features: Dict) -> np.ndarray:
         """Extract handcrafted features in consistent order."""
         # Get all numeric features
@@ -312,6 +344,7 @@ class GGNNModelWrapper:
         self, 
         sequences: List[List[str]],
         features: Optional[List[Dict]] = None,
+        batch_size: int = 64,
     ) -> np.ndarray:
         """
         Get prediction probabilities.
@@ -319,35 +352,32 @@ class GGNNModelWrapper:
         Args:
             sequences: List of instruction sequences
             features: Optional list of feature dictionaries
+            batch_size: Sequences per forward pass
             
         Returns:
             Probability matrix [n_samples, n_classes]
         """
-        probs_list = []
-        
-        for i, seq in enumerate(sequences):
-            feat = features[i] if features else None
-            tensors = self._build_pdg_tensors(seq, feat)
-            
-            # Move to device
-            node_features = tensors[0].to(DEVICE)
-            adj_data = tensors[1].to(DEVICE)
-            adj_control = tensors[2].to(DEVICE)
-            topo_order = tensors[3].to(DEVICE)
-            node_mask = tensors[4].to(DEVICE)
-            seq_lengths = tensors[5].to(DEVICE)
-            hc_features = tensors[6].to(DEVICE) if tensors[6] is not None else None
-            
-            # Forward pass
-            logits = self.model(
-                node_features, adj_data, adj_control, topo_order,
-                node_mask, seq_lengths, hc_features
-            )
-            
-            probs = F.softmax(logits, dim=-1).cpu().numpy()
-            probs_list.append(probs[0])
-        
-        return np.array(probs_list)
+        probs = np.zeros((len(sequences), len(CLASSES)))
+        
+        # Samples with and without handcrafted features cannot share a forward pass
+        groups = defaultdict(list)
+        for i in range(len(sequences)):
+            groups[bool(self.use_handcrafted and features and features[i])].append(i)
+        
+        for with_hc, indices in groups.items():
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                tensors = self._build_pdg_batch(
+                    [sequences[i] for i in chunk],
+                    [features[i] for i in chunk] if with_hc else None,
+                )
+                tensors = [t.to(DEVICE) if t is not None else None for t in tensors]
+                
+                # Forward pass
+                logits = self.model(*tensors)
+                probs[chunk] = F.softmax(logits, dim=-1).cpu().numpy()
+        
+        return probs
     
     def predict(self, sequences: List[List[str]], features: Optional[List[Dict]] = None) -> List[str]:
         """Get predictions."""
@@ -495,8 +525,12 @@ class EnsembleModel:
 # =============================================================================
 
 def load_data(data_path: Path) -> List[Dict]:
-    """Load data from JSONL file."""
+    """Load data from a JSONL file or a feature store directory."""
     print(f"Loading data from {data_path}...")
+    if is_feature_store(data_path):
+        records = FeatureStore(data_path).records()
+        print(f"  Loaded {len(records)} records (feature store)")
+        return records
     records = []
     with open(data_path) as f:
         for line in f:
@@ -72,7 +72,13 @@ CONFUSED_CLASS_NAMES = [
 # =============================================================================
 
 class PDGDataset(Dataset):
-    """Dataset for GGNN-BiLSTM training with PDGs"""
+    """Dataset for GGNN-BiLSTM training with PDGs
+
+    By default (sparse=True) the adjacencies are kept as (index [2, E],
+    weight [E]) edge lists and returned as sparse COO tensors, so memory
+    scales with the number of edges instead of max_nodes**2 per sample;
+    sparse=False stores dense matrices.
+    """
     
     def __init__(
         self,
@@ -81,10 +87,12 @@ class PDGDataset(Dataset):
         handcrafted_feature_names: List[str],
         max_nodes: int = MAX_NODES,
         speculative_window: int = 10,
+        sparse: bool = True,
     ):
         self.label_to_id = label_to_id
         self.handcrafted_feature_names = handcrafted_feature_names
         self.max_nodes = max_nodes
+        self.sparse = sparse
         
         self.pdg_builder = PDGBuilder(speculative_window=speculative_window)
         
@@ -113,7 +121,10 @@ class PDGDataset(Dataset):
         n_nodes = min(len(pdg.nodes), self.max_nodes)
         
         node_features = pdg.get_node_features(self.max_nodes)
-        adj_data, adj_control = pdg.get_adjacency_matrices(self.max_nodes)
+        if self.sparse:
+            adj_data, adj_control = pdg.get_sparse_adjacency(self.max_nodes)
+        else:
+            adj_data, adj_control = pdg.get_adjacency_matrices(self.max_nodes)
         
         topo = pdg.topological_order()
         topo_filtered = [t for t in topo if t < self.max_nodes]
@@ -147,12 +158,21 @@ class PDGDataset(Dataset):
     def __len__(self):
         return len(self.data)
     
+    def _adjacency(self, adj) -> torch.Tensor:
+        if not self.sparse:
+            return torch.from_numpy(adj)
+        index, weight = adj
+        return torch.sparse_coo_tensor(
+            torch.from_numpy(index), torch.from_numpy(weight),
+            (self.max_nodes, self.max_nodes), is_coalesced=True,
+        )
+    
     def __getitem__(self, idx):
         item = self.data[idx]
         return {
             'node_features': torch.from_numpy(item['node_features']),
-            'adj_data': torch.from_numpy(item['adj_data']),
-            'adj_control': torch.from_numpy(item['adj_control']),
+            'adj_data': self._adjacency(item['adj_data']),
+            'adj_control': self._adjacency(item['adj_control']),
             'topo_order': torch.from_numpy(item['topo_order']),
             'node_mask': torch.from_numpy(item['node_mask']),
             'seq_length': torch.tensor(item['seq_length'], dtype=torch.long),
@@ -533,6 +553,9 @@ def main():
     parser.add_argument('--contrastive-lr', type=float, default=5e-4)
     parser.add_argument('--dropout', type=float, default=0.2)
     parser.add_argument('--grad-accum', type=int, default=2)
+    parser.add_argument('--dense-adjacency', action='store_true',
+                        help='Store dense max_nodes^2 PDG adjacency matrices instead of '
+                             'edge lists with sparse message passing')
     
     args = parser.parse_args()
     
@@ -613,9 +636,11 @@ def main():
     # Create datasets
     print("\nCreating datasets...")
     print("  Creating train dataset...")
-    train_dataset = PDGDataset(train_records, label_to_id, feature_names)
+    train_dataset = PDGDataset(train_records, label_to_id, feature_names,
+                               sparse=not args.dense_adjacency)
     print("  Creating test dataset...")
-    test_dataset = PDGDataset(test_records, label_to_id, feature_names)
+    test_dataset = PDGDataset(test_records, label_to_id, feature_names,
+                              sparse=not args.dense_adjacency)
     
     # Create data loaders
     print("  Creating data loaders...")
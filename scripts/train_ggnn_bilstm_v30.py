@@ -264,7 +264,7 @@ class PDGDataset(Dataset):
         
         n_nodes = min(len(pdg.nodes), self.max_nodes)
         node_features = pdg.get_node_features(self.max_nodes)
-        adj_data, adj_control = pdg.get_adjacency_matrices(self.max_nodes)
+        adj_data, adj_control = pdg.get_sparse_adjacency(self.max_nodes)
         
         topo = pdg.topological_order()
         topo_filtered = [t for t in topo if t < self.max_nodes]
@@ -296,12 +296,19 @@ class PDGDataset(Dataset):
     def __len__(self):
         return len(self.data)
     
+    def _adjacency(self, adj) -> torch.Tensor:
+        index, weight = adj
+        return torch.sparse_coo_tensor(
+            torch.from_numpy(index), torch.from_numpy(weight),
+            (self.max_nodes, self.max_nodes), is_coalesced=True,
+        )
+    
     def __getitem__(self, idx):
         item = self.data[idx]
         return {
             'node_features': torch.from_numpy(item['node_features']),
-            'adj_data': torch.from_numpy(item['adj_data']),
-            'adj_control': torch.from_numpy(item['adj_control']),
+            'adj_data': self._adjacency(item['adj_data']),
+            'adj_control': self._adjacency(item['adj_control']),
             'topo_order': torch.from_numpy(item['topo_order']),
             'node_mask': torch.from_numpy(item['node_mask']),
             'seq_length': torch.tensor(item['seq_length'], dtype=torch.long),
@@ -37,7 +37,7 @@ from tqdm import tqdm
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from pdg_builder import PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
+from pdg_builder import PDG, PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
 from gine_classifier import GINEClassifier, SupervisedContrastiveLoss
 
 
@@ -77,6 +77,7 @@ class GINEDataset(Dataset):
         max_nodes: int = MAX_NODES,
         max_edges: int = MAX_EDGES,
         speculative_window: int = 10,
+        workers: int = 1,
     ):
         self.label_to_id = label_to_id
         self.handcrafted_feature_names = handcrafted_feature_names
@@ -86,8 +87,11 @@ class GINEDataset(Dataset):
 
         print(f"Pre-computing PDGs with {NUM_EDGE_TYPES} edge types...")
         self.data = []
-        for rec in tqdm(records, desc="Building PDGs"):
-            item = self._process_record(rec)
+        # PDGs are built in input order across `workers` processes
+        pdgs = self.pdg_builder.build_many(
+            (self._pdg_sequence(rec) for rec in records), workers=workers)
+        for rec, pdg in tqdm(zip(records, pdgs), total=len(records), desc="Building PDGs"):
+            item = self._process_record(rec, pdg)
             if item is not None:
                 self.data.append(item)
         print(f"  Valid samples: {len(self.data)}/{len(records)}")
@@ -105,7 +109,14 @@ class GINEDataset(Dataset):
             pct = 100.0 * edge_counts[et] / total_edges if total_edges > 0 else 0
             print(f"    {edge_names.get(et, '?'):15s}: {edge_counts[et]:>8d} ({pct:.1f}%)")
 
-    def _process_record(self, rec: Dict) -> Optional[Dict]:
+    def _pdg_sequence(self, rec: Dict) -> List[str]:
+        """Sequence _process_record builds a PDG from ([] for skipped records)."""
+        sequence = rec.get('sequence', [])
+        if len(sequence) < 3 or rec.get('label', 'UNKNOWN') not in self.label_to_id:
+            return []
+        return sequence
+
+    def _process_record(self, rec: Dict, pdg: Optional[PDG] = None) -> Optional[Dict]:
         sequence = rec.get('sequence', [])
         if len(sequence) < 3:
             return None
@@ -114,7 +125,8 @@ class GINEDataset(Dataset):
         if label not in self.label_to_id:
             return None
 
-        pdg = self.pdg_builder.build(sequence)
+        if pdg is None:
+            pdg = self.pdg_builder.build(sequence)
         if len(pdg.nodes) < 2:
             return None
 
@@ -455,6 +467,8 @@ def main():
     parser.add_argument('--grad-accum', type=int, default=2)
     parser.add_argument('--no-virtual-node', action='store_true')
     parser.add_argument('--speculative-window', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for parallel PDG construction')
 
     args = parser.parse_args()
 
@@ -542,10 +556,12 @@ def main():
     train_dataset = GINEDataset(
         train_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
+        workers=args.workers,
     )
     test_dataset = GINEDataset(
         test_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
+        workers=args.workers,
     )
 
     train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
@@ -43,7 +43,7 @@ from tqdm import tqdm
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from pdg_builder import PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
+from pdg_builder import PDG, PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
 from gine_classifier import GINEClassifier, SupervisedContrastiveLoss
 
 
@@ -95,6 +95,7 @@ class GINEDatasetReweighted(Dataset):
         max_nodes: int = MAX_NODES,
         max_edges: int = MAX_EDGES,
         speculative_window: int = 10,
+        workers: int = 1,
     ):
         self.label_to_id = label_to_id
         self.handcrafted_feature_names = handcrafted_feature_names
@@ -115,8 +116,11 @@ class GINEDatasetReweighted(Dataset):
             print(f"    {edge_names[et]:20s}: {self.multipliers[et]:.1f}x")
 
         self.data = []
-        for rec in tqdm(records, desc="Building PDGs"):
-            item = self._process_record(rec)
+        # PDGs are built in input order across `workers` processes
+        pdgs = self.pdg_builder.build_many(
+            (self._pdg_sequence(rec) for rec in records), workers=workers)
+        for rec, pdg in tqdm(zip(records, pdgs), total=len(records), desc="Building PDGs"):
+            item = self._process_record(rec, pdg)
             if item is not None:
                 self.data.append(item)
         print(f"  Valid samples: {len(self.data)}/{len(records)}")
@@ -133,7 +137,14 @@ class GINEDatasetReweighted(Dataset):
             pct = 100.0 * edge_counts[et] / total_edges if total_edges > 0 else 0
             print(f"    {edge_names.get(et, '?'):15s}: {edge_counts[et]:>8d} ({pct:.1f}%)")
 
-    def _process_record(self, rec: Dict) -> Optional[Dict]:
+    def _pdg_sequence(self, rec: Dict) -> List[str]:
+        """Sequence _process_record builds a PDG from ([] for skipped records)."""
+        sequence = rec.get('sequence', [])
+        if len(sequence) < 3 or rec.get('label', 'UNKNOWN') not in self.label_to_id:
+            return []
+        return sequence
+
+    def _process_record(self, rec: Dict, pdg: Optional[PDG] = None) -> Optional[Dict]:
         sequence = rec.get('sequence', [])
         if len(sequence) < 3:
             return None
@@ -142,7 +153,8 @@ class GINEDatasetReweighted(Dataset):
         if label not in self.label_to_id:
             return None
 
-        pdg = self.pdg_builder.build(sequence)
+        if pdg is None:
+            pdg = self.pdg_builder.build(sequence)
         if len(pdg.nodes) < 2:
             return None
 
@@ -452,6 +464,8 @@ def main():
     parser.add_argument('--grad-accum', type=int, default=2)
     parser.add_argument('--no-virtual-node', action='store_true')
     parser.add_argument('--speculative-window', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for parallel PDG construction')
 
     args = parser.parse_args()
     tag = "V35b GINE Reweighted"
@@ -535,11 +549,13 @@ def main():
         train_records, label_to_id, feature_names,
         edge_type_multipliers=EDGE_TYPE_WEIGHT_MULTIPLIERS,
         speculative_window=args.speculative_window,
+        workers=args.workers,
     )
     test_dataset = GINEDatasetReweighted(
         test_records, label_to_id, feature_names,
         edge_type_multipliers=EDGE_TYPE_WEIGHT_MULTIPLIERS,
         speculative_window=args.speculative_window,
+        workers=args.workers,
     )
 
     train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
@@ -27,7 +27,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 import matplotlib
@@ -39,7 +39,11 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from pdg_builder import PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
 from gine_classifier_v38 import GINEClassifier, SupervisedContrastiveLoss
-from strip_boilerplate import strip_boilerplate
+from pdg_cache import PDGCache, build_pdg_arrays
+from feature_store import FeatureStore, is_feature_store
+from gine_samples_v38 import (
+    MAX_NODES, MAX_EDGES, NODE_FEATURE_DIM, gine_graph_arrays, handcrafted_vector,
+)
 
 if torch.cuda.is_available():
     DEVICE = torch.device('cuda')
@@ -47,9 +51,6 @@ elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
     DEVICE = torch.device('mps')
 else:
     DEVICE = torch.device('cpu')
-MAX_NODES = 64
-MAX_EDGES = 512
-NODE_FEATURE_DIM = 35  # 34 base + 1 positional
 
 CONFUSED_CLASS_NAMES = [
     ('L1TF', 'SPECTRE_V1'),
@@ -66,8 +67,132 @@ CONFUSED_CLASS_NAMES = [
 # DATASET — with boilerplate stripping + positional encoding
 # =============================================================================
 
+def _ranges(starts: torch.Tensor, counts: torch.Tensor) -> torch.Tensor:
+    """Concatenation of arange(s, s + c) for every (s, c) pair, without a Python loop."""
+    seg_starts = torch.cumsum(counts, 0) - counts
+    within = torch.arange(int(counts.sum())) - torch.repeat_interleave(seg_starts, counts)
+    return torch.repeat_interleave(starts, counts) + within
+
+
+class GINETensorStore:
+    """All precomputed samples of a GINEDatasetV38 as a few contiguous tensors.
+
+    Padded mode keeps one [N, ...] tensor per field. Sparse mode concatenates
+    the unpadded graphs CSR-style: node rows and edges of sample i live in
+    [node_ptr[i], node_ptr[i+1]) and [edge_ptr[i], edge_ptr[i+1]), with edge_index
+    holding graph-local node ids. batch() builds a whole batch with index
+    operations: padded batches are stacked [B, ...] tensors, sparse batches
+    concatenate the graphs PyG-style (node ids in edge_index offset into the
+    concatenated node list, `batch` mapping every node to its graph).
+
+    The tensors are moved to shared memory, so DataLoader workers map them
+    instead of receiving pickled copies.
+    """
+
+    def __init__(self, data: List[Dict], sparse: bool):
+        if not data:
+            raise ValueError("GINETensorStore needs at least one sample")
+        self.sparse = sparse
+        self.labels = torch.tensor([item['label'] for item in data], dtype=torch.long)
+
+        def stacked(name):
+            return torch.from_numpy(np.stack([item[name] for item in data]))
+
+        def concatenated(name, axis=0):
+            return torch.from_numpy(np.ascontiguousarray(
+                np.concatenate([item[name] for item in data], axis=axis)))
+
+        if sparse:
+            node_counts = [item['node_features'].shape[0] for item in data]
+            edge_counts = [item['edge_type'].shape[0] for item in data]
+            self.node_ptr = torch.from_numpy(np.concatenate([[0], np.cumsum(node_counts)]).astype(np.int64))
+            self.edge_ptr = torch.from_numpy(np.concatenate([[0], np.cumsum(edge_counts)]).astype(np.int64))
+            self.node_features = concatenated('node_features')
+            self.edge_index = concatenated('edge_index', axis=1)
+            self.edge_type = concatenated('edge_type')
+            self.edge_weight = concatenated('edge_weight')
+        else:
+            self.node_features = stacked('node_features')
+            self.edge_index = stacked('edge_index')
+            self.edge_type = stacked('edge_type')
+            self.edge_weight = stacked('edge_weight')
+            self.node_mask = stacked('node_mask')
+            self.edge_mask = stacked('edge_mask')
+        self.handcrafted = stacked('handcrafted')
+
+        for tensor in vars(self).values():
+            if isinstance(tensor, torch.Tensor):
+                tensor.share_memory_()
+
+    def __len__(self):
+        return self.labels.shape[0]
+
+    def real_edge_types(self) -> torch.Tensor:
+        """edge_type of every real (unpadded) edge in the store."""
+        return self.edge_type if self.sparse else self.edge_type[self.edge_mask]
+
+    def sample(self, idx: int) -> Dict:
+        """One sample, shaped like the old per-sample __getitem__ output."""
+        if self.sparse:
+            n0, n1 = self.node_ptr[idx].item(), self.node_ptr[idx + 1].item()
+            e0, e1 = self.edge_ptr[idx].item(), self.edge_ptr[idx + 1].item()
+            return {
+                'node_features': self.node_features[n0:n1],
+                'edge_index': self.edge_index[:, e0:e1],
+                'edge_type': self.edge_type[e0:e1],
+                'edge_weight': self.edge_weight[e0:e1],
+                'handcrafted': self.handcrafted[idx],
+                'label': self.labels[idx].item(),
+            }
+        return {
+            'node_features': self.node_features[idx],
+            'edge_index': self.edge_index[idx],
+            'edge_type': self.edge_type[idx],
+            'edge_weight': self.edge_weight[idx],
+            'node_mask': self.node_mask[idx],
+            'edge_mask': self.edge_mask[idx],
+            'handcrafted': self.handcrafted[idx],
+            'label': self.labels[idx].item(),
+        }
+
+    def batch(self, indices) -> Dict[str, torch.Tensor]:
+        idx = torch.as_tensor(indices, dtype=torch.long)
+        if not self.sparse:
+            return {
+                'node_features': self.node_features.index_select(0, idx),
+                'edge_index': self.edge_index.index_select(0, idx),
+                'edge_type': self.edge_type.index_select(0, idx),
+                'edge_weight': self.edge_weight.index_select(0, idx),
+                'node_mask': self.node_mask.index_select(0, idx),
+                'edge_mask': self.edge_mask.index_select(0, idx),
+                'handcrafted': self.handcrafted.index_select(0, idx),
+                'label': self.labels.index_select(0, idx),
+            }
+
+        node_counts = self.node_ptr[idx + 1] - self.node_ptr[idx]
+        edge_counts = self.edge_ptr[idx + 1] - self.edge_ptr[idx]
+        node_pos = _ranges(self.node_ptr[idx], node_counts)
+        edge_pos = _ranges(self.edge_ptr[idx], edge_counts)
+        # Shift graph-local node ids to the graph's offset in the concatenated batch
+        node_offsets = torch.cumsum(node_counts, 0) - node_counts
+        return {
+            'node_features': self.node_features.index_select(0, node_pos),
+            'edge_index': self.edge_index.index_select(1, edge_pos)
+                          + torch.repeat_interleave(node_offsets, edge_counts),
+            'edge_type': self.edge_type.index_select(0, edge_pos),
+            'edge_weight': self.edge_weight.index_select(0, edge_pos),
+            'batch': torch.repeat_interleave(torch.arange(len(idx)), node_counts),
+            'handcrafted': self.handcrafted.index_select(0, idx),
+            'label': self.labels.index_select(0, idx),
+        }
+
+
 class GINEDatasetV38(Dataset):
-    """GINE dataset with boilerplate stripping and positional node features."""
+    """GINE dataset with boilerplate stripping and positional node features.
+
+    Precomputed samples are packed into a GINETensorStore; indexing with a list
+    of indices (see make_loader) returns a whole collated batch.
+    """
 
     def __init__(
         self,
@@ -78,42 +203,68 @@ class GINEDatasetV38(Dataset):
         max_edges: int = MAX_EDGES,
         speculative_window: int = 10,
         strip_bp: bool = True,
+        cache_dir: Optional[str] = None,
+        workers: int = 1,
+        sparse: bool = False,
     ):
         self.label_to_id = label_to_id
         self.handcrafted_feature_names = handcrafted_feature_names
         self.max_nodes = max_nodes
         self.max_edges = max_edges
         self.strip_bp = strip_bp
+        self.sparse = sparse
         self.pdg_builder = PDGBuilder(speculative_window=speculative_window)
+        self.pdg_cache = None
+        if cache_dir or workers > 1:
+            self.pdg_cache = PDGCache(cache_dir, speculative_window=speculative_window,
+                                      strip_bp=strip_bp, builder=self.pdg_builder)
 
         print(f"Pre-computing PDGs (strip_boilerplate={strip_bp}) ...")
-        self.data = []
+        if workers > 1:
+            # Build all missing graphs up front across a process pool
+            n_built = self.pdg_cache.prefetch(
+                [r.get('sequence', []) for r in records
+                 if len(r.get('sequence', [])) >= 3 and r.get('label') in label_to_id],
+                workers=workers,
+            )
+            print(f"  Built {n_built} PDGs with {workers} workers")
+        data = []
         n_stripped = 0
         total_before = 0
         total_after = 0
         for rec in tqdm(records, desc="Building PDGs"):
             item = self._process_record(rec)
             if item is not None:
-                self.data.append(item)
+                data.append(item)
                 total_before += item.get('_len_before', 0)
                 total_after += item.get('_len_after', 0)
                 if item.get('_was_stripped', False):
                     n_stripped += 1
 
-        print(f"  Valid samples: {len(self.data)}/{len(records)}")
+        if self.pdg_cache is not None:
+            self.pdg_cache.flush()
+            print(f"  {self.pdg_cache.stats()}")
+
+        print(f"  Valid samples: {len(data)}/{len(records)}")
         if strip_bp:
-            pct = 100 * n_stripped / max(len(self.data), 1)
+            pct = 100 * n_stripped / max(len(data), 1)
             reduction = 100 * (1 - total_after / max(total_before, 1))
             print(f"  Boilerplate stripped: {n_stripped} ({pct:.1f}%) samples")
             print(f"  Instructions: {total_before} -> {total_after} ({reduction:.1f}% reduction)")
 
+        # Pack everything into contiguous shared-memory tensors; the per-sample
+        # arrays and the PDG cache are no longer needed
+        self.store = GINETensorStore(data, sparse)
+        del data
+        self.pdg_cache = None
+
         # Edge type distribution
-        edge_counts = Counter()
         edge_names = {v: k for k, v in EDGE_TYPES.items()}
-        for item in self.data:
-            n_real = item['n_edges']
-            for et in item['edge_type'][:n_real]:
-                edge_counts[et] += 1
+        edge_counts = Counter({
+            et: int(count)
+            for et, count in enumerate(np.bincount(self.store.real_edge_types().numpy()))
+            if count > 0
+        })
         print("  Edge type distribution:")
         total_edges = sum(edge_counts.values())
         for et in sorted(edge_counts.keys()):
@@ -131,101 +282,70 @@ class GINEDatasetV38(Dataset):
 
         len_before = len(sequence)
 
-        # Strip boilerplate
-        if self.strip_bp:
-            sequence = strip_boilerplate(sequence)
-
-        len_after = len(sequence)
-        was_stripped = len_after < len_before
-
-        pdg = self.pdg_builder.build(sequence)
-        if len(pdg.nodes) < 2:
+        # Strip boilerplate + build PDG (a cache hit skips both)
+        if self.pdg_cache is not None:
+            graph = self.pdg_cache.get_or_build(sequence)
+        else:
+            graph = build_pdg_arrays(self.pdg_builder, sequence, self.strip_bp)
+        len_after = graph['len_after']
+        if graph['node_features'].shape[0] < 2:
             return None
 
-        n_nodes = min(len(pdg.nodes), self.max_nodes)
-
-        # Get base node features (34-dim) and add positional encoding
-        base_features = pdg.get_node_features(self.max_nodes)  # [max_nodes, 34]
-
-        # Positional encoding: instruction_index / total_instructions
-        pos_enc = np.zeros((self.max_nodes, 1), dtype=np.float32)
-        for i in range(n_nodes):
-            pos_enc[i, 0] = i / max(n_nodes - 1, 1)
-
-        # Concatenate: [max_nodes, 35]
-        node_features = np.concatenate([base_features, pos_enc], axis=1)
-
-        edge_index, edge_type = pdg.get_edge_index_and_type(self.max_nodes)
-        edge_weight = pdg.get_edge_weights(self.max_nodes)
-        n_edges = edge_index.shape[1]
-
-        # Pad or truncate edges
-        if n_edges > self.max_edges:
-            edge_index = edge_index[:, :self.max_edges]
-            edge_type = edge_type[:self.max_edges]
-            edge_weight = edge_weight[:self.max_edges]
-            n_edges = self.max_edges
-        elif n_edges < self.max_edges:
-            pad_size = self.max_edges - n_edges
-            edge_index = np.pad(edge_index, ((0, 0), (0, pad_size)), constant_values=0)
-            edge_type = np.pad(edge_type, (0, pad_size), constant_values=0)
-            edge_weight = np.pad(edge_weight, (0, pad_size), constant_values=0.0)
-
-        node_mask = np.zeros(self.max_nodes, dtype=bool)
-        node_mask[:n_nodes] = True
-        edge_mask = np.zeros(self.max_edges, dtype=bool)
-        edge_mask[:n_edges] = True
-
-        rec_features = rec.get('features', {})
-        handcrafted = np.zeros(len(self.handcrafted_feature_names), dtype=np.float32)
-        for i, name in enumerate(self.handcrafted_feature_names):
-            val = rec_features.get(name, 0.0)
-            if isinstance(val, (int, float)) and np.isfinite(val):
-                handcrafted[i] = np.clip(val, -100, 100)
+        was_stripped = len_after < len_before
 
-        return {
-            'node_features': node_features.astype(np.float32),
-            'edge_index': edge_index.astype(np.int64),
-            'edge_type': edge_type.astype(np.int64),
-            'edge_weight': edge_weight.astype(np.float32),
-            'node_mask': node_mask,
-            'edge_mask': edge_mask,
-            'n_edges': n_edges,
-            'handcrafted': handcrafted,
+        # Positional feature, node/edge caps and (unless sparse) padding + masks
+        item = gine_graph_arrays(graph, self.max_nodes, self.max_edges, pad=not self.sparse)
+        item['handcrafted'] = handcrafted_vector(rec.get('features', {}), self.handcrafted_feature_names)
+        item.update({
             'label': self.label_to_id[label],
             '_len_before': len_before,
             '_len_after': len_after,
             '_was_stripped': was_stripped,
-        }
+        })
+        return item
 
     def __len__(self):
-        return len(self.data)
+        return len(self.store)
 
     def __getitem__(self, idx):
-        item = self.data[idx]
-        return {
-            'node_features': torch.from_numpy(item['node_features']),
-            'edge_index': torch.from_numpy(item['edge_index']),
-            'edge_type': torch.from_numpy(item['edge_type']),
-            'edge_weight': torch.from_numpy(item['edge_weight']),
-            'node_mask': torch.from_numpy(item['node_mask']),
-            'edge_mask': torch.from_numpy(item['edge_mask']),
-            'handcrafted': torch.from_numpy(item['handcrafted']),
-            'label': item['label'],
-        }
+        if isinstance(idx, int):
+            return self.store.sample(idx)
+        return self.store.batch(idx)
+
+
+def make_loader(dataset: GINEDatasetV38, batch_size: int, shuffle: bool,
+                num_workers: int = 0) -> DataLoader:
+    """DataLoader whose sampler yields index lists, so each batch is built by
+    GINETensorStore.batch() in one step instead of per-sample __getitem__ + collate."""
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=DEVICE.type == 'cuda',
+        persistent_workers=num_workers > 0,
+    )
 
 
-def collate_fn(batch):
-    return {
-        'node_features': torch.stack([x['node_features'] for x in batch]),
-        'edge_index': torch.stack([x['edge_index'] for x in batch]),
-        'edge_type': torch.stack([x['edge_type'] for x in batch]),
-        'edge_weight': torch.stack([x['edge_weight'] for x in batch]),
-        'node_mask': torch.stack([x['node_mask'] for x in batch]),
-        'edge_mask': torch.stack([x['edge_mask'] for x in batch]),
-        'handcrafted': torch.stack([x['handcrafted'] for x in batch]),
-        'label': torch.tensor([x['label'] for x in batch], dtype=torch.long),
-    }
+def model_forward(model, batch, device, return_projection=False):
+    """Run the model on a padded or sparse GINETensorStore batch."""
+    node_features = batch['node_features'].to(device)
+    edge_index = batch['edge_index'].to(device)
+    edge_type = batch['edge_type'].to(device)
+    edge_weight = batch['edge_weight'].to(device)
+    handcrafted = batch['handcrafted'].to(device)
+
+    if 'batch' in batch:
+        return model.forward_sparse(
+            node_features, edge_index, edge_type, batch['batch'].to(device),
+            handcrafted, return_projection=return_projection, edge_weight=edge_weight,
+        )
+    return model(
+        node_features, edge_index, edge_type, batch['node_mask'].to(device),
+        handcrafted, return_projection=return_projection,
+        edge_mask=batch['edge_mask'].to(device), edge_weight=edge_weight,
+    )
 
 
 # =============================================================================
@@ -243,19 +363,10 @@ def train_epoch(model, loader, optimizer, ce_criterion, con_criterion, device,
     optimizer.zero_grad()
 
     for i, batch in enumerate(tqdm(loader, desc=desc, leave=False)):
-        node_features = batch['node_features'].to(device)
-        edge_index = batch['edge_index'].to(device)
-        edge_type = batch['edge_type'].to(device)
-        edge_weight = batch['edge_weight'].to(device)
-        node_mask = batch['node_mask'].to(device)
-        edge_mask = batch['edge_mask'].to(device)
-        handcrafted = batch['handcrafted'].to(device)
         labels = batch['label'].to(device)
 
-        logits, proj, feat_aux_logits = model(
-            node_features, edge_index, edge_type, node_mask,
-            handcrafted, return_projection=True, edge_mask=edge_mask,
-            edge_weight=edge_weight,
+        logits, proj, feat_aux_logits = model_forward(
+            model, batch, device, return_projection=True,
         )
 
         ce_loss = ce_criterion(logits, labels)
@@ -290,17 +401,9 @@ def evaluate(model, loader, device, desc="Eval"):
     all_labels = []
 
     for batch in tqdm(loader, desc=desc, leave=False):
-        node_features = batch['node_features'].to(device)
-        edge_index = batch['edge_index'].to(device)
-        edge_type = batch['edge_type'].to(device)
-        edge_weight = batch['edge_weight'].to(device)
-        node_mask = batch['node_mask'].to(device)
-        edge_mask = batch['edge_mask'].to(device)
-        handcrafted = batch['handcrafted'].to(device)
         labels = batch['label'].to(device)
 
-        logits = model(node_features, edge_index, edge_type, node_mask, handcrafted,
-                       edge_mask=edge_mask, edge_weight=edge_weight)
+        logits = model_forward(model, batch, device)
 
         preds = logits.argmax(dim=1)
         correct += (preds == labels).sum().item()
@@ -382,7 +485,8 @@ def plot_edge_type_scales(scales_history, edge_names, output_path):
 
 def main():
     parser = argparse.ArgumentParser(description='V38: GINE + boilerplate strip + edge scaling + positional')
-    parser.add_argument('--data', type=str, default='data/features/combined_v25_real_benign.jsonl')
+    parser.add_argument('--data', type=str, default='data/features/combined_v25_real_benign.jsonl',
+                        help='Features JSONL, or a feature store written with --with-sequence')
     parser.add_argument('--output-dir', type=str, default='viz_v38_gine_stripped')
     parser.add_argument('--viz-dir', type=str, default='viz_v38_gine_stripped')
     parser.add_argument('--epochs', type=int, default=100)
@@ -401,6 +505,14 @@ def main():
     parser.add_argument('--no-virtual-node', action='store_true')
     parser.add_argument('--no-strip', action='store_true', help='Disable boilerplate stripping')
     parser.add_argument('--speculative-window', type=int, default=10)
+    parser.add_argument('--pdg-cache', type=str, default=None,
+                        help='Directory for the content-addressed PDG cache (reused across runs)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for parallel PDG construction')
+    parser.add_argument('--sparse', action='store_true',
+                        help='Unpadded concatenated-graph batches (segment ops instead of padding)')
+    parser.add_argument('--loader-workers', type=int, default=0,
+                        help='DataLoader worker processes (they share the dataset tensors)')
 
     args = parser.parse_args()
     tag = "V38 GINE Stripped+EdgeScale+Positional"
@@ -430,16 +542,21 @@ def main():
 
     # Load data
     print(f"Loading data from {args.data}...")
+    if is_feature_store(args.data):
+        store = FeatureStore(args.data)
+        if not store.has_sequences:
+            raise ValueError(f"{args.data} has no sequences; rebuild it with --with-sequence")
+        raw_records = store.records()
+    else:
+        with open(args.data) as f:
+            raw_records = [json.loads(line) for line in f if line.strip()]
     records = []
-    with open(args.data) as f:
-        for line in f:
-            if line.strip():
-                rec = json.loads(line)
-                label = rec.get('label', 'UNKNOWN')
-                if label in ('vuln', 'benign'):
-                    label = rec.get('vuln_label', label.upper() if label == 'benign' else 'UNKNOWN')
-                rec['label'] = label
-                records.append(rec)
+    for rec in raw_records:
+        label = rec.get('label', 'UNKNOWN')
+        if label in ('vuln', 'benign'):
+            label = rec.get('vuln_label', label.upper() if label == 'benign' else 'UNKNOWN')
+        rec['label'] = label
+        records.append(rec)
     print(f"  Loaded {len(records)} records")
 
     label_counts = Counter(r.get('label', 'UNKNOWN') for r in records)
@@ -484,17 +601,23 @@ def main():
         train_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        cache_dir=args.pdg_cache,
+        workers=args.workers,
+        sparse=args.sparse,
     )
     test_dataset = GINEDatasetV38(
         test_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        cache_dir=args.pdg_cache,
+        workers=args.workers,
+        sparse=args.sparse,
     )
 
-    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
-                              collate_fn=collate_fn, num_workers=0)
-    test_loader = DataLoader(test_dataset, batch_size=args.batch_size, shuffle=False,
-                             collate_fn=collate_fn, num_workers=0)
+    train_loader = make_loader(train_dataset, args.batch_size, shuffle=True,
+                               num_workers=args.loader_workers)
+    test_loader = make_loader(test_dataset, args.batch_size, shuffle=False,
+                              num_workers=args.loader_workers)
 
     # Model
     print(f"\nInitializing GINE v38 model...")
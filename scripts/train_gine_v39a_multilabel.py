@@ -57,7 +57,7 @@ from tqdm import tqdm
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from pdg_builder import PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
+from pdg_builder import PDG, PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
 from gine_classifier_v39a import GINEClassifier, HeteroscedasticLoss, SupervisedContrastiveLoss
 from strip_boilerplate import strip_boilerplate
 
@@ -185,6 +185,7 @@ class GINEDatasetV39a(Dataset):
         max_edges: int = MAX_EDGES,
         speculative_window: int = 10,
         strip_bp: bool = True,
+        workers: int = 1,
     ):
         self.label_to_id = label_to_id
         self.num_classes = num_classes
@@ -200,10 +201,15 @@ class GINEDatasetV39a(Dataset):
         total_before = 0
         total_after = 0
 
-        for rec, sl in tqdm(zip(records, soft_labels), total=len(records), desc="Building PDGs"):
+        # (Stripped) sequences, then PDGs built in input order across `workers` processes
+        sequences = [self._pdg_sequence(rec) if sl is not None else []
+                     for rec, sl in zip(records, soft_labels)]
+        pdgs = self.pdg_builder.build_many(sequences, workers=workers)
+        for rec, sl, seq, pdg in tqdm(zip(records, soft_labels, sequences, pdgs),
+                                      total=len(records), desc="Building PDGs"):
             if sl is None:
                 continue
-            item = self._process_record(rec, sl)
+            item = self._process_record(rec, sl, seq, pdg)
             if item is not None:
                 self.data.append(item)
                 total_before += item.get('_len_before', 0)
@@ -218,7 +224,16 @@ class GINEDatasetV39a(Dataset):
             print(f"  Boilerplate stripped: {n_stripped} ({pct:.1f}%) samples")
             print(f"  Instructions: {total_before} -> {total_after} ({reduction:.1f}% reduction)")
 
-    def _process_record(self, rec: Dict, soft_label: np.ndarray) -> Optional[Dict]:
+    def _pdg_sequence(self, rec: Dict) -> List[str]:
+        """(Stripped) sequence _process_record builds a PDG from ([] for skipped records)."""
+        sequence = rec.get('sequence', [])
+        if len(sequence) < 3 or rec.get('label', 'UNKNOWN') not in self.label_to_id:
+            return []
+        return strip_boilerplate(sequence) if self.strip_bp else sequence
+
+    def _process_record(self, rec: Dict, soft_label: np.ndarray,
+                        stripped: Optional[List[str]] = None,
+                        pdg: Optional[PDG] = None) -> Optional[Dict]:
         sequence = rec.get('sequence', [])
         if len(sequence) < 3:
             return None
@@ -229,13 +244,16 @@ class GINEDatasetV39a(Dataset):
 
         len_before = len(sequence)
 
-        if self.strip_bp:
+        if stripped is not None:
+            sequence = stripped
+        elif self.strip_bp:
             sequence = strip_boilerplate(sequence)
 
         len_after = len(sequence)
         was_stripped = len_after < len_before
 
-        pdg = self.pdg_builder.build(sequence)
+        if pdg is None:
+            pdg = self.pdg_builder.build(sequence)
         if len(pdg.nodes) < 2:
             return None
 
@@ -536,6 +554,8 @@ def main():
     parser.add_argument('--no-virtual-node', action='store_true')
     parser.add_argument('--no-strip', action='store_true')
     parser.add_argument('--speculative-window', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for parallel PDG construction')
 
     args = parser.parse_args()
     tag = "V39a GINE Multi-Label+Aleatoric"
@@ -634,11 +654,13 @@ def main():
         train_records, train_soft, label_to_id, num_classes, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        workers=args.workers,
     )
     test_dataset = GINEDatasetV39a(
         test_records, test_soft, label_to_id, num_classes, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        workers=args.workers,
     )
 
     train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
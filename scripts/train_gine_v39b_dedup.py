@@ -43,7 +43,7 @@ from tqdm import tqdm
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from pdg_builder import PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
+from pdg_builder import PDG, PDGBuilder, EDGE_TYPES, NUM_EDGE_TYPES
 from gine_classifier import GINEClassifier, SupervisedContrastiveLoss
 from strip_boilerplate import strip_boilerplate
 
@@ -189,6 +189,7 @@ class GINEDatasetV39b(Dataset):
         max_edges: int = MAX_EDGES,
         speculative_window: int = 10,
         strip_bp: bool = True,
+        workers: int = 1,
     ):
         self.label_to_id = label_to_id
         self.handcrafted_feature_names = handcrafted_feature_names
@@ -203,8 +204,12 @@ class GINEDatasetV39b(Dataset):
         total_before = 0
         total_after = 0
 
-        for rec in tqdm(records, desc="Building PDGs"):
-            item = self._process_record(rec)
+        # (Stripped) sequences, then PDGs built in input order across `workers` processes
+        sequences = [self._pdg_sequence(rec) for rec in records]
+        pdgs = self.pdg_builder.build_many(sequences, workers=workers)
+        for rec, seq, pdg in tqdm(zip(records, sequences, pdgs), total=len(records),
+                                  desc="Building PDGs"):
+            item = self._process_record(rec, seq, pdg)
             if item is not None:
                 self.data.append(item)
                 total_before += item.get('_len_before', 0)
@@ -219,7 +224,15 @@ class GINEDatasetV39b(Dataset):
             print(f"  Boilerplate stripped: {n_stripped} ({pct:.1f}%) samples")
             print(f"  Instructions: {total_before} -> {total_after} ({reduction:.1f}% reduction)")
 
-    def _process_record(self, rec: Dict) -> Optional[Dict]:
+    def _pdg_sequence(self, rec: Dict) -> List[str]:
+        """(Stripped) sequence _process_record builds a PDG from ([] for skipped records)."""
+        sequence = rec.get('sequence', [])
+        if len(sequence) < 3 or rec.get('label', 'UNKNOWN') not in self.label_to_id:
+            return []
+        return strip_boilerplate(sequence) if self.strip_bp else sequence
+
+    def _process_record(self, rec: Dict, stripped: Optional[List[str]] = None,
+                        pdg: Optional[PDG] = None) -> Optional[Dict]:
         sequence = rec.get('sequence', [])
         if len(sequence) < 3:
             return None
@@ -230,13 +243,16 @@ class GINEDatasetV39b(Dataset):
 
         len_before = len(sequence)
 
-        if self.strip_bp:
+        if stripped is not None:
+            sequence = stripped
+        elif self.strip_bp:
             sequence = strip_boilerplate(sequence)
 
         len_after = len(sequence)
         was_stripped = len_after < len_before
 
-        pdg = self.pdg_builder.build(sequence)
+        if pdg is None:
+            pdg = self.pdg_builder.build(sequence)
         if len(pdg.nodes) < 2:
             return None
 
@@ -469,6 +485,8 @@ def main():
     parser.add_argument('--no-virtual-node', action='store_true')
     parser.add_argument('--no-strip', action='store_true')
     parser.add_argument('--speculative-window', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for parallel PDG construction')
 
     args = parser.parse_args()
     tag = "V39b GINE Deduplicated"
@@ -562,11 +580,13 @@ def main():
         train_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        workers=args.workers,
     )
     test_dataset = GINEDatasetV39b(
         test_records, label_to_id, feature_names,
         speculative_window=args.speculative_window,
         strip_bp=not args.no_strip,
+        workers=args.workers,
     )
 
     train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
@@ -8,11 +8,15 @@ from typing import List, Tuple
 from collections import Counter
 
 import joblib
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.metrics import classification_report
 from sklearn.model_selection import GroupShuffleSplit, StratifiedShuffleSplit
 
+sys.path.insert(0, str(Path(__file__).parent))
+from feature_store import FeatureStore, is_feature_store
+
 
 def log(msg: str):
     """Print with flush for real-time output."""
@@ -37,9 +41,32 @@ def load_features(path: Path) -> Tuple[List[dict], List[str], List[str], List[fl
     return X, y, g, w
 
 
+def load_feature_store(path: Path):
+    """Dense float32 matrix plus labels/groups/weights from a feature store,
+    and a DictVectorizer fixed to the store's columns (for inference on dicts)."""
+    log(f"Loading feature store from {path}...")
+    store = FeatureStore(path)
+    X = store.matrix()
+    y = store.column("label")
+    g = [grp or label for grp, label in zip(store.column("group"), y)]
+    w = np.nan_to_num(store.float_column("weight"), nan=1.0).astype(float).tolist()
+    vec = DictVectorizer(sparse=True)
+    vec.fit([dict.fromkeys(store.feature_names, 0.0)])
+    log(f"  Total: {len(y)} records")
+    dropped = store.dropped_string_features
+    if dropped is None:
+        log("  WARNING: store does not record dropped string features; string-valued "
+            "features one-hot encoded on the JSONL path may be missing")
+    elif dropped:
+        log(f"  WARNING: {len(dropped)} string-valued features are not in the store and are "
+            f"not trained on (the JSONL path one-hot encodes them): {', '.join(dropped)}")
+    return X, y, g, w, vec
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="inp", type=Path, default=Path("data/dataset/gadgets_features.jsonl"))
+    ap.add_argument("--in", dest="inp", type=Path, default=Path("data/dataset/gadgets_features.jsonl"),
+                    help="Features JSONL or feature store directory (see feature_store.py)")
     ap.add_argument("--model-dir", type=Path, default=Path("models/gadgets"))
     ap.add_argument("--test-size", type=float, default=0.2)
     ap.add_argument("--seed", type=int, default=42)
@@ -51,21 +78,22 @@ def main():
     
     start_time = time.time()
 
-    X_dicts, y, groups, weights = load_features(args.inp)
+    if is_feature_store(args.inp):
+        X, y, groups, weights, vec = load_feature_store(args.inp)
+    else:
+        X_dicts, y, groups, weights = load_features(args.inp)
+        log("\nVectorizing features...")
+        vec = DictVectorizer(sparse=True)
+        X = vec.fit_transform(X_dicts)
     
     # Print label distribution
     label_counts = Counter(y)
     log("\nLabel distribution:")
     for label, count in sorted(label_counts.items(), key=lambda x: -x[1]):
         log(f"  {label}: {count}")
-    
-    log("\nVectorizing features...")
-    vec = DictVectorizer(sparse=True)
-    X = vec.fit_transform(X_dicts)
     log(f"  Feature matrix shape: {X.shape}")
 
     # Build group-level labels for stratification
-    import numpy as np
     groups_arr = np.array(groups)
     y_arr = np.array(y)
     unique_groups = np.unique(groups_arr)